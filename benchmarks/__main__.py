@@ -0,0 +1,159 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+
+import argparse
+import datetime
+import json
+import logging
+import platform
+import subprocess
+import sys
+
+from . import compare
+from . import suite
+from . import workloads
+
+
+LOG = logging.getLogger(__name__)
+
+VERSION = 1
+
+
+def shape_type(value):
+    if value in workloads.SHAPES:
+        return workloads.SHAPES[value]
+    try:
+        return workloads.Shape(*[int(n) for n in value.split("x")])
+    except (TypeError, ValueError):
+        raise argparse.ArgumentTypeError(
+            "Shape must be one of {} or TENANTSxUSERSxSERVERSxSECGROUPSx"
+            "FLOATING_IPS".format(", ".join(sorted(workloads.SHAPES))))
+
+
+def threshold_type(value):
+    metric, _, threshold = value.partition("=")
+    try:
+        return metric, float(threshold)
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            "Threshold must be METRIC=FRACTION, e.g. run_time=0.2")
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(description="Benchmarks of migrations "
+                                                 "on fake clouds.")
+    subparsers = parser.add_subparsers()
+    run_parser = subparsers.add_parser("run", help="Run benchmarks and "
+                                                   "write their metrics.")
+    run_parser.set_defaults(action="run")
+    run_parser.add_argument("benchmarks",
+                            nargs="*",
+                            choices=sorted(suite.BENCHMARKS) + [[]],
+                            help="Benchmarks to run, all by default.")
+    run_parser.add_argument("--shape",
+                            type=shape_type,
+                            default=workloads.SHAPES["small"],
+                            help="Shape of the source cloud: one of {} or "
+                                 "TENANTSxUSERSxSERVERSxSECGROUPSx"
+                                 "FLOATING_IPS with numbers of users, "
+                                 "servers and security groups per tenant. "
+                                 "Defaults to small."
+                                 .format(", ".join(sorted(workloads.SHAPES))))
+    run_parser.add_argument("--seed",
+                            type=int,
+                            default=0,
+                            help="Seed of random values of fake clouds.")
+    run_parser.add_argument("--repeat",
+                            type=int,
+                            default=3,
+                            help="Number of runs of every benchmark, the "
+                                 "best time is reported.")
+    run_parser.add_argument("--output",
+                            type=argparse.FileType("w"),
+                            default=sys.stdout,
+                            help="File to write results in JSON to.")
+    compare_parser = subparsers.add_parser("compare",
+                                           help="Check results for "
+                                                "regressions.")
+    compare_parser.set_defaults(action="compare")
+    compare_parser.add_argument("baseline",
+                                type=argparse.FileType("r"),
+                                help="Results of the baseline run.")
+    compare_parser.add_argument("current",
+                                type=argparse.FileType("r"),
+                                help="Results of the checked run.")
+    compare_parser.add_argument("--threshold",
+                                type=float,
+                                default=0.1,
+                                help="Allowed relative regression of a "
+                                     "metric. Defaults to 0.1.")
+    compare_parser.add_argument("--metric-threshold",
+                                type=threshold_type,
+                                action="append",
+                                default=[],
+                                dest="thresholds",
+                                help="Threshold of a particular metric, "
+                                     "e.g. run_time=0.2.")
+    return parser
+
+
+def get_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"],
+                                       stderr=subprocess.STDOUT).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    names = args.benchmarks or sorted(suite.BENCHMARKS)
+    results = {
+        "version": VERSION,
+        "commit": get_commit(),
+        "created_at": datetime.datetime.utcnow().isoformat(),
+        "python": platform.python_version(),
+        "seed": args.seed,
+        "shape": args.shape._asdict(),
+        "repeat": args.repeat,
+        "benchmarks": suite.run(names, args.shape, args.seed, args.repeat),
+    }
+    json.dump(results, args.output, indent=2, sort_keys=True)
+    args.output.write("\n")
+    return 0
+
+
+def compare_results(args):
+    baseline = json.load(args.baseline)
+    current = json.load(args.current)
+    compare.check_shapes(baseline, current)
+    rows = compare.compare(baseline, current, args.threshold,
+                           dict(args.thresholds))
+    print(compare.format_rows(rows))
+    regressions = [row for row in rows if row[-1]]
+    if regressions:
+        print("{} regression(s) over the threshold".format(len(regressions)))
+        return 1
+    return 0
+
+
+def main():
+    logging.basicConfig(level=logging.WARNING)
+    args = get_parser().parse_args()
+    if args.action == "run":
+        return run(args)
+    return compare_results(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
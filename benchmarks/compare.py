@@ -0,0 +1,79 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+
+import logging
+
+
+LOG = logging.getLogger(__name__)
+
+# NOTE: Metrics which are not listed here are informational and are not
+#       checked for regressions.
+LOWER_IS_BETTER = frozenset(("build_time", "run_time", "stream_time",
+                             "api_calls_per_resource", "build_api_calls",
+                             "src_api_calls", "dst_api_calls",
+                             "memory_growth_kb", "peak_memory_kb"))
+HIGHER_IS_BETTER = frozenset(("throughput_mbps",))
+
+
+def relative_change(baseline, current):
+    if not baseline:
+        return 0.0 if not current else float("inf")
+    return float(current - baseline) / baseline
+
+
+def compare(baseline, current, threshold=0.1, thresholds=None):
+    """Compares metrics of benchmarks of two runs
+
+    Returns a list of `(benchmark, metric, baseline, current, change,
+    regressed)` tuples for every metric present in both runs. A metric
+    is regressed if it got worse by more than `threshold` of the
+    baseline, `thresholds` override it for particular metrics.
+    """
+    thresholds = thresholds or {}
+    rows = []
+    for name, metrics in sorted(current["benchmarks"].iteritems()):
+        base_metrics = baseline["benchmarks"].get(name)
+        if base_metrics is None:
+            LOG.warning("Benchmark %s is missing in the baseline", name)
+            continue
+        for metric, value in sorted(metrics.iteritems()):
+            if metric not in base_metrics:
+                continue
+            base_value = base_metrics[metric]
+            change = relative_change(base_value, value)
+            limit = thresholds.get(metric, threshold)
+            if metric in LOWER_IS_BETTER:
+                regressed = change > limit
+            elif metric in HIGHER_IS_BETTER:
+                regressed = change < -limit
+            else:
+                regressed = False
+            rows.append((name, metric, base_value, value, change, regressed))
+    return rows
+
+
+def check_shapes(baseline, current):
+    for key in ("shape", "seed"):
+        if baseline.get(key) != current.get(key):
+            LOG.warning("Runs have different %s: %r and %r", key,
+                        baseline.get(key), current.get(key))
+
+
+def format_rows(rows):
+    lines = []
+    for name, metric, base_value, value, change, regressed in rows:
+        lines.append("{:<20} {:<24} {:>14.4f} {:>14.4f} {:>+8.1%}{}".format(
+            name, metric, base_value, value, change,
+            "  REGRESSION" if regressed else ""))
+    return "\n".join(lines)
@@ -0,0 +1,201 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+
+import logging
+import multiprocessing
+import resource
+import time
+
+from taskflow import flow as taskflow_flow
+from taskflow.patterns import graph_flow
+
+from pumphouse import context
+from pumphouse import flows
+from pumphouse.cmds import pump
+from pumphouse.tasks import resources as resources_tasks
+from pumphouse.tasks import utils as task_utils
+
+from . import workloads
+
+
+LOG = logging.getLogger(__name__)
+
+CHUNK_SIZE = 65536
+
+BENCHMARKS = {}
+
+
+def benchmark(func):
+    BENCHMARKS[func.__name__] = func
+    return func
+
+
+def get_memory_kb():
+    # NOTE: The maximum resident set size is in kilobytes on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def get_tenant_ids(cloud):
+    return sorted(tenant.id for tenant in cloud.keystone.tenants.list()
+                  if tenant.name.startswith("pumphouse-fake"))
+
+
+def count_tasks(flow):
+    return sum(count_tasks(item) if isinstance(item, taskflow_flow.Flow)
+               else 1 for item in flow)
+
+
+def run_migration(migrate, shape, seed, num_resources, segmented=False):
+    clouds = workloads.Clouds(shape, seed)
+    ctx = context.Context({"provision_server": "image"},
+                          clouds.src, clouds.dst)
+    tenant_ids = get_tenant_ids(clouds.src)
+    start = time.time()
+    if segmented:
+        segments = migrate(ctx, tenant_ids)
+    else:
+        segments = [migrate(ctx, graph_flow.Flow("benchmark"), tenant_ids)]
+    build_time = time.time() - start
+    build_calls = clouds.api_calls()
+    start = time.time()
+    flows.run_segments(segments, ctx.store)
+    run_time = time.time() - start
+    calls = clouds.api_calls()
+    return {
+        "build_time": build_time,
+        "run_time": run_time,
+        "segments": len(segments),
+        "tasks": sum(count_tasks(segment) for segment in segments),
+        "resources": num_resources,
+        "build_api_calls": sum(build_calls.values()),
+        "src_api_calls": calls[clouds.src.name],
+        "dst_api_calls": calls[clouds.dst.name],
+        "api_calls_per_resource":
+            float(sum(calls.values())) / max(num_resources, 1),
+    }
+
+
+@benchmark
+def migrate_resources(shape, seed):
+    """Builds and runs the flow of migration of servers of tenants."""
+    num_resources = shape.tenants * (1 + shape.users + shape.servers +
+                                     shape.secgroups) + shape.floating_ips
+    return run_migration(pump.migrate_resources, shape, seed, num_resources)
+
+
+@benchmark
+def migrate_resources_waves(shape, seed):
+    """Plans migration of servers of tenants in waves and runs them."""
+    num_resources = shape.tenants * (1 + shape.users + shape.servers +
+                                     shape.secgroups) + shape.floating_ips
+    return run_migration(resources_tasks.migrate_resources_waves, shape,
+                         seed, num_resources, segmented=True)
+
+
+@benchmark
+def migrate_identity(shape, seed):
+    """Builds and runs the flow of migration of tenants and users."""
+    num_resources = shape.tenants * (1 + shape.users)
+    return run_migration(pump.migrate_identity, shape, seed, num_resources)
+
+
+class NullReporter(task_utils.UploadReporter):
+    def report(self, absolute):
+        pass
+
+
+@benchmark
+def image_streaming(shape, seed, size=256 * 1024 * 1024):
+    """Streams an image of `size` bytes through the FileProxy."""
+    chunk = b"\0" * CHUNK_SIZE
+    chunks = (chunk for _ in xrange(size // CHUNK_SIZE))
+    proxy = task_utils.FileProxy(chunks, size, NullReporter(None))
+    transferred = 0
+    start = time.time()
+    try:
+        while True:
+            transferred += len(proxy.read(CHUNK_SIZE))
+    except StopIteration:
+        pass
+    elapsed = time.time() - start
+    return {
+        "bytes": transferred,
+        "stream_time": elapsed,
+        "throughput_mbps": transferred / 1048576.0 / max(elapsed, 1e-9),
+    }
+
+
+def run_in_process(conn, name, shape, seed):
+    try:
+        start_memory = get_memory_kb()
+        result = BENCHMARKS[name](shape, seed)
+        peak_memory = get_memory_kb()
+        result["peak_memory_kb"] = peak_memory
+        result["memory_growth_kb"] = peak_memory - start_memory
+        conn.send((result, None))
+    except Exception as exc:
+        LOG.exception("Benchmark %s failed", name)
+        conn.send((None, "{}: {}".format(exc.__class__.__name__, exc)))
+    finally:
+        conn.close()
+
+
+def run_benchmark(name, shape, seed=None):
+    """Runs the benchmark in a separate process
+
+    Memory is measured in a fresh process for every run, so benchmarks
+    do not affect peak memory of each other.
+    """
+    parent_conn, child_conn = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.Process(target=run_in_process,
+                                      args=(child_conn, name, shape, seed))
+    process.start()
+    child_conn.close()
+    try:
+        result, error = parent_conn.recv()
+    except EOFError:
+        result, error = None, "exited with code {}".format(
+            process.exitcode)
+    process.join()
+    if error is not None:
+        raise RuntimeError("Benchmark {} failed: {}".format(name, error))
+    return result
+
+
+# NOTE: Times are the best of repeats, memory is the worst of them.
+AGGREGATES = {
+    "build_time": min,
+    "run_time": min,
+    "stream_time": min,
+    "throughput_mbps": max,
+    "peak_memory_kb": max,
+    "memory_growth_kb": max,
+}
+
+
+def aggregate(results):
+    return dict((key, AGGREGATES.get(key, max)(r[key] for r in results))
+                for key in results[0])
+
+
+def run(names, shape, seed=None, repeat=1):
+    """Runs benchmarks `repeat` times and returns their metrics."""
+    metrics = {}
+    for name in names:
+        results = []
+        for i in xrange(repeat):
+            LOG.info("Running benchmark %s (%d/%d)", name, i + 1, repeat)
+            results.append(run_benchmark(name, shape, seed))
+        metrics[name] = aggregate(results)
+    return metrics
@@ -0,0 +1,102 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+
+import collections
+import logging
+
+from pumphouse import fake
+
+
+LOG = logging.getLogger(__name__)
+
+Shape = collections.namedtuple("Shape", ("tenants", "users", "servers",
+                                         "secgroups", "floating_ips"))
+
+# NOTE: Numbers of users, servers and security groups are per tenant,
+#       floating IPs are assigned to the first servers.
+SHAPES = {
+    "tiny": Shape(tenants=2, users=1, servers=5, secgroups=1,
+                  floating_ips=2),
+    "small": Shape(tenants=10, users=2, servers=20, secgroups=2,
+                   floating_ips=20),
+    "medium": Shape(tenants=50, users=4, servers=40, secgroups=4,
+                    floating_ips=200),
+    "large": Shape(tenants=200, users=5, servers=50, secgroups=5,
+                   floating_ips=1000),
+}
+
+ENDPOINT = {
+    "username": "admin",
+    "password": "admin",
+    "tenant_name": "admin",
+    "auth_url": "http://localhost:5000/v2.0",
+}
+
+
+def make_fake_cloud(name, shape=None, seed=None):
+    """Creates a fake cloud of the shape with a seed
+
+    Calls of services of the cloud are counted by its simulation which
+    has no delays by default.
+    """
+    fake_config = {
+        "seed": seed,
+        "simulation": {"default": {"latency": 0}},
+    }
+    if shape is not None:
+        fake_config["populate"] = {
+            "num_tenants": shape.tenants,
+            "num_users": shape.tenants * shape.users,
+            "num_servers": shape.tenants * shape.servers,
+            "num_secgroups": shape.tenants * shape.secgroups,
+            "num_floating_ips": shape.floating_ips,
+        }
+    cloud = fake.Cloud.from_dict(name, fake.Identity(None), {
+        "endpoint": ENDPOINT,
+        "fake": fake_config,
+    })
+    if shape is not None:
+        with cloud.simulation.bypass():
+            assign_floating_ips(cloud, shape.floating_ips)
+    return cloud
+
+
+def assign_floating_ips(cloud, count):
+    servers = sorted(cloud.nova.servers.list(), key=lambda s: s.name)
+    floating_ips = sorted(cloud.nova.floating_ips_bulk.list(),
+                          key=lambda ip: ip.address)
+    for server, floating_ip in zip(servers, floating_ips[:count]):
+        addresses = next(server.addresses.itervalues())
+        cloud.nova.servers.add_floating_ip(server, floating_ip.address,
+                                           addresses[0]["addr"])
+
+
+class Clouds(object):
+    """Source and destination fake clouds of a benchmark
+
+    :param shape:   an instance of :class:`Shape` of the source cloud
+    :param seed:    a seed of random values of the clouds
+    """
+
+    def __init__(self, shape, seed=None):
+        self.src = make_fake_cloud("source", shape, seed)
+        self.dst = make_fake_cloud("destination", seed=seed)
+
+    def api_calls(self):
+        """Returns numbers of calls of services of both clouds."""
+        calls = collections.Counter()
+        for cloud in (self.src, self.dst):
+            for stats in cloud.simulation.report().itervalues():
+                calls[cloud.name] += stats.get("calls", 0)
+        return calls
@@ -14,6 +14,7 @@
 
 from functools import wraps
 from keystoneclient.exceptions import Unauthorized
+import requests
 import sys
 import urllib2
 
@@ -70,13 +71,19 @@ class ParserException(FuelClientException):
 def handle_exceptions(exc):
     """handle_exceptions - exception handling manager.
     """
-    if isinstance(exc, urllib2.HTTPError):
+    if isinstance(exc, requests.HTTPError):
+        error_body = exc.response.text
+        exit_with_error("{0} {1}".format(
+            exc,
+            "({0})".format(error_body or "")
+        ))
+    elif isinstance(exc, urllib2.HTTPError):
         error_body = exc.read()
         exit_with_error("{0} {1}".format(
             exc,
             "({0})".format(error_body or "")
         ))
-    elif isinstance(exc, urllib2.URLError):
+    elif isinstance(exc, (urllib2.URLError, requests.ConnectionError)):
         exit_with_error("""
         Can't connect to Nailgun server!
         Please modify "SERVER_ADDRESS" and "LISTEN_PORT"
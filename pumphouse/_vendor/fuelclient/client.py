@@ -12,11 +12,17 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
+import contextlib
+import copy
 import json
 import logging
 import os
-import urllib2
+import re
+import threading
+import time
 
+import requests
 import yaml
 
 from keystoneclient import client as auth_client
@@ -30,9 +36,43 @@ from .logs import NullHandler
 logger = logging.getLogger()
 logger.addHandler(NullHandler())
 
+ID_RE = re.compile(r"/\d+(?=/|$)")
+
+
+class RequestStats(object):
+    """Counters and latency of requests to a single endpoint
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+
+    def record(self, elapsed, error=False):
+        self.count += 1
+        if error:
+            self.errors += 1
+        self.total_time += elapsed
+        self.max_time = max(self.max_time, elapsed)
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "total_time": self.total_time,
+            "avg_time": self.total_time / self.count if self.count else 0.0,
+            "max_time": self.max_time,
+        }
+
 
 class Client(object):
     """This class handles API requests
+
+    All requests go through a single session with a pool of keep-alive
+    connections. The keystone token is cached until it is about to
+    expire or rejected by the server. Responses of GET requests can be
+    cached for a short time inside of the `cached` context.
     """
 
     def __init__(self):
@@ -43,6 +83,11 @@ class Client(object):
             "LISTEN_PORT": "8000",
             "KEYSTONE_USER": "admin",
             "KEYSTONE_PASS": "admin",
+            "CONNECT_TIMEOUT": "10",
+            "READ_TIMEOUT": "120",
+            "POOL_SIZE": "10",
+            "TOKEN_STALE_DURATION": "60",
+            "CACHE_TTL": "10",
         }
         if os.path.exists(path_to_config):
             with open(path_to_config, "r") as fh:
@@ -59,23 +104,60 @@ class Client(object):
         self.ostf_root = self.root + "/ostf/"
         self.user = defaults["KEYSTONE_USER"]
         self.password = defaults["KEYSTONE_PASS"]
+        self.timeout = (float(defaults["CONNECT_TIMEOUT"]),
+                        float(defaults["READ_TIMEOUT"]))
+        self.pool_size = int(defaults["POOL_SIZE"])
+        self.token_stale_duration = int(defaults["TOKEN_STALE_DURATION"])
+        self.cache_ttl = float(defaults["CACHE_TTL"])
         self._keystone_client = None
         self._auth_required = None
+        self._auth_lock = threading.Lock()
+        self._session = None
+        self._stats = collections.defaultdict(RequestStats)
+        self._stats_lock = threading.Lock()
+        self._cache = {}
+        self._cache_lock = threading.Lock()
+        self._cache_hits = 0
+        self._cache_misses = 0
+        self._cache_scope = threading.local()
+
+    @property
+    def session(self):
+        if self._session is None:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(
+                pool_connections=self.pool_size,
+                pool_maxsize=self.pool_size)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            self._session = session
+        return self._session
 
     @property
     def auth_token(self):
         if self.auth_required:
-            if not self.keystone_client.auth_token:
-                self.keystone_client.authenticate()
-            return self.keystone_client.auth_token
+            with self._auth_lock:
+                client = self.keystone_client
+                auth_ref = client.auth_ref
+                if (not client.auth_token or auth_ref is None or
+                        auth_ref.will_expire_soon(
+                            self.token_stale_duration)):
+                    client.authenticate()
+                return client.auth_token
         return ''
 
+    def invalidate_token(self):
+        with self._auth_lock:
+            if self._keystone_client is not None:
+                self._keystone_client.auth_ref = None
+
     @property
     def auth_required(self):
         if self._auth_required is None:
-            request = urllib2.urlopen(''.join([self.api_root, 'version']))
-            self._auth_required = json.loads(
-                request.read()).get('auth_required', False)
+            response = self._send("GET", self.api_root + "version",
+                                  auth=False)
+            self._auth_required = response.json().get('auth_required',
+                                                      False)
         return self._auth_required
 
     @property
@@ -107,18 +189,135 @@ class Client(object):
         if self.debug:
             print(message)
 
+    def get_stats(self):
+        """Returns counters and latency of requests by endpoints
+
+        Endpoints are methods with paths of requests where IDs of
+        objects are replaced by the `{id}` placeholder.
+        """
+        with self._stats_lock:
+            return dict((endpoint, stats.to_dict())
+                        for endpoint, stats in self._stats.iteritems())
+
+    def get_cache_stats(self):
+        """Returns numbers of hits and misses of the cache of responses
+
+        Only requests made inside of the `cached` context are counted.
+        """
+        with self._cache_lock:
+            return {"hits": self._cache_hits, "misses": self._cache_misses}
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self._stats.clear()
+        with self._cache_lock:
+            self._cache_hits = 0
+            self._cache_misses = 0
+
+    @contextlib.contextmanager
+    def cached(self, ttl=None):
+        """Caches responses of GET requests made in the current thread
+
+        Cached responses are valid for `ttl` seconds and are dropped
+        when the resource is changed by PUT, POST or DELETE requests.
+        """
+        previous = getattr(self._cache_scope, "ttl", None)
+        self._cache_scope.ttl = self.cache_ttl if ttl is None else ttl
+        try:
+            yield self
+        finally:
+            self._cache_scope.ttl = previous
+
+    def clear_cache(self):
+        with self._cache_lock:
+            self._cache.clear()
+
+    @staticmethod
+    def _path(api):
+        return tuple(api.split("?", 1)[0].strip("/").split("/"))
+
+    def _get_cached(self, api):
+        ttl = getattr(self._cache_scope, "ttl", None)
+        if not ttl:
+            return None
+        with self._cache_lock:
+            entry = self._cache.get(api)
+            if entry is None or entry[1] < time.time():
+                self._cache_misses += 1
+                return None
+            self._cache_hits += 1
+        return copy.deepcopy(entry[2])
+
+    def _set_cached(self, api, data):
+        ttl = getattr(self._cache_scope, "ttl", None)
+        if not ttl:
+            return
+        with self._cache_lock:
+            self._cache[api] = (self._path(api), time.time() + ttl,
+                                copy.deepcopy(data))
+
+    def _invalidate(self, api):
+        """Drops cached responses of the changed resource
+
+        Responses of the resource, its sub-resources and collections it
+        belongs to are dropped. Changes of an environment also drop the
+        list of nodes and data of nodes, but not their attributes.
+        """
+        path = self._path(api)
+        with self._cache_lock:
+            for key, entry in self._cache.items():
+                entry_path = entry[0]
+                common = min(len(path), len(entry_path))
+                if (path[:common] == entry_path[:common] or
+                        path[0] == "clusters" and
+                        entry_path[0] == "nodes" and
+                        len(entry_path) <= 2):
+                    del self._cache[key]
+
+    def _endpoint(self, method, url):
+        path = url.split("?", 1)[0]
+        for root in (self.api_root, self.ostf_root):
+            if path.startswith(root):
+                path = path[len(root) - 1:]
+                break
+        return "{0} {1}".format(method, ID_RE.sub("/{id}", path))
+
+    def _send(self, method, url, data=None, auth=True):
+        headers = {}
+        if data is not None:
+            headers['Content-Type'] = 'application/json'
+        if auth:
+            headers['X-Auth-Token'] = self.auth_token
+        endpoint = self._endpoint(method, url)
+        start = time.time()
+        error = True
+        try:
+            response = self.session.request(method, url, data=data,
+                                            headers=headers,
+                                            timeout=self.timeout)
+            error = response.status_code >= 400
+            return response
+        finally:
+            with self._stats_lock:
+                self._stats[endpoint].record(time.time() - start, error)
+
+    def _request(self, method, url, data=None):
+        response = self._send(method, url, data)
+        if response.status_code == 401 and self.auth_required:
+            # The cached token is rejected, get a new one and try again.
+            self.invalidate_token()
+            response = self._send(method, url, data)
+        response.raise_for_status()
+        return response
+
     def delete_request(self, api):
         """Make DELETE request to specific API with some data
         """
         self.print_debug(
             "DELETE {0}".format(self.api_root + api)
         )
-        opener = urllib2.build_opener(urllib2.HTTPHandler)
-        request = urllib2.Request(self.api_root + api)
-        request.add_header('Content-Type', 'application/json')
-        request.add_header('X-Auth-Token', self.auth_token)
-        request.get_method = lambda: 'DELETE'
-        opener.open(request)
+        self._invalidate(api)
+        self._request('DELETE', self.api_root + api)
         return {}
 
     def put_request(self, api, data):
@@ -129,29 +328,25 @@ class Client(object):
             "PUT {0} data={1}"
             .format(self.api_root + api, data_json)
         )
-        opener = urllib2.build_opener(urllib2.HTTPHandler)
-        request = urllib2.Request(self.api_root + api, data=data_json)
-        request.add_header('Content-Type', 'application/json')
-        request.add_header('X-Auth-Token', self.auth_token)
-        request.get_method = lambda: 'PUT'
-        return json.loads(
-            opener.open(request).read()
-        )
+        self._invalidate(api)
+        return self._request('PUT', self.api_root + api, data_json).json()
 
     def get_request(self, api, ostf=False):
         """Make GET request to specific API
         """
         url = (self.ostf_root if ostf else self.api_root) + api
+        if not ostf:
+            data = self._get_cached(api)
+            if data is not None:
+                return data
         self.print_debug(
             "GET {0}"
             .format(url)
         )
-        opener = urllib2.build_opener(urllib2.HTTPHandler)
-        request = urllib2.Request(url)
-        request.add_header('X-Auth-Token', self.auth_token)
-        return json.loads(
-            opener.open(request).read()
-        )
+        data = self._request('GET', url).json()
+        if not ostf:
+            self._set_cached(api, data)
+        return data
 
     def post_request(self, api, data, ostf=False):
         """Make POST request to specific API with some data
@@ -162,22 +357,13 @@ class Client(object):
             "POST {0} data={1}"
             .format(url, data_json)
         )
-        request = urllib2.Request(
-            url=url,
-            data=data_json,
-            headers={
-                'Content-Type': 'application/json'
-            }
-        )
-        request.add_header('X-Auth-Token', self.auth_token)
+        if not ostf:
+            self._invalidate(api)
+        response = self._request('POST', url, data_json)
         try:
-            response = json.loads(
-                urllib2.urlopen(request)
-                .read()
-            )
+            return response.json()
         except ValueError:
-            response = {}
-        return response
+            return {}
 
     @exceptions_decorator
     def get_fuel_version(self):
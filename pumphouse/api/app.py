@@ -18,8 +18,10 @@ import flask
 
 from . import handlers
 from . import hooks
+from . import jobs
 
 from pumphouse import events
+from pumphouse import limits
 
 
 def create_app():
@@ -55,11 +57,16 @@ def start_app(config=None, **kwargs):
     app.config.setdefault("CLOUDS_RESET", False)
     app.config.setdefault("BIND_HOST", None)
     app.config.setdefault("PLUGINS", None)
+    app.config.setdefault("JOBS", None)
+    app.config.setdefault("LIMITS", None)
     if config is not None:
         app.config.update(config)
     events.init_app(app)
     hooks.source.init_app(app)
     hooks.destination.init_app(app)
+    jobs.init_app(app)
+    if app.config["LIMITS"]:
+        limits.limits.update(app.config["LIMITS"])
     host, port = get_bind_host()
     events.run(app, policy_server=False, host=host, port=port)
 
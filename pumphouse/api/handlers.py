@@ -15,16 +15,22 @@
 import datetime
 import functools
 import gevent
-import os
 import logging
 
 import flask
 
 from . import hooks
+from . import jobs
+from . import metrics
 
 from pumphouse import context
 from pumphouse import events
+from pumphouse import exceptions
 from pumphouse import flows
+from pumphouse import fuel
+from pumphouse import limits
+from pumphouse import pipeline
+from pumphouse import stats
 from pumphouse.tasks import evacuation
 from pumphouse.tasks import resources as resource_tasks
 from pumphouse.tasks import node as node_tasks
@@ -217,11 +223,89 @@ def resources():
     )
 
 
+def submit_job(kind, target, func):
+    try:
+        job = jobs.get_manager().submit(kind, target, func)
+    except exceptions.QueueFull as exc:
+        response = flask.jsonify(error=str(exc))
+        response.status_code = 503
+        return response
+    return flask.jsonify(job.to_dict())
+
+
+@pump.route("/jobs")
+@crossdomain()
+def list_jobs():
+    return flask.jsonify(jobs=[job.to_dict()
+                               for job in jobs.get_manager().list()])
+
+
+@pump.route("/jobs/<job_id>")
+@crossdomain()
+def get_job(job_id):
+    try:
+        job = jobs.get_manager().get(job_id)
+    except exceptions.NotFound:
+        flask.abort(404)
+    return flask.jsonify(job.to_dict())
+
+
+@pump.route("/jobs/<job_id>", methods=["DELETE"])
+@crossdomain()
+def cancel_job(job_id):
+    try:
+        job = jobs.get_manager().cancel(job_id)
+    except exceptions.NotFound:
+        flask.abort(404)
+    return flask.jsonify(job.to_dict())
+
+
+@pump.route("/admin/limits")
+@crossdomain()
+def get_limits():
+    return flask.jsonify(limits.limits.to_dict())
+
+
+@pump.route("/admin/limits/adaptive")
+@crossdomain()
+def get_adaptive_limits():
+    return flask.jsonify(limits.limits.report())
+
+
+@pump.route("/admin/calls")
+@crossdomain()
+def get_calls():
+    return flask.jsonify(dict((stats.format_key(key), call_stats)
+                              for key, call_stats
+                              in stats.calls.get_stats().iteritems()))
+
+
+@pump.route("/metrics")
+def get_metrics():
+    return flask.Response(metrics.render(jobs.get_manager()),
+                          content_type=metrics.CONTENT_TYPE)
+
+
+@pump.route("/admin/limits", methods=["PUT"])
+@crossdomain()
+def update_limits():
+    values = flask.request.get_json(force=True, silent=True)
+    if not isinstance(values, dict):
+        flask.abort(400)
+    try:
+        result = limits.limits.update(values)
+    except exceptions.UsageError as exc:
+        response = flask.jsonify(error=str(exc))
+        response.status_code = 400
+        return response
+    return flask.jsonify(result)
+
+
 @pump.route("/tenants/<tenant_id>", methods=["POST"])
 @crossdomain()
 def migrate_tenant(tenant_id):
     @flask.copy_current_request_context
-    def migrate():
+    def migrate(job):
         config = flask.current_app.config.get("PLUGINS") or {}
         src = hooks.source.connect()
         dst = hooks.destination.connect()
@@ -235,9 +319,14 @@ def migrate_tenant(tenant_id):
         }, namespace="/events")
 
         try:
+            # NOTE: The tenant is migrated by one flow instead of waves,
+            #       so cancelling the job reverts the whole migration.
             flow = resource_tasks.migrate_resources(ctx, tenant_id)
             LOG.debug("Migration flow: %s", flow)
-            result = flows.run_flow(flow, ctx.store)
+            job.track([flow])
+            result = flows.run_flow(flow, ctx.store, green=True,
+                                    cancel=job.cancelled,
+                                    listener=job.on_task)
             LOG.debug("Result of migration: %s", result)
         except Exception:
             msg = ("Error is occured during migration resources of tenant: {}"
@@ -246,24 +335,24 @@ def migrate_tenant(tenant_id):
             events.emit("error", {
                 "message": msg,
             }, namespace="/events")
+            raise
+        finally:
+            events.emit("update", {
+                "id": tenant_id,
+                "cloud": src.name,
+                "type": "tenant",
+                "progress": None,
+                "action": None,
+            }, namespace="/events")
 
-        events.emit("update", {
-            "id": tenant_id,
-            "cloud": src.name,
-            "type": "tenant",
-            "progress": None,
-            "action": None,
-        }, namespace="/events")
-
-    gevent.spawn(migrate)
-    return flask.make_response()
+    return submit_job("migration", tenant_id, migrate)
 
 
 @pump.route("/hosts/<host_id>", methods=["POST"])
 @crossdomain()
 def evacuate_host(host_id):
     @flask.copy_current_request_context
-    def evacuate():
+    def evacuate(job):
         config = flask.current_app.config.get("PLUGINS") or {}
         src = hooks.source.connect()
         dst = hooks.destination.connect()
@@ -279,7 +368,10 @@ def evacuate_host(host_id):
         try:
             flow = evacuation.evacuate_servers(ctx, host_id)
             LOG.debug("Evacuation flow: %s", flow)
-            result = flows.run_flow(flow, ctx.store)
+            job.track([flow])
+            result = flows.run_flow(flow, ctx.store, green=True,
+                                    cancel=job.cancelled,
+                                    listener=job.on_task)
             LOG.debug("Result of evacuation: %s", result)
         except Exception:
             msg = ("Error is occured during evacuating host {}"
@@ -288,29 +380,27 @@ def evacuate_host(host_id):
             events.emit("error", {
                 "message": msg,
             }, namespace="/events")
+            raise
+        finally:
+            events.emit("update", {
+                "id": host_id,
+                "type": "host",
+                "cloud": src.name,
+                "progress": None,
+                "action": None,
+            }, namespace="/events")
 
-        events.emit("update", {
-            "id": host_id,
-            "type": "host",
-            "cloud": src.name,
-            "progress": None,
-            "action": None,
-        }, namespace="/events")
-    gevent.spawn(evacuate)
-    return flask.make_response()
+    return submit_job("evacuation", host_id, evacuate)
 
 
 @pump.route("/hosts/<host_id>", methods=["DELETE"])
 @crossdomain()
 def reassign_host(host_id):
     @flask.copy_current_request_context
-    def reassign():
+    def reassign(job):
         # NOTE(akscram): Initialization of fuelclient.
-        fuel_config = flask.current_app.config["CLOUDS"]["fuel"]["endpoint"]
-        os.environ["SERVER_ADDRESS"] = fuel_config["host"]
-        os.environ["LISTEN_PORT"] = str(fuel_config["port"])
-        os.environ["KEYSTONE_USER"] = fuel_config["username"]
-        os.environ["KEYSTONE_PASS"] = fuel_config["password"]
+        fuel.configure(
+            flask.current_app.config["CLOUDS"]["fuel"]["endpoint"])
 
         src_config = hooks.source.config()
         dst_config = hooks.destination.config()
@@ -326,7 +416,10 @@ def reassign_host(host_id):
 
             flow = node_tasks.reassign_node(ctx, host_id)
             LOG.debug("Reassigning flow: %s", flow)
-            result = flows.run_flow(flow, ctx.store)
+            job.track([flow])
+            result = flows.run_flow(flow, ctx.store, green=True,
+                                    cancel=job.cancelled,
+                                    listener=job.on_task)
             LOG.debug("Result of migration: %s", result)
         except Exception:
             msg = ("Error is occured during reassigning host {}"
@@ -335,9 +428,59 @@ def reassign_host(host_id):
             events.emit("error", {
                 "message": msg,
             }, namespace="/events")
+            raise
+
+    return submit_job("reassignment", host_id, reassign)
+
+
+@pump.route("/hosts", methods=["POST"])
+@crossdomain()
+def convert_hosts():
+    params = flask.request.get_json(force=True, silent=True) or {}
+
+    @flask.copy_current_request_context
+    def convert(job):
+        fuel.configure(
+            flask.current_app.config["CLOUDS"]["fuel"]["endpoint"])
+
+        plugins_config = flask.current_app.config.get("PLUGINS") or {}
+        src_config = hooks.source.config()
+        dst_config = hooks.destination.config()
+        envs_config = {
+            "source": src_config["environment"],
+            "destination": dst_config["environment"],
+        }
 
-    gevent.spawn(reassign)
-    return flask.make_response()
+        try:
+            src = hooks.source.connect()
+            dst = hooks.destination.connect()
+            hostnames = pipeline.select_hosts(src,
+                                              params.get("hosts"),
+                                              params.get("percentage"))
+            progress = pipeline.convert_hosts(
+                plugins_config, envs_config, src, dst, hostnames,
+                max_in_flight=params.get("max_in_flight",
+                                         pipeline.DEFAULT_MAX_IN_FLIGHT),
+                max_evacuations=params.get("max_evacuations", 1),
+                max_reassignments=params.get("max_reassignments", 1),
+                cancel=job.cancelled,
+                listener=job.on_task,
+                track=job.track)
+            LOG.debug("Result of conversion: %s", progress)
+        except Exception:
+            msg = "Error is occured during conversion of hosts"
+            LOG.exception(msg)
+            events.emit("error", {
+                "message": msg,
+            }, namespace="/events")
+            raise
+        if job.cancelled.is_set() and any(
+                status != pipeline.DONE
+                for stages in progress.itervalues()
+                for status in stages.itervalues()):
+            raise exceptions.Cancelled("Conversion of hosts was cancelled")
+
+    return submit_job("conversion", params.get("hosts"), convert)
 
 
 # XXX(akscram): Nothing works without this.
@@ -0,0 +1,250 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+
+import collections
+import logging
+import time
+import uuid
+
+import flask
+import gevent
+import gevent.event
+import gevent.lock
+import gevent.queue
+from taskflow import states
+
+from pumphouse import exceptions
+from pumphouse import flows
+
+
+LOG = logging.getLogger(__name__)
+
+DEFAULT_MAX_RUNNING = 2
+DEFAULT_MAX_QUEUED = 10
+DEFAULT_HISTORY = 100
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+FINISHED_STATES = (SUCCEEDED, FAILED, CANCELLED)
+
+
+class Job(object):
+    """A migration run by the manager
+
+    The function of the job is called with the job itself, it should pass
+    the :attr:`cancelled` event and the :meth:`on_task` listener to
+    :func:`pumphouse.flows.run_flow` and list flows in :meth:`track` to
+    report the progress.
+
+    Only the flow which runs when the job is cancelled is reverted, e.g.
+    hosts of a conversion which were converted before stay done. Tasks
+    which stay done are counted in the `kept` progress, such a job fails
+    instead of being cancelled and is reported as `partial`.
+
+    :param kind:   a type of the job, e.g. `migration`
+    :param target: an ID of the object processed by the job
+    :param func:   a callable which runs the job
+    """
+
+    def __init__(self, kind, target, func):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.target = target
+        self.func = func
+        self.state = QUEUED
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.cancelled = gevent.event.Event()
+        self.total = 0
+        self.done = 0
+        self.reverted = 0
+        self.kept = set()
+
+    @property
+    def finished(self):
+        return self.state in FINISHED_STATES
+
+    def track(self, flows_list):
+        """Counts tasks of flows run by the job"""
+        self.total += sum(len(list(flows.iter_tasks(flow)))
+                          for flow in flows_list)
+
+    def on_task(self, state, details):
+        if state == states.SUCCESS:
+            self.done += 1
+            self.kept.add(details["task_uuid"])
+        elif state == states.REVERTED:
+            self.reverted += 1
+            self.kept.discard(details["task_uuid"])
+
+    @property
+    def partial(self):
+        return self.state in (FAILED, CANCELLED) and bool(self.kept)
+
+    def cancel(self):
+        self.cancelled.set()
+        if self.state == QUEUED:
+            self.finish(CANCELLED)
+
+    def finish(self, state, error=None):
+        self.state = state
+        self.error = error
+        self.finished_at = time.time()
+
+    def run(self):
+        self.state = RUNNING
+        self.started_at = time.time()
+        try:
+            self.func(self)
+        except Exception as exc:
+            if self.cancelled.is_set() and self.kept:
+                LOG.warning("Job %s is cancelled, %d finished tasks are "
+                            "not reverted", self, len(self.kept))
+                self.finish(FAILED, error="Cancelled, {} finished tasks "
+                            "are not reverted".format(len(self.kept)))
+            elif self.cancelled.is_set():
+                self.finish(CANCELLED)
+            else:
+                LOG.exception("Job %s failed", self)
+                self.finish(FAILED, error=str(exc) or type(exc).__name__)
+        else:
+            self.finish(SUCCEEDED)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "target": self.target,
+            "state": self.state,
+            "error": self.error,
+            "cancel_requested": self.cancelled.is_set(),
+            "partial": self.partial,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "progress": {
+                "done": self.done,
+                "total": self.total,
+                "reverted": self.reverted,
+                "kept": len(self.kept),
+            },
+        }
+
+    def __repr__(self):
+        return "<Job(id={!r}, kind={!r}, target={!r}, state={!r})>".format(
+            self.id, self.kind, self.target, self.state)
+
+
+class Manager(object):
+    """Runs jobs from a bounded queue by a limited number of greenlets
+
+    Finished jobs are kept in memory, the oldest of them are dropped when
+    their number exceeds the history.
+
+    :param max_running: a number of jobs run at the same time
+    :param max_queued:  a number of jobs waiting to be run
+    :param history:     a number of finished jobs kept for status requests
+    """
+
+    def __init__(self, max_running=DEFAULT_MAX_RUNNING,
+                 max_queued=DEFAULT_MAX_QUEUED, history=DEFAULT_HISTORY):
+        self.max_running = max(1, max_running)
+        self.history = history
+        self.queue = gevent.queue.Queue(max(1, max_queued))
+        self.jobs = collections.OrderedDict()
+        self.lock = gevent.lock.RLock()
+        self.runners = []
+
+    def start(self):
+        with self.lock:
+            if not self.runners:
+                self.runners = [gevent.spawn(self.work)
+                                for _ in xrange(self.max_running)]
+
+    def stop(self):
+        with self.lock:
+            runners, self.runners = self.runners, []
+        gevent.killall(runners)
+
+    def work(self):
+        while True:
+            job = self.queue.get()
+            if job.state != QUEUED:
+                continue
+            LOG.info("Job %s started", job)
+            job.run()
+            LOG.info("Job %s finished", job)
+            self.trim()
+
+    def submit(self, kind, target, func):
+        """Queues a new job
+
+        Raises :class:`pumphouse.exceptions.QueueFull` if the queue is
+        full.
+        """
+        job = Job(kind, target, func)
+        self.start()
+        with self.lock:
+            try:
+                self.queue.put_nowait(job)
+            except gevent.queue.Full:
+                raise exceptions.QueueFull("Too many jobs are queued")
+            self.jobs[job.id] = job
+        self.trim()
+        return job
+
+    def get(self, job_id):
+        with self.lock:
+            try:
+                return self.jobs[job_id]
+            except KeyError:
+                raise exceptions.NotFound("Job {} not found".format(job_id))
+
+    def list(self):
+        with self.lock:
+            return self.jobs.values()
+
+    def counts(self):
+        """Returns numbers of kept jobs by their states"""
+        with self.lock:
+            return collections.Counter(job.state
+                                       for job in self.jobs.itervalues())
+
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        job.cancel()
+        return job
+
+    def trim(self):
+        with self.lock:
+            finished = [job_id for job_id, job in self.jobs.iteritems()
+                        if job.finished]
+            for job_id in finished[:max(0, len(finished) - self.history)]:
+                del self.jobs[job_id]
+
+
+def init_app(app):
+    """Creates the manager of jobs configured by the `JOBS` section"""
+    config = app.config.get("JOBS") or {}
+    app.extensions["jobs"] = Manager(**config)
+
+
+def get_manager():
+    return flask.current_app.extensions["jobs"]
@@ -0,0 +1,242 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+
+import collections
+import logging
+
+from . import jobs
+
+from pumphouse import fuel
+from pumphouse import limits
+from pumphouse import stats
+
+
+LOG = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+JOB_STATES = (jobs.QUEUED, jobs.RUNNING) + jobs.FINISHED_STATES
+
+
+def escape(value):
+    return (str(value).replace("\\", "\\\\").replace("\n", "\\n")
+            .replace('"', '\\"'))
+
+
+def format_value(value):
+    if value is None:
+        return "NaN"
+    if isinstance(value, (int, long)):
+        return str(value)
+    return repr(float(value))
+
+
+class Exposition(object):
+    """Lines of metrics in the text format of Prometheus"""
+
+    def __init__(self):
+        self.lines = []
+
+    def header(self, name, kind, text):
+        self.lines.append("# HELP {} {}".format(name, text))
+        self.lines.append("# TYPE {} {}".format(name, kind))
+
+    def sample(self, name, value, **labels):
+        if labels:
+            name = "{}{{{}}}".format(name, ",".join(
+                '{}="{}"'.format(key, escape(labels[key]))
+                for key in sorted(labels)))
+        self.lines.append("{} {}".format(name, format_value(value)))
+
+    def metric(self, name, kind, text, samples):
+        """Adds the metric with samples of pairs of labels and values"""
+        self.header(name, kind, text)
+        for labels, value in samples:
+            self.sample(name, value, **labels)
+
+    def histogram(self, name, text, samples):
+        """Adds the histogram with samples of labels and call stats"""
+        self.header(name, "histogram", text)
+        for labels, call_stats in samples:
+            total = 0
+            bounds = call_stats["bounds"] + (float("inf"),)
+            for bound, count in zip(bounds, call_stats["buckets"]):
+                total += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                self.sample(name + "_bucket", total, le=le, **labels)
+            self.sample(name + "_sum", call_stats["total_time"], **labels)
+            self.sample(name + "_count", call_stats["count"], **labels)
+
+    def render(self):
+        return "\n".join(self.lines) + "\n"
+
+
+def merge(call_stats, into):
+    """Adds counters of calls to the statistics of a group of them"""
+    if into is None:
+        return dict(call_stats, buckets=list(call_stats["buckets"]))
+    into["count"] += call_stats["count"]
+    into["total_time"] += call_stats["total_time"]
+    into["buckets"] = [a + b for a, b in zip(into["buckets"],
+                                             call_stats["buckets"])]
+    return into
+
+
+def add_tasks(exposition):
+    tasks = sorted(stats.tasks.get_stats().iteritems())
+    exposition.metric(
+        "pumphouse_tasks_total", "counter",
+        "Number of executed tasks by classes.",
+        (({"task": key[0]}, s["count"]) for key, s in tasks))
+    exposition.metric(
+        "pumphouse_task_failures_total", "counter",
+        "Number of failed tasks by classes.",
+        (({"task": key[0]}, s["errors"]) for key, s in tasks))
+    exposition.histogram(
+        "pumphouse_task_duration_seconds",
+        "Duration of executions of tasks by classes.",
+        (({"task": key[0]}, dict(s, bounds=stats.tasks.bounds))
+         for key, s in tasks))
+    exposition.metric(
+        "pumphouse_flows_running", "gauge",
+        "Number of flows being run.",
+        [({}, stats.flows.value)])
+
+
+def add_jobs(exposition, manager):
+    counts = manager.counts()
+    exposition.metric(
+        "pumphouse_jobs", "gauge",
+        "Number of kept jobs by states.",
+        (({"state": state}, counts[state]) for state in JOB_STATES))
+    exposition.metric(
+        "pumphouse_jobs_queue_depth", "gauge",
+        "Number of jobs waiting to be run.",
+        [({}, counts[jobs.QUEUED])])
+
+
+def add_calls(exposition):
+    calls = sorted(stats.calls.get_stats().iteritems())
+    services = collections.OrderedDict()
+    for (cloud, service, method), call_stats in calls:
+        key = (cloud, service)
+        services[key] = merge(call_stats, services.get(key))
+
+    def method_labels(key):
+        return {"cloud": key[0] or "", "service": key[1], "method": key[2]}
+    exposition.metric(
+        "pumphouse_cloud_calls_total", "counter",
+        "Number of calls of clients of clouds by methods.",
+        ((method_labels(key), s["count"]) for key, s in calls))
+    exposition.metric(
+        "pumphouse_cloud_call_errors_total", "counter",
+        "Number of failed calls of clients of clouds by methods.",
+        ((method_labels(key), s["errors"]) for key, s in calls))
+    exposition.histogram(
+        "pumphouse_cloud_call_duration_seconds",
+        "Latency of calls of clients of clouds by services.",
+        (({"cloud": cloud or "", "service": service},
+          dict(s, bounds=stats.calls.bounds))
+         for (cloud, service), s in services.iteritems()))
+    exposition.metric(
+        "pumphouse_transfer_bytes_total", "counter",
+        "Bytes of images data passed by calls of clouds, its rate is "
+        "the throughput.",
+        ((method_labels(key), s["bytes"]) for key, s in calls
+         if s["bytes"]))
+
+
+def add_limits(exposition):
+    current = limits.limits.to_dict()
+    exposition.metric(
+        "pumphouse_limit_max_tasks", "gauge",
+        "Limit of tasks run at the same time, NaN if not limited.",
+        [({}, current["max_tasks"])])
+    exposition.metric(
+        "pumphouse_limit_bandwidth_bytes", "gauge",
+        "Limit of bytes per second of images data, NaN if not limited.",
+        [({}, current["bandwidth"])])
+    states = sorted(limits.limits.states().iteritems())
+
+    def labels(key):
+        return {"cloud": key[0] or "", "service": key[1]}
+    exposition.metric(
+        "pumphouse_adaptive_limit", "gauge",
+        "Adaptive limit of concurrent calls of services of clouds.",
+        ((labels(key), state["limit"]) for key, state in states))
+    exposition.metric(
+        "pumphouse_adaptive_in_flight", "gauge",
+        "Number of calls of services of clouds being made.",
+        ((labels(key), state["in_flight"]) for key, state in states))
+    exposition.metric(
+        "pumphouse_adaptive_overloads_total", "counter",
+        "Number of calls which found services of clouds overloaded.",
+        ((labels(key), state["overloads"]) for key, state in states))
+
+
+def add_fuel(exposition):
+    watchers = sorted(fuel.watcher_stats().iteritems())
+    exposition.metric(
+        "pumphouse_fuel_poller_ticks_total", "counter",
+        "Number of requests of lists of nodes made by pollers of Fuel.",
+        (({"endpoint": root}, s["ticks"]) for root, s in watchers))
+    exposition.metric(
+        "pumphouse_fuel_poller_failed_ticks_total", "counter",
+        "Number of failed requests of lists of nodes.",
+        (({"endpoint": root}, s["failed_ticks"]) for root, s in watchers))
+    exposition.metric(
+        "pumphouse_fuel_poller_tick_seconds_total", "counter",
+        "Total time of requests of lists of nodes.",
+        (({"endpoint": root}, s["tick_time"]) for root, s in watchers))
+    exposition.metric(
+        "pumphouse_fuel_poller_last_tick_timestamp_seconds", "gauge",
+        "Time of the last request of the list of nodes.",
+        (({"endpoint": root}, s["last_tick"]) for root, s in watchers))
+    exposition.metric(
+        "pumphouse_fuel_poller_subscribers", "gauge",
+        "Number of waiters for changes of nodes.",
+        (({"endpoint": root}, s["subscribers"]) for root, s in watchers))
+    cache = fuel.cache_stats()
+    lookups = cache["hits"] + cache["misses"]
+    exposition.metric(
+        "pumphouse_fuel_cache_hits_total", "counter",
+        "Number of responses of Fuel taken from the cache.",
+        [({}, cache["hits"])])
+    exposition.metric(
+        "pumphouse_fuel_cache_misses_total", "counter",
+        "Number of cacheable requests sent to Fuel.",
+        [({}, cache["misses"])])
+    exposition.metric(
+        "pumphouse_fuel_cache_hit_ratio", "gauge",
+        "Ratio of hits of the cache of responses of Fuel.",
+        [({}, float(cache["hits"]) / lookups if lookups else None)])
+
+
+def render(manager=None):
+    """Returns metrics of the process in the text format of Prometheus
+
+    Metrics are built from counters kept by the process, so the cost of
+    a scrape depends only on numbers of classes of tasks, methods of
+    clients and endpoints of Fuel.
+
+    :param manager: an instance of :class:`pumphouse.api.jobs.Manager`
+    """
+    exposition = Exposition()
+    add_tasks(exposition)
+    if manager is not None:
+        add_jobs(exposition, manager)
+    add_calls(exposition)
+    add_limits(exposition)
+    add_fuel(exposition)
+    return exposition.render()
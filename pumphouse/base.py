@@ -58,6 +58,9 @@ class Service(object):
                     "num_tenants", self.default_num_tenants)
                 kwargs['num_servers'] = self.populate_config.get(
                     "num_servers", self.default_num_servers)
+                for key in ("max_workers", "batch_size"):
+                    if key in self.populate_config:
+                        kwargs[key] = self.populate_config[key]
             if kwargs:
                 management.setup(self.plugins, events,
                                  cloud, self.target, **kwargs)
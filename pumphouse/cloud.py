@@ -13,7 +13,10 @@
 # limitations under the License.
 
 import collections
+import functools
 import logging
+import time
+
 import sqlalchemy as sqla
 
 from novaclient.v1_1 import client as nova_client
@@ -22,9 +25,17 @@ from glanceclient import client as glance
 from cinderclient import client as cinder
 from neutronclient.neutron import client as neutron_client
 
+from pumphouse import limits
+from pumphouse import stats
+
 
 LOG = logging.getLogger(__name__)
 
+# NOTE: Bytes of data of images are counted for these methods, returned
+#       by `images.data` and read from the argument of `images.upload`.
+METERED_RESULTS = frozenset([("glance", "images.data")])
+METERED_ARGUMENTS = {("glance", "images.upload"): (1, "image_data")}
+
 
 class Identity(collections.Mapping):
     select_query = sqla.text("SELECT id, password FROM user "
@@ -101,6 +112,73 @@ class Namespace(NAMESPACE):
                         self.tenant_name, self.auth_url))
 
 
+def get_package(obj):
+    return type(obj).__module__.partition(".")[0]
+
+
+def meter_arguments(method, key, args, kwargs):
+    index, name = METERED_ARGUMENTS[method]
+    if len(args) > index:
+        args = list(args)
+        args[index] = stats.meter(args[index], key, stats.calls)
+    elif name in kwargs:
+        kwargs[name] = stats.meter(kwargs[name], key, stats.calls)
+    return args, kwargs
+
+
+class Service(object):
+    """Passes calls of methods of the client through limits of the service
+
+    Managers of the client are wrapped as well, values returned by
+    methods are not. Calls are counted in :data:`pumphouse.stats.calls`
+    by the cloud, the service and the path of the method.
+
+    :param client:  a client of the service or its manager
+    :param service: a name of the service, e.g. `nova`
+    :param cloud:   a name of the cloud of the client
+    :param path:    a path of the manager in the client, e.g. `servers.`
+    """
+
+    def __init__(self, client, service, cloud=None, path=""):
+        self.client = client
+        self.service = service
+        self.cloud = cloud
+        self.path = path
+
+    def __getattr__(self, attr):
+        value = getattr(self.client, attr)
+        if attr.startswith("_"):
+            return value
+        name = self.path + attr
+        if callable(value):
+            method = (self.service, name)
+            key = (self.cloud,) + method
+
+            @functools.wraps(value)
+            def limited(*args, **kwargs):
+                if method in METERED_ARGUMENTS:
+                    args, kwargs = meter_arguments(method, key, args, kwargs)
+                with limits.limits.call(self.service, self.cloud):
+                    start = time.time()
+                    error = True
+                    try:
+                        result = value(*args, **kwargs)
+                        error = False
+                    finally:
+                        stats.calls.record(key, time.time() - start, error)
+                if method in METERED_RESULTS:
+                    result = stats.meter(result, key, stats.calls)
+                return result
+            return limited
+        if (get_package(value) == get_package(self.client) and
+                not isinstance(value, (dict, list, tuple, set))):
+            return Service(value, self.service, self.cloud, name + ".")
+        return value
+
+    def __repr__(self):
+        return "<Service({!r}, {!r})>".format(self.service, self.client)
+
+
 class Cloud(object):
     """Describes a cloud involved in migration process
 
@@ -118,22 +196,29 @@ class Cloud(object):
         self.name = name
         self.namespace = namespace
         self.identity = identity
-        self.nova = nova_client.Client(self.namespace.username,
-                                       self.namespace.password,
-                                       self.namespace.tenant_name,
-                                       self.namespace.auth_url,
-                                       "compute")
-        self.keystone = keystone_client.Client(**self.namespace.to_dict())
+        self.nova = Service(nova_client.Client(self.namespace.username,
+                                               self.namespace.password,
+                                               self.namespace.tenant_name,
+                                               self.namespace.auth_url,
+                                               "compute"),
+                            "nova", self.name)
+        self.keystone = Service(
+            keystone_client.Client(**self.namespace.to_dict()),
+            "keystone", self.name)
         g_endpoint = self.keystone.service_catalog.get_endpoints()["image"][0]
-        self.glance = glance.Client("2",
-                                    endpoint=g_endpoint["publicURL"],
-                                    token=self.keystone.auth_token)
-        self.cinder = cinder.Client("1",
-                                    self.namespace.username,
-                                    self.namespace.password,
-                                    self.namespace.tenant_name,
-                                    self.namespace.auth_url)
-        self.neutron = neutron_client.Client("2.0", **self.namespace.to_dict())
+        self.glance = Service(glance.Client("2",
+                                            endpoint=g_endpoint["publicURL"],
+                                            token=self.keystone.auth_token),
+                              "glance", self.name)
+        self.cinder = Service(cinder.Client("1",
+                                            self.namespace.username,
+                                            self.namespace.password,
+                                            self.namespace.tenant_name,
+                                            self.namespace.auth_url),
+                              "cinder", self.name)
+        self.neutron = Service(
+            neutron_client.Client("2.0", **self.namespace.to_dict()),
+            "neutron", self.name)
 
     def ping(self):
         try:
@@ -15,13 +15,21 @@
 import argparse
 import collections
 import logging
+import multiprocessing
 import os
+import signal
 
 from pumphouse import exceptions
 from pumphouse import management
 from pumphouse import utils
 from pumphouse import flows
+from pumphouse import fuel
+from pumphouse import limits
 from pumphouse import context
+from pumphouse import pipeline
+from pumphouse import plan
+from pumphouse import shard
+from pumphouse import workers
 from pumphouse.tasks import evacuation as evacuation_tasks
 from pumphouse.tasks import image as image_tasks
 from pumphouse.tasks import identity as identity_tasks
@@ -48,6 +56,84 @@ def load_cloud_driver(is_fake=False):
     return cloud_driver, identity_driver
 
 
+def add_planning_arguments(parser):
+    parser.add_argument("resource",
+                        choices=RESOURCES_MIGRATIONS.keys(),
+                        nargs="?",
+                        default="servers",
+                        help="Specify a type of resources to migrate "
+                             "to the destination cloud.")
+    filter_group = parser.add_mutually_exclusive_group(required=True)
+    filter_group.add_argument("-i", "--ids",
+                              nargs="*",
+                              help="A list of IDs of resource to migrate to "
+                                   "the destination cloud.")
+    filter_group.add_argument("-t", "--tenant",
+                              default=None,
+                              help="Specify ID of a tenant which should be "
+                                   "moved to destination cloud with all "
+                                   "it's resources.")
+    filter_group.add_argument("--host",
+                              default=None,
+                              help="Specify hypervisor hostname to filter "
+                                   "servers designated for migration.")
+    parser.add_argument("--wave-size",
+                        default=resources_tasks.DEFAULT_WAVE_SIZE,
+                        type=int,
+                        help="Number of servers migrated by one engine "
+                             "when resources of tenants are migrated, 0 "
+                             "runs the whole migration with one engine.")
+    parser.add_argument("--planning-workers",
+                        default=context.DEFAULT_PLANNING_WORKERS,
+                        type=int,
+                        help="Number of concurrent requests made to fetch "
+                             "data of servers while their migration is "
+                             "planned.")
+    parser.add_argument("--shard",
+                        type=shard_type,
+                        help="Migrate only a part of resources in the i/N "
+                             "format, e.g. 0/4 is the first of 4 parts, "
+                             "resources are split by their IDs.")
+
+
+def add_run_arguments(parser):
+    parser.add_argument("--leases",
+                        help="A path to the SQLite database of leases "
+                             "shared by shards of the migration, shared "
+                             "resources are created by one of them.")
+    parser.add_argument("--engine",
+                        choices=("parallel", "workers"),
+                        default="parallel",
+                        help="Run tasks in threads of this process or "
+                             "send tasks of clouds to processes started "
+                             "by the worker command.")
+    add_limits_argument(parser)
+
+
+def add_limits_argument(parser):
+    parser.add_argument("--limits",
+                        help="A path to the YAML file of limits of tasks, "
+                             "calls of services, bandwidth and intervals "
+                             "of checks, it is read again on SIGUSR1.")
+
+
+def shard_type(value):
+    try:
+        return shard.parse_shard(value)
+    except exceptions.UsageError as exc:
+        raise argparse.ArgumentTypeError(str(exc))
+
+
+def plan_type(value):
+    try:
+        return plan.load(value)
+    except exceptions.PlanError as exc:
+        raise argparse.ArgumentTypeError(str(exc))
+    except IOError as exc:
+        raise argparse.ArgumentTypeError("Unable to read the plan {}: {}"
+                                         .format(value, exc))
+
+
 def get_parser():
     parser = argparse.ArgumentParser(description="Migration resources through "
                                                  "OpenStack clouds.")
@@ -90,27 +176,41 @@ def get_parser():
                                 type=int,
                                 help="Number of volumes per tenant to create "
                                 "on setup.")
-    migrate_parser.add_argument("resource",
-                                choices=RESOURCES_MIGRATIONS.keys(),
-                                nargs="?",
-                                default="servers",
-                                help="Specify a type of resources to migrate "
-                                     "to the destination cloud.")
-    migrate_filter = migrate_parser.add_mutually_exclusive_group(
-        required=True)
-    migrate_filter.add_argument("-i", "--ids",
-                                nargs="*",
-                                help="A list of IDs of resource to migrate to "
-                                     "the destination cloud.")
-    migrate_filter.add_argument("-t", "--tenant",
-                                default=None,
-                                help="Specify ID of a tenant which should be "
-                                     "moved to destination cloud with all "
-                                     "it's resources.")
-    migrate_filter.add_argument("--host",
-                                default=None,
-                                help="Specify hypervisor hostname to filter "
-                                     "servers designated for migration.")
+    add_planning_arguments(migrate_parser)
+    add_run_arguments(migrate_parser)
+    plan_parser = subparsers.add_parser("plan",
+                                        help="Plan a migration of resources "
+                                             "and save the plan to apply it "
+                                             "later.")
+    plan_parser.set_defaults(action="plan")
+    add_planning_arguments(plan_parser)
+    plan_parser.add_argument("-o", "--output",
+                             default="plan.json.gz",
+                             help="A filename of the plan, files with "
+                                  "the .gz extension are compressed.")
+    apply_parser = subparsers.add_parser("apply",
+                                         help="Perform a migration saved by "
+                                              "the plan command.")
+    apply_parser.set_defaults(action="apply")
+    apply_parser.add_argument("plan",
+                              type=plan_type,
+                              help="A filename of the plan.")
+    add_run_arguments(apply_parser)
+    worker_parser = subparsers.add_parser("worker",
+                                          help="Run tasks of migrations "
+                                               "started with the workers "
+                                               "engine.")
+    worker_parser.set_defaults(action="worker")
+    worker_parser.add_argument("--processes",
+                               default=1,
+                               type=int,
+                               help="Number of worker processes.")
+    worker_parser.add_argument("--threads",
+                               default=workers.DEFAULT_THREADS,
+                               type=int,
+                               help="Number of tasks run by each process "
+                                    "at the same time.")
+    add_limits_argument(worker_parser)
     cleanup_parser = subparsers.add_parser("cleanup",
                                            help="Remove resources from a "
                                                 "destination cloud.")
@@ -120,6 +220,11 @@ def get_parser():
                                 choices=("source", "destination"),
                                 default="destination",
                                 help="Choose a cloud to clean up.")
+    cleanup_parser.add_argument("--max-workers",
+                                default=management.DEFAULT_CLEANUP_WORKERS,
+                                type=int,
+                                help="Number of resources of each type "
+                                     "deleted at the same time.")
     setup_parser = subparsers.add_parser("setup",
                                          help="Create resource in a source "
                                               "cloud for the test purposes.")
@@ -138,6 +243,16 @@ def get_parser():
                               type=int,
                               help="Number of volumes per tenant to create "
                               "on setup.")
+    setup_parser.add_argument("--max-workers",
+                              default=management.DEFAULT_SETUP_WORKERS,
+                              type=int,
+                              help="Number of tenants populated at the same "
+                              "time.")
+    setup_parser.add_argument("--batch-size",
+                              default=management.DEFAULT_BOOT_BATCH_SIZE,
+                              type=int,
+                              help="Number of servers booted by one "
+                              "request.")
     evacuate_parser = subparsers.add_parser("evacuate",
                                             help="Evacuate instances from "
                                                  "the given host.")
@@ -146,11 +261,44 @@ def get_parser():
                                  help="The hostname of the host for "
                                       "evacuation")
     evacuate_parser = subparsers.add_parser("reassign",
-                                            help="Reassign the given host "
+                                            help="Reassign the given hosts "
                                                  "from one cloud to another.")
     evacuate_parser.set_defaults(action="reassign")
-    evacuate_parser.add_argument("hostname",
-                                 help="The hostname of the host to reassign.")
+    evacuate_parser.add_argument("hostnames",
+                                 nargs="+",
+                                 help="The hostnames of hosts to reassign, "
+                                      "changes are deployed once for all "
+                                      "of them.")
+    convert_parser = subparsers.add_parser("convert",
+                                           help="Evacuate and reassign hosts "
+                                                "one after another with "
+                                                "overlapping.")
+    convert_parser.set_defaults(action="convert")
+    convert_filter = convert_parser.add_mutually_exclusive_group(
+        required=True)
+    convert_filter.add_argument("hostnames",
+                                nargs="*",
+                                default=[],
+                                help="The hostnames of hosts to convert.")
+    convert_filter.add_argument("--percentage",
+                                type=float,
+                                help="Convert the percentage of all "
+                                     "compute hosts of the source cloud.")
+    convert_parser.add_argument("--max-in-flight",
+                                default=pipeline.DEFAULT_MAX_IN_FLIGHT,
+                                type=int,
+                                help="Number of hosts processed at the "
+                                     "same time.")
+    convert_parser.add_argument("--max-evacuations",
+                                default=1,
+                                type=int,
+                                help="Number of hosts evacuated at the "
+                                     "same time.")
+    convert_parser.add_argument("--max-reassignments",
+                                default=1,
+                                type=int,
+                                help="Number of hosts reassigned at the "
+                                     "same time.")
     return parser
 
 
@@ -167,6 +315,9 @@ def migrate_volumes(ctx, flow, ids):
 def migrate_images(ctx, flow, ids):
     for image in ctx.src_cloud.glance.images.list():
         if image.id in ids:
+            # NOTE: Listed images are complete, they are not fetched
+            #       again during planning.
+            ctx.fetch(("image", image.id), lambda: image)
             image_flow = image_tasks.migrate_image(
                 ctx, image.id)
             flow.add(image_flow)
@@ -276,9 +427,43 @@ RESOURCES_MIGRATIONS = collections.OrderedDict([
 ])
 
 
+def plan_migration(ctx, resource, ids, wave_size):
+    """Returns a list of flows of the migration to run one by one"""
+    if resource == "resources" and wave_size > 0:
+        return resources_tasks.migrate_resources_waves(ctx, ids, wave_size)
+    migrate_function = RESOURCES_MIGRATIONS[resource]
+    return [migrate_function(ctx, graph_flow.Flow("migrate-resources"), ids)]
+
+
+def load_leases(path):
+    if path is None:
+        return None
+    return shard.Leases(path)
+
+
+def load_broker(config, engine):
+    if engine != "workers":
+        return None
+    return workers.Broker.from_config(config.get("WORKERS"))
+
+
+def run_worker(config, Cloud, Identity, threads, limits_path=None):
+    if limits_path is not None:
+        limits.watch(limits_path)
+    clouds_config = config["CLOUDS"]
+    src = init_client(clouds_config["source"], "source", Cloud, Identity)
+    dst = init_client(clouds_config["destination"], "destination", Cloud,
+                      Identity)
+    worker = load_broker(config, "workers").worker(src, dst, threads=threads)
+    try:
+        worker.run()
+    except KeyboardInterrupt:
+        worker.stop()
+
+
 class Events(object):
     def emit(self, event, *args, **kwargs):
-        LOG.info("Event {!r}: {}, {}".format(args, kwargs))
+        LOG.info("Event %r: %s, %s", event, args, kwargs)
 
 
 def init_client(config, name, client_class, identity_class):
@@ -296,24 +481,24 @@ def main():
     Cloud, Identity = load_cloud_driver(is_fake=args.fake)
     clouds_config = args.config["CLOUDS"]
     plugins_config = args.config["PLUGINS"]
-    if args.action == "migrate":
-        flow = graph_flow.Flow("migrate-resources")
-        store = {}
+    if args.action in ("migrate", "apply") and args.limits is not None:
+        limits.watch(args.limits)
+    if args.action in ("migrate", "plan"):
         src_config = clouds_config["source"]
         src = init_client(src_config,
                           "source",
                           Cloud,
                           Identity)
-        if args.setup:
+        if args.action == "migrate" and args.setup:
             workloads = clouds_config["source"].get("workloads", {})
-            management.setup(events, src, "source", args.num_tenants,
+            management.setup(plugins_config, events, src, "source",
+                             args.num_tenants,
                              args.num_servers, args.num_volumes, workloads)
         dst_config = clouds_config["destination"]
         dst = init_client(dst_config,
                           "destination",
                           Cloud,
                           Identity)
-        migrate_function = RESOURCES_MIGRATIONS[args.resource]
         if args.ids:
             ids = args.ids
         elif args.tenant:
@@ -322,21 +507,67 @@ def main():
             ids = get_ids_by_host(src, args.resource, args.host)
         else:
             raise exceptions.UsageError("Missing tenant ID")
-        ctx = context.Context(plugins_config, src, dst)
-        resources_flow = migrate_function(ctx, flow, ids)
+        if args.shard is not None:
+            ids = args.shard.select(ids)
+            LOG.info("Shard %s migrates %d of resources: %s", args.shard,
+                     len(ids), ", ".join(ids))
+        ctx = context.Context(plugins_config, src, dst,
+                              planning_workers=args.planning_workers)
         if (args.dump):
+            migrate_function = RESOURCES_MIGRATIONS[args.resource]
+            resources_flow = migrate_function(
+                ctx, graph_flow.Flow("migrate-resources"), ids)
             with open(args.dump, "w") as f:
                 utils.dump_flow(resources_flow, f, True)
             return 0
-
-        flows.run_flow(resources_flow, ctx.store)
+        segments = plan_migration(ctx, args.resource, ids, args.wave_size)
+        if args.action == "plan":
+            plan.save(plan.make_plan(ctx, segments, args.resource, ids),
+                      args.output)
+            return 0
+        flows.run_segments(segments, ctx.store,
+                           leases=load_leases(args.leases),
+                           broker=load_broker(args.config, args.engine))
+    elif args.action == "apply":
+        src = init_client(clouds_config["source"],
+                          "source",
+                          Cloud,
+                          Identity)
+        dst = init_client(clouds_config["destination"],
+                          "destination",
+                          Cloud,
+                          Identity)
+        segments, store = plan.load_plan(args.plan, src, dst)
+        flows.run_segments(segments, store,
+                           leases=load_leases(args.leases),
+                           broker=load_broker(args.config, args.engine))
+    elif args.action == "worker":
+        processes = [multiprocessing.Process(target=run_worker,
+                                             args=(args.config, Cloud,
+                                                   Identity, args.threads,
+                                                   args.limits))
+                     for _ in xrange(args.processes)]
+        for process in processes:
+            process.start()
+
+        def forward_signal(signum, frame):
+            for process in processes:
+                os.kill(process.pid, signum)
+        signal.signal(signal.SIGUSR1, forward_signal)
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            for process in processes:
+                process.join()
     elif args.action == "cleanup":
         cloud_config = clouds_config[args.target]
         cloud = init_client(cloud_config,
                             args.target,
                             Cloud,
                             Identity)
-        management.cleanup(events, cloud, args.target)
+        management.cleanup(events, cloud, args.target,
+                           max_workers=args.max_workers)
     elif args.action == "setup":
         src_config = clouds_config["source"]
         src = init_client(src_config,
@@ -348,7 +579,9 @@ def main():
                          args.num_tenants,
                          args.num_servers,
                          args.num_volumes,
-                         workloads)
+                         workloads,
+                         max_workers=args.max_workers,
+                         batch_size=args.batch_size)
     elif args.action == "evacuate":
         src = init_client(clouds_config["source"],
                           "source",
@@ -366,11 +599,7 @@ def main():
             return
         flows.run_flow(flow, ctx.store)
     elif args.action == "reassign":
-        fuel_config = clouds_config["fuel"]["endpoint"]
-        os.environ["SERVER_ADDRESS"] = fuel_config["host"]
-        os.environ["LISTEN_PORT"] = str(fuel_config["port"])
-        os.environ["KEYSTONE_USER"] = fuel_config["username"]
-        os.environ["KEYSTONE_PASS"] = fuel_config["password"]
+        fuel.configure(clouds_config["fuel"]["endpoint"])
 
         src_config = clouds_config["source"]
         dst_config = clouds_config["destination"]
@@ -387,12 +616,43 @@ def main():
                           Cloud,
                           Identity)
         ctx = context.Context(config, src, dst)
-        flow = reassignment_tasks.reassign_node(ctx, args.hostname)
+        if len(args.hostnames) == 1:
+            flow = reassignment_tasks.reassign_node(ctx, args.hostnames[0])
+        else:
+            flow = reassignment_tasks.reassign_nodes(ctx, args.hostnames)
         if (args.dump):
             with open(args.dump, "w") as f:
                 utils.dump_flow(flow, f, True)
             return
         flows.run_flow(flow, ctx.store)
+    elif args.action == "convert":
+        fuel.configure(clouds_config["fuel"]["endpoint"])
+
+        src_config = clouds_config["source"]
+        dst_config = clouds_config["destination"]
+        envs_config = {
+            "source": src_config["environment"],
+            "destination": dst_config["environment"],
+        }
+        src = init_client(src_config,
+                          "source",
+                          Cloud,
+                          Identity)
+        dst = init_client(dst_config,
+                          "destination",
+                          Cloud,
+                          Identity)
+        hostnames = pipeline.select_hosts(src, args.hostnames,
+                                          args.percentage)
+        progress = pipeline.convert_hosts(
+            plugins_config, envs_config, src, dst, hostnames,
+            max_in_flight=args.max_in_flight,
+            max_evacuations=args.max_evacuations,
+            max_reassignments=args.max_reassignments)
+        for hostname, stages in progress.iteritems():
+            LOG.info("Host %s: %s", hostname,
+                     ", ".join("{} {}".format(stage, status)
+                               for stage, status in stages.iteritems()))
 
 if __name__ == "__main__":
     main()
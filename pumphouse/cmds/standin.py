@@ -0,0 +1,70 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+
+import argparse
+import logging
+import sys
+import urlparse
+
+from pumphouse import fake
+from pumphouse.standin import app
+from pumphouse import utils
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(description="Serves a fake cloud over "
+                                                 "OpenStack APIs for clients "
+                                                 "of real clouds.")
+    parser.add_argument("config",
+                        type=utils.safe_load_yaml,
+                        help="A filename of a configuration of clouds "
+                             "endpoints and a strategy.")
+    parser.add_argument("--cloud",
+                        default="source",
+                        choices=("source", "destination"),
+                        help="A name of the cloud in the configuration "
+                             "to serve.")
+    parser.add_argument("--host",
+                        default=None,
+                        help="An address to listen on, the host of the "
+                             "auth_url of the cloud by default.")
+    parser.add_argument("--port",
+                        default=None,
+                        type=int,
+                        help="A port to listen on, the port of the "
+                             "auth_url of the cloud by default, 0 for any "
+                             "free port.")
+    return parser
+
+
+def main():
+    args = get_parser().parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    cloud_config = args.config["CLOUDS"][args.cloud]
+    auth_url = urlparse.urlparse(cloud_config["endpoint"]["auth_url"])
+    host = args.host or auth_url.hostname or "127.0.0.1"
+    port = args.port if args.port is not None else auth_url.port or 0
+    cloud = fake.Cloud.from_dict(args.cloud, fake.Identity(None),
+                                 cloud_config)
+    server = app.Server(cloud, host=host, port=port)
+    # NOTE: The parent process reads the endpoint from the first line of
+    #       the output when the port is chosen by the system.
+    sys.stdout.write("{}\n".format(server.auth_url))
+    sys.stdout.flush()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
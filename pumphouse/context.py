@@ -13,13 +13,19 @@
 # limitations under the License.
 
 import logging
+import threading
+
+from concurrent import futures
 
 
 LOG = logging.getLogger(__name__)
 
+DEFAULT_PLANNING_WORKERS = 8
+
 
 class Context(object):
-    def __init__(self, config, src_cloud, dst_cloud, store=None):
+    def __init__(self, config, src_cloud, dst_cloud, store=None,
+                 planning_workers=DEFAULT_PLANNING_WORKERS):
         self.config = config
         self.src_cloud = src_cloud
         self.dst_cloud = dst_cloud
@@ -27,3 +33,54 @@ class Context(object):
             self.store = {}
         else:
             self.store = store
+        self.store_lock = threading.Lock()
+        self.planning_workers = planning_workers
+        self.cache = {}
+        self.cache_lock = threading.Lock()
+
+    def claim(self, key, value=None):
+        """Sets the value of the key in the store if it is not set yet
+
+        The check and the update are atomic, so only one of flows planned
+        at the same time adds tasks bound to the key.
+
+        :returns: True if the key was claimed by this call
+        """
+        with self.store_lock:
+            if key in self.store:
+                return False
+            self.store[key] = value
+            return True
+
+    def fetch(self, key, func, *args, **kwargs):
+        """Returns data for planning of flows cached by the key
+
+        The data is fetched by calling `func` with arguments if it is not
+        cached yet, e.g. by :meth:`prefetch`.
+        """
+        with self.cache_lock:
+            if key in self.cache:
+                return self.cache[key]
+        value = func(*args, **kwargs)
+        with self.cache_lock:
+            return self.cache.setdefault(key, value)
+
+    def prefetch(self, fetchers):
+        """Fetches data for planning of flows concurrently
+
+        At most :attr:`planning_workers` fetchers are run at once. Flows
+        are still built one by one in a fixed order, so they are the same
+        as without prefetching.
+
+        :param fetchers: an iterable of callables which take the context
+                         and fetch data with :meth:`fetch`
+        """
+        with futures.ThreadPoolExecutor(self.planning_workers) as executor:
+            fs = [executor.submit(fetcher, self) for fetcher in fetchers]
+            for future in futures.as_completed(fs):
+                exc = future.exception()
+                if exc is not None:
+                    # NOTE: Failed data is fetched again during planning
+                    #       to raise the error in its place.
+                    LOG.warning("Unable to prefetch data for planning: %s",
+                                exc)
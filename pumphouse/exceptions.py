@@ -20,6 +20,24 @@ from glanceclient import exc as glance_excs  # NOQA
 from cinderclient import exceptions as cinder_excs  # NOQA
 
 
+# These errors are caused by overload or temporary unavailability of
+# services, so failed requests can be repeated safely.
+transient_excs = (
+    nova_excs.OverLimit,
+    nova_excs.RateLimit,
+    nova_excs.ConnectionRefused,
+    cinder_excs.OverLimit,
+    cinder_excs.ConnectionError,
+    glance_excs.CommunicationError,
+    glance_excs.OverLimit,
+    glance_excs.ServiceUnavailable,
+    keystone_excs.ConnectionRefused,
+    keystone_excs.RequestEntityTooLarge,
+    keystone_excs.ServiceUnavailable,
+    keystone_excs.GatewayTimeout,
+)
+
+
 class Error(Exception):
     pass
 
@@ -87,3 +105,23 @@ class CheckRunError(Error):
 
 class CheckTimeout(Error):
     pass
+
+
+class PlanError(Error):
+    pass
+
+
+class Cancelled(Error):
+    pass
+
+
+class LeaseLost(Error):
+    pass
+
+
+class WorkerLost(Error):
+    pass
+
+
+class QueueFull(Error):
+    pass
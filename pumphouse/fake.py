@@ -12,13 +12,23 @@
 # See the License for the specific language governing permissions and#
 # limitations under the License.
 
+# NOTE: The lazy import of _strptime by strptime is not thread-safe.
+import _strptime  # noqa
+import collections
+import contextlib
 import datetime
+import functools
+import inspect
 import random
 import six
 import string
+import threading
 import time
 import uuid
+import weakref
 
+from cinderclient import exceptions as cinder_excs
+from glanceclient import exc as glance_excs
 from novaclient import exceptions as nova_excs
 from keystoneclient.openstack.common.apiclient import exceptions \
     as keystone_excs
@@ -28,6 +38,14 @@ from . import cloud as pump_cloud
 from . import exceptions
 
 
+MISSING = object()
+
+# NOTE: Stores of objects are kept out of items of objects, so
+#       representations of objects do not include whole collections.
+#       Entries are dropped with their stores.
+owners = weakref.WeakValueDictionary()
+
+
 class AttrDict(dict):
     def __init__(self, manager, *args, **kwargs):
         super(AttrDict, self).__init__(*args, **kwargs)
@@ -35,8 +53,115 @@ class AttrDict(dict):
         self._info = self
         self.manager = manager
 
+    def __setattr__(self, name, value):
+        if name == "__dict__":
+            super(AttrDict, self).__setattr__(name, value)
+        else:
+            self[name] = value
+
+    def __setitem__(self, key, value):
+        store = owners.get(id(self))
+        if store is not None:
+            store.set_attr(self, key, value)
+        else:
+            super(AttrDict, self).__setitem__(key, value)
+
     def to_dict(self):
-        return self.copy()
+        obj = self.copy()
+        for key in ("manager", "_info"):
+            obj.pop(key, None)
+        return obj
+
+
+class Store(dict):
+    """Objects of a resource by their IDs
+
+    Objects can be looked up by values of their attributes. The index of
+    an attribute is built on the first lookup by it and is kept up to
+    date when objects are added, removed or changed, so lookups do not
+    scan all objects. IDs of objects with a status which changes in time
+    are kept in `pending` to update only them on listing.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(Store, self).__init__(*args, **kwargs)
+        self.indexes = {}
+        self.pending = set()
+        self.lock = threading.RLock()
+        for obj in self.itervalues():
+            self._attach(obj)
+
+    def __setitem__(self, obj_id, obj):
+        with self.lock:
+            self.pop(obj_id, None)
+            super(Store, self).__setitem__(obj_id, obj)
+            self._attach(obj)
+            for key, index in self.indexes.iteritems():
+                self._index(index, key, obj)
+
+    def __delitem__(self, obj_id):
+        if obj_id not in self:
+            raise KeyError(obj_id)
+        self.pop(obj_id)
+
+    def pop(self, obj_id, *default):
+        with self.lock:
+            if obj_id not in self:
+                return super(Store, self).pop(obj_id, *default)
+            obj = super(Store, self).pop(obj_id)
+            for key, index in self.indexes.iteritems():
+                self._unindex(index, key, obj)
+            self.pending.discard(obj_id)
+            if owners.get(id(obj)) is self:
+                del owners[id(obj)]
+            return obj
+
+    def lookup(self, key, value):
+        """Returns objects with the value of the attribute."""
+        try:
+            hash(value)
+        except TypeError:
+            return [obj for obj in self.values()
+                    if obj.get(key, MISSING) == value]
+        with self.lock:
+            index = self.indexes.get(key)
+            if index is None:
+                index = self.indexes[key] = {}
+                for obj in self.itervalues():
+                    self._index(index, key, obj)
+            return [self[obj_id] for obj_id in index.get(value, ())]
+
+    def set_attr(self, obj, key, value):
+        with self.lock:
+            indexed = (key in self.indexes and
+                       dict.get(self, obj.get("id")) is obj)
+            if indexed:
+                self._unindex(self.indexes[key], key, obj)
+            dict.__setitem__(obj, key, value)
+            if indexed:
+                self._index(self.indexes[key], key, obj)
+
+    def _attach(self, obj):
+        if isinstance(obj, AttrDict):
+            owners[id(obj)] = self
+
+    def _index(self, index, key, obj):
+        value = obj.get(key, MISSING)
+        try:
+            index.setdefault(value, set()).add(obj["id"])
+        except TypeError:
+            pass
+
+    def _unindex(self, index, key, obj):
+        value = obj.get(key, MISSING)
+        try:
+            ids = index.get(value)
+        except TypeError:
+            return
+        if ids is not None:
+            ids.discard(obj["id"])
+            if not ids:
+                del index[value]
 
 
 class TenantAttrDict(AttrDict):
@@ -44,12 +169,301 @@ class TenantAttrDict(AttrDict):
         return self.manager.list_users(self)
 
 
+class ServerAttrDict(AttrDict):
+    def list_security_group(self):
+        return self.manager.list_security_group(self)
+
+
+def nova_error(status, message):
+    if status == 413:
+        return nova_excs.OverLimit(status, message)
+    if status == 429:
+        return nova_excs.RateLimit(status, message)
+    return nova_excs.ClientException(status, message)
+
+
+def cinder_error(status, message):
+    if status == 413:
+        return cinder_excs.OverLimit(status, message)
+    return cinder_excs.ClientException(status, message)
+
+
+def glance_error(status, message):
+    if status == 413:
+        return glance_excs.OverLimit(message)
+    if status == 503:
+        return glance_excs.ServiceUnavailable(message)
+    exc = glance_excs.HTTPException(message)
+    exc.code = status
+    return exc
+
+
+def keystone_error(status, message):
+    if status == 413:
+        return keystone_excs.RequestEntityTooLarge(message=message)
+    if status == 503:
+        return keystone_excs.ServiceUnavailable(message=message)
+    return keystone_excs.HttpError(message=message, http_status=status)
+
+
+SERVICE_ERRORS = {
+    "nova": nova_error,
+    "cinder": cinder_error,
+    "glance": glance_error,
+    "keystone": keystone_error,
+}
+
+# NOTE: The behavior of the `delays` flag used before the simulation
+#       model was configurable.
+DELAYS_SIMULATION = {
+    "glance": {
+        "images.upload": {
+            "latency": {"distribution": "uniform", "min": 5, "max": 15},
+        },
+    },
+    "nova": {
+        "servers.live_migrate": {
+            "latency": {"distribution": "uniform", "min": 5, "max": 10},
+        },
+    },
+}
+
+
+class RateLimiter(object):
+    """Allows a number of requests per period of time"""
+
+    def __init__(self, requests, period=1, status=413):
+        self.requests = requests
+        self.period = period
+        self.status = status
+        self.window = 0
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Returns True if one more request is allowed right now."""
+        with self.lock:
+            window = int(time.time() / self.period)
+            if window != self.window:
+                self.window = window
+                self.count = 0
+            if self.count >= self.requests:
+                return False
+            self.count += 1
+            return True
+
+
+class Behavior(object):
+    """Simulated behavior of a method of a fake service
+
+    :param rng:          an instance of :class:`random.Random`
+    :param latency:      a number of seconds or a dict with a
+                         `distribution` and its parameters: `value` of
+                         constant, `min` and `max` of uniform, `mean` and
+                         `stddev` of normal, `mu` and `sigma` of lognormal,
+                         `mean` of exponential
+    :param bandwidth:    a number of bytes of data transferred per second
+    :param errors:       a dict of HTTP statuses and probabilities of them
+    :param rate_limiter: an instance of :class:`RateLimiter` or None
+    """
+
+    def __init__(self, rng, latency=None, bandwidth=None, errors=None,
+                 rate_limiter=None):
+        self.rng = rng
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.errors = sorted((errors or {}).iteritems())
+        self.rate_limiter = rate_limiter
+
+    def delay(self):
+        latency = self.latency
+        if latency is None:
+            return 0
+        if not isinstance(latency, dict):
+            return latency
+        distribution = latency.get("distribution", "constant")
+        if distribution == "constant":
+            delay = latency["value"]
+        elif distribution == "uniform":
+            delay = self.rng.uniform(latency["min"], latency["max"])
+        elif distribution == "normal":
+            delay = self.rng.normalvariate(latency["mean"],
+                                           latency["stddev"])
+        elif distribution == "lognormal":
+            delay = self.rng.lognormvariate(latency["mu"], latency["sigma"])
+        elif distribution == "exponential":
+            delay = self.rng.expovariate(1.0 / latency["mean"])
+        else:
+            raise exceptions.ConfigError(
+                "Unknown latency distribution: {}".format(distribution))
+        return max(0, delay)
+
+    def error(self):
+        """Returns an HTTP status of the failure of a request or None."""
+        if self.rate_limiter is not None and not self.rate_limiter.acquire():
+            return self.rate_limiter.status
+        if self.errors:
+            chance = self.rng.random()
+            for status, probability in self.errors:
+                if chance < probability:
+                    return status
+                chance -= probability
+        return None
+
+
+class Simulation(object):
+    """A model of latencies, limits and failures of fake services
+
+    Behaviors of methods are configured in the `simulation` subsection
+    of the fake configuration by the name of a service and the name of
+    a method prefixed with its collection, e.g. `servers.create`. The
+    `default` key of a service applies to all methods of the service,
+    the top level `default` key applies to all services. A rate limit
+    is shared by all methods at the level where it is configured.
+    Random values are reproducible with the same `seed` for every
+    method, they differ between runs if the seed is not given.
+
+    :param config: a dict of behaviors of services
+    :param seed:   a seed of random generators
+    """
+
+    def __init__(self, config=None, seed=None):
+        self.config = config or {}
+        self.seed = seed
+        self.behaviors = {}
+        self.rate_limiters = {}
+        self.stats = collections.defaultdict(collections.Counter)
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    @property
+    def enabled(self):
+        return bool(self.config)
+
+    def behavior(self, service, method):
+        key = (service, method)
+        with self.lock:
+            if key not in self.behaviors:
+                self.behaviors[key] = self.make_behavior(service, method)
+            return self.behaviors[key]
+
+    def make_behavior(self, service, method):
+        service_config = self.config.get(service, {})
+        levels = [
+            (("default",), self.config.get("default")),
+            ((service, "default"), service_config.get("default")),
+            ((service, method), service_config.get(method)),
+        ]
+        params = {}
+        rate_limiter = None
+        for level, config in levels:
+            if not config:
+                continue
+            params.update((k, v) for k, v in config.iteritems()
+                          if k != "rate_limit")
+            if "rate_limit" in config:
+                if level not in self.rate_limiters:
+                    self.rate_limiters[level] = RateLimiter(
+                        **config["rate_limit"])
+                rate_limiter = self.rate_limiters[level]
+        if not params and rate_limiter is None:
+            return None
+        if self.seed is None:
+            rng = random.Random()
+        else:
+            rng = random.Random("{}:{}:{}".format(self.seed, service,
+                                                  method))
+        return Behavior(rng, rate_limiter=rate_limiter, **params)
+
+    def call(self, service, method, func, *args, **kwargs):
+        """Calls the method of the service with the simulated behavior
+
+        Only the outermost call is simulated, calls made by fake
+        resources to each other are not.
+        """
+        depth = getattr(self.local, "depth", 0)
+        behavior = None if depth else self.behavior(service, method)
+        if behavior is None:
+            return func(*args, **kwargs)
+        delay = behavior.delay()
+        status = behavior.error()
+        with self.lock:
+            stats = self.stats["{} {}".format(service, method)]
+            stats["calls"] += 1
+            stats["delay"] += delay
+            if status is not None:
+                stats[str(status)] += 1
+        time.sleep(delay)
+        if status is not None:
+            raise SERVICE_ERRORS[service](
+                status, "Simulated failure of {} {}".format(service, method))
+        with self.bypass():
+            return func(*args, **kwargs)
+
+    @contextlib.contextmanager
+    def bypass(self):
+        """Calls made in the context are not simulated."""
+        depth = getattr(self.local, "depth", 0)
+        self.local.depth = depth + 1
+        try:
+            yield
+        finally:
+            self.local.depth = depth
+
+    def transfer(self, service, method, size):
+        """Sleeps for the time of the transfer of `size` bytes."""
+        behavior = self.behavior(service, method)
+        if behavior is None or not behavior.bandwidth:
+            return
+        delay = float(size) / behavior.bandwidth
+        with self.lock:
+            self.stats["{} {}".format(service, method)]["delay"] += delay
+        time.sleep(delay)
+
+    def report(self):
+        """Returns counters of simulated calls, delays and failures."""
+        with self.lock:
+            return dict((name, dict(counters))
+                        for name, counters in self.stats.iteritems())
+
+
+class SimulatedResource(object):
+    """Passes calls of methods of the resource through the simulation"""
+
+    def __init__(self, resource, simulation, service, name):
+        self.resource = resource
+        self.simulation = simulation
+        self.service = service
+        self.name = name
+
+    def __getattr__(self, attr):
+        value = getattr(self.resource, attr)
+        if attr.startswith("_") or not inspect.ismethod(value):
+            return value
+        method = "{}.{}".format(self.name, attr)
+
+        @functools.wraps(value)
+        def simulated(*args, **kwargs):
+            return self.simulation.call(self.service, method, value,
+                                        *args, **kwargs)
+        return simulated
+
+    def __repr__(self):
+        return "<SimulatedResource({!r})>".format(self.resource)
+
+
 class Collection(object):
     def __init__(self, resource_class):
         self.resource_class = resource_class
+        self.name = None
 
     def __get__(self, obj, type):
-        return obj.get_resource(self.resource_class)
+        if self.name is None:
+            self.name = next(name
+                             for klass in type.__mro__
+                             for name, value in vars(klass).iteritems()
+                             if value is self)
+        return obj.get_resource(self.resource_class, self.name)
 
 
 class Resource(object):
@@ -63,15 +477,26 @@ class Resource(object):
 
     def list(self, search_opts=None, filters=None, tenant_id=None,
              project_id=None, instance_uuid=None):
-        for obj in self._iterate_values():
-            self._update_status(obj)
+        self._update_pending()
         return self.objects.values()
 
-    findall = list
+    def findall(self, **kwargs):
+        self._update_pending()
+        return self._findall(**kwargs)
 
     def _update_status(self, obj):
         return obj
 
+    def _update_pending(self):
+        pending = getattr(self.objects, "pending", None)
+        if pending:
+            for obj_id in list(pending):
+                obj = self.objects.get(obj_id)
+                if obj is None:
+                    pending.discard(obj_id)
+                else:
+                    self._update_status(obj)
+
     def create(self, obj):
         self.objects[obj.id] = obj
 
@@ -80,19 +505,15 @@ class Resource(object):
             real_id = id['id']
         else:
             real_id = id
-        for obj_id, obj in self.objects.iteritems():
-            if obj_id == real_id:
-                obj = self._update_status(obj)
-                return obj
+        obj = self.objects.get(real_id)
+        if obj is not None:
+            return self._update_status(obj)
         raise self.NotFound("Not found: {}".format(id))
 
     def find(self, **kwargs):
-        for obj in self._iterate_values():
-            for key, value in kwargs.iteritems():
-                if obj[key] != value:
-                    break
-            else:
-                return obj
+        objects = self._findall(**kwargs)
+        if objects:
+            return objects[0]
         filter_str = ", ".join("{}={}".format(k, v)
                                for k, v in kwargs.iteritems())
         raise self.NotFound("Not found: {}".format(filter_str))
@@ -100,13 +521,22 @@ class Resource(object):
     def _iterate_values(self):
         if isinstance(self.objects, list):
             return self.objects
-        return self.objects.itervalues()
+        # NOTE: A copy of values allows other threads to add objects
+        #       while the list is iterated.
+        return self.objects.values()
 
     def _findall(self, **kwargs):
+        if kwargs and isinstance(self.objects, Store):
+            # NOTE: Objects are looked up by one of attributes in the index
+            #       and checked for the rest of them.
+            key, value = next(kwargs.iteritems())
+            candidates = self.objects.lookup(key, value)
+        else:
+            candidates = self._iterate_values()
         objects = []
-        for obj in self._iterate_values():
+        for obj in candidates:
             for key, value in kwargs.iteritems():
-                if obj[key] != value:
+                if obj.get(key, MISSING) != value:
                     break
             else:
                 objects.append(obj)
@@ -120,17 +550,16 @@ class Resource(object):
         self.objects.pop(obj_id, None)
 
     def _get_user_id(self, username):
-        users_dict = self.cloud.data['keystone']['users']
-        for user_id, user in users_dict.iteritems():
-            if user['name'] == username:
-                return user_id
+        users = self.cloud.data['keystone']['users'].lookup("name", username)
+        if users:
+            return users[0]["id"]
         return
 
     def _get_tenant_id(self, tenant_name):
-        tenants_dict = self.cloud.data['keystone']['tenants']
-        for tenant_id, tenant in tenants_dict.iteritems():
-            if tenant['name'] == tenant_name:
-                return tenant_id
+        tenants = self.cloud.data['keystone']['tenants'].lookup("name",
+                                                                tenant_name)
+        if tenants:
+            return tenants[0]["id"]
         raise exceptions.NotFound()
 
 
@@ -141,9 +570,9 @@ class NovaResource(Resource):
 class Server(NovaResource):
     def random_mac(self):
         mac = [0x00, 0x16, 0x3e,
-               random.randint(0x00, 0x7f),
-               random.randint(0x00, 0xff),
-               random.randint(0x00, 0xff)]
+               self.cloud.random.randint(0x00, 0x7f),
+               self.cloud.random.randint(0x00, 0xff),
+               self.cloud.random.randint(0x00, 0xff)]
         return ':'.join(map(lambda x: "%02x" % x, mac))
 
     def _update_status(self, server, status=None):
@@ -154,9 +583,53 @@ class Server(NovaResource):
             if not self.cloud.delays or delta.total_seconds() > 10:
                 server.updated = datetime.datetime.now().isoformat()
                 server.status = "ACTIVE"
+        if server.status != "BUILDING":
+            self.objects.pending.discard(server.id)
+        return server
+
+    def list(self, search_opts=None):
+        search_opts = search_opts or {}
+        filters = {}
+        tenant_id = search_opts.get("tenant_id", search_opts.get("tenant"))
+        if tenant_id is not None:
+            filters["tenant_id"] = tenant_id
+        if search_opts.get("reservation_id") is not None:
+            filters["reservation_id"] = search_opts["reservation_id"]
+        if filters:
+            return self.findall(**filters)
+        return super(Server, self).list()
+
+    def list_security_group(self, server):
+        server = self.get(server)
+        return [secgroup
+                for group in server["security_groups"]
+                for secgroup in self.cloud.nova.security_groups.findall(
+                    name=group["name"])]
+
+    def create(self, name, image, flavor, nics=[], min_count=None,
+               max_count=None, return_reservation_id=False,
+               reservation_id=None):
+        """Creates servers, several of them by the multiple create request
+
+        Returns the body of the response with the reservation ID of the
+        request if `return_reservation_id` is set, as Nova does.
+        """
+        count = max_count or min_count or 1
+        if reservation_id is None:
+            reservation_id = "r-{}".format(uuid.uuid4().hex[:8])
+        if count > 1:
+            servers = [self.create("{}-{}".format(name, i + 1),
+                                   image, flavor, nics,
+                                   reservation_id=reservation_id)
+                       for i in xrange(count)]
+            server = servers[0]
+        else:
+            server = self._create(name, image, flavor, nics, reservation_id)
+        if return_reservation_id:
+            return {"reservation_id": reservation_id}
         return server
 
-    def create(self, name, image, flavor, nics=[]):
+    def _create(self, name, image, flavor, nics, reservation_id):
         addresses = {}
         server_uuid = uuid.uuid4()
         if isinstance(image, six.string_types):
@@ -185,7 +658,7 @@ class Server(NovaResource):
                 "addr": nic["v4-fixed-ip"],
                 "OS-EXT-IPS:type": "fixed"
             })
-        server = AttrDict(self, {
+        server = ServerAttrDict(self, {
             "OS-EXT-STS:task_state": None,
             "addresses": addresses,
             "image": {"id": image_id, },
@@ -215,8 +688,10 @@ class Server(NovaResource):
             "created": str(datetime.datetime.now()),
             "tenant_id": self.tenant_id,
             "os-extended-volumes:volumes_attached": [],
+            "reservation_id": reservation_id,
             "metadata": {}},)
         self.objects[server.id] = server
+        self.objects.pending.add(server.id)
         return server
 
     def add_floating_ip(self, server_ref, floating_ip, fixed_ip=None):
@@ -226,25 +701,35 @@ class Server(NovaResource):
             "addr": floating_ip,
             "OS-EXT-IPS:type": "floating"
         }
-        floating_ip_list = self.cloud.nova.floating_ips_bulk.list()
+        floating_ip_list = self.cloud.nova.floating_ips_bulk.findall(
+            address=floating_ip)
         if hasattr(server_ref, "id"):
             server_id = server_ref.id
         else:
             server_id = server_ref
         server = self.objects[server_id]
         for net in server["addresses"]:
-            if not fixed_ip:
-                raise NotImplementedError
             for addr in server["addresses"][net]:
-                if addr['addr'] == fixed_ip:
+                # NOTE: Nova associates the floating IP with the first
+                #       fixed IP of the server if none is given.
+                if not fixed_ip or addr['addr'] == fixed_ip:
                     server['addresses'][net].append(floating_ip_addr)
                     server._info = server
                     for ip in floating_ip_list:
-                        if ip.address == floating_ip:
-                            ip['instance_uuid'] = ip['instance_id'] = server_id
+                        ip['instance_uuid'] = ip['instance_id'] = server_id
                     return server
         raise exceptions.NotFound
 
+    def remove_floating_ip(self, server_ref, floating_ip):
+        server = self.get(server_ref)
+        for addresses in server["addresses"].itervalues():
+            addresses[:] = [addr for addr in addresses
+                            if addr["addr"] != floating_ip]
+        for ip in self.cloud.nova.floating_ips_bulk.findall(
+                address=floating_ip):
+            ip['instance_uuid'] = ip['instance_id'] = None
+        return server
+
     def suspend(self, obj_id):
         server = self.get(obj_id)
         server.status = "SUSPENDED"
@@ -258,12 +743,10 @@ class Server(NovaResource):
         return server
 
     def live_migrate(self, server_id, host, block_migration, disk_over_commit):
-        if self.cloud.delays:
-            time.sleep(random.randint(5, 10))
         server = self.get(server_id)
         server.status = "ACTIVE"
         server["OS-EXT-SRV-ATTR:hypervisor_hostname"] = \
-            self.cloud.nova.schedule_server()
+            host or self.cloud.nova.schedule_server()
         server.update = datetime.datetime.now().isoformat()
         return server
 
@@ -275,14 +758,18 @@ class Server(NovaResource):
 
 
 class Image(Resource):
+    NotFound = glance_excs.NotFound
+
     def data(self, id):
+        image = self.get(id)
+        self.cloud.simulation.transfer("glance", "images.data", image.size)
         data = AttrDict(self)
         data._resp = 'xxxxxxxxxxxxxxxxxxxxxxxxxxxxxx'
         return data
 
     def upload(self, image_id, data):
-        if self.cloud.delays:
-            time.sleep(random.randint(5, 15))
+        image = self.get(image_id)
+        self.cloud.simulation.transfer("glance", "images.upload", image.size)
 
     def create(self, **kwargs):
         image_uuid = uuid.uuid4()
@@ -306,6 +793,52 @@ class Image(Resource):
         return image
 
 
+class Volume(Resource):
+    NotFound = cinder_excs.NotFound
+
+    def create(self, size, snapshot_id=None, source_volid=None,
+               display_name=None, display_description=None,
+               volume_type=None, user_id=None, project_id=None,
+               availability_zone=None, metadata=None, imageRef=None):
+        volume = AttrDict(self, {
+            "id": str(uuid.uuid4()),
+            "size": size,
+            "status": "available",
+            "display_name": display_name,
+            "display_description": display_description,
+            "volume_type": volume_type or "None",
+            "availability_zone": availability_zone or "nova",
+            "snapshot_id": snapshot_id,
+            "source_volid": source_volid,
+            "bootable": "true" if imageRef else "false",
+            "attachments": [],
+            "metadata": metadata or {},
+            "created_at": datetime.datetime.now().isoformat(),
+            "os-vol-tenant-attr:tenant_id": self.tenant_id,
+            "os-vol-host-attr:host": self.cloud.nova.schedule_server(),
+        })
+        self.objects[volume.id] = volume
+        return volume
+
+    def upload_to_image(self, volume, force, image_name, container_format,
+                        disk_format):
+        volume = self.get(volume)
+        image = self.cloud.glance.images.create(
+            name=image_name,
+            container_format=container_format,
+            disk_format=disk_format)
+        return None, {
+            "os-volume_upload_image": {
+                "id": volume.id,
+                "image_id": image.id,
+                "image_name": image_name,
+                "container_format": container_format,
+                "disk_format": disk_format,
+                "status": "uploading",
+            },
+        }
+
+
 class Network(NovaResource):
     def create(self, **kwargs):
         net_uuid = uuid.uuid4()
@@ -368,9 +901,7 @@ class Flavor(NovaResource):
 
 class FloatingIP(NovaResource):
     def create(self, pool=None):
-        floating_ips = [obj
-                        for obj in self._iterate_values()
-                        if not obj.project_id]
+        floating_ips = self._findall(project_id=None)
         if len(floating_ips) < 1:
             raise self.NotFound()
         floating_ip = floating_ips[0]
@@ -407,9 +938,8 @@ class FloatingIPBulk(NovaResource):
         return floating_ip
 
     def delete(self, ip_range):
-        for obj_id, obj in self.objects.items():
-            if obj.address == ip_range:
-                self.objects.pop(obj_id, None)
+        for obj in self._findall(address=ip_range):
+            self.objects.pop(obj.id, None)
 
 
 class SecGroup(NovaResource):
@@ -447,12 +977,13 @@ class Hypervisor(NovaResource):
         hypervs = []
         for hyperv in self.objects:
             if hyperv.name == hostname:
-                hyperv = AttrDict(hyperv)
+                hyperv = AttrDict(self, hyperv)
                 if servers:
                     hyperv["servers"] = [
                         {"uuid": s.id}
-                        for s in self.cloud.nova.servers.list()
-                        if s["OS-EXT-SRV-ATTR:hypervisor_hostname"] == hostname
+                        for s in self.cloud.nova.servers.findall(**{
+                            "OS-EXT-SRV-ATTR:hypervisor_hostname": hostname,
+                        })
                     ]
                 hypervs.append(hyperv)
         return hypervs
@@ -462,8 +993,8 @@ class Service(NovaResource):
     def list(self, host=None, binary=None):
         objects = [obj
                    for obj in self.objects
-                   if (host is not None and obj.host == host and
-                       binary is not None and obj.binary == binary)]
+                   if ((host is None or obj.host == host) and
+                       (binary is None or obj.binary == binary))]
         return objects
 
     def disable(self, hostname, binary):
@@ -476,6 +1007,10 @@ class Service(NovaResource):
         service.status = "enabled"
         return service
 
+    def delete(self, service_id):
+        self.objects[:] = [obj for obj in self.objects
+                           if str(obj.id) != str(service_id)]
+
 
 class KeystoneResource(Resource):
     NotFound = keystone_excs.NotFound
@@ -496,9 +1031,7 @@ class Tenant(KeystoneResource):
         pass
 
     def list_users(self, tenant):
-        return [user
-                for user in self.cloud.keystone.users.list()
-                if user.tenantId == tenant.id]
+        return self.cloud.keystone.users.findall(tenantId=tenant.id)
 
 
 class User(KeystoneResource):
@@ -530,23 +1063,20 @@ class Role(KeystoneResource):
         return role
 
     def add_user_role(self, user_id, role_id, tenant):
-        for r_id, role in self.objects.iteritems():
-            if r_id == role_id:
-                break
-        for user in self.cloud.keystone.users.list():
-            if user.id == user_id:
-                if 'roles' in user:
-                    user['roles'].append(role)
-                else:
-                    user['roles'] = [role]
-                return
-        raise exceptions.NotFound()
+        role = self.objects.get(role_id)
+        user = self.cloud.keystone.users.objects.get(user_id)
+        if user is None:
+            raise exceptions.NotFound()
+        if 'roles' in user:
+            user['roles'].append(role)
+        else:
+            user['roles'] = [role]
 
     def roles_for_user(self, user_id, **kwargs):
-        for user in self.cloud.keystone.users.list():
-            if user['id'] == user_id:
-                return user['roles']
-        raise exceptions.NotFound()
+        user = self.cloud.keystone.users.objects.get(user_id)
+        if user is None:
+            raise exceptions.NotFound()
+        return user['roles']
 
 
 class AuthRef(KeystoneResource):
@@ -556,21 +1086,24 @@ class AuthRef(KeystoneResource):
 class BaseService(object):
     def __init__(self, cloud):
         self.cloud = cloud
-        service_name = self.__class__.__name__.lower()
-        self.resources_objects = cloud.get_service(service_name)
+        self.service_name = self.__class__.__name__.lower()
+        self.resources_objects = cloud.get_service(self.service_name)
         self.resources = {}
 
-    def get_resource(self, resource_class):
+    def get_resource(self, resource_class, name):
         if resource_class in self.resources:
             return self.resources[resource_class]
         resource_name = "{}s".format(resource_class.__name__.lower())
         objects = self.get_named_resource(resource_class, resource_name)
-        self.resources[resource_class] = resource = resource_class(self.cloud,
-                                                                   objects)
+        resource = resource_class(self.cloud, objects)
+        if self.cloud.simulation.enabled:
+            resource = SimulatedResource(resource, self.cloud.simulation,
+                                         self.service_name, name)
+        self.resources[resource_class] = resource
         return resource
 
     def get_named_resource(self, resource_class, resource_name):
-        return self.resources_objects.setdefault(resource_name, {})
+        return self.resources_objects.setdefault(resource_name, Store())
 
 
 class Nova(BaseService):
@@ -589,7 +1122,7 @@ class Nova(BaseService):
         services = self.services._findall(status="enabled",
                                           state="up",
                                           binary="nova-compute")
-        service = random.choice(services)
+        service = self.cloud.random.choice(services)
         return service.host
 
     def get_named_resource(self, resource_class, resource_name):
@@ -603,6 +1136,10 @@ class Glance(BaseService):
     images = Collection(Image)
 
 
+class Cinder(BaseService):
+    volumes = Collection(Volume)
+
+
 class Keystone(BaseService):
     tenants = Collection(Tenant)
     users = Collection(User)
@@ -614,11 +1151,20 @@ class Cloud(object):
     default_num_hypervisors = 2
     default_delays = False
 
-    def __init__(self, name, namespace, identity, data=None, fake=None):
+    def __init__(self, name, namespace, identity, data=None, fake=None,
+                 simulation=None):
         self.name = name
         self.namespace = namespace
         self.fake = fake or {}
         self.delays = self.fake.get("delays", self.default_delays)
+        if simulation is None:
+            simulation_config = self.fake.get("simulation")
+            if simulation_config is None and self.delays:
+                simulation_config = DELAYS_SIMULATION
+            simulation = Simulation(simulation_config,
+                                    seed=self.fake.get("seed"))
+        self.simulation = simulation
+        self.random = random.Random(self.fake.get("seed"))
         self.num_hypervisors = self.fake.get("num_hypervisors",
                                              self.default_num_hypervisors)
         self.populate = self.fake.get("populate", {})
@@ -626,12 +1172,15 @@ class Cloud(object):
         self.nova = Nova(self)
         self.keystone = Keystone(self)
         self.glance = Glance(self)
+        self.cinder = Cinder(self)
         if isinstance(identity, Identity):
             self.identity = identity
         else:
             self.identity = Identity(**identity)
         if data is None:
-            self.initialize_data()
+            with self.simulation.bypass():
+                self.initialize_data()
+                self.populate_data()
 
     def ping(self):
         return True
@@ -657,13 +1206,15 @@ class Cloud(object):
             "name": "_member_",
             "id": str(uuid.uuid4()),
         })
-        self.data["keystone"]["tenants"] = {admin_tenant.id: admin_tenant}
-        self.data["keystone"]["roles"] = {admin_role.id: admin_role,
-                                          member_role.id: member_role}
-        self.data["keystone"]["users"] = {admin_user.id: admin_user}
-        hostname_prefix = "".join(random.choice(string.ascii_uppercase)
+        self.data["keystone"]["tenants"] = Store({admin_tenant.id:
+                                                  admin_tenant})
+        self.data["keystone"]["roles"] = Store({admin_role.id: admin_role,
+                                                member_role.id: member_role})
+        self.data["keystone"]["users"] = Store({admin_user.id: admin_user})
+        hostname_prefix = "".join(self.random.choice(string.ascii_uppercase)
                                   for i in (0, 0))
         services = [AttrDict(self.nova, {
+            "id": i + 1,
             "host": "pumphouse-{}-{}".format(hostname_prefix, i),
             "binary": "nova-compute",
             "state": "up",
@@ -671,7 +1222,13 @@ class Cloud(object):
         }) for i in range(self.num_hypervisors)]
         hypervs = [AttrDict(self.nova, {
             "name": s.host,
+            "hypervisor_hostname": s.host,
             "service": s,
+            "memory_mb": 32768,
+            "memory_mb_used": 512,
+            "free_ram_mb": 32256,
+            "vcpus": 16,
+            "vcpus_used": 0,
         }) for s in services]
         secgroup = AttrDict(self.nova, {
             "name": "default",
@@ -712,27 +1269,106 @@ class Cloud(object):
         })
         self.data["nova"]["services"] = services
         self.data["nova"]["hypervisors"] = hypervs
-        self.data["nova"]["secgroups"] = {secgroup.id: secgroup}
-        self.data["nova"]["networks"] = {network.id: network}
+        self.data["nova"]["secgroups"] = Store({secgroup.id: secgroup})
+        self.data["nova"]["networks"] = Store({network.id: network})
+
+    def populate_data(self):
+        """Fills the cloud with objects for load testing
+
+        The number of objects of every type is set in the `populate`
+        section of the fake configuration. Users and security groups are
+        spread over tenants, servers are spread over tenants, their users
+        and security groups, images, flavors and hypervisors evenly, they
+        are active from the start.
+        """
+        num_tenants = self.populate.get("num_tenants", 0)
+        num_users = self.populate.get("num_users", num_tenants)
+        num_secgroups = self.populate.get("num_secgroups", 0)
+        num_servers = self.populate.get("num_servers", 0)
+        num_images = self.populate.get("num_images", 1 if num_servers else 0)
+        num_flavors = self.populate.get("num_flavors",
+                                        1 if num_servers else 0)
+        num_floating_ips = self.populate.get("num_floating_ips", 0)
+        prefix = "pumphouse-fake"
+        tenants = [self.keystone.tenants.create(
+            "{}-tenant-{}".format(prefix, i),
+            description="fake tenant {}".format(i))
+            for i in xrange(num_tenants)]
+        owners = tenants or [self.keystone.tenants.find(
+            name=self.namespace.tenant_name)]
+        users = collections.defaultdict(list)
+        for i in xrange(num_users):
+            tenant = owners[i % len(owners)]
+            users[tenant.id].append(self.keystone.users.create(
+                name="{}-user-{}".format(prefix, i),
+                password="default",
+                email=None,
+                tenant_id=tenant.id))
+        secgroups = collections.defaultdict(list)
+        for i in xrange(num_secgroups):
+            tenant = owners[i % len(owners)]
+            secgroup = self.nova.security_groups.create(
+                "{}-secgroup-{}".format(prefix, i),
+                "fake security group {}".format(i))
+            secgroup.tenant_id = tenant.id
+            secgroups[tenant.id].append(secgroup)
+        images = [self.glance.images.create(
+            name="{}-image-{}".format(prefix, i),
+            disk_format="qcow2",
+            container_format="bare",
+            visibility="public") for i in xrange(num_images)]
+        flavors = [self.nova.flavors.create("{}-flavor-{}".format(prefix, i),
+                                            512, 1, 1)
+                   for i in xrange(num_flavors)]
+        hosts = [service.host for service in self.nova.services.list()]
+        for i in xrange(num_servers):
+            server = self.nova.servers.create(
+                "{}-server-{}".format(prefix, i),
+                images[i % len(images)],
+                flavors[i % len(flavors)])
+            server.status = "ACTIVE"
+            server["OS-EXT-SRV-ATTR:hypervisor_hostname"] = \
+                hosts[i % len(hosts)]
+            if tenants:
+                server.tenant_id = tenants[i % len(tenants)].id
+            # NOTE: The n-th server of a tenant belongs to its n-th user
+            #       and security group.
+            n = i // len(owners)
+            tenant_users = users.get(server.tenant_id)
+            if tenant_users:
+                server.user_id = tenant_users[n % len(tenant_users)].id
+            tenant_secgroups = secgroups.get(server.tenant_id)
+            if tenant_secgroups:
+                secgroup = tenant_secgroups[n % len(tenant_secgroups)]
+                server.security_groups = [{"name": secgroup.name}]
+            self.nova.servers.objects.pending.discard(server.id)
+        for i in xrange(num_floating_ips):
+            self.nova.floating_ips_bulk.create(
+                "172.{}.{}.{}".format(16 + i // 65536 % 16,
+                                      i // 256 % 256, i % 256),
+                pool="{}-pool".format(prefix))
 
     def get_service(self, service_name):
         return self.data.setdefault(service_name, {})
 
     def restrict(self, **kwargs):
         namespace = self.namespace.restrict(**kwargs)
-        return self.__class__(self.name, namespace, self.identity,
-                              data=self.data)
+        cloud = self.__class__(self.name, namespace, self.identity,
+                               data=self.data, fake=self.fake,
+                               simulation=self.simulation)
+        cloud.random = self.random
+        return cloud
 
     @classmethod
-    def from_dict(cls, name, endpoint, identity, **kwargs):
+    def from_dict(cls, name, identity, config):
+        endpoint = config["endpoint"]
         namespace = pump_cloud.Namespace(
             username=endpoint["username"],
             password=endpoint["password"],
             tenant_name=endpoint["tenant_name"],
             auth_url=endpoint["auth_url"],
         )
-        cloud = cls(name, namespace, identity, **kwargs)
-        return cloud
+        return cls(name, namespace, identity, fake=config.get("fake"))
 
     def __repr__(self):
         return "<Cloud(namespace={!r})>".format(self.namespace)
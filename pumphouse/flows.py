@@ -12,15 +12,595 @@
 # See the License for the specific language governing permissions and#
 # limitations under the License.
 
-import taskflow.engines
+import collections
+import cPickle as pickle
+import logging
+import resource
+import tempfile
+import threading
+import time
 
+from concurrent import futures
+import taskflow.flow
+from taskflow.engines.action_engine import engine as taskflow_engine
+from taskflow.engines.action_engine import executor as taskflow_executor
+from taskflow import exceptions as taskflow_excs
+from taskflow import states
+from taskflow import storage as taskflow_storage
+from taskflow import task as taskflow_task
+from taskflow.utils import async_utils
+from taskflow.utils import misc
+from taskflow.utils import persistence_utils
+from taskflow.utils import threading_utils
+
+from . import exceptions
+from . import fuel
+from . import limits
 from . import plugin
+from . import stats
+
 
+LOG = logging.getLogger(__name__)
 
 registry = plugin.Registry()
 register = registry.register
 
 
-def run_flow(flow, store):
-    result = taskflow.engines.run(flow, engine_conf='parallel', store=store)
-    return result
+def iter_tasks(flow):
+    """Iterates over all tasks of the flow including nested flows."""
+    for item in flow:
+        if isinstance(item, taskflow.flow.Flow):
+            for task in iter_tasks(item):
+                yield task
+        else:
+            yield item
+
+
+def get_peak_memory():
+    """Returns the maximum resident set size of the process in KiB."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+class Released(object):
+    """A placeholder of a result moved to the spool"""
+
+    __slots__ = ("offset", "length")
+
+    def __init__(self, offset, length):
+        self.offset = offset
+        self.length = length
+
+
+class ResultSpool(object):
+    """Keeps released results of tasks in a temporary file"""
+
+    def __init__(self):
+        self.file = None
+        self.lock = threading.Lock()
+        self.count = 0
+        self.size = 0
+
+    def put(self, data):
+        dump = pickle.dumps(data, pickle.HIGHEST_PROTOCOL)
+        with self.lock:
+            if self.file is None:
+                self.file = tempfile.TemporaryFile(prefix="pumphouse-")
+            self.file.seek(0, 2)
+            offset = self.file.tell()
+            self.file.write(dump)
+            self.count += 1
+            self.size += len(dump)
+        return Released(offset, len(dump))
+
+    def get(self, released):
+        with self.lock:
+            self.file.seek(released.offset)
+            dump = self.file.read(released.length)
+        return pickle.loads(dump)
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+
+# NOTE: The engine is built on internals of taskflow 0.4 and 0.5: the
+#       storage, the executors of tasks and the action engine are
+#       replaced by subclasses, see the pinned version in requirements.
+class Storage(taskflow_storage.MultiThreadedStorage):
+    """Storage which keeps only results needed by pending tasks
+
+    Results are trimmed to the fields listed in :attr:`fields` by names
+    of tasks. Released results are moved to a temporary file and loaded
+    back only if they are needed again, e.g. to revert tasks.
+    """
+
+    def __init__(self, flow_detail, backend=None):
+        super(Storage, self).__init__(flow_detail, backend=backend)
+        self.fields = {}
+        self.spool = ResultSpool()
+
+    def save(self, atom_name, data, state=states.SUCCESS):
+        fields = self.fields.get(atom_name)
+        if (state == states.SUCCESS and fields is not None and
+                isinstance(data, dict)):
+            data = dict((key, data[key]) for key in fields if key in data)
+        super(Storage, self).save(atom_name, data, state=state)
+
+    def release(self, atom_name):
+        """Moves the result of the task to the spool
+
+        Returns True if the result was released.
+        """
+        with self._lock.write_lock():
+            ad = self._atomdetail_by_name(atom_name)
+            if (ad.state != states.SUCCESS or ad.results is None or
+                    isinstance(ad.results, Released)):
+                return False
+            try:
+                ad.results = self.spool.put(ad.results)
+            except (pickle.PicklingError, TypeError):
+                LOG.debug("Result of %r could not be released", atom_name,
+                          exc_info=True)
+                return False
+            return True
+
+    def _get(self, atom_name, only_last=False):
+        result = super(Storage, self)._get(atom_name, only_last=only_last)
+        if isinstance(result, Released):
+            return self.spool.get(result)
+        return result
+
+    def fetch_all(self):
+        """Fetches named results which were not released."""
+        with self._lock.read_lock():
+            released = set(ad.name for ad in self._flowdetail
+                           if isinstance(ad.results, Released))
+            results = {}
+            for name, indexes in self._reverse_mapping.iteritems():
+                if any(atom_name in released for atom_name, _ in indexes):
+                    continue
+                try:
+                    results[name] = self.fetch(name)
+                except taskflow_excs.NotFound:
+                    pass
+            return results
+
+
+def execute_task(task, arguments, progress_callback, calls=None):
+    """Executes the task within the limit of tasks of the process
+
+    Executions are counted in :data:`pumphouse.stats.tasks` by names of
+    classes of tasks. Calls of clouds made by the task are counted in
+    `calls` as well if they are given.
+    """
+    with limits.limits.tasks, stats.calls.scope(calls):
+        start = time.time()
+        # NOTE: The private function of taskflow 0.4 and 0.5 runs the task
+        #       and returns the triple of the task, the event and the
+        #       result or the failure, as the parallel executor does.
+        result = taskflow_executor._execute_task(task, arguments,
+                                                 progress_callback)
+        stats.tasks.record((task.__class__.__name__,), time.time() - start,
+                           isinstance(result[2], misc.Failure))
+        return result
+
+
+def execute_shared(leases, func, task, *args):
+    """Executes the shared task by the function under the lease of its name
+
+    The task fails if the lease was lost while it ran, another shard
+    could run the same task at that time.
+    """
+    try:
+        return leases.call(task.name, func, task, *args)
+    except exceptions.LeaseLost:
+        LOG.exception("The lease of task %r was lost while it ran",
+                      task.name)
+        return task, taskflow_executor.EXECUTED, misc.Failure()
+
+
+def revert_task(task, arguments, result, failures, progress_callback,
+                calls=None):
+    """Reverts the task counting calls of clouds in `calls` as well"""
+    with stats.calls.scope(calls):
+        return taskflow_executor._revert_task(task, arguments, result,
+                                              failures, progress_callback)
+
+
+class ThreadPoolExecutor(futures.ThreadPoolExecutor):
+    """A pool of threads which grows up to the limit of tasks
+
+    The limit of tasks can be raised while the flow runs, see
+    :class:`pumphouse.limits.Limits`.
+    """
+
+    def submit(self, fn, *args, **kwargs):
+        max_tasks = limits.limits.max_tasks
+        # NOTE: Threads are started on submissions while their number is
+        #       less than the maximum.
+        if max_tasks is not None and max_tasks > self._max_workers:
+            self._max_workers = max_tasks
+        return super(ThreadPoolExecutor, self).submit(fn, *args, **kwargs)
+
+
+class LeasedTaskExecutor(taskflow_executor.ParallelTaskExecutor):
+    """Executes shared tasks under leases of their names
+
+    Tasks with the `shared` attribute create resources which could be
+    created by other shards of the migration at the same time, see
+    :class:`pumphouse.shard.Leases`. Calls of clouds made by tasks are
+    counted in `calls` if they are given, see :class:`Report`.
+    """
+
+    def __init__(self, leases, *args, **kwargs):
+        self.calls = kwargs.pop("calls", None)
+        super(LeasedTaskExecutor, self).__init__(*args, **kwargs)
+        self.leases = leases
+
+    def execute_task(self, task, task_uuid, arguments, progress_callback=None):
+        if self.leases is None or not getattr(task, "shared", False):
+            return self._executor.submit(execute_task, task, arguments,
+                                         progress_callback, self.calls)
+        return self._executor.submit(execute_shared, self.leases,
+                                     execute_task, task, arguments,
+                                     progress_callback, self.calls)
+
+    def revert_task(self, task, task_uuid, arguments, result, failures,
+                    progress_callback=None):
+        return self._executor.submit(revert_task, task, arguments, result,
+                                     failures, progress_callback, self.calls)
+
+    def start(self):
+        if self._create_executor:
+            max_workers = (self._max_workers or
+                           threading_utils.get_optimal_thread_count())
+            self._executor = ThreadPoolExecutor(max_workers)
+
+
+class CancellableTaskExecutor(taskflow_executor.TaskExecutorBase):
+    """Fails tasks which were not started before the run was cancelled
+
+    Failed tasks make the engine revert finished tasks of the flow, tasks
+    which are running at the moment are not interrupted.
+
+    :param executor: an executor of tasks to wrap
+    :param cancel:   an event set to cancel the run
+    """
+
+    # NOTE: TaskExecutorBase is the interface of executors in taskflow 0.4
+    #       and 0.5, it is renamed to TaskExecutor in 0.6.
+
+    def __init__(self, executor, cancel):
+        self.executor = executor
+        self.cancel = cancel
+
+    def execute_task(self, task, task_uuid, arguments,
+                     progress_callback=None):
+        if self.cancel.is_set():
+            try:
+                raise exceptions.Cancelled("The run of the flow was "
+                                           "cancelled")
+            except exceptions.Cancelled:
+                failure = misc.Failure()
+            return async_utils.make_completed_future(
+                (task, taskflow_executor.EXECUTED, failure))
+        return self.executor.execute_task(task, task_uuid, arguments,
+                                          progress_callback)
+
+    def revert_task(self, task, task_uuid, arguments, result, failures,
+                    progress_callback=None):
+        return self.executor.revert_task(task, task_uuid, arguments, result,
+                                         failures, progress_callback)
+
+    def wait_for_any(self, fs, timeout=None):
+        done = set(f for f in fs if f.done())
+        if done:
+            return done, set(fs) - done
+        return self.executor.wait_for_any(fs, timeout)
+
+    def start(self):
+        self.executor.start()
+
+    def stop(self):
+        self.executor.stop()
+
+
+class Engine(taskflow_engine.MultiThreadedActionEngine):
+    _storage_factory = Storage
+
+    def __init__(self, *args, **kwargs):
+        self.leases = kwargs.pop("leases", None)
+        self.broker = kwargs.pop("broker", None)
+        self.green = kwargs.pop("green", False)
+        self.cancel = kwargs.pop("cancel", None)
+        self.calls = kwargs.pop("calls", None)
+        super(Engine, self).__init__(*args, **kwargs)
+
+    def _task_executor_factory(self):
+        executor = self._make_task_executor()
+        if self.cancel is not None:
+            executor = CancellableTaskExecutor(executor, self.cancel)
+        return executor
+
+    def _make_task_executor(self):
+        if self.broker is not None:
+            return self.broker.executor(self._flow_detail.uuid,
+                                        leases=self.leases,
+                                        calls=self.calls)
+        if self.green:
+            # NOTE: The module is imported here so that gevent is not
+            #       imported by every user of flows.
+            from . import green
+            return green.GreenTaskExecutor(self.leases,
+                                           max_workers=self._max_workers,
+                                           calls=self.calls)
+        return LeasedTaskExecutor(self.leases,
+                                  executor=self._executor,
+                                  max_workers=self._max_workers,
+                                  calls=self.calls)
+
+
+def get_required_fields(atom, arg):
+    """Returns fields of the argument used by the task or None if unknown
+
+    Tasks list fields of their arguments in the `required_fields`
+    attribute, the `result` key is used for the result of the task
+    passed to its revert method.
+    """
+    required_fields = getattr(atom, "required_fields", None) or {}
+    fields = required_fields.get(arg)
+    if fields is None and arg == "result" and not overrides_revert(atom):
+        return ()
+    return fields
+
+
+def overrides_revert(atom):
+    revert = getattr(type(atom), "revert", None)
+    return getattr(revert, "__func__", None) not in (
+        taskflow_task.BaseTask.revert.__func__,
+        taskflow_task.Task.revert.__func__)
+
+
+class ResultsReleaser(object):
+    """Releases results of tasks when all their consumers are finished
+
+    Consumers of the result of a task are tasks which require any of its
+    provided names. If every consumer lists the fields of the result it
+    uses, the result is trimmed to them when it is saved.
+
+    :param flow:    an instance of :class:`taskflow.flow.Flow`
+    :param storage: an instance of :class:`Storage` of the engine
+    :param keep:    names of results needed after the run, they are
+                    neither trimmed nor released
+    """
+
+    def __init__(self, flow, storage, keep=()):
+        self.storage = storage
+        self.lock = threading.Lock()
+        self.consumers = collections.defaultdict(set)
+        self.providers = collections.defaultdict(set)
+        self.released = 0
+        atoms = list(iter_tasks(flow))
+        provided_by = collections.defaultdict(set)
+        for atom in atoms:
+            for name in atom.save_as:
+                provided_by[name].add(atom.name)
+        fields = {}
+        for atom in atoms:
+            fields[atom.name] = get_required_fields(atom, "result")
+        for name in keep:
+            for provider in provided_by.get(name, ()):
+                # NOTE: The consumer outside of the flow never finishes.
+                self.consumers[provider].add(None)
+                fields[provider] = None
+        for atom in atoms:
+            for arg, name in atom.rebind.iteritems():
+                for provider in provided_by.get(name, ()):
+                    self.consumers[provider].add(atom.name)
+                    self.providers[atom.name].add(provider)
+                    arg_fields = get_required_fields(atom, arg)
+                    if fields[provider] is None or arg_fields is None:
+                        fields[provider] = None
+                    else:
+                        fields[provider] = (tuple(fields[provider]) +
+                                            tuple(arg_fields))
+        for atom in atoms:
+            # NOTE: Whole results of tasks with indexed results or without
+            #       consumers are kept as is.
+            if (fields[atom.name] is not None and
+                    self.consumers.get(atom.name) and
+                    all(index is None for index in atom.save_as.values())):
+                storage.fields[atom.name] = frozenset(fields[atom.name])
+
+    def register(self, engine):
+        engine.task_notifier.register(states.SUCCESS, self.on_success)
+
+    def on_success(self, state, details):
+        task_name = details["task_name"]
+        to_release = []
+        with self.lock:
+            if not self.consumers.get(task_name):
+                to_release.append(task_name)
+            for provider in self.providers.pop(task_name, ()):
+                consumers = self.consumers[provider]
+                consumers.discard(task_name)
+                if not consumers:
+                    to_release.append(provider)
+        for name in to_release:
+            if self.storage.release(name):
+                self.released += 1
+
+
+class Report(object):
+    """Collects statistics of an execution of the flow
+
+    Calls of clouds are counted in :attr:`calls` by tasks of the flow run
+    in this process, so calls of other flows running at the same time
+    are not mixed in. Calls made by tasks sent to worker processes are
+    counted in those processes, they are not a part of the report.
+
+    :param flow:    an instance of :class:`taskflow.flow.Flow`
+    :param workers: whether tasks are sent to worker processes
+    """
+
+    def __init__(self, flow, workers=False):
+        self.flow = flow
+        self.workers = workers
+        self.retries = {}
+        self.fuel_requests = {}
+        self.initial_fuel_requests = fuel.request_stats()
+        self.cloud_calls = {}
+        self.calls = stats.Calls()
+        self.initial_memory = get_peak_memory()
+        self.peak_memory = self.initial_memory
+        self.released = 0
+        self.spooled = 0
+
+    def collect(self, releaser=None):
+        for task in iter_tasks(self.flow):
+            retries = getattr(task, "retries", 0)
+            if retries:
+                self.retries[task.name] = retries
+        for endpoint, request_stats in fuel.request_stats().iteritems():
+            initial = self.initial_fuel_requests.get(endpoint, {})
+            count = request_stats["count"] - initial.get("count", 0)
+            if count:
+                self.fuel_requests[endpoint] = {
+                    "count": count,
+                    "errors": (request_stats["errors"] -
+                               initial.get("errors", 0)),
+                    "total_time": (request_stats["total_time"] -
+                                   initial.get("total_time", 0.0)),
+                }
+        self.cloud_calls = dict(
+            (stats.format_key(key), call_stats)
+            for key, call_stats in self.calls.get_stats().iteritems())
+        self.peak_memory = get_peak_memory()
+        if releaser is not None:
+            self.released = releaser.released
+            self.spooled = releaser.storage.spool.size
+
+    def to_dict(self):
+        return {
+            "flow": self.flow.name,
+            "retries": dict(self.retries),
+            "fuel_requests": dict(self.fuel_requests),
+            "cloud_calls": dict(self.cloud_calls),
+            "cloud_calls_of_workers_excluded": self.workers,
+            "peak_memory_kb": self.peak_memory,
+            "memory_growth_kb": self.peak_memory - self.initial_memory,
+            "released_results": self.released,
+            "spooled_bytes": self.spooled,
+        }
+
+    def log(self):
+        LOG.info("Flow %r finished, total retries: %d",
+                 self.flow.name, sum(self.retries.itervalues()))
+        for name, retries in sorted(self.retries.iteritems()):
+            LOG.info("Task %r was retried %d times", name, retries)
+        for endpoint, request_stats in sorted(self.fuel_requests.iteritems()):
+            LOG.info("Fuel %s: %d requests (%d failed) in %.2f seconds",
+                     endpoint, request_stats["count"], request_stats["errors"],
+                     request_stats["total_time"])
+        for method, call_stats in sorted(self.cloud_calls.iteritems()):
+            LOG.info("Calls of %s: %d (%d failed) in %.2f seconds, the "
+                     "longest took %.2f seconds, %d bytes passed", method,
+                     call_stats["count"], call_stats["errors"],
+                     call_stats["total_time"], call_stats["max_time"],
+                     call_stats["bytes"])
+        if self.workers:
+            LOG.info("Calls of tasks run by workers are counted by the "
+                     "worker processes, not in this report")
+        LOG.info("Peak memory: %d KiB (grew by %d KiB), %d results "
+                 "released (%d bytes spooled)", self.peak_memory,
+                 self.peak_memory - self.initial_memory, self.released,
+                 self.spooled)
+
+
+def load_engine(flow, store, max_workers=None, leases=None, broker=None,
+                green=False, cancel=None, calls=None):
+    flow_detail = persistence_utils.create_flow_detail(flow)
+    engine = Engine(flow, flow_detail, None, {"engine": "parallel"},
+                    max_workers=max_workers, leases=leases, broker=broker,
+                    green=green, cancel=cancel, calls=calls)
+    if store:
+        engine.storage.inject(store)
+    return engine
+
+
+def run_flow(flow, store, max_workers=None, keep=(), leases=None,
+             broker=None, green=False, cancel=None, listener=None):
+    """Runs the flow releasing results of tasks as soon as possible
+
+    Returns named results of tasks which were not released, results of
+    the last tasks of the flow are released too unless they are listed
+    in `keep`. Shared tasks are run under `leases` if they are given.
+    Tasks of clouds are sent to workers if the `broker` is given, see
+    :class:`pumphouse.workers.Broker`. With `green` tasks are spawned in
+    greenlets instead of a pool of threads, see :mod:`pumphouse.green`.
+
+    Once the `cancel` event is set, tasks which were not started fail
+    with :class:`pumphouse.exceptions.Cancelled` and the flow is
+    reverted. The `listener` is called with states of tasks and their
+    details on every transition.
+    """
+    report = Report(flow, workers=broker is not None)
+    engine = load_engine(flow, store, max_workers=max_workers,
+                         leases=leases, broker=broker, green=green,
+                         cancel=cancel, calls=report.calls)
+    releaser = ResultsReleaser(flow, engine.storage, keep=keep)
+    releaser.register(engine)
+    if listener is not None:
+        engine.task_notifier.register(engine.task_notifier.ANY, listener)
+    try:
+        with stats.flows:
+            engine.run()
+        return engine.storage.fetch_all()
+    finally:
+        report.collect(releaser)
+        report.log()
+        engine.storage.spool.close()
+
+
+def run_segments(segments, store, max_workers=None, leases=None,
+                 broker=None, green=False, cancel=None, listener=None):
+    """Runs flows of segments one by one with separate engines
+
+    Results of a segment required by later segments are passed to them
+    in the store and dropped from it after the last segment which needs
+    them. If a segment fails, later segments are not run.
+
+    :param segments: a list of instances of :class:`taskflow.flow.Flow`
+    :param store:    a dict of values required by segments
+    :param leases:   an instance of :class:`pumphouse.shard.Leases`
+    :param broker:   an instance of :class:`pumphouse.workers.Broker`
+    :param green:    run tasks in greenlets, see :func:`run_flow`
+    :param cancel:   an event to cancel the run, see :func:`run_flow`
+    :param listener: a callable called on transitions of tasks
+    :returns:        the store with results passed between segments
+    """
+    store = dict(store)
+    later_requires = []
+    requires = set()
+    for segment in reversed(segments):
+        later_requires.append(requires)
+        requires = requires | segment.requires
+    later_requires.reverse()
+    passed = set()
+    for i, segment in enumerate(segments):
+        keep = later_requires[i] & segment.provides
+        LOG.info("Running segment %r (%d of %d)", segment.name, i + 1,
+                 len(segments))
+        results = run_flow(segment, store, max_workers=max_workers, keep=keep,
+                           leases=leases, broker=broker, green=green,
+                           cancel=cancel, listener=listener)
+        for name in keep:
+            if name in results:
+                store[name] = results[name]
+                passed.add(name)
+        for name in passed - later_requires[i]:
+            del store[name]
+            passed.discard(name)
+    return store
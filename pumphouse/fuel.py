@@ -0,0 +1,212 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+
+import logging
+import os
+import sys
+import threading
+import time
+
+from pumphouse import exceptions
+
+
+LOG = logging.getLogger(__name__)
+
+CLIENT_MODULE = "pumphouse._vendor.fuelclient.client"
+
+# NOTE: The vendored fuelclient reads its configuration from the
+#       environment when it is imported for the first time.
+CONFIG_ENVIRON = (
+    ("host", "SERVER_ADDRESS"),
+    ("port", "LISTEN_PORT"),
+    ("username", "KEYSTONE_USER"),
+    ("password", "KEYSTONE_PASS"),
+    ("connect_timeout", "CONNECT_TIMEOUT"),
+    ("read_timeout", "READ_TIMEOUT"),
+    ("pool_size", "POOL_SIZE"),
+    ("cache_ttl", "CACHE_TTL"),
+)
+
+
+def configure(fuel_config):
+    """Configures the vendored fuelclient by the endpoint of Fuel."""
+    for key, name in CONFIG_ENVIRON:
+        if key in fuel_config:
+            os.environ[name] = str(fuel_config[key])
+
+
+def cached(ttl=None):
+    """Caches responses of Fuel to GET requests made in the context."""
+    from pumphouse._vendor.fuelclient.client import APIClient
+    return APIClient.cached(ttl)
+
+
+def request_stats():
+    """Returns statistics of requests to Fuel by endpoints
+
+    The statistics is empty if the client has not been used yet.
+    """
+    client = sys.modules.get(CLIENT_MODULE)
+    if client is None:
+        return {}
+    return client.APIClient.get_stats()
+
+
+def cache_stats():
+    """Returns numbers of hits and misses of the cache of responses"""
+    client = sys.modules.get(CLIENT_MODULE)
+    if client is None:
+        return {"hits": 0, "misses": 0}
+    return client.APIClient.get_cache_stats()
+
+
+class NodeWatcher(object):
+    """Polls the list of nodes of a Fuel endpoint for all subscribers
+
+    A single background thread fetches `nodes/` once per `interval`
+    while there is at least one subscriber, so the load of Nailgun does
+    not depend on the number of nodes which are being watched.
+
+    :param fetch:    a callable which returns a list of data of nodes
+    :param interval: a number of seconds between requests
+    """
+
+    def __init__(self, fetch, interval=1):
+        self.fetch = fetch
+        self.interval = interval
+        self.nodes = {}
+        self.version = 0
+        self.subscribers = 0
+        self.thread = None
+        self.condition = threading.Condition()
+        self.ticks = 0
+        self.failed_ticks = 0
+        self.tick_time = 0.0
+        self.last_tick = None
+
+    def subscribe(self):
+        with self.condition:
+            self.subscribers += 1
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run,
+                                               name="fuel-node-watcher")
+                self.thread.daemon = True
+                self.thread.start()
+
+    def unsubscribe(self):
+        with self.condition:
+            self.subscribers -= 1
+
+    def run(self):
+        while True:
+            with self.condition:
+                if not self.subscribers:
+                    self.thread = None
+                    return
+            self.tick()
+            time.sleep(self.interval)
+
+    def tick(self):
+        start = time.time()
+        try:
+            nodes = dict((node["id"], node) for node in self.fetch())
+        except Exception:
+            LOG.exception("Could not fetch the list of nodes")
+            with self.condition:
+                self.record_tick(start, failed=True)
+            return
+        with self.condition:
+            self.record_tick(start)
+            self.nodes = nodes
+            self.version += 1
+            self.condition.notify_all()
+
+    def record_tick(self, start, failed=False):
+        now = time.time()
+        self.ticks += 1
+        if failed:
+            self.failed_ticks += 1
+        self.tick_time += now - start
+        self.last_tick = now
+
+    def to_dict(self):
+        with self.condition:
+            return {
+                "ticks": self.ticks,
+                "failed_ticks": self.failed_ticks,
+                "tick_time": self.tick_time,
+                "last_tick": self.last_tick,
+                "subscribers": self.subscribers,
+                "nodes": len(self.nodes),
+            }
+
+    def watch(self):
+        """Yields pairs of all nodes and nodes changed since last time
+
+        Nodes are dicts of their IDs and data, they are empty until the
+        first successful request. Pairs are yielded at least once per
+        interval even if the list is not updated. The subscription lasts
+        until the generator is closed.
+        """
+        self.subscribe()
+        try:
+            version = None
+            seen = {}
+            while True:
+                with self.condition:
+                    if self.version == version:
+                        self.condition.wait(self.interval)
+                    version = self.version
+                    nodes = self.nodes
+                changed = [node for node_id, node in nodes.iteritems()
+                           if seen.get(node_id) != node]
+                seen = nodes
+                yield nodes, changed
+        finally:
+            self.unsubscribe()
+
+    def wait_for(self, check, timeout=60):
+        """Waits until `check` returns not None for the list of nodes."""
+        start = time.time()
+        nodes_iter = self.watch()
+        try:
+            for nodes, _ in nodes_iter:
+                result = check(nodes.values())
+                if result is not None:
+                    return result
+                if time.time() - start > timeout:
+                    raise exceptions.TimeoutException()
+        finally:
+            nodes_iter.close()
+
+
+watchers = {}
+watchers_lock = threading.Lock()
+
+
+def get_watcher():
+    """Returns the node watcher of the configured Fuel endpoint."""
+    from pumphouse._vendor.fuelclient.client import APIClient
+    from pumphouse._vendor.fuelclient.objects.node import Node
+    with watchers_lock:
+        if APIClient.root not in watchers:
+            watchers[APIClient.root] = NodeWatcher(Node.get_all_data)
+        return watchers[APIClient.root]
+
+
+def watcher_stats():
+    """Returns statistics of node watchers by endpoints of Fuel"""
+    with watchers_lock:
+        items = watchers.items()
+    return dict((root, watcher.to_dict()) for root, watcher in items)
@@ -0,0 +1,115 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+
+import sys
+
+import gevent
+import gevent.lock
+from concurrent import futures
+from taskflow.utils import async_utils
+
+from . import flows
+
+
+class GreenFuture(futures.Future):
+    """A future of a function run in a greenlet"""
+
+    def __init__(self):
+        super(GreenFuture, self).__init__()
+        self.greenlet = None
+
+
+class GreenExecutor(object):
+    """Runs functions in greenlets, compatible with futures executors
+
+    Every function gets its own greenlet at once and waits in it for a
+    free slot, so submissions never block and waiting functions cost only
+    greenlets, not threads of a pool.
+
+    :param max_workers: a number of functions run at the same time
+    """
+
+    def __init__(self, max_workers=None):
+        self.semaphore = None
+        if max_workers is not None:
+            self.semaphore = gevent.lock.Semaphore(max_workers)
+        self.greenlets = set()
+
+    def run(self, future, fn, args, kwargs):
+        try:
+            if self.semaphore is not None:
+                self.semaphore.acquire()
+            try:
+                if not future.set_running_or_notify_cancel():
+                    return
+                try:
+                    result = fn(*args, **kwargs)
+                except Exception:
+                    future.set_exception_info(*sys.exc_info()[1:])
+                else:
+                    future.set_result(result)
+            finally:
+                if self.semaphore is not None:
+                    self.semaphore.release()
+        finally:
+            self.greenlets.discard(future.greenlet)
+
+    def submit(self, fn, *args, **kwargs):
+        future = GreenFuture()
+        future.greenlet = gevent.spawn(self.run, future, fn, args, kwargs)
+        self.greenlets.add(future.greenlet)
+        return future
+
+    def shutdown(self, wait=True):
+        if wait:
+            gevent.joinall(list(self.greenlets))
+
+
+def wait_for_any(fs, timeout=None):
+    """Waits for one of futures to complete
+
+    Returns a pair of sets of done and not done futures. Greenlets of
+    futures are waited for directly instead of through conditions.
+    """
+    if not all(isinstance(f, GreenFuture) for f in fs):
+        return async_utils.wait_for_any(fs, timeout)
+    done = set(f for f in fs if f.done())
+    if not done:
+        # NOTE: Futures are resolved before their greenlets exit.
+        gevent.wait([f.greenlet for f in fs], timeout=timeout, count=1)
+        done = set(f for f in fs if f.done())
+    return done, set(fs) - done
+
+
+class GreenTaskExecutor(flows.LeasedTaskExecutor):
+    """Executes tasks in greenlets of the current thread
+
+    Used under the API server. Threads are already greenlets there, the
+    server patches the process with gevent, so tasks run cooperatively
+    either way; this executor spawns a greenlet per task instead of
+    keeping a pool of workers, and the number of running tasks is still
+    limited by `max_workers`.
+    """
+
+    def wait_for_any(self, fs, timeout=None):
+        return wait_for_any(fs, timeout)
+
+    def start(self):
+        if self._create_executor:
+            self._executor = GreenExecutor(self._max_workers)
+
+    def stop(self):
+        if self._create_executor:
+            self._executor.shutdown(wait=True)
+            self._executor = None
@@ -0,0 +1,461 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+
+import collections
+import contextlib
+import logging
+import numbers
+import signal
+import socket
+import threading
+import time
+
+import requests
+import yaml
+
+from pumphouse import events
+from pumphouse import exceptions
+
+
+LOG = logging.getLogger(__name__)
+
+KNOBS = ("max_tasks", "service_concurrency", "bandwidth", "check_interval",
+         "adaptive")
+ADAPTIVE_PARAMS = ("initial", "minimum", "maximum", "increase", "decrease",
+                   "target_latency", "cooldown")
+
+OVERLOAD_STATUSES = (413, 429, 503)
+# NOTE: Clients raise errors of the underlying libraries on timeouts and
+#       resets of connections.
+OVERLOAD_EXCS = exceptions.transient_excs + (
+    socket.timeout,
+    socket.error,
+    requests.exceptions.Timeout,
+    requests.exceptions.ConnectionError,
+)
+
+# NOTE: The weight of the latest call in the average latency.
+LATENCY_WEIGHT = 0.2
+WATCH_INTERVAL = 1
+
+
+class ResizableSemaphore(object):
+    """A semaphore which limit can be changed while it is held
+
+    :param limit: a number of holders at the same time, None or 0 for
+                  no limit
+    """
+
+    def __init__(self, limit=None):
+        self.limit = limit or None
+        self.holders = 0
+        self.condition = threading.Condition()
+
+    def resize(self, limit):
+        with self.condition:
+            self.limit = limit or None
+            self.condition.notify_all()
+
+    def acquire(self):
+        with self.condition:
+            while self.limit is not None and self.holders >= self.limit:
+                self.condition.wait()
+            self.holders += 1
+
+    def release(self):
+        with self.condition:
+            self.holders -= 1
+            self.condition.notify()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+
+class Bandwidth(object):
+    """Spreads transfers of data over time to keep the rate
+
+    :param rate: a number of bytes per second, None or 0 for no limit
+    """
+
+    def __init__(self, rate=None):
+        self.rate = rate or None
+        self.next_free = 0
+        self.lock = threading.Lock()
+
+    def reserve(self, size):
+        """Returns a number of seconds to wait after the transfer"""
+        with self.lock:
+            if self.rate is None:
+                return 0
+            now = time.time()
+            self.next_free = max(self.next_free, now) + size / self.rate
+            return self.next_free - now
+
+    def transfer(self, size):
+        delay = self.reserve(size)
+        if delay > 0:
+            time.sleep(delay)
+
+
+def is_overload(exc):
+    """Checks that the error is caused by overload of the service"""
+    if isinstance(exc, OVERLOAD_EXCS):
+        return True
+    for attr in ("code", "http_status", "status_code"):
+        if getattr(exc, attr, None) in OVERLOAD_STATUSES:
+            return True
+    return False
+
+
+class AdaptiveLimiter(object):
+    """Limits concurrent calls of a service by its health
+
+    The limit grows additively while calls succeed in time and is cut
+    multiplicatively when the service is overloaded: it rejects calls
+    with 413, 429 or 503 statuses, calls time out, connections are reset
+    or the average latency exceeds the target. The limit is cut at most
+    once per cooldown, so a burst of failures counts as one.
+
+    :param name:           a name of the limiter used in events
+    :param initial:        the initial number of concurrent calls
+    :param minimum:        the lowest limit
+    :param maximum:        the highest limit
+    :param increase:       the increase of the limit per the limit of
+                           successful calls
+    :param decrease:       the factor of the limit on overload
+    :param target_latency: the highest average latency of calls, None to
+                           ignore latency
+    :param cooldown:       a number of seconds between cuts of the limit
+    """
+
+    def __init__(self, name, initial=8, minimum=1, maximum=64, increase=1,
+                 decrease=0.5, target_latency=None, cooldown=1):
+        self.name = name
+        self.condition = threading.Condition()
+        self.in_flight = 0
+        self.calls = 0
+        self.overloads = 0
+        self.latency = None
+        self.last_decrease = 0
+        self.configure(initial=initial, minimum=minimum, maximum=maximum,
+                       increase=increase, decrease=decrease,
+                       target_latency=target_latency, cooldown=cooldown)
+        self.limit = float(min(max(initial, self.minimum), self.maximum))
+
+    def configure(self, initial=8, minimum=1, maximum=64, increase=1,
+                  decrease=0.5, target_latency=None, cooldown=1):
+        with self.condition:
+            self.minimum = max(1, minimum)
+            self.maximum = max(self.minimum, maximum)
+            self.increase = increase
+            self.decrease = decrease
+            self.target_latency = target_latency
+            self.cooldown = cooldown
+            if hasattr(self, "limit"):
+                self.limit = min(max(self.limit, self.minimum), self.maximum)
+            self.condition.notify_all()
+
+    def acquire(self):
+        with self.condition:
+            while self.in_flight >= int(self.limit):
+                self.condition.wait()
+            self.in_flight += 1
+
+    def release(self, latency, overloaded=False):
+        with self.condition:
+            self.in_flight -= 1
+            self.calls += 1
+            if self.latency is None:
+                self.latency = latency
+            else:
+                self.latency += LATENCY_WEIGHT * (latency - self.latency)
+            previous = int(self.limit)
+            congested = (self.target_latency is not None and
+                         self.latency > self.target_latency)
+            if overloaded:
+                self.overloads += 1
+            if overloaded or congested:
+                now = time.time()
+                if now - self.last_decrease >= self.cooldown:
+                    self.last_decrease = now
+                    self.limit = max(self.minimum,
+                                     self.limit * self.decrease)
+            else:
+                self.limit = min(self.maximum,
+                                 self.limit + self.increase / self.limit)
+            self.condition.notify_all()
+            changed = int(self.limit) != previous
+            if changed:
+                state = self.to_dict()
+        if changed:
+            LOG.info("Limit of calls of %s is changed to %d", self.name,
+                     state["limit"])
+            events.emit("limit", dict(state, name=self.name),
+                        namespace="/events")
+
+    def to_dict(self):
+        return {
+            "limit": int(self.limit),
+            "in_flight": self.in_flight,
+            "calls": self.calls,
+            "overloads": self.overloads,
+            "latency": self.latency,
+        }
+
+
+class Limits(object):
+    """Limits of running migrations which can be changed at any time
+
+    * `max_tasks` is a number of tasks run at the same time by all engines
+      of the process.
+    * `service_concurrency` maps names of services to numbers of calls of
+      their clients made at the same time.
+    * `bandwidth` is a number of bytes per second of images data passed
+      through the process.
+    * `check_interval` is a number of seconds between checks of statuses
+      of resources which overrides intervals of tasks.
+    * `adaptive` contains parameters of :class:`AdaptiveLimiter` of calls
+      of every service of every cloud.
+
+    Limits set to None or 0 are not applied.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.max_tasks = None
+        self.service_concurrency = {}
+        self.bandwidth = None
+        self.check_interval = None
+        self.tasks = ResizableSemaphore()
+        self.services = collections.defaultdict(ResizableSemaphore)
+        self.transfers = Bandwidth()
+        self.adaptive = None
+        self.limiters = {}
+        self.local = threading.local()
+
+    def to_dict(self):
+        with self.lock:
+            return {
+                "max_tasks": self.max_tasks,
+                "service_concurrency": dict(self.service_concurrency),
+                "bandwidth": self.bandwidth,
+                "check_interval": self.check_interval,
+                "adaptive": (dict(self.adaptive)
+                             if self.adaptive is not None else None),
+            }
+
+    def states(self):
+        """Returns states of adaptive limiters by clouds and services"""
+        with self.lock:
+            limiters = self.limiters.items()
+        return dict((key, limiter.to_dict()) for key, limiter in limiters)
+
+    def report(self):
+        return dict((" ".join(filter(None, key)), state)
+                    for key, state in self.states().iteritems())
+
+    def get_limiter(self, cloud, service):
+        """Returns the adaptive limiter or None if it is disabled"""
+        with self.lock:
+            if self.adaptive is None:
+                return None
+            key = (cloud, service)
+            limiter = self.limiters.get(key)
+            if limiter is None:
+                limiter = AdaptiveLimiter(" ".join(filter(None, key)),
+                                          **self.adaptive)
+                self.limiters[key] = limiter
+            return limiter
+
+    def update(self, values):
+        """Changes limits listed in values, others are kept
+
+        Raises :class:`pumphouse.exceptions.UsageError` if any of values
+        is not valid, no limits are changed then.
+        """
+        values = dict(values)
+        unknown = set(values) - set(KNOBS)
+        if unknown:
+            raise exceptions.UsageError("Unknown limits: {}".format(
+                ", ".join(sorted(unknown))))
+        services = values.get("service_concurrency")
+        if services is not None:
+            if not isinstance(services, dict):
+                raise exceptions.UsageError("Limits of services must be a "
+                                            "mapping")
+            for service, limit in services.iteritems():
+                check_limit("service_concurrency.{}".format(service), limit)
+        for name in ("max_tasks", "bandwidth", "check_interval"):
+            if name in values:
+                check_limit(name, values[name])
+        adaptive = values.get("adaptive")
+        if adaptive is not None:
+            check_adaptive(adaptive)
+        with self.lock:
+            if "max_tasks" in values:
+                self.max_tasks = values["max_tasks"] or None
+                self.tasks.resize(self.max_tasks)
+            if services is not None:
+                for service in set(self.service_concurrency) - set(services):
+                    self.services[service].resize(None)
+                self.service_concurrency = dict(services)
+                for service, limit in services.iteritems():
+                    self.services[service].resize(limit)
+            if "bandwidth" in values:
+                self.bandwidth = values["bandwidth"] or None
+                with self.transfers.lock:
+                    self.transfers.rate = (float(self.bandwidth)
+                                           if self.bandwidth else None)
+            if "check_interval" in values:
+                self.check_interval = values["check_interval"] or None
+            if "adaptive" in values:
+                self.adaptive = (dict(adaptive) if adaptive is not None
+                                 else None)
+                if self.adaptive is None:
+                    self.limiters.clear()
+                for limiter in self.limiters.itervalues():
+                    limiter.configure(**self.adaptive)
+        LOG.info("Limits are changed: %s", values)
+        return self.to_dict()
+
+    def load(self, path):
+        """Updates limits from the YAML file"""
+        try:
+            with open(path) as f:
+                values = yaml.safe_load(f)
+        except Exception:
+            LOG.exception("Unable to read limits from %s", path)
+            return
+        try:
+            self.update(values or {})
+        except exceptions.UsageError:
+            LOG.exception("Limits of %s are not valid", path)
+
+    @contextlib.contextmanager
+    def call(self, service, cloud=None):
+        """Holds a slot of the service during the call
+
+        Only the outermost call is limited, calls made by clients inside
+        of it are passed through.
+        """
+        depth = getattr(self.local, "depth", 0)
+        if depth:
+            self.local.depth = depth + 1
+            try:
+                yield
+            finally:
+                self.local.depth = depth
+            return
+        limiter = self.get_limiter(cloud, service)
+        with self.services[service]:
+            if limiter is not None:
+                limiter.acquire()
+            overloaded = False
+            start = time.time()
+            self.local.depth = 1
+            try:
+                yield
+            except Exception as exc:
+                overloaded = is_overload(exc)
+                raise
+            finally:
+                self.local.depth = 0
+                if limiter is not None:
+                    limiter.release(time.time() - start, overloaded)
+
+    def transfer(self, size):
+        self.transfers.transfer(size)
+
+    def interval(self, default):
+        return self.check_interval or default
+
+
+def check_limit(name, value):
+    if value is None:
+        return
+    if (not isinstance(value, numbers.Real) or isinstance(value, bool) or
+            value < 0):
+        raise exceptions.UsageError("The {} limit must be a non-negative "
+                                    "number, got {!r}".format(name, value))
+
+
+def check_adaptive(params):
+    if not isinstance(params, dict):
+        raise exceptions.UsageError("Parameters of adaptive limits must be "
+                                    "a mapping")
+    unknown = set(params) - set(ADAPTIVE_PARAMS)
+    if unknown:
+        raise exceptions.UsageError("Unknown parameters of adaptive limits: "
+                                    "{}".format(", ".join(sorted(unknown))))
+    for name, value in params.iteritems():
+        check_limit("adaptive.{}".format(name), value)
+    decrease = params.get("decrease")
+    if decrease is not None and not 0 < decrease < 1:
+        raise exceptions.UsageError("The adaptive.decrease parameter must "
+                                    "be between 0 and 1")
+
+
+limits = Limits()
+
+
+class Watcher(object):
+    """Loads limits from the file in a thread after the signal comes
+
+    The handler of the signal only sets a flag, limits are loaded by the
+    thread: the signal interrupts the main thread, which could hold the
+    lock of limits at that moment.
+
+    :param path:     a path to the YAML file of limits
+    :param interval: a number of seconds between checks of the flag
+    """
+
+    def __init__(self, path, interval=WATCH_INTERVAL):
+        self.path = path
+        self.interval = interval
+        self.signalled = False
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def handle(self, signum, frame):
+        self.signalled = True
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            if self.signalled:
+                self.signalled = False
+                limits.load(self.path)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run,
+                                       name="limits-watcher")
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+
+
+def watch(path, signum=signal.SIGUSR1):
+    """Loads limits from the file now and every time the signal comes"""
+    limits.load(path)
+    watcher = Watcher(path)
+    watcher.start()
+    signal.signal(signum, watcher.handle)
+    return watcher
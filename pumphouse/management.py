@@ -12,18 +12,24 @@
 # See the License for the specific language governing permissions and#
 # limitations under the License.
 
+import collections
 import logging
 import random
+import threading
 import urllib
 import tempfile
 
+from concurrent import futures
 from keystoneclient.openstack.common.apiclient import exceptions \
     as keystone_excs
 from novaclient import exceptions as nova_excs
+from taskflow.patterns import graph_flow
 
 from pumphouse import exceptions
+from pumphouse import flows
 from pumphouse import utils
 from pumphouse import plugin
+from pumphouse import task
 
 LOG = logging.getLogger(__name__)
 
@@ -33,6 +39,11 @@ TEST_IMAGE_URL = ("http://download.cirros-cloud.net/0.3.2/"
 TEST_IMAGE_FILE = '/tmp/cirros-0.3.2.img'
 TEST_RESOURCE_PREFIX = "pumphouse"
 FLOATING_IP_STRING = "172.16.0.{}"
+DEFAULT_CLEANUP_WORKERS = 8
+DEFAULT_SETUP_WORKERS = 8
+DEFAULT_BOOT_BATCH_SIZE = 10
+BOOT_TIMEOUT = 600
+VOLUME_TIMEOUT = 300
 network_manager = plugin.Plugin("network_manager", default="FlatDHCP")
 network_generator = plugin.Plugin("network_generator", default="FlatDHCP")
 
@@ -58,158 +69,337 @@ def become_admin_in_tenant(cloud, user, tenant):
                     user, tenant)
 
 
-def cleanup(events, cloud, target):
-    def is_prefixed(string):
-        return string.startswith(TEST_RESOURCE_PREFIX)
-    search_opts = {"all_tenants": 1}
-    for server in cloud.nova.servers.list(search_opts=search_opts):
-        if not is_prefixed(server.name):
-            continue
+def is_prefixed(string):
+    return string.startswith(TEST_RESOURCE_PREFIX)
+
+
+class ManagementTask(task.BaseCloudTask):
+    """A base task to manage test resources of the cloud
+
+    Calls to the cloud made with :meth:`map` run in parallel, the
+    number of concurrent calls is limited by `max_workers`.
+    """
+
+    def __init__(self, cloud, events, target,
+                 max_workers=DEFAULT_CLEANUP_WORKERS, *args, **kwargs):
+        super(ManagementTask, self).__init__(cloud, *args, **kwargs)
+        self.events = events
+        self.target = target
+        self.max_workers = max_workers
+
+    def map(self, func, items):
+        items = list(items)
+        if not items:
+            return []
+        with futures.ThreadPoolExecutor(self.max_workers) as executor:
+            return list(executor.map(func, items))
+
+    def emit(self, event, data):
+        data["cloud"] = self.target
+        self.events.emit(event, data, namespace="/events")
+
+
+class CleanupTask(ManagementTask):
+    """Deletes test resources of one type in parallel
+
+    Subclasses define how to list resources and delete one of them.
+    """
+
+    def execute(self, **requires):
+        return self.map(self.delete, self.list())
+
+    def list(self):
+        raise NotImplementedError()
+
+    def delete(self, resource):
+        raise NotImplementedError()
+
+
+class CleanupServers(CleanupTask):
+    def list(self):
+        return [server
+                for server in self.cloud.nova.servers.list(
+                    search_opts={"all_tenants": 1})
+                if is_prefixed(server.name)]
+
+    def execute(self, **requires):
+        servers = super(CleanupServers, self).execute(**requires)
+        # NOTE: One request per check of all deleted servers instead of
+        #       waiting for each of them separately.
+        utils.wait_for(set(server.id for server in servers),
+                       self.remaining,
+                       attribute_getter=len,
+                       value=0,
+                       timeout=300)
+        for server in servers:
+            LOG.info("Deleted server: %s", server._info)
+            self.emit("server terminate", {
+                "id": server.id,
+                "host_name": getattr(server,
+                                     "OS-EXT-SRV-ATTR:hypervisor_hostname"),
+            })
+        return [server.id for server in servers]
+
+    def remaining(self, server_ids):
+        servers = self.cloud.nova.servers.list(
+            search_opts={"all_tenants": 1})
+        return server_ids.intersection(server.id for server in servers)
+
+    def delete(self, server):
         try:
-            server_floating_ips = cloud.nova.floating_ips_bulk.findall(
+            server_floating_ips = self.cloud.nova.floating_ips_bulk.findall(
                 instance_uuid=server.id)
         except nova_excs.NotFound:
             LOG.info("No floating ips found for server: %s",
                      server._info)
         else:
             for floating_ip in server_floating_ips:
-                cloud.nova.servers.remove_floating_ip(server,
-                                                      floating_ip.address)
+                self.cloud.nova.servers.remove_floating_ip(
+                    server, floating_ip.address)
                 LOG.info("Removed floating ip address: %s",
                          floating_ip._info)
-        cloud.nova.servers.delete(server)
-        utils.wait_for(server, cloud.nova.servers.get,
-                       stop_excs=(nova_excs.NotFound,))
-        LOG.info("Deleted server: %s", server._info)
-        hostname = getattr(server, "OS-EXT-SRV-ATTR:hypervisor_hostname")
-        events.emit("server terminate", {
-            "cloud": target,
-            "id": server.id,
-            "host_name": hostname
-        }, namespace="/events")
+        self.cloud.nova.servers.delete(server)
+        return server
+
+
+class CleanupFlavors(CleanupTask):
+    def list(self):
+        return [flavor for flavor in self.cloud.nova.flavors.list()
+                if is_prefixed(flavor.name)]
 
-    for flavor in cloud.nova.flavors.list():
-        if is_prefixed(flavor.name):
-            cloud.nova.flavors.delete(flavor)
-            LOG.info("Deleted flavor: %s", flavor._info)
-            events.emit("flavor delete", {
-                "cloud": target,
-                "id": flavor.id,
-            }, namespace="/events")
-
-    if (cloud.cinder):
-        for volume in cloud.cinder.volumes.list(
-                search_opts={'all_tenants': 1}):
-            vol_name = volume._info['display_name']
-            vol_id = volume._info['id']
-            if vol_name and is_prefixed(vol_name):
-                cloud.cinder.volumes.delete(vol_id)
-
-                LOG.info("Delete volume: %s", str(volume._info))
-                events.emit("volume delete", {
-                    "cloud": target,
-                    "id": vol_id
-                }, namespace="/events")
-
-    for image in cloud.glance.images.list():
-        if not is_prefixed(image.name):
-            continue
-        cloud.glance.images.delete(image.id)
+    def delete(self, flavor):
+        self.cloud.nova.flavors.delete(flavor)
+        LOG.info("Deleted flavor: %s", flavor._info)
+        self.emit("flavor delete", {
+            "id": flavor.id,
+        })
+        return flavor.id
+
+
+class CleanupVolumes(CleanupTask):
+    def list(self):
+        return [volume
+                for volume in self.cloud.cinder.volumes.list(
+                    search_opts={'all_tenants': 1})
+                if (volume._info['display_name'] and
+                    is_prefixed(volume._info['display_name']))]
+
+    def delete(self, volume):
+        vol_id = volume._info['id']
+        self.cloud.cinder.volumes.delete(vol_id)
+        LOG.info("Delete volume: %s", str(volume._info))
+        self.emit("volume delete", {
+            "id": vol_id
+        })
+        return vol_id
+
+
+class CleanupImages(CleanupTask):
+    def list(self):
+        return [image for image in self.cloud.glance.images.list()
+                if is_prefixed(image.name)]
+
+    def delete(self, image):
+        self.cloud.glance.images.delete(image.id)
         LOG.info("Deleted image: %s", dict(image))
-        events.emit("image delete", {
-            "cloud": target,
+        self.emit("image delete", {
             "id": image.id
-        }, namespace="/events")
+        })
+        return image.id
+
+
+class CleanupSecGroups(CleanupTask):
+    def list(self):
+        return [secgroup
+                for secgroup in self.cloud.nova.security_groups.list()
+                if is_prefixed(secgroup.name)]
 
-    for secgroup in cloud.nova.security_groups.list():
-        if not is_prefixed(secgroup.name):
-            continue
+    def delete(self, secgroup):
         if secgroup.name in RO_SECURITY_GROUPS:
             for rule in secgroup.rules:
-                cloud.nova.security_group_rules.delete(rule['id'])
+                self.cloud.nova.security_group_rules.delete(rule['id'])
                 LOG.info("Deleted rule from default secgroup: %s", rule)
         else:
-            cloud.nova.security_groups.delete(secgroup.id)
+            self.cloud.nova.security_groups.delete(secgroup.id)
             LOG.info("Deleted secgroup: %s", secgroup._info)
-        events.emit("secgroup delete", {
-            "cloud": target,
+        self.emit("secgroup delete", {
             "id": secgroup.id
-        }, namespace="/events")
+        })
+        return secgroup.id
+
 
-    for floating_ip in cloud.nova.floating_ips_bulk.list():
-        cloud.nova.floating_ips_bulk.delete(floating_ip.address)
+class CleanupFloatingIPs(CleanupTask):
+    def list(self):
+        return self.cloud.nova.floating_ips_bulk.list()
+
+    def delete(self, floating_ip):
+        self.cloud.nova.floating_ips_bulk.delete(floating_ip.address)
         LOG.info("Deleted floating ip: %s", floating_ip._info)
-        events.emit("floating_ip delete", {
-            "cloud": target,
+        self.emit("floating_ip delete", {
             "id": floating_ip.address
-        }, namespace="/events")
+        })
+        return floating_ip.address
+
+
+class CleanupPorts(CleanupTask):
+    def list(self):
+        return self.cloud.neutron.list_ports()['ports']
+
+    def delete(self, port):
+        self.cloud.neutron.delete_port(port['id'])
+        LOG.info("Deleted port: %s", port['id'])
+        return port['id']
+
 
-    if (cloud.neutron):
-        for port in cloud.neutron.list_ports()['ports']:
-            LOG.info("Deleted network: %s", port['id'])
-            cloud.neutron.delete_port(port['id'])
-
-        for subnet in cloud.neutron.list_subnets()['subnets']:
-            LOG.info("Deleted subnet: %s", subnet['name'])
-            cloud.neutron.delete_subnet(subnet['id'])
-
-        for network in cloud.neutron.list_networks()['networks']:
-            LOG.info("Delete network: %s", network['name'])
-            cloud.neutron.delete_network(network['id'])
-
-            LOG.info("Deleted network: %s", network._info)
-            events.emit("network delete", {
-                "cloud": target,
-                "id": network['id']
-            }, namespace="/events")
-
-    for network in cloud.nova.networks.list():
-        if not is_prefixed(network.label):
-            continue
-        cloud.nova.networks.disassociate(network)
-        cloud.nova.networks.delete(network)
+class CleanupSubnets(CleanupTask):
+    def list(self):
+        return self.cloud.neutron.list_subnets()['subnets']
+
+    def delete(self, subnet):
+        self.cloud.neutron.delete_subnet(subnet['id'])
+        LOG.info("Deleted subnet: %s", subnet['name'])
+        return subnet['id']
+
+
+class CleanupNeutronNetworks(CleanupTask):
+    def list(self):
+        return self.cloud.neutron.list_networks()['networks']
+
+    def delete(self, network):
+        self.cloud.neutron.delete_network(network['id'])
+        LOG.info("Deleted network: %s", network['name'])
+        self.emit("network delete", {
+            "id": network['id']
+        })
+        return network['id']
+
+
+class CleanupNovaNetworks(CleanupTask):
+    def list(self):
+        return [network for network in self.cloud.nova.networks.list()
+                if is_prefixed(network.label)]
+
+    def delete(self, network):
+        self.cloud.nova.networks.disassociate(network)
+        self.cloud.nova.networks.delete(network)
         LOG.info("Deleted network: %s", network._info)
-        events.emit("network delete", {
-            "cloud": target,
+        self.emit("network delete", {
             "id": network.id
-        }, namespace="/events")
+        })
+        return network.id
+
+
+class CleanupUsers(CleanupTask):
+    def list(self):
+        return [user for user in self.cloud.keystone.users.list()
+                if is_prefixed(user.name)]
+
+    def delete(self, user):
+        self.cloud.keystone.users.delete(user)
+        LOG.info("Deleted user: %s", user._info)
+        self.emit("user delete", {
+            "id": user.id
+        })
+        return user.id
+
+
+class CleanupRoles(CleanupTask):
+    def list(self):
+        return [role for role in self.cloud.keystone.roles.list()
+                if is_prefixed(role.name)]
+
+    def delete(self, role):
+        self.cloud.keystone.roles.delete(role)
+        LOG.info("Deleted role: %s", role._info)
+        self.emit("role delete", {
+            "id": role.id
+        })
+        return role.id
+
+
+class CleanupTenants(CleanupTask):
+    def list(self):
+        return [tenant for tenant in self.cloud.keystone.tenants.list()
+                if is_prefixed(tenant.name)]
+
+    def delete(self, tenant):
+        self.cloud.keystone.tenants.delete(tenant)
+        LOG.info("Deleted tenant: %s", tenant._info)
+        self.emit("tenant delete", {
+            "id": tenant.id,
+        })
+        return tenant.id
+
+
+class EnableServices(CleanupTask):
+    def list(self):
+        return [service
+                for service in self.cloud.nova.services.list(
+                    binary="nova-compute")
+                if service.status == "disabled"]
+
+    def delete(self, service):
+        self.cloud.nova.services.enable(service.host, "nova-compute")
+        LOG.info("Enabled the nova-compute service on %s", service.host)
+        self.emit("", {
+            "name": service.host,
+        })
+        return service.host
 
-    for user in cloud.keystone.users.list():
-        if is_prefixed(user.name):
-            cloud.keystone.users.delete(user)
-            LOG.info("Deleted user: %s", user._info)
-            events.emit("user delete", {
-                "cloud": target,
-                "id": user.id
-            }, namespace="/events")
-
-    for role in cloud.keystone.roles.list():
-        if is_prefixed(role.name):
-            cloud.keystone.roles.delete(role)
-            LOG.info("Deleted role: %s", role._info)
-            events.emit("role delete", {
-                "cloud": target,
-                "id": role.id
-            }, namespace="/events")
-
-    for tenant in cloud.keystone.tenants.list():
-        if is_prefixed(tenant.name):
-            cloud.keystone.tenants.delete(tenant)
-            LOG.info("Deleted role: %s", tenant._info)
-            events.emit("tenant delete", {
-                "cloud": target,
-                "id": tenant.id,
-            }, namespace="/events")
-
-    services = cloud.nova.services.list(binary="nova-compute")
-    for service in services:
-        if service.status == "disabled":
-            cloud.nova.services.enable(service.host, "nova-compute")
-            LOG.info("Enabled the nova-compute service on %s", service.host)
-            events.emit("", {
-                "cloud": target,
-                "name": service.host,
-            }, namespace="/events")
+
+def cleanup_flow(events, cloud, target, max_workers=DEFAULT_CLEANUP_WORKERS):
+    """Builds the flow to remove test resources from the cloud
+
+    Resources of different types are deleted concurrently when they do
+    not depend on each other: servers before volumes and floating IPs,
+    ports before subnets before networks, users before tenants.
+    """
+    flow = graph_flow.Flow("cleanup-{}".format(target))
+
+    def add(task_class, name, requires=()):
+        flow.add(task_class(cloud, events, target,
+                            max_workers=max_workers,
+                            name=name,
+                            provides=name,
+                            requires=list(requires)))
+
+    servers = "cleanup-servers"
+    floating_ips = "cleanup-floating-ips"
+    volumes = "cleanup-volumes"
+    images = "cleanup-images"
+    secgroups = "cleanup-secgroups"
+    nova_networks = "cleanup-nova-networks"
+    users = "cleanup-users"
+    tenant_resources = [servers, floating_ips, images, secgroups,
+                        nova_networks, users]
+
+    add(CleanupServers, servers)
+    add(CleanupFlavors, "cleanup-flavors", [servers])
+    if getattr(cloud, "cinder", None):
+        add(CleanupVolumes, volumes, [servers])
+        tenant_resources.append(volumes)
+    add(CleanupImages, images, [servers])
+    add(CleanupSecGroups, secgroups, [servers])
+    add(CleanupFloatingIPs, floating_ips, [servers])
+    if getattr(cloud, "neutron", None):
+        ports = "cleanup-ports"
+        subnets = "cleanup-subnets"
+        neutron_networks = "cleanup-neutron-networks"
+        add(CleanupPorts, ports, [servers])
+        add(CleanupSubnets, subnets, [ports])
+        add(CleanupNeutronNetworks, neutron_networks, [subnets])
+        tenant_resources.append(neutron_networks)
+    add(CleanupNovaNetworks, nova_networks, [servers, floating_ips])
+    add(CleanupUsers, users)
+    add(CleanupRoles, "cleanup-roles", [users])
+    add(CleanupTenants, "cleanup-tenants", tenant_resources)
+    add(EnableServices, "cleanup-services")
+    return flow
+
+
+def cleanup(events, cloud, target, max_workers=DEFAULT_CLEANUP_WORKERS):
+    flow = cleanup_flow(events, cloud, target, max_workers=max_workers)
+    flows.run_flow(flow, {})
 
 
 def generate_flavors_list(num):
@@ -361,19 +551,40 @@ def setup_volume(cloud, volume_dict):
     return cloud.cinder.volumes.create(**volume_dict)
 
 
-def setup_server(cloud, server_dict):
-    image = list(cloud.glance.images.list(
-        filters={
-            "name": server_dict["image"]["name"]
-        }))[0]
-    flavor = cloud.nova.flavors.find(name=server_dict["flavor"]["name"])
-    server_params = (server_dict["name"],
-                     image.id,
-                     flavor.id)
-    server = cloud.nova.servers.create(*server_params)
-    server = utils.wait_for(server.id, cloud.nova.servers.get,
-                            value="ACTIVE")
-    return server
+def create_reservation(cloud, name, image, flavor, count):
+    """Sends the multiple create request and returns its reservation ID"""
+    if cloud.__module__ == "pumphouse.fake":
+        body = cloud.nova.servers.create(name, image.id, flavor.id,
+                                         min_count=count, max_count=count,
+                                         return_reservation_id=True)
+    else:
+        # NOTE: The client does not ask Nova to return the reservation ID
+        #       of the request, so the request is sent directly.
+        _, body = cloud.nova.client.post("/servers", body={"server": {
+            "name": name,
+            "imageRef": image.id,
+            "flavorRef": flavor.id,
+            "min_count": count,
+            "max_count": count,
+            "return_reservation_id": True,
+        }})
+    return body["reservation_id"]
+
+
+def boot_servers(cloud, name, image, flavor, count=1):
+    """Boots servers of the same image and flavor with one request
+
+    Returns IDs of booted servers. Several servers are created by the
+    multiple create request of Nova and are found by the reservation ID
+    of the request, so other servers with the same names are skipped.
+    """
+    if count == 1:
+        return [cloud.nova.servers.create(name, image.id, flavor.id).id]
+    reservation_id = create_reservation(cloud, name, image, flavor, count)
+    servers = cloud.nova.servers.list(search_opts={
+        "reservation_id": reservation_id,
+    })
+    return [server.id for server in servers]
 
 
 def setup_server_floating_ip(cloud, server):
@@ -399,8 +610,302 @@ def setup_server_floating_ip(cloud, server):
         return server, floating_ip
 
 
+class SetupImages(ManagementTask):
+    def __init__(self, cloud, events, target, images, *args, **kwargs):
+        super(SetupImages, self).__init__(cloud, events, target,
+                                          *args, **kwargs)
+        self.images = images
+
+    def execute(self):
+        return [image["id"]
+                for image in self.map(self.create, self.images)]
+
+    def create(self, image_dict):
+        image = setup_image(self.cloud, image_dict.copy())
+        LOG.info("Created: %s", dict(image))
+        self.emit("image created", {
+            "id": image["id"],
+            "name": image["name"],
+        })
+        return image
+
+
+class SetupFlavors(ManagementTask):
+    def __init__(self, cloud, events, target, flavors, *args, **kwargs):
+        super(SetupFlavors, self).__init__(cloud, events, target,
+                                           *args, **kwargs)
+        self.flavors = flavors
+
+    def execute(self):
+        return [flavor.id for flavor in self.map(self.create, self.flavors)]
+
+    def create(self, flavor_dict):
+        flavor = self.cloud.nova.flavors.create(
+            flavor_dict["name"],
+            flavor_dict["ram"],
+            flavor_dict["vcpu"],
+            flavor_dict["disk"],
+            is_public=True)
+        LOG.info("Created: %s", flavor._info)
+        self.emit("flavor created", {
+            "id": flavor.id,
+            "name": flavor.name,
+        })
+        return flavor
+
+
+class SetupNetworks(ManagementTask):
+    def __init__(self, cloud, events, target, plugins, networks,
+                 *args, **kwargs):
+        super(SetupNetworks, self).__init__(cloud, events, target,
+                                            *args, **kwargs)
+        self.plugins = plugins
+        self.networks = networks
+
+    def execute(self):
+        setup_network = network_manager.select_from_config(self.plugins)
+        setup_network(self.events, self.cloud, self.networks)
+
+
+class SetupFloatingIPs(ManagementTask):
+    def __init__(self, cloud, events, target, floating_ips, *args, **kwargs):
+        super(SetupFloatingIPs, self).__init__(cloud, events, target,
+                                               *args, **kwargs)
+        self.floating_ips = floating_ips
+
+    def execute(self):
+        floating_ips = [{"pool": poolname, "addr": addr}
+                        for pool in self.floating_ips
+                        for poolname, addr_list in pool.iteritems()
+                        for addr in addr_list]
+        return self.map(self.create, floating_ips)
+
+    def create(self, floating_ip_dict):
+        ip_range = setup_floating_ip(self.cloud, floating_ip_dict)
+        LOG.info("Created: %s", ip_range._info)
+        self.emit("floating_ip created", {
+            "id": floating_ip_dict["addr"],
+        })
+        return floating_ip_dict["addr"]
+
+
+class SetupTenant(ManagementTask):
+    def __init__(self, cloud, events, target, tenant_dict, *args, **kwargs):
+        super(SetupTenant, self).__init__(cloud, events, target,
+                                          *args, **kwargs)
+        self.tenant_dict = tenant_dict
+
+    def execute(self):
+        tenant = self.cloud.keystone.tenants.create(
+            self.tenant_dict["name"],
+            description=self.tenant_dict.get("description"))
+        become_admin_in_tenant(self.cloud,
+                               self.cloud.keystone.auth_ref.user_id,
+                               tenant)
+        tenant_cloud = self.cloud.restrict(tenant_name=tenant.name)
+        setup_secgroup(tenant_cloud)
+        user = self.cloud.keystone.users.create(
+            name=self.tenant_dict["username"],
+            password="default",
+            tenant_id=tenant.id)
+        LOG.info("Created: %s", user._info)
+        user_cloud = self.cloud.restrict(username=user.name,
+                                         password="default",
+                                         tenant_name=tenant.name)
+        LOG.info("Created: %s", tenant._info)
+        self.emit("tenant create", {
+            "id": tenant.id,
+            "name": tenant.name,
+            "description": tenant.description,
+        })
+        return user_cloud
+
+
+class SetupVolumes(ManagementTask):
+    """Creates volumes of the tenant and waits for all of them at once"""
+
+    def __init__(self, cloud, events, target, volumes, *args, **kwargs):
+        super(SetupVolumes, self).__init__(cloud, events, target,
+                                           *args, **kwargs)
+        self.volumes = volumes
+
+    def execute(self, user_cloud, **requires):
+        volumes = self.map(lambda volume_dict: setup_volume(user_cloud,
+                                                            volume_dict),
+                           self.volumes)
+        volume_ids = set(volume.id for volume in volumes)
+        utils.wait_for(volume_ids,
+                       lambda ids: self.pending(user_cloud, ids),
+                       attribute_getter=len,
+                       value=0,
+                       timeout=VOLUME_TIMEOUT)
+        for volume in user_cloud.cinder.volumes.list():
+            if volume.id not in volume_ids:
+                continue
+            LOG.info("Created: %s", str(volume._info))
+            self.emit("volume create", {
+                "id": volume._info["id"],
+                "status": "active",
+                "display_name": volume._info["display_name"],
+                "tenant_id": volume._info["os-vol-tenant-attr:tenant_id"],
+                "host_id": volume._info.get("os-vol-host-attr:host"),
+                "attachment_server_ids": [],
+            })
+        return sorted(volume_ids)
+
+    def pending(self, cloud, volume_ids):
+        pending = set()
+        for volume in cloud.cinder.volumes.list():
+            if volume.id not in volume_ids:
+                continue
+            if volume.status == "error":
+                raise exceptions.Error(
+                    "Volume {} fell into error state".format(volume.id))
+            if volume.status != "available":
+                pending.add(volume.id)
+        return pending
+
+
+class SetupServers(ManagementTask):
+    """Boots servers of the tenant in batches
+
+    Servers with the same image and flavor are booted by one request
+    for up to `batch_size` servers. All servers of the tenant are
+    polled by one request until they become active, then floating IPs
+    are assigned to them one by one under the shared `floating_ip_lock`.
+    """
+
+    def __init__(self, cloud, events, target, servers, floating_ip_lock,
+                 batch_size=DEFAULT_BOOT_BATCH_SIZE, *args, **kwargs):
+        super(SetupServers, self).__init__(cloud, events, target,
+                                           *args, **kwargs)
+        self.servers = servers
+        self.floating_ip_lock = floating_ip_lock
+        self.batch_size = max(1, batch_size)
+
+    def execute(self, user_cloud, **requires):
+        batches = self.map(lambda batch: boot_servers(user_cloud, *batch),
+                           self.batches(user_cloud))
+        server_ids = set(server_id
+                         for batch in batches
+                         for server_id in batch)
+        utils.wait_for(server_ids,
+                       lambda ids: self.pending(user_cloud, ids),
+                       attribute_getter=len,
+                       value=0,
+                       timeout=BOOT_TIMEOUT)
+        for server_id in sorted(server_ids):
+            self.assign_floating_ip(server_id)
+        return sorted(server_ids)
+
+    def batches(self, cloud):
+        groups = collections.OrderedDict()
+        for server_dict in self.servers:
+            key = (server_dict["image"]["name"], server_dict["flavor"]["name"])
+            groups.setdefault(key, []).append(server_dict)
+        for (image_name, flavor_name), server_dicts in groups.iteritems():
+            image = list(cloud.glance.images.list(
+                filters={"name": image_name}))[0]
+            flavor = cloud.nova.flavors.find(name=flavor_name)
+            for i in xrange(0, len(server_dicts), self.batch_size):
+                batch = server_dicts[i:i + self.batch_size]
+                yield batch[0]["name"], image, flavor, len(batch)
+
+    def pending(self, cloud, server_ids):
+        pending = set()
+        for server in cloud.nova.servers.list():
+            if server.id not in server_ids:
+                continue
+            if server.status == "ERROR":
+                raise exceptions.Error(
+                    "Server {} fell into error state".format(server.id))
+            if server.status != "ACTIVE":
+                pending.add(server.id)
+        return pending
+
+    def assign_floating_ip(self, server_id):
+        server = self.cloud.nova.servers.get(server_id)
+        LOG.info("Created server: %s", server._info)
+        # NOTE: Free floating IPs are shared by all tenants.
+        with self.floating_ip_lock:
+            server, floating_ip = setup_server_floating_ip(self.cloud,
+                                                           server)
+        LOG.info("Assigned floating ip %s to server: %s",
+                 floating_ip._info,
+                 server._info)
+        hostname = getattr(server, "OS-EXT-SRV-ATTR:hypervisor_hostname")
+        self.emit("server boot", {
+            "id": server.id,
+            "name": server.name,
+            "tenant_id": server.tenant_id,
+            "image_id": server.image["id"],
+            "host_name": hostname,
+            "status": server.status.lower(),
+        })
+        self.emit("floating_ip assigned", {
+            "id": floating_ip.address,
+            "server_id": server.id,
+        })
+
+
+def setup_flow(plugins, events, cloud, target, tenants, images, flavors,
+               floating_ips, networks, max_workers=DEFAULT_SETUP_WORKERS,
+               batch_size=DEFAULT_BOOT_BATCH_SIZE):
+    """Builds the flow to create test resources in the cloud
+
+    Images, flavors, networks and floating IPs are created first, every
+    tenant is populated by its own tasks which run in parallel.
+    """
+    flow = graph_flow.Flow("setup-{}".format(target))
+    common = ["setup-images", "setup-flavors", "setup-networks",
+              "setup-floating-ips"]
+    flow.add(SetupImages(cloud, events, target, images,
+                         max_workers=max_workers,
+                         name="setup-images",
+                         provides="setup-images"))
+    flow.add(SetupFlavors(cloud, events, target, flavors,
+                          max_workers=max_workers,
+                          name="setup-flavors",
+                          provides="setup-flavors"))
+    flow.add(SetupNetworks(cloud, events, target, plugins, networks,
+                           name="setup-networks",
+                           provides="setup-networks"))
+    flow.add(SetupFloatingIPs(cloud, events, target, floating_ips,
+                              max_workers=max_workers,
+                              name="setup-floating-ips",
+                              provides="setup-floating-ips"))
+    floating_ip_lock = threading.Lock()
+    for tenant_dict in tenants:
+        tenant_binding = "setup-tenant-{}".format(tenant_dict["name"])
+        volumes_binding = "setup-volumes-{}".format(tenant_dict["name"])
+        servers_binding = "setup-servers-{}".format(tenant_dict["name"])
+        flow.add(SetupTenant(cloud, events, target, tenant_dict,
+                             name=tenant_binding,
+                             provides=tenant_binding))
+        if tenant_dict["volumes"]:
+            flow.add(SetupVolumes(cloud, events, target,
+                                  tenant_dict["volumes"],
+                                  max_workers=max_workers,
+                                  name=volumes_binding,
+                                  provides=volumes_binding,
+                                  rebind=[tenant_binding]))
+        if tenant_dict["servers"]:
+            flow.add(SetupServers(cloud, events, target,
+                                  tenant_dict["servers"],
+                                  floating_ip_lock,
+                                  batch_size=batch_size,
+                                  max_workers=max_workers,
+                                  name=servers_binding,
+                                  provides=servers_binding,
+                                  rebind=[tenant_binding],
+                                  requires=common))
+    return flow
+
+
 def setup(plugins, events, cloud, target,
-          num_tenants=0, num_servers=0, num_volumes=0, workloads={}):
+          num_tenants=0, num_servers=0, num_volumes=0, workloads={},
+          max_workers=DEFAULT_SETUP_WORKERS,
+          batch_size=DEFAULT_BOOT_BATCH_SIZE):
 
     """Prepares test resources in the source cloud
 
@@ -412,11 +917,13 @@ def setup(plugins, events, cloud, target,
     :type num_servers:  int
     :param num_volumes: a number of volumes to create per tenant
     :type num_volumes:  int
+    :param max_workers: a number of tenants populated at the same time
+                        and of concurrent requests of every task
+    :type max_workers:  int
+    :param batch_size:  a number of servers booted by one request
+    :type batch_size:   int
     """
 
-    prefix = TEST_RESOURCE_PREFIX
-    test_clouds = {}
-    test_tenant_clouds = {}
     tenants = workloads.get('tenants',
                             list(generate_tenants_list(num_tenants)))
     num_tenants = len(tenants)
@@ -440,115 +947,8 @@ def setup(plugins, events, cloud, target,
     generate_networks_list = network_generator.select_from_config(plugins)
     networks = workloads.get('networks',
                              generate_networks_list(num_tenants))
-    for image_dict in images:
-        image = setup_image(cloud, image_dict.copy())
-        LOG.info("Created: %s", dict(image))
-        events.emit("image created", {
-            "id": image["id"],
-            "name": image["name"],
-            "cloud": target
-        }, namespace="/events")
-
-    for flavor_dict in flavors:
-        flavor = cloud.nova.flavors.create(
-            flavor_dict["name"],
-            flavor_dict["ram"],
-            flavor_dict["vcpu"],
-            flavor_dict["disk"],
-            is_public=True)
-        LOG.info("Created: %s", flavor._info)
-        events.emit("flavor created", {
-            "id": flavor.id,
-            "name": flavor.name,
-            "cloud": target
-        }, namespace="/events")
-
-    setup_network = network_manager.select_from_config(plugins)
-    setup_network(events, cloud, networks)
-
-    for pool in floating_ips:
-        for poolname in pool:
-            addr_list = pool[poolname]
-            for addr in addr_list:
-                floating_ip_dict = {"pool": poolname, "addr": addr}
-                ip_range = setup_floating_ip(cloud, floating_ip_dict)
-                LOG.info("Created: %s", ip_range._info)
-                events.emit("floating_ip created", {
-                    "id": addr,
-                    "cloud": target
-                }, namespace="/events")
-
-    for tenant_dict in tenants:
-        tenant = cloud.keystone.tenants.create(
-            tenant_dict["name"],
-            description=tenant_dict.get("description"))
-        become_admin_in_tenant(cloud, cloud.keystone.auth_ref.user_id, tenant)
-        tenant_cloud = cloud.restrict(tenant_name=tenant.name)
-        test_tenant_clouds[tenant.id] = tenant_cloud
-        setup_secgroup(tenant_cloud)
-        user = cloud.keystone.users.create(
-            name=tenant_dict["username"],
-            password="default",
-            tenant_id=tenant.id)
-        LOG.info("Created: %s", user._info)
-        user_cloud = cloud.restrict(username=user.name,
-                                    password="default",
-                                    tenant_name=tenant.name)
-        LOG.info("Created: %s", tenant._info)
-        events.emit("tenant create", {
-            "cloud": target,
-            "id": tenant.id,
-            "name": tenant.name,
-            "description": tenant.description,
-        }, namespace="/events")
-
-        for volume_dict in tenant_dict["volumes"]:
-            try:
-                volume = setup_volume(user_cloud, volume_dict)
-            except Exception as exc:
-                LOG.exception("Exception: %s", exc.message)
-                raise exc
-            tries = []
-            while volume.status != 'available':
-                volume = user_cloud.cinder.volumes.get(volume.id)
-                tries.append(volume)
-                if len(tries) > 30:
-                    LOG.exception("Volume not available in time: %s",
-                                  str(volume._info))
-                    raise exceptions.TimeoutException()
-            LOG.info("Created: %s", str(volume._info))
-            events.emit("volume create", {
-                "cloud": target,
-                "id": volume._info["id"],
-                "status": "active",
-                "display_name": volume._info["display_name"],
-                "tenant_id": volume._info["os-vol-tenant-attr:tenant_id"],
-                "host_id": volume._info.get("os-vol-host-attr:host"),
-                "attachment_server_ids": [],
-            }, namespace="/events")
-
-        for server_dict in tenant_dict["servers"]:
-            server = setup_server(user_cloud, server_dict)
-            LOG.info("Created server: %s", server._info)
-            server, floating_ip = setup_server_floating_ip(cloud,
-                                                           server)
-            LOG.info("Assigned floating ip %s to server: %s",
-                     floating_ip._info,
-                     server._info)
-            server = cloud.nova.servers.get(server)
-            hostname = getattr(server, "OS-EXT-SRV-ATTR:hypervisor_hostname")
-            events.emit("server boot", {
-                "cloud": target,
-                "id": server.id,
-                "name": server.name,
-                "tenant_id": server.tenant_id,
-                "image_id": server.image["id"],
-                "host_name": hostname,
-                "status": server.status.lower(),
-            }, namespace="/events")
-
-            events.emit("floating_ip assigned", {
-                "id": floating_ip.address,
-                "server_id": server.id,
-                "cloud": target
-            }, namespace="/events")
+    flow = setup_flow(plugins, events, cloud, target, tenants, images,
+                      flavors, floating_ips, networks,
+                      max_workers=max_workers,
+                      batch_size=batch_size)
+    flows.run_flow(flow, {}, max_workers=max_workers)
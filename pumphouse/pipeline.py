@@ -0,0 +1,238 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+
+import collections
+import logging
+import math
+import threading
+
+from pumphouse import context
+from pumphouse import events
+from pumphouse import flows
+from pumphouse.tasks import evacuation as evacuation_tasks
+from pumphouse.tasks import node as node_tasks
+
+
+LOG = logging.getLogger(__name__)
+
+DEFAULT_MAX_IN_FLIGHT = 2
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+SKIPPED = "skipped"
+
+
+class Stage(object):
+    """A step of the processing of every host in the pipeline
+
+    :param name:        a name of the stage reported in progress events
+    :param build:       a callable which takes a hostname and returns a
+                        pair of a flow and a store for it
+    :param concurrency: a number of hosts processed by the stage at once
+    """
+
+    def __init__(self, name, build, concurrency=1):
+        self.name = name
+        self.build = build
+        self.concurrency = max(1, concurrency)
+        self.semaphore = threading.BoundedSemaphore(self.concurrency)
+
+    def run(self, hostname, cancel=None, listener=None, track=None):
+        """Builds and runs the flow of the stage for the host
+
+        The `cancel` event and the `listener` are passed to
+        :func:`pumphouse.flows.run_flow`, `track` is called with the list
+        of the flow before it is run.
+        """
+        flow, store = self.build(hostname)
+        if track is not None:
+            track([flow])
+        return flows.run_flow(flow, store, cancel=cancel, listener=listener)
+
+    def __repr__(self):
+        return "<Stage(name={!r}, concurrency={!r})>".format(
+            self.name, self.concurrency)
+
+
+class RollingPipeline(object):
+    """Passes hosts through the stages with overlapping
+
+    Every host goes through all stages one by one, but different hosts
+    can be on different stages at the same time: while one host is
+    redeployed, the next one is already evacuated. The number of hosts
+    in flight and the number of hosts on each stage are limited.
+
+    Once the `cancel` event is set, hosts and stages which were not
+    started are skipped and running flows are reverted.
+
+    :param cloud:         a cloud that hosts belong to, used in events
+    :param stages:        a list of instances of :class:`Stage`
+    :param max_in_flight: a number of hosts processed at the same time
+    :param cancel:        an event to cancel the run
+    :param listener:      a callable called on transitions of tasks
+    :param track:         a callable called with flows before they run
+    """
+
+    def __init__(self, cloud, stages, max_in_flight=DEFAULT_MAX_IN_FLIGHT,
+                 cancel=None, listener=None, track=None):
+        self.cloud = cloud
+        self.stages = stages
+        self.max_in_flight = max(1, max_in_flight)
+        self.cancel = cancel
+        self.listener = listener
+        self.track = track
+        self.progress = collections.OrderedDict()
+        self.lock = threading.Lock()
+
+    def run(self, hostnames):
+        """Processes all hosts and returns the progress of them."""
+        for hostname in hostnames:
+            self.progress[hostname] = collections.OrderedDict(
+                (stage.name, PENDING) for stage in self.stages)
+        in_flight = threading.BoundedSemaphore(self.max_in_flight)
+        threads = []
+        for hostname in hostnames:
+            in_flight.acquire()
+            if self.cancelled():
+                in_flight.release()
+                self.skip(hostname)
+                continue
+            thread = threading.Thread(target=self.process,
+                                      args=(hostname, in_flight),
+                                      name="pipeline-{}".format(hostname))
+            thread.daemon = True
+            thread.start()
+            threads.append(thread)
+        for thread in threads:
+            thread.join()
+        return self.progress
+
+    def process(self, hostname, in_flight):
+        try:
+            for stage in self.stages:
+                with stage.semaphore:
+                    if self.cancelled():
+                        self.skip(hostname)
+                        return
+                    self.update(hostname, stage, RUNNING)
+                    try:
+                        stage.run(hostname, cancel=self.cancel,
+                                  listener=self.listener, track=self.track)
+                    except Exception:
+                        LOG.exception("Stage %s failed for host %s",
+                                      stage.name, hostname)
+                        self.update(hostname, stage, FAILED)
+                        self.skip(hostname)
+                        return
+                    self.update(hostname, stage, DONE)
+        finally:
+            in_flight.release()
+
+    def cancelled(self):
+        return self.cancel is not None and self.cancel.is_set()
+
+    def skip(self, hostname):
+        with self.lock:
+            stages = self.progress[hostname]
+            for name, status in stages.iteritems():
+                if status == PENDING:
+                    stages[name] = SKIPPED
+
+    def update(self, hostname, stage, status):
+        with self.lock:
+            self.progress[hostname][stage.name] = status
+            summary = self.summary()
+        LOG.info("Host %s: stage %s is %s (%s)",
+                 hostname, stage.name, status,
+                 ", ".join("{} {}".format(stage_name, counts)
+                           for stage_name, counts in summary.iteritems()))
+        self.stage_event(hostname, stage, status)
+
+    def summary(self):
+        """Returns the number of hosts in every status for each stage."""
+        summary = collections.OrderedDict()
+        for stage in self.stages:
+            counts = collections.Counter(stages[stage.name]
+                                         for stages in
+                                         self.progress.itervalues())
+            summary[stage.name] = dict(counts)
+        return summary
+
+    def stage_event(self, hostname, stage, status):
+        done = sum(1 for s in self.progress[hostname].itervalues()
+                   if s == DONE)
+        events.emit("update", {
+            "id": hostname,
+            "type": "host",
+            "cloud": self.cloud.name,
+            "progress": done * 100 / len(self.stages),
+            "action": stage.name if status == RUNNING else None,
+            "data": {
+                "stage": stage.name,
+                "status": status,
+            },
+        }, namespace="/events")
+
+
+def select_hosts(cloud, hostnames=None, percentage=None):
+    """Selects hosts for the pipeline
+
+    Returns the given hostnames or the percentage of all nova-compute
+    hosts of the cloud ordered by name.
+    """
+    if hostnames:
+        return list(hostnames)
+    services = cloud.nova.services.list(binary="nova-compute")
+    hosts = sorted(set(service.host for service in services))
+    if percentage is None:
+        return hosts
+    number = int(math.ceil(len(hosts) * percentage / 100.0))
+    return hosts[:number]
+
+
+def convert_hosts(plugins_config, envs_config, src, dst, hostnames,
+                  max_in_flight=DEFAULT_MAX_IN_FLIGHT,
+                  max_evacuations=1, max_reassignments=1, cancel=None,
+                  listener=None, track=None):
+    """Evacuates and reassigns hosts to the destination cloud
+
+    :param plugins_config:    the PLUGINS section of the configuration
+    :param envs_config:       names of Fuel environments of the clouds
+                              with the `source` and `destination` keys
+    :param src:               an instance of the source cloud
+    :param dst:               an instance of the destination cloud
+    :param hostnames:         a list of hostnames of hosts to convert
+    :param max_in_flight:     a number of hosts processed at the same time
+    :param max_evacuations:   a number of hosts evacuated at the same time
+    :param max_reassignments: a number of hosts reassigned at the same time
+    :param cancel:            an event to cancel the conversion
+    :param listener:          a callable called on transitions of tasks
+    :param track:             a callable called with flows before they run
+    """
+    def build_evacuation(hostname):
+        ctx = context.Context(plugins_config, src, dst)
+        return evacuation_tasks.evacuate_servers(ctx, hostname), ctx.store
+
+    def build_reassignment(hostname):
+        ctx = context.Context(envs_config, src, dst)
+        return node_tasks.reassign_node(ctx, hostname), ctx.store
+
+    pipeline = RollingPipeline(src, [
+        Stage("evacuation", build_evacuation, max_evacuations),
+        Stage("reassignment", build_reassignment, max_reassignments),
+    ], max_in_flight=max_in_flight, cancel=cancel, listener=listener,
+        track=track)
+    return pipeline.run(hostnames)
@@ -0,0 +1,237 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+
+import datetime
+import gzip
+import json
+import logging
+
+from taskflow import flow as taskflow_flow
+from taskflow.patterns import graph_flow
+from taskflow.patterns import linear_flow
+from taskflow.patterns import unordered_flow
+from taskflow import task as taskflow_task
+
+from pumphouse import exceptions
+from pumphouse import task
+from pumphouse import utils
+
+
+LOG = logging.getLogger(__name__)
+
+PLAN_VERSION = 1
+
+PATTERNS = {
+    "graph": graph_flow.Flow,
+    "linear": linear_flow.Flow,
+    "unordered": unordered_flow.Flow,
+}
+
+# NOTE: Tasks are created again from their classes, names, bindings and
+#       clouds, so their constructors must not take other arguments.
+PLANNABLE_INITS = (
+    taskflow_task.Task.__dict__["__init__"],
+    task.BaseCloudTask.__dict__["__init__"],
+    task.BaseCloudsTask.__dict__["__init__"],
+)
+
+
+def get_class_path(cls):
+    return "{}.{}".format(cls.__module__, cls.__name__)
+
+
+def can_recreate(cls):
+    """Checks that tasks of the class can be created from clouds and names"""
+    for klass in cls.__mro__:
+        if "__init__" in klass.__dict__:
+            return klass.__dict__["__init__"] in PLANNABLE_INITS
+    return False
+
+
+def get_cloud_name(cloud, clouds):
+    for name, value in clouds.iteritems():
+        if value is cloud:
+            return name
+    raise exceptions.PlanError("Unknown cloud {!r}".format(cloud))
+
+
+def get_provides(save_as):
+    """Converts the mapping of results back to an argument of atoms"""
+    if not save_as:
+        return None
+    indexes = set(save_as.itervalues())
+    if indexes == set([None]):
+        name, = save_as
+        return name
+    if all(isinstance(index, int) for index in indexes):
+        return sorted(save_as, key=save_as.get)
+    return sorted(save_as)
+
+
+def dump_atom(atom, clouds):
+    cls = type(atom)
+    if not can_recreate(cls):
+        raise exceptions.PlanError("Task {} of {} can not be saved in a plan"
+                                   .format(atom.name, get_class_path(cls)))
+    data = {
+        "class": get_class_path(cls),
+        "name": atom.name,
+        "rebind": atom.rebind,
+    }
+    provides = get_provides(atom.save_as)
+    if provides is not None:
+        data["provides"] = provides
+    if atom.inject:
+        data["inject"] = atom.inject
+    if isinstance(atom, task.BaseCloudTask):
+        data["clouds"] = [get_cloud_name(atom.cloud, clouds)]
+    elif isinstance(atom, task.BaseCloudsTask):
+        data["clouds"] = [get_cloud_name(atom.src_cloud, clouds),
+                          get_cloud_name(atom.dst_cloud, clouds)]
+    return data
+
+
+def dump_flow(flow, clouds):
+    """Converts the flow to plain values which can be saved in JSON
+
+    Children of graph flows are sorted by names, their dependencies are
+    found again when the flow is loaded, so the same flow is always
+    saved in the same way.
+
+    :param clouds: a dict of names and clouds referenced by tasks
+    """
+    for pattern, cls in PATTERNS.iteritems():
+        if type(flow) is cls:
+            break
+    else:
+        raise exceptions.PlanError("Flow {} of {} can not be saved in a plan"
+                                   .format(flow.name,
+                                           get_class_path(type(flow))))
+    children = list(flow)
+    if pattern != "linear":
+        children.sort(key=lambda item: item.name)
+    items = []
+    for item in children:
+        if isinstance(item, taskflow_flow.Flow):
+            items.append(dump_flow(item, clouds))
+        else:
+            items.append(dump_atom(item, clouds))
+    return {
+        "pattern": pattern,
+        "name": flow.name,
+        "items": items,
+    }
+
+
+def load_atom(data, clouds):
+    cls = utils.load_class(data["class"])
+    args = [clouds[name] for name in data.get("clouds", ())]
+    return cls(*args,
+               name=data["name"],
+               provides=data.get("provides"),
+               rebind=data["rebind"],
+               inject=data.get("inject"))
+
+
+def load_flow(data, clouds):
+    flow = PATTERNS[data["pattern"]](data["name"])
+    items = []
+    for item in data["items"]:
+        if "pattern" in item:
+            items.append(load_flow(item, clouds))
+        else:
+            items.append(load_atom(item, clouds))
+    flow.add(*items)
+    return flow
+
+
+def to_primitive(obj):
+    """Converts resources of clients to plain values for the inventory"""
+    if hasattr(obj, "to_dict"):
+        obj = obj.to_dict()
+    if isinstance(obj, dict):
+        return dict((str(key), to_primitive(value))
+                    for key, value in obj.iteritems())
+    if isinstance(obj, (list, tuple, set)):
+        return [to_primitive(value) for value in obj]
+    if obj is None or isinstance(obj, (basestring, int, long, float, bool)):
+        return obj
+    return str(obj)
+
+
+def make_plan(context, segments, resource, ids):
+    """Makes a plan of the migration to apply it later
+
+    The plan contains flows of segments run one by one, values of the
+    store and the snapshot of data of the source cloud fetched while
+    the flows were planned, see :meth:`pumphouse.context.Context.fetch`.
+
+    :param segments: a list of flows planned with the context
+    :returns: a dict of plain values
+    """
+    clouds = {
+        "source": context.src_cloud,
+        "destination": context.dst_cloud,
+    }
+    inventory = dict((":".join(map(str, key)), to_primitive(value))
+                     for key, value in context.cache.iteritems())
+    return {
+        "version": PLAN_VERSION,
+        "created_at": datetime.datetime.utcnow().isoformat(),
+        "resource": resource,
+        "ids": list(ids),
+        "segments": [dump_flow(segment, clouds) for segment in segments],
+        "store": dict(context.store),
+        "inventory": inventory,
+    }
+
+
+def load_plan(plan, src_cloud, dst_cloud):
+    """Creates flows and the store of the plan
+
+    :returns: a tuple of a list of flows of segments and the store
+    """
+    version = plan.get("version")
+    if version != PLAN_VERSION:
+        raise exceptions.PlanError("Unsupported version of the plan: {}"
+                                   .format(version))
+    clouds = {
+        "source": src_cloud,
+        "destination": dst_cloud,
+    }
+    segments = [load_flow(segment, clouds) for segment in plan["segments"]]
+    return segments, dict(plan["store"])
+
+
+def open_plan(filename, mode="r"):
+    if filename.endswith(".gz"):
+        return gzip.open(filename, mode + "b")
+    return open(filename, mode)
+
+
+def save(plan, filename):
+    """Saves the plan to the file, files with `.gz` names are compressed"""
+    with open_plan(filename, "w") as f:
+        json.dump(plan, f, separators=(",", ":"), sort_keys=True)
+    LOG.info("Plan of %d segments is saved to %s",
+             len(plan["segments"]), filename)
+
+
+def load(filename):
+    with open_plan(filename) as f:
+        try:
+            return json.load(f)
+        except ValueError as exc:
+            raise exceptions.PlanError("Invalid plan {}: {}"
+                                       .format(filename, exc))
@@ -0,0 +1,179 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+
+import collections
+import contextlib
+import hashlib
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+from pumphouse import exceptions
+
+
+LOG = logging.getLogger(__name__)
+
+DEFAULT_TTL = 60
+DEFAULT_POLL_INTERVAL = 0.5
+BUSY_TIMEOUT = 30
+
+
+class Shard(collections.namedtuple("Shard", ("index", "count"))):
+    """A part of a migration run by one of several processes"""
+
+    def __str__(self):
+        return "{}/{}".format(self.index, self.count)
+
+    def owns(self, resource_id):
+        # NOTE: The hash of strings differs between builds of Python, so
+        #       MD5 is used to give the same result on every machine.
+        digest = hashlib.md5(str(resource_id)).hexdigest()
+        return int(digest, 16) % self.count == self.index
+
+    def select(self, ids):
+        """Returns IDs which belong to this shard in the given order"""
+        return [resource_id for resource_id in ids if self.owns(resource_id)]
+
+
+def parse_shard(value):
+    """Parses a shard in the `i/N` format, indexes start with 0"""
+    try:
+        index, count = map(int, value.split("/"))
+    except ValueError:
+        raise exceptions.UsageError("Invalid shard {!r}, expected i/N"
+                                    .format(value))
+    if not 0 <= index < count:
+        raise exceptions.UsageError("Invalid shard {!r}, the index must be "
+                                    "in range from 0 to {}"
+                                    .format(value, count - 1))
+    return Shard(index, count)
+
+
+class Leases(object):
+    """Exclusive leases of keys shared by processes in a SQLite database
+
+    Shards of a migration run tasks which create shared resources, e.g.
+    flavors or images, under the lease of the name of the task, so only
+    one of them creates a resource and others find it created.
+
+    A lease expires after `ttl` seconds unless it is renewed, so leases
+    of crashed processes are taken over by others. Leases are renewed
+    while they are held, if the renewal fails another process could
+    hold the lease and :class:`pumphouse.exceptions.LeaseLost` is raised
+    once the work under the lease is finished.
+
+    :param path:  a path to the database file available to all shards
+    :param owner: a unique name of the process, defaults to the host
+                  name and the PID
+    """
+
+    def __init__(self, path, owner=None, ttl=DEFAULT_TTL,
+                 poll_interval=DEFAULT_POLL_INTERVAL):
+        self.path = path
+        if owner is None:
+            owner = "{}-{}".format(socket.gethostname(), os.getpid())
+        self.owner = owner
+        self.ttl = ttl
+        self.poll_interval = poll_interval
+        with self.connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS leases ("
+                         "key TEXT PRIMARY KEY, "
+                         "owner TEXT NOT NULL, "
+                         "expires REAL NOT NULL)")
+
+    def connect(self):
+        # NOTE: Connections of SQLite can not be shared by threads, so
+        #       every operation opens its own one. Transactions are
+        #       started explicitly to lock the database before reading.
+        conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT,
+                               isolation_level=None)
+        return contextlib.closing(conn)
+
+    def try_acquire(self, key):
+        """Acquires or renews the lease of the key if it is free
+
+        :returns: True if the lease is held by this owner
+        """
+        now = time.time()
+        with self.connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("SELECT owner, expires FROM leases "
+                                   "WHERE key = ?", (key,)).fetchone()
+                if (row is not None and row[0] != self.owner and
+                        row[1] > now):
+                    return False
+                conn.execute("INSERT OR REPLACE INTO leases "
+                             "(key, owner, expires) VALUES (?, ?, ?)",
+                             (key, self.owner, now + self.ttl))
+                return True
+            finally:
+                conn.execute("COMMIT")
+
+    def acquire(self, key):
+        """Waits until the lease of the key is acquired"""
+        waited = False
+        while not self.try_acquire(key):
+            if not waited:
+                LOG.info("Waiting for the lease of %s", key)
+                waited = True
+            time.sleep(self.poll_interval)
+
+    def is_held(self, key):
+        """Checks that the lease of the key is held by this owner"""
+        with self.connect() as conn:
+            row = conn.execute("SELECT owner, expires FROM leases "
+                               "WHERE key = ?", (key,)).fetchone()
+        return (row is not None and row[0] == self.owner and
+                row[1] > time.time())
+
+    def release(self, key):
+        with self.connect() as conn:
+            conn.execute("DELETE FROM leases WHERE key = ? AND owner = ?",
+                         (key, self.owner))
+
+    @contextlib.contextmanager
+    def hold(self, key):
+        """Holds the lease of the key renewing it in the background"""
+        self.acquire(key)
+        stopped = threading.Event()
+        lost = threading.Event()
+
+        def renew():
+            while not stopped.wait(self.ttl / 3.0):
+                if not self.try_acquire(key):
+                    LOG.warning("The lease of %s is lost", key)
+                    lost.set()
+                    return
+
+        renewer = threading.Thread(target=renew, name="lease-" + key)
+        renewer.daemon = True
+        renewer.start()
+        try:
+            yield
+        finally:
+            stopped.set()
+            renewer.join()
+            held = not lost.is_set() and self.is_held(key)
+            self.release(key)
+        if not held:
+            raise exceptions.LeaseLost("The lease of {} was lost while it "
+                                       "was held".format(key))
+
+    def call(self, key, func, *args, **kwargs):
+        with self.hold(key):
+            return func(*args, **kwargs)
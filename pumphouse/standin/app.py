@@ -0,0 +1,107 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+
+import logging
+import threading
+
+import flask
+from werkzeug import serving
+
+from . import base
+from . import compute
+from . import identity
+from . import image
+from . import network
+from . import volume
+
+
+LOG = logging.getLogger(__name__)
+
+
+def create_app(cloud):
+    """Creates a WSGI application which serves APIs of the fake cloud.
+
+    :param cloud: an instance of :class:`pumphouse.fake.Cloud`
+    :returns: a :class:`flask.Flask` instance
+    """
+    app = flask.Flask(__name__)
+    app.extensions["tokens"] = base.Tokens(cloud)
+    app.register_blueprint(identity.identity)
+    app.register_blueprint(compute.compute)
+    app.register_blueprint(image.image)
+    app.register_blueprint(volume.volume)
+    app.register_blueprint(network.network)
+    app.register_error_handler(Exception, base.handle_error)
+    app.teardown_request(base.drain_request)
+    return app
+
+
+class RequestHandler(serving.WSGIRequestHandler):
+    # NOTE: Connections are kept alive, so pools of connections of
+    #       clients work as with real services.
+    protocol_version = "HTTP/1.1"
+
+
+class Server(object):
+    """Serves the fake cloud over HTTP in a thread
+
+    Clients of the cloud authenticate at :attr:`auth_url` with the name
+    of any user and tenant of the fake cloud.
+
+    :param cloud: an instance of :class:`pumphouse.fake.Cloud`
+    :param host:  an address to listen on
+    :param port:  a port to listen on, a free port is chosen if it is 0
+    """
+
+    def __init__(self, cloud, host="127.0.0.1", port=0):
+        self.app = create_app(cloud)
+        self.server = serving.make_server(host, port, self.app,
+                                          threaded=True,
+                                          request_handler=RequestHandler)
+        # NOTE: Threads of kept alive connections must not block exit.
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return "http://{}:{}".format(host, port)
+
+    @property
+    def auth_url(self):
+        return "{}/v2.0".format(self.url)
+
+    def serve_forever(self):
+        LOG.info("Serving the fake cloud at %s", self.auth_url)
+        self.server.serve_forever()
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever,
+                                       name="standin-server")
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
@@ -0,0 +1,190 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+
+import functools
+import json
+import logging
+import threading
+import uuid
+
+import flask
+
+from pumphouse import exceptions
+
+
+LOG = logging.getLogger(__name__)
+
+# NOTE: Attributes of objects of the fake cloud which are not a part of
+#       their representations in the APIs.
+HIDDEN_KEYS = frozenset(("manager", "_info", "_resp"))
+
+CHUNK_SIZE = 65536
+
+NEUTRON_ERROR_TYPES = {
+    400: "BadRequest",
+    401: "Unauthorized",
+    403: "Forbidden",
+    404: "NotFound",
+    409: "Conflict",
+}
+
+
+class Tokens(object):
+    """Tokens issued by the stand-in and clouds restricted by them
+
+    :param cloud: an instance of :class:`pumphouse.fake.Cloud`
+    """
+
+    def __init__(self, cloud):
+        self.cloud = cloud
+        self.tokens = {}
+        self.lock = threading.Lock()
+
+    def issue(self, username, tenant_name):
+        cloud = self.cloud.restrict(username=username,
+                                    tenant_name=tenant_name)
+        token = uuid.uuid4().hex
+        with self.lock:
+            self.tokens[token] = cloud
+        return token, cloud
+
+    def get(self, token):
+        with self.lock:
+            return self.tokens.get(token)
+
+
+def get_tokens():
+    return flask.current_app.extensions["tokens"]
+
+
+def to_json(obj):
+    """Converts objects of the fake cloud to plain JSON-ready values."""
+    if isinstance(obj, dict):
+        # NOTE: Items are copied because other requests could change
+        #       the object at the same time.
+        return dict((key, to_json(value)) for key, value in obj.items()
+                    if key not in HIDDEN_KEYS)
+    if isinstance(obj, (list, tuple)):
+        return [to_json(value) for value in obj]
+    return obj
+
+
+def respond(body=None, status=200, headers=None):
+    if body is None:
+        return flask.Response(status=status, headers=headers)
+    return flask.Response(json.dumps(to_json(body)),
+                          status=status,
+                          headers=headers,
+                          mimetype="application/json")
+
+
+def error_response(status, message):
+    """Makes a response with an error in the format of the service
+
+    Clients of Nova, Cinder and Keystone take the message of an error
+    from the first key of the body, Neutron client looks for the
+    `NeutronError` key.
+    """
+    if flask.request.blueprint == "network":
+        body = {"NeutronError": {
+            "type": NEUTRON_ERROR_TYPES.get(status, "NeutronError"),
+            "message": message,
+            "detail": "",
+        }}
+    else:
+        body = {"error": {
+            "message": message,
+            "code": status,
+        }}
+    return respond(body, status=status)
+
+
+def error_status(exc):
+    if isinstance(exc, exceptions.NotFound):
+        return 404
+    for attr in ("code", "http_status"):
+        status = getattr(exc, attr, None)
+        if isinstance(status, int) and 400 <= status < 600:
+            return status
+    return 500
+
+
+def handle_error(exc):
+    status = error_status(exc)
+    if status == 500:
+        LOG.exception("Unexpected error in %s %s",
+                      flask.request.method, flask.request.path)
+    return error_response(status, str(exc) or exc.__class__.__name__)
+
+
+def authenticate():
+    """Finds the cloud of the token of the request
+
+    The restricted cloud is available as `flask.g.cloud` in views.
+    """
+    token = flask.request.headers.get("X-Auth-Token")
+    cloud = get_tokens().get(token)
+    if cloud is None:
+        return error_response(401, "The request you have made requires "
+                                   "authentication.")
+    flask.g.cloud = cloud
+
+
+def drain_request(exc=None):
+    """Reads the rest of the body so the connection can be reused."""
+    exhaust = getattr(flask.request.stream, "exhaust", None)
+    if exhaust is not None:
+        exhaust()
+
+
+def iter_chunked(stream):
+    while True:
+        size = int(stream.readline().split(b";")[0].strip(), 16)
+        if not size:
+            # NOTE: Skip trailers up to the empty line.
+            while stream.readline().strip():
+                pass
+            return
+        chunk = stream.read(size)
+        stream.readline()
+        yield chunk
+
+
+def is_chunked():
+    encoding = flask.request.headers.get("Transfer-Encoding", "")
+    return encoding.lower() == "chunked"
+
+
+def iter_body():
+    """Yields chunks of the body of the request without keeping it
+
+    The development server of Werkzeug does not decode the chunked
+    transfer encoding which clients use to upload files of unknown
+    size, so it is decoded here.
+    """
+    request = flask.request
+    if is_chunked():
+        return iter_chunked(request.environ["wsgi.input"])
+    return iter(functools.partial(request.stream.read, CHUNK_SIZE), b"")
+
+
+def get_body(key=None):
+    body = flask.request.get_json(force=True, silent=True)
+    if body is None:
+        flask.abort(400)
+    if key is not None:
+        if key not in body:
+            flask.abort(400)
+        return body[key]
+    return body
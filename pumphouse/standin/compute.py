@@ -0,0 +1,312 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+
+import logging
+
+import flask
+
+from . import base
+
+
+LOG = logging.getLogger(__name__)
+
+compute = flask.Blueprint("compute", __name__,
+                          url_prefix="/compute/v2/<tenant_id>")
+compute.before_request(base.authenticate)
+
+
+@compute.url_value_preprocessor
+def pop_tenant_id(endpoint, values):
+    values.pop("tenant_id", None)
+
+
+@compute.route("/servers", methods=["GET"])
+@compute.route("/servers/detail", methods=["GET"])
+def list_servers():
+    search_opts = {}
+    if "reservation_id" in flask.request.args:
+        search_opts["reservation_id"] = flask.request.args["reservation_id"]
+    return base.respond({
+        "servers": flask.g.cloud.nova.servers.list(search_opts=search_opts),
+    })
+
+
+@compute.route("/servers/<server_id>", methods=["GET"])
+def get_server(server_id):
+    return base.respond({
+        "server": flask.g.cloud.nova.servers.get(server_id),
+    })
+
+
+@compute.route("/servers", methods=["POST"])
+def create_server():
+    body = base.get_body("server")
+    # NOTE: The fake cloud picks a fixed IP address itself only if no
+    #       networks are requested.
+    nics = [{"net-id": net["uuid"], "v4-fixed-ip": net["fixed_ip"]}
+            for net in body.get("networks", [])
+            if net.get("uuid") and net.get("fixed_ip")]
+    server = flask.g.cloud.nova.servers.create(
+        body["name"], body["imageRef"], body["flavorRef"],
+        nics=nics,
+        min_count=body.get("min_count"),
+        max_count=body.get("max_count"),
+        return_reservation_id=body.get("return_reservation_id", False))
+    if body.get("return_reservation_id"):
+        return base.respond(server, status=202)
+    return base.respond({"server": server}, status=202)
+
+
+@compute.route("/servers/<server_id>", methods=["DELETE"])
+def delete_server(server_id):
+    servers = flask.g.cloud.nova.servers
+    servers.delete(servers.get(server_id))
+    return base.respond(status=204)
+
+
+@compute.route("/servers/<server_id>/action", methods=["POST"])
+def server_action(server_id):
+    body = base.get_body()
+    servers = flask.g.cloud.nova.servers
+    headers = None
+    if "addFloatingIp" in body:
+        action = body["addFloatingIp"]
+        servers.add_floating_ip(server_id, action["address"],
+                                action.get("fixed_address"))
+    elif "removeFloatingIp" in body:
+        servers.remove_floating_ip(server_id,
+                                   body["removeFloatingIp"]["address"])
+    elif "suspend" in body:
+        servers.suspend(server_id)
+    elif "resume" in body:
+        servers.resume(server_id)
+    elif "os-migrateLive" in body:
+        action = body["os-migrateLive"]
+        servers.live_migrate(server_id, action.get("host"),
+                             action.get("block_migration"),
+                             action.get("disk_over_commit"))
+    elif "createImage" in body:
+        image_id = servers.create_image(servers.get(server_id),
+                                        body["createImage"]["name"])
+        # NOTE: The client takes the ID of the image from the location.
+        headers = {"Location": "{}image/v2/images/{}".format(
+            flask.request.url_root, image_id)}
+    else:
+        return base.error_response(400, "Unsupported action: {}".format(
+            ", ".join(body)))
+    return base.respond(status=202, headers=headers)
+
+
+@compute.route("/flavors", methods=["GET"])
+@compute.route("/flavors/detail", methods=["GET"])
+def list_flavors():
+    return base.respond({"flavors": flask.g.cloud.nova.flavors.list()})
+
+
+@compute.route("/flavors/<flavor_id>", methods=["GET"])
+def get_flavor(flavor_id):
+    return base.respond({
+        "flavor": flask.g.cloud.nova.flavors.get(flavor_id),
+    })
+
+
+@compute.route("/flavors", methods=["POST"])
+def create_flavor():
+    body = base.get_body("flavor")
+    flavor = flask.g.cloud.nova.flavors.create(
+        body["name"], body["ram"], body["vcpus"], body["disk"])
+    return base.respond({"flavor": flavor})
+
+
+@compute.route("/flavors/<flavor_id>", methods=["DELETE"])
+def delete_flavor(flavor_id):
+    flavors = flask.g.cloud.nova.flavors
+    flavors.delete(flavors.get(flavor_id))
+    return base.respond(status=202)
+
+
+@compute.route("/os-networks", methods=["GET"])
+def list_networks():
+    return base.respond({"networks": flask.g.cloud.nova.networks.list()})
+
+
+@compute.route("/os-networks/<network_id>", methods=["GET"])
+def get_network(network_id):
+    return base.respond({
+        "network": flask.g.cloud.nova.networks.get(network_id),
+    })
+
+
+@compute.route("/os-networks", methods=["POST"])
+def create_network():
+    network = flask.g.cloud.nova.networks.create(
+        **base.get_body("network"))
+    return base.respond({"network": network})
+
+
+@compute.route("/os-networks/<network_id>", methods=["DELETE"])
+def delete_network(network_id):
+    networks = flask.g.cloud.nova.networks
+    networks.delete(networks.get(network_id))
+    return base.respond(status=202)
+
+
+@compute.route("/os-networks/<network_id>/action", methods=["POST"])
+def network_action(network_id):
+    body = base.get_body()
+    networks = flask.g.cloud.nova.networks
+    if "disassociate" not in body:
+        return base.error_response(400, "Unsupported action: {}".format(
+            ", ".join(body)))
+    networks.disassociate(networks.get(network_id))
+    return base.respond(status=202)
+
+
+@compute.route("/os-floating-ips-bulk", methods=["GET"])
+def list_floating_ips_bulk():
+    return base.respond({
+        "floating_ip_info": flask.g.cloud.nova.floating_ips_bulk.list(),
+    })
+
+
+@compute.route("/os-floating-ips-bulk", methods=["POST"])
+def create_floating_ips_bulk():
+    body = base.get_body("floating_ips_bulk_create")
+    flask.g.cloud.nova.floating_ips_bulk.create(body["ip_range"],
+                                                pool=body.get("pool"))
+    return base.respond({"floating_ips_bulk_create": body})
+
+
+@compute.route("/os-floating-ips-bulk/delete", methods=["PUT"])
+def delete_floating_ips_bulk():
+    ip_range = base.get_body("ip_range")
+    flask.g.cloud.nova.floating_ips_bulk.delete(ip_range)
+    return base.respond({"floating_ips_bulk_delete": ip_range})
+
+
+@compute.route("/os-floating-ip-pools", methods=["GET"])
+def list_floating_ip_pools():
+    pools = flask.g.cloud.nova.floating_ip_pools.list()
+    return base.respond({
+        "floating_ip_pools": [{"name": pool["name"]} for pool in pools],
+    })
+
+
+@compute.route("/os-security-groups", methods=["GET"])
+def list_security_groups():
+    return base.respond({
+        "security_groups": [
+            security_group(secgroup)
+            for secgroup in flask.g.cloud.nova.security_groups.list()
+        ],
+    })
+
+
+@compute.route("/os-security-groups/<secgroup_id>", methods=["GET"])
+def get_security_group(secgroup_id):
+    secgroup = flask.g.cloud.nova.security_groups.get(secgroup_id)
+    return base.respond({"security_group": security_group(secgroup)})
+
+
+@compute.route("/os-security-groups", methods=["POST"])
+def create_security_group():
+    body = base.get_body("security_group")
+    secgroup = flask.g.cloud.nova.security_groups.create(
+        body["name"], body.get("description"))
+    return base.respond({"security_group": security_group(secgroup)})
+
+
+@compute.route("/os-security-groups/<secgroup_id>", methods=["DELETE"])
+def delete_security_group(secgroup_id):
+    secgroups = flask.g.cloud.nova.security_groups
+    secgroups.delete(secgroups.get(secgroup_id))
+    return base.respond(status=202)
+
+
+def security_group(secgroup):
+    # NOTE: The fake cloud keeps an empty string instead of rules.
+    secgroup = base.to_json(secgroup)
+    secgroup["rules"] = secgroup.get("rules") or []
+    return secgroup
+
+
+@compute.route("/os-security-group-rules", methods=["POST"])
+def create_security_group_rule():
+    body = dict(base.get_body("security_group_rule"))
+    parent_group_id = body.pop("parent_group_id")
+    rule = flask.g.cloud.nova.security_group_rules.create(parent_group_id,
+                                                          **body)
+    rule = base.to_json(rule)
+    rule["parent_group_id"] = parent_group_id
+    return base.respond({"security_group_rule": rule})
+
+
+@compute.route("/os-security-group-rules/<rule_id>", methods=["DELETE"])
+def delete_security_group_rule(rule_id):
+    flask.g.cloud.nova.security_group_rules.delete(rule_id)
+    return base.respond(status=202)
+
+
+@compute.route("/os-hypervisors", methods=["GET"])
+@compute.route("/os-hypervisors/detail", methods=["GET"])
+def list_hypervisors():
+    return base.respond({
+        "hypervisors": flask.g.cloud.nova.hypervisors.list(),
+    })
+
+
+@compute.route("/os-hypervisors/<hostname>/search", methods=["GET"])
+def search_hypervisors(hostname):
+    return base.respond({
+        "hypervisors": flask.g.cloud.nova.hypervisors.search(hostname),
+    })
+
+
+@compute.route("/os-hypervisors/<hostname>/servers", methods=["GET"])
+def list_hypervisor_servers(hostname):
+    return base.respond({
+        "hypervisors": flask.g.cloud.nova.hypervisors.search(hostname,
+                                                             servers=True),
+    })
+
+
+@compute.route("/os-services", methods=["GET"])
+def list_services():
+    args = flask.request.args
+    return base.respond({
+        "services": flask.g.cloud.nova.services.list(
+            host=args.get("host"), binary=args.get("binary")),
+    })
+
+
+@compute.route("/os-services/enable", methods=["PUT"])
+def enable_service():
+    body = base.get_body()
+    service = flask.g.cloud.nova.services.enable(body["host"],
+                                                 body["binary"])
+    return base.respond({"service": service})
+
+
+@compute.route("/os-services/disable", methods=["PUT"])
+def disable_service():
+    body = base.get_body()
+    service = flask.g.cloud.nova.services.disable(body["host"],
+                                                  body["binary"])
+    return base.respond({"service": service})
+
+
+@compute.route("/os-services/<service_id>", methods=["DELETE"])
+def delete_service(service_id):
+    flask.g.cloud.nova.services.delete(service_id)
+    return base.respond(status=204)
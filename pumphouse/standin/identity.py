@@ -0,0 +1,211 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+
+import datetime
+import logging
+
+import flask
+
+from . import base
+
+
+LOG = logging.getLogger(__name__)
+
+TOKEN_LIFETIME = datetime.timedelta(days=1)
+TIME_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+identity = flask.Blueprint("identity", __name__, url_prefix="/v2.0")
+
+
+@identity.before_request
+def authenticate():
+    if flask.request.endpoint != "identity.create_token":
+        return base.authenticate()
+
+
+def service_catalog(url_root, tenant_id):
+    endpoints = [
+        ("identity", "keystone", "v2.0"),
+        ("compute", "nova", "compute/v2/{}".format(tenant_id)),
+        ("image", "glance", "image"),
+        ("volume", "cinder", "volume/v1/{}".format(tenant_id)),
+        ("network", "neutron", "network"),
+    ]
+    catalog = []
+    for service_type, name, path in endpoints:
+        url = url_root + path
+        catalog.append({
+            "type": service_type,
+            "name": name,
+            "endpoints": [{
+                "region": "RegionOne",
+                "publicURL": url,
+                "internalURL": url,
+                "adminURL": url,
+            }],
+            "endpoints_links": [],
+        })
+    return catalog
+
+
+def find_one(resource, key, value):
+    objects = resource.objects.lookup(key, value)
+    if objects:
+        return objects[0]
+    return None
+
+
+@identity.route("/tokens", methods=["POST"])
+def create_token():
+    # NOTE: Passwords are not checked, the fake cloud does not keep them
+    #       for all users.
+    auth = base.get_body("auth")
+    username = auth.get("passwordCredentials", {}).get("username")
+    tokens = base.get_tokens()
+    keystone = tokens.cloud.keystone
+    user = find_one(keystone.users, "name", username)
+    if "tenantId" in auth:
+        tenant = keystone.tenants.objects.get(auth["tenantId"])
+    else:
+        tenant = find_one(keystone.tenants, "name", auth.get("tenantName"))
+    if user is None or tenant is None:
+        return base.error_response(401, "Invalid user / password")
+    token, _ = tokens.issue(username, tenant["name"])
+    now = datetime.datetime.utcnow()
+    roles = user.get("roles", [])
+    return base.respond({"access": {
+        "token": {
+            "id": token,
+            "issued_at": now.strftime(TIME_FORMAT),
+            "expires": (now + TOKEN_LIFETIME).strftime(TIME_FORMAT),
+            "tenant": tenant,
+        },
+        "user": {
+            "id": user["id"],
+            "name": username,
+            "username": username,
+            "roles": [{"name": role["name"]} for role in roles],
+            "roles_links": [],
+        },
+        "serviceCatalog": service_catalog(flask.request.url_root,
+                                          tenant["id"]),
+        "metadata": {
+            "is_admin": 0,
+            "roles": [role["id"] for role in roles],
+        },
+    }})
+
+
+@identity.route("/tenants", methods=["GET"])
+def list_tenants():
+    return base.respond({
+        "tenants": flask.g.cloud.keystone.tenants.list(),
+        "tenants_links": [],
+    })
+
+
+@identity.route("/tenants", methods=["POST"])
+def create_tenant():
+    body = dict(base.get_body("tenant"))
+    tenant = flask.g.cloud.keystone.tenants.create(body.pop("name"), **body)
+    return base.respond({"tenant": tenant})
+
+
+@identity.route("/tenants/<tenant_id>", methods=["GET"])
+def get_tenant(tenant_id):
+    tenant = flask.g.cloud.keystone.tenants.get(tenant_id)
+    return base.respond({"tenant": tenant})
+
+
+@identity.route("/tenants/<tenant_id>", methods=["DELETE"])
+def delete_tenant(tenant_id):
+    keystone = flask.g.cloud.keystone
+    keystone.tenants.delete(keystone.tenants.get(tenant_id))
+    return base.respond(status=204)
+
+
+@identity.route("/tenants/<tenant_id>/users", methods=["GET"])
+def list_tenant_users(tenant_id):
+    users = flask.g.cloud.keystone.users.findall(tenantId=tenant_id)
+    return base.respond({"users": users, "users_links": []})
+
+
+@identity.route("/users", methods=["GET"])
+def list_users():
+    return base.respond({
+        "users": flask.g.cloud.keystone.users.list(),
+        "users_links": [],
+    })
+
+
+@identity.route("/users", methods=["POST"])
+def create_user():
+    body = dict(base.get_body("user"))
+    body["tenant_id"] = body.pop("tenantId", None)
+    user = flask.g.cloud.keystone.users.create(**body)
+    return base.respond({"user": user})
+
+
+@identity.route("/users/<user_id>", methods=["GET"])
+def get_user(user_id):
+    user = flask.g.cloud.keystone.users.get(user_id)
+    return base.respond({"user": user})
+
+
+@identity.route("/users/<user_id>", methods=["DELETE"])
+def delete_user(user_id):
+    keystone = flask.g.cloud.keystone
+    keystone.users.delete(keystone.users.get(user_id))
+    return base.respond(status=204)
+
+
+@identity.route("/users/<user_id>/roles", methods=["GET"])
+@identity.route("/tenants/<tenant_id>/users/<user_id>/roles",
+                methods=["GET"])
+def list_user_roles(user_id, tenant_id=None):
+    roles = flask.g.cloud.keystone.roles.roles_for_user(user_id)
+    return base.respond({"roles": roles})
+
+
+@identity.route("/tenants/<tenant_id>/users/<user_id>/roles/OS-KSADM/"
+                "<role_id>", methods=["PUT"])
+def add_user_role(tenant_id, user_id, role_id):
+    roles = flask.g.cloud.keystone.roles
+    role = roles.get(role_id)
+    roles.add_user_role(user_id, role_id, tenant_id)
+    return base.respond({"role": role})
+
+
+@identity.route("/OS-KSADM/roles", methods=["GET"])
+def list_roles():
+    return base.respond({"roles": flask.g.cloud.keystone.roles.list()})
+
+
+@identity.route("/OS-KSADM/roles", methods=["POST"])
+def create_role():
+    body = base.get_body("role")
+    role = flask.g.cloud.keystone.roles.create(body["name"])
+    return base.respond({"role": role})
+
+
+@identity.route("/OS-KSADM/roles/<role_id>", methods=["GET"])
+def get_role(role_id):
+    return base.respond({"role": flask.g.cloud.keystone.roles.get(role_id)})
+
+
+@identity.route("/OS-KSADM/roles/<role_id>", methods=["DELETE"])
+def delete_role(role_id):
+    keystone = flask.g.cloud.keystone
+    keystone.roles.delete(keystone.roles.get(role_id))
+    return base.respond(status=204)
@@ -0,0 +1,119 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+
+import bisect
+import logging
+import urllib
+
+import flask
+
+from . import base
+
+
+LOG = logging.getLogger(__name__)
+
+DEFAULT_PAGE_SIZE = 20
+PAGING_ARGS = ("limit", "marker", "sort_key", "sort_dir")
+
+# NOTE: The client validates images by the schema, so it lists only
+#       properties of images without constraints of their types.
+IMAGE_PROPERTIES = ("id", "name", "status", "visibility", "protected",
+                    "checksum", "owner", "size", "virtual_size",
+                    "container_format", "disk_format", "created_at",
+                    "updated_at", "tags", "min_ram", "min_disk", "file",
+                    "schema", "self", "direct_url", "locations")
+
+image = flask.Blueprint("image", __name__, url_prefix="/image/v2")
+image.before_request(base.authenticate)
+
+
+@image.route("/schemas/image", methods=["GET"])
+def get_image_schema():
+    return base.respond({
+        "name": "image",
+        "properties": dict((name, {}) for name in IMAGE_PROPERTIES),
+        "links": [],
+    })
+
+
+@image.route("/images", methods=["GET"])
+def list_images():
+    args = flask.request.args
+    filters = dict((key, value) for key, value in args.iteritems()
+                   if key not in PAGING_ARGS)
+    limit = int(args.get("limit", DEFAULT_PAGE_SIZE))
+    images = sorted(flask.g.cloud.glance.images.findall(**filters),
+                    key=lambda image: image["id"])
+    start = 0
+    if "marker" in args:
+        ids = [image["id"] for image in images]
+        start = bisect.bisect_right(ids, args["marker"])
+    page = images[start:start + limit]
+    body = {"images": page, "schema": "/v2/schemas/images"}
+    if start + limit < len(images):
+        query = dict(filters, limit=limit, marker=page[-1]["id"])
+        body["next"] = "/v2/images?{}".format(urllib.urlencode(query))
+    return base.respond(body)
+
+
+@image.route("/images/<image_id>", methods=["GET"])
+def get_image(image_id):
+    return base.respond(flask.g.cloud.glance.images.get(image_id))
+
+
+@image.route("/images", methods=["POST"])
+def create_image():
+    image = flask.g.cloud.glance.images.create(**base.get_body())
+    return base.respond(image, status=201)
+
+
+@image.route("/images/<image_id>", methods=["DELETE"])
+def delete_image(image_id):
+    images = flask.g.cloud.glance.images
+    images.delete(images.get(image_id))
+    return base.respond(status=204)
+
+
+@image.route("/images/<image_id>/file", methods=["PUT"])
+def upload_image(image_id):
+    images = flask.g.cloud.glance.images
+    image = images.get(image_id)
+    size = sum(len(chunk) for chunk in base.iter_body())
+    images.upload(image_id, None)
+    if size:
+        image["size"] = size
+    image["status"] = "active"
+    headers = None
+    if base.is_chunked():
+        # NOTE: Glance client ends chunked bodies with an extra empty
+        #       chunk, the connection is closed to drop it.
+        headers = {"Connection": "close"}
+    return base.respond(status=204, headers=headers)
+
+
+@image.route("/images/<image_id>/file", methods=["GET"])
+def download_image(image_id):
+    images = flask.g.cloud.glance.images
+    image = images.get(image_id)
+    images.data(image_id)
+    size = image.get("size") or 0
+
+    def generate():
+        chunk = b"\0" * base.CHUNK_SIZE
+        for _ in xrange(size // base.CHUNK_SIZE):
+            yield chunk
+        yield chunk[:size % base.CHUNK_SIZE]
+    return flask.Response(generate(),
+                          headers={"Content-Length": str(size)},
+                          mimetype="application/octet-stream")
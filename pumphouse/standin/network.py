@@ -0,0 +1,45 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+
+import logging
+
+import flask
+
+from . import base
+
+
+LOG = logging.getLogger(__name__)
+
+# NOTE: The fake cloud uses nova-network, so there are no objects of
+#       Neutron. The lists are served empty for clients which check them.
+RESOURCES = ("networks", "subnets", "ports")
+
+network = flask.Blueprint("network", __name__, url_prefix="/network/v2.0")
+network.before_request(base.authenticate)
+
+
+@network.route("/<any({}):resource>.json".format(", ".join(RESOURCES)),
+               methods=["GET"])
+def list_resources(resource):
+    return base.respond({
+        resource: [],
+        "{}_links".format(resource): [],
+    })
+
+
+@network.route("/<any({}):resource>/<obj_id>.json".format(
+    ", ".join(RESOURCES)), methods=["GET", "PUT", "DELETE"])
+def get_resource(resource, obj_id):
+    return base.error_response(404, "{} {} could not be found".format(
+        resource[:-1].capitalize(), obj_id))
@@ -0,0 +1,80 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+
+import logging
+
+import flask
+
+from . import base
+
+
+LOG = logging.getLogger(__name__)
+
+VOLUME_ATTRS = ("size", "snapshot_id", "source_volid", "display_name",
+                "display_description", "volume_type", "user_id",
+                "project_id", "availability_zone", "metadata", "imageRef")
+
+volume = flask.Blueprint("volume", __name__,
+                         url_prefix="/volume/v1/<tenant_id>")
+volume.before_request(base.authenticate)
+
+
+@volume.url_value_preprocessor
+def pop_tenant_id(endpoint, values):
+    values.pop("tenant_id", None)
+
+
+@volume.route("/volumes", methods=["GET"])
+@volume.route("/volumes/detail", methods=["GET"])
+def list_volumes():
+    return base.respond({"volumes": flask.g.cloud.cinder.volumes.list()})
+
+
+@volume.route("/volumes/<volume_id>", methods=["GET"])
+def get_volume(volume_id):
+    return base.respond({
+        "volume": flask.g.cloud.cinder.volumes.get(volume_id),
+    })
+
+
+@volume.route("/volumes", methods=["POST"])
+def create_volume():
+    body = base.get_body("volume")
+    kwargs = dict((key, body[key]) for key in VOLUME_ATTRS if key in body)
+    return base.respond({
+        "volume": flask.g.cloud.cinder.volumes.create(**kwargs),
+    })
+
+
+@volume.route("/volumes/<volume_id>", methods=["DELETE"])
+def delete_volume(volume_id):
+    volumes = flask.g.cloud.cinder.volumes
+    volumes.delete(volumes.get(volume_id))
+    return base.respond(status=202)
+
+
+@volume.route("/volumes/<volume_id>/action", methods=["POST"])
+def volume_action(volume_id):
+    body = base.get_body()
+    if "os-volume_upload_image" not in body:
+        return base.error_response(400, "Unsupported action: {}".format(
+            ", ".join(body)))
+    action = body["os-volume_upload_image"]
+    _, result = flask.g.cloud.cinder.volumes.upload_to_image(
+        volume_id,
+        action.get("force", False),
+        action["image_name"],
+        action.get("container_format", "bare"),
+        action.get("disk_format", "raw"))
+    return base.respond(result, status=202)
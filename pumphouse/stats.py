@@ -0,0 +1,194 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+
+import bisect
+import collections
+import contextlib
+import logging
+import threading
+
+
+LOG = logging.getLogger(__name__)
+
+# NOTE: Upper bounds of buckets of the latency histogram in seconds, the
+#       last bucket counts all slower calls.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+                   5.0, 10.0, 30.0, 60.0)
+DURATION_BUCKETS = (0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0,
+                    600.0, 1800.0, 3600.0)
+
+
+class CallStats(object):
+    """Counters of calls of one method of a service
+
+    :param bounds: upper bounds of buckets of the histogram of latencies
+    """
+
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.count = 0
+        self.errors = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.bytes = 0
+        self.buckets = [0] * (len(bounds) + 1)
+
+    def record(self, latency, error=False):
+        self.count += 1
+        if error:
+            self.errors += 1
+        self.total_time += latency
+        if latency > self.max_time:
+            self.max_time = latency
+        self.buckets[bisect.bisect_left(self.bounds, latency)] += 1
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "total_time": self.total_time,
+            "avg_time": self.total_time / self.count if self.count else 0.0,
+            "max_time": self.max_time,
+            "bytes": self.bytes,
+            "buckets": list(self.buckets),
+        }
+
+
+class Calls(object):
+    """Statistics of calls by keys
+
+    Calls of clients of clouds are counted by the cloud, the service and
+    the method, e.g. `("source", "nova", "servers.list")`, executions of
+    tasks are counted by names of their classes. Calls made within
+    :meth:`scope` are counted by the given statistics as well.
+
+    :param bounds: upper bounds of buckets of histograms of latencies
+    """
+
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.lock = threading.Lock()
+        self.stats = collections.defaultdict(self.make_stats)
+        self.local = threading.local()
+
+    def make_stats(self):
+        return CallStats(self.bounds)
+
+    @contextlib.contextmanager
+    def scope(self, calls):
+        """Counts calls of the current thread in `calls` as well
+
+        Threads are greenlets once gevent patched the process.
+        """
+        previous = getattr(self.local, "calls", None)
+        self.local.calls = calls
+        try:
+            yield
+        finally:
+            self.local.calls = previous
+
+    def record(self, key, latency, error=False):
+        with self.lock:
+            self.stats[key].record(latency, error)
+        calls = getattr(self.local, "calls", None)
+        if calls is not None:
+            calls.record(key, latency, error)
+
+    def transfer(self, key, size):
+        with self.lock:
+            self.stats[key].bytes += size
+        calls = getattr(self.local, "calls", None)
+        if calls is not None:
+            calls.transfer(key, size)
+
+    def get_stats(self):
+        """Returns statistics of calls by keys"""
+        with self.lock:
+            return dict((key, stats.to_dict())
+                        for key, stats in self.stats.iteritems())
+
+    def reset(self):
+        with self.lock:
+            self.stats.clear()
+
+
+class Gauge(object):
+    """A number of things in progress, e.g. of running flows"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.value = 0
+
+    def __enter__(self):
+        with self.lock:
+            self.value += 1
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        with self.lock:
+            self.value -= 1
+
+
+def format_key(key):
+    return " ".join(filter(None, key))
+
+
+def meter(data, key, calls):
+    """Wraps the data to count bytes passed by the call"""
+    if data is None:
+        return data
+    if isinstance(data, basestring):
+        calls.transfer(key, len(data))
+        return data
+    return Meter(data, key, calls)
+
+
+class Meter(object):
+    """Counts bytes of data read from the file or the iterator
+
+    Other attributes are passed through to the wrapped object.
+
+    :param data:  a file-like object or an iterator of chunks
+    :param key:   a key of the call which passes the data
+    :param calls: an instance of :class:`Calls`
+    """
+
+    def __init__(self, data, key, calls):
+        self.data = data
+        self.key = key
+        self.calls = calls
+        self.iterator = None
+
+    def count(self, chunk):
+        if chunk:
+            self.calls.transfer(self.key, len(chunk))
+        return chunk
+
+    def read(self, *args, **kwargs):
+        return self.count(self.data.read(*args, **kwargs))
+
+    def __iter__(self):
+        return self
+
+    def next(self):
+        if self.iterator is None:
+            self.iterator = iter(self.data)
+        return self.count(next(self.iterator))
+
+    def __getattr__(self, attr):
+        return getattr(self.data, attr)
+
+
+calls = Calls()
+tasks = Calls(DURATION_BUCKETS)
+flows = Gauge()
@@ -16,12 +16,23 @@ from taskflow import task
 
 
 class BaseCloudTask(task.Task):
+    # NOTE: Maps names of arguments to fields of them used by the task,
+    #       results of other tasks are trimmed to the fields needed by
+    #       all their consumers.
+    required_fields = None
+    # NOTE: Shared tasks create resources which could be used by several
+    #       shards of the migration, they are run under leases.
+    shared = False
+
     def __init__(self, cloud, *args, **kwargs):
         super(BaseCloudTask, self).__init__(*args, **kwargs)
         self.cloud = cloud
 
 
 class BaseCloudsTask(task.Task):
+    required_fields = None
+    shared = False
+
     def __init__(self, src_cloud, dst_cloud, *args, **kwargs):
         super(BaseCloudsTask, self).__init__(*args, **kwargs)
         self.src_cloud = src_cloud
@@ -12,7 +12,9 @@
 # See the License for the specific language governing permissions and#
 # limitations under the License.
 
+import collections
 import logging
+import threading
 
 from taskflow.patterns import graph_flow
 
@@ -23,14 +25,147 @@ from pumphouse.tasks import service as service_tasks
 
 LOG = logging.getLogger(__name__)
 
+DEFAULT_MAX_PER_SOURCE = 2
+DEFAULT_MAX_PER_TARGET = 1
+
+
+class Target(object):
+    """Free resources of a hypervisor which can receive servers."""
+
+    def __init__(self, host, free_ram, free_vcpus):
+        self.host = host
+        self.free_ram = free_ram
+        self.free_vcpus = free_vcpus
+
+    def fits(self, ram):
+        # vCPUs are usually overcommitted, so only RAM is limited.
+        return self.free_ram >= ram
+
+    def allocate(self, ram, vcpus):
+        self.free_ram -= ram
+        self.free_vcpus -= vcpus
+
+    def __repr__(self):
+        return ("<Target(host={!r}, free_ram={!r}, free_vcpus={!r})>"
+                .format(self.host, self.free_ram, self.free_vcpus))
+
+
+class EvacuationPlanner(object):
+    """Plans the evacuation of servers from the host
+
+    Servers are distributed between lanes of consecutive live
+    migrations, the number of lanes limits concurrent migrations from
+    the source host. The biggest servers are planned first and each of
+    them is placed on the hypervisor with the largest amount of free
+    RAM (and vCPUs), concurrent migrations to the same target are
+    limited by a semaphore.
+
+    :param cloud:          an instance of :class:`pumphouse.cloud.Cloud`
+    :param hostname:       a hostname of the host to evacuate
+    :param max_per_source: a number of concurrent migrations from the host
+    :param max_per_target: a number of concurrent migrations to any target
+    """
+
+    def __init__(self, cloud, hostname,
+                 max_per_source=DEFAULT_MAX_PER_SOURCE,
+                 max_per_target=DEFAULT_MAX_PER_TARGET):
+        self.cloud = cloud
+        self.hostname = hostname
+        self.max_per_source = max(1, max_per_source)
+        self.max_per_target = max(1, max_per_target)
+        self.flavors = {}
+
+    def get_servers(self):
+        try:
+            hypervs = self.cloud.nova.hypervisors.search(self.hostname,
+                                                         servers=True)
+        except exceptions.nova_excs.NotFound:
+            LOG.exception("Could not find hypervisors at the host %r.",
+                          self.hostname)
+            raise
+        servers = []
+        for hyperv in hypervs:
+            if hasattr(hyperv, "servers"):
+                for server in hyperv.servers:
+                    ram, vcpus = self.get_server_size(server["uuid"])
+                    servers.append((server["uuid"], ram, vcpus))
+        return servers
+
+    def get_server_size(self, server_id):
+        server = self.cloud.nova.servers.get(server_id)
+        flavor_id = server.flavor["id"]
+        if flavor_id not in self.flavors:
+            try:
+                flavor = self.cloud.nova.flavors.get(flavor_id)
+            except exceptions.nova_excs.NotFound:
+                LOG.warning("Could not find flavor %r of server %r",
+                            flavor_id, server_id)
+                self.flavors[flavor_id] = (0, 0)
+            else:
+                self.flavors[flavor_id] = (flavor.ram, flavor.vcpus)
+        return self.flavors[flavor_id]
+
+    def get_targets(self):
+        services = self.cloud.nova.services.list(binary="nova-compute")
+        available = set(s.host for s in services
+                        if s.status == "enabled" and s.state == "up")
+        targets = []
+        for hyperv in self.cloud.nova.hypervisors.list():
+            host = hyperv.service["host"]
+            if host == self.hostname or host not in available:
+                continue
+            free_ram = getattr(hyperv, "free_ram_mb", 0)
+            free_vcpus = (getattr(hyperv, "vcpus", 0) -
+                          getattr(hyperv, "vcpus_used", 0))
+            targets.append(Target(host, free_ram, free_vcpus))
+        return targets
+
+    def plan(self):
+        """Returns lanes of pairs of a server ID and a target host.
+
+        The target host is None if there is no hypervisor with enough
+        resources, then the scheduler chooses it.
+        """
+        servers = sorted(self.get_servers(),
+                         key=lambda server: (-server[1], -server[2]))
+        targets = self.get_targets()
+        lanes = [[] for _ in range(min(self.max_per_source,
+                                       len(servers)))]
+        loads = [0] * len(lanes)
+        for server_id, ram, vcpus in servers:
+            candidates = [t for t in targets if t.fits(ram)]
+            if candidates:
+                target = max(candidates,
+                             key=lambda t: (t.free_ram, t.free_vcpus))
+                target.allocate(ram, vcpus)
+                host = target.host
+            else:
+                LOG.warning("There is no target host with %s MB of free "
+                            "RAM for server %r, it will be chosen by "
+                            "the scheduler", ram, server_id)
+                host = None
+            # The longest processing time first: the lane with the least
+            # amount of memory to migrate gets the next server.
+            lane = loads.index(min(loads))
+            lanes[lane].append((server_id, host))
+            loads[lane] += ram
+        return lanes
+
+    def semaphores(self):
+        return collections.defaultdict(
+            lambda: threading.BoundedSemaphore(self.max_per_target))
+
 
 def evacuate_servers(context, hostname):
-    try:
-        hypervs = context.src_cloud.nova.hypervisors.search(hostname,
-                                                            servers=True)
-    except exceptions.nova_excs.NotFound:
-        LOG.exception("Could not find hypervisors at the host %r.", hostname)
-        raise
+    evacuation_config = (context.config or {}).get("evacuation") or {}
+    planner = EvacuationPlanner(
+        context.src_cloud, hostname,
+        max_per_source=evacuation_config.get("max_per_source",
+                                             DEFAULT_MAX_PER_SOURCE),
+        max_per_target=evacuation_config.get("max_per_target",
+                                             DEFAULT_MAX_PER_TARGET))
+    lanes = planner.plan()
+    semaphores = planner.semaphores()
 
     disable_services = "disable-services-{}".format(hostname)
     flow = graph_flow.Flow(disable_services)
@@ -41,9 +176,14 @@ def evacuate_servers(context, hostname):
                                                      inject={
                                                          "hostname": hostname,
                                                      }))
-    for hyperv in hypervs:
-        if hasattr(hyperv, "servers"):
-            for server in hyperv.servers:
-                server_tasks.evacuate_server(context, flow, server["uuid"],
-                                             requires=[disable_services])
+    for lane in lanes:
+        requires = [disable_services]
+        for server_id, target_host in lane:
+            evacuated = server_tasks.evacuate_server(
+                context, flow, server_id,
+                requires=requires,
+                target_host=target_host,
+                semaphore=semaphores[target_host]
+                if target_host is not None else None)
+            requires = [disable_services, evacuated]
     return flow
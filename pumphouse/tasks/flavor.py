@@ -31,6 +31,8 @@ class RetrieveFlavor(task.BaseCloudTask):
 
 
 class EnsureFlavor(task.BaseCloudTask):
+    shared = True
+
     def execute(self, flavor_info):
         try:
             # TODO(akscram): Ensure that the flavor with the same ID is
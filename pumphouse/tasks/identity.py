@@ -12,6 +12,7 @@
 # See the License for the specific language governing permissions and#
 # limitations under the License.
 
+import functools
 import logging
 
 from taskflow.patterns import graph_flow
@@ -46,6 +47,12 @@ def migrate_passwords(context, users_ids, tenant_id):
     return task
 
 
+def fetch_user_roles(context, user_id, tenant_id):
+    return context.fetch(("user-roles", user_id, tenant_id),
+                         context.src_cloud.keystone.users.list_roles,
+                         user_id, tenant=tenant_id)
+
+
 def migrate_server_identity(context, server_info):
     server_id = server_info["id"]
     flow = graph_flow.Flow("server-identity-{}".format(server_id))
@@ -57,13 +64,13 @@ def migrate_server_identity(context, server_info):
         tenant_flow = tenant_tasks.migrate_tenant(context, tenant_id)
         flow.add(tenant_flow)
     if user_retrieve not in context.store:
-        user = context.src_cloud.keystone.users.get(user_id)
+        user = context.fetch(("user", user_id),
+                             context.src_cloud.keystone.users.get, user_id)
         user_tenant_id = getattr(user, "tenantId", None)
         user_flow = user_tasks.migrate_user(context, user_id,
                                             tenant_id=user_tenant_id)
         flow.add(user_flow)
-    roles = context.src_cloud.keystone.users.list_roles(user_id,
-                                                        tenant=tenant_id)
+    roles = fetch_user_roles(context, user_id, tenant_id)
     for role in roles:
         role_id = role.id
         role_retrieve = "role-{}-retrieve".format(role_id)
@@ -93,6 +100,9 @@ def migrate_identity(context, tenant_id):
     users_ids, roles_ids = set(), set()
     # XXX(akscram): Due to the bug #1308218 users duplication can be here.
     users = context.src_cloud.keystone.users.list(tenant_id)
+    context.prefetch(functools.partial(fetch_user_roles, user_id=user.id,
+                                       tenant_id=tenant_id)
+                     for user in users)
     for user in users:
         user_retrieve = "user-{}-retrieve".format(user.id)
         if (user.id == context.src_cloud.keystone.auth_ref.user_id or
@@ -104,8 +114,7 @@ def migrate_identity(context, tenant_id):
                                             tenant_id=user_tenant_id)
         flow.add(user_flow)
         users_ids.add(user.id)
-        user_roles = context.src_cloud.keystone.users.list_roles(
-            user.id, tenant=tenant_id)
+        user_roles = fetch_user_roles(context, user.id, tenant_id)
         for role in user_roles:
             # NOTE(akscram): Actually all roles which started with
             #                underscore are hidden.
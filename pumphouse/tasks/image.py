@@ -42,6 +42,13 @@ class LogReporter(task_utils.UploadReporter):
 
 
 class EnsureImage(task.BaseCloudsTask):
+    shared = True
+    required_fields = {
+        "user_info": ("tenantId", "name"),
+        "kernel_info": ("id",),
+        "ramdisk_info": ("id",),
+    }
+
     def execute(self, image_id, user_info, kernel_info, ramdisk_info):
         if user_info:
             tenant = self.dst_cloud.keystone.tenants.get(user_info["tenantId"])
@@ -157,7 +164,8 @@ def migrate_image_task(context, task_class, image_id, user_id, *rebind):
 # XXX(akscram): We should to simplify this function. The cascade of
 #               if-statements looks ugly.
 def migrate_image(context, image_id):
-    image = context.src_cloud.glance.images.get(image_id)
+    image = context.fetch(("image", image_id),
+                          context.src_cloud.glance.images.get, image_id)
     user_id = None
     if image["visibility"] == "private":
         user_id = image.get("owner")
@@ -245,6 +245,7 @@ class EnsureNeutronPort(task.BaseCloudTask):
 
 
 class EnsureNeutronSubnet(task.BaseCloudTask):
+    shared = True
 
     # XXX (sryabin) similar verify in EnsureNeutronNetwork
     def verifySubnet(self, src_subnet, dst_subnet):
@@ -270,6 +271,8 @@ class EnsureNeutronSubnet(task.BaseCloudTask):
 
 
 class EnsureNeutronNetwork(task.BaseCloudTask):
+    shared = True
+
     # XXX (sryabin) similar verify in EnsureNeutronSubnet
 
     def verify(self, src, dst):
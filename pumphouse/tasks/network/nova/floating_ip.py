@@ -19,6 +19,7 @@ from taskflow.patterns import linear_flow
 from pumphouse import task
 from pumphouse import events
 from pumphouse import exceptions
+from pumphouse import utils
 from pumphouse.tasks import utils as task_utils
 
 
@@ -32,6 +33,8 @@ class RetrieveFloatingIP(task.BaseCloudTask):
 
 
 class EnsureFloatingIPBulk(task.BaseCloudTask):
+    shared = True
+
     def execute(self, floating_ip_info):
         address = floating_ip_info["address"]
         pool = floating_ip_info["pool"]
@@ -72,8 +75,16 @@ class EnsureFloatingIPBulk(task.BaseCloudTask):
 
 
 class EnsureFloatingIP(task.BaseCloudTask):
-    # TODO(ogelbukh): this task must be refactored in a way that replaces a
-    # while loop with built-in retry mechanism of Taskflow lib
+    # Nova rejects association of the floating IP with BadRequest until
+    # the network of the just spawned server is ready.
+    association_backoff = utils.Backoff(initial=1, maximum=10,
+                                        max_elapsed=120)
+    required_fields = {
+        "server_info": ("id",),
+        "floating_ip_info": ("address",),
+        "fixed_ip_info": ("v4-fixed-ip",),
+    }
+
     def execute(self, server_info, floating_ip_info, fixed_ip_info):
         floating_ip_address = floating_ip_info["address"]
         fixed_ip_address = fixed_ip_info["v4-fixed-ip"]
@@ -86,28 +97,19 @@ class EnsureFloatingIP(task.BaseCloudTask):
                           floating_ip_address)
             raise
         if floating_ip.instance_uuid is None:
-            tries = []
-            while len(tries) in range(30):
-                try:
-                    # FIXME(ogelbukh): pass fixed ip address to bind to,
-                    # requires retention of network information for server
-                    self.cloud.nova.servers.add_floating_ip(
-                        server_id, floating_ip_address, None)
-                except exceptions.nova_excs.BadRequest as exc:
-                    tries.append(exc)
-                    pass
-                else:
-                    floating_ip = self.cloud.nova.floating_ips_bulk.find(
-                        address=floating_ip_address)
-                    LOG.info("Assigned floating ip: %s",
-                             floating_ip.to_dict())
-                    self.assigned_event(floating_ip_address, server_id)
-                    return floating_ip.to_dict()
-            else:
+            try:
+                self.add_floating_ip(server_id, floating_ip_address)
+            except exceptions.nova_excs.BadRequest:
                 LOG.exception("Unable to add floating ip: %s",
                               floating_ip.to_dict())
                 self.assigning_error_event(floating_ip_address, server_id)
                 raise exceptions.TimeoutException()
+            floating_ip = self.cloud.nova.floating_ips_bulk.find(
+                address=floating_ip_address)
+            LOG.info("Assigned floating ip: %s",
+                     floating_ip.to_dict())
+            self.assigned_event(floating_ip_address, server_id)
+            return floating_ip.to_dict()
         elif floating_ip.instance_uuid == server_id:
             LOG.warn("Already associated: %s", floating_ip)
             return floating_ip.to_dict()
@@ -115,6 +117,15 @@ class EnsureFloatingIP(task.BaseCloudTask):
             LOG.exception("Duplicate association: %s", floating_ip)
             raise exceptions.Conflict()
 
+    @utils.retry_on((exceptions.nova_excs.BadRequest,) +
+                    exceptions.transient_excs,
+                    backoff=association_backoff)
+    def add_floating_ip(self, server_id, floating_ip_address):
+        # FIXME(ogelbukh): pass fixed ip address to bind to,
+        # requires retention of network information for server
+        self.cloud.nova.servers.add_floating_ip(
+            server_id, floating_ip_address, None)
+
     def assigned_event(self, address, server_id):
         events.emit("update", {
             "id": address,
@@ -47,6 +47,8 @@ class RetrieveNetworkByLabel(task.BaseCloudTask):
 
 
 class EnsureNetwork(task.BaseCloudTask):
+    shared = True
+
     def verify(self, network, network_info):
         network_label = network["label"]
         for k, v in network.items():
@@ -13,6 +13,7 @@
 # limitations under the License.
 
 
+import functools
 import logging
 
 from taskflow.patterns import graph_flow
@@ -20,9 +21,9 @@ from taskflow import task
 
 from pumphouse import events
 from pumphouse import exceptions
+from pumphouse import fuel
 from pumphouse.tasks import service as service_tasks
 from pumphouse import task as pump_task
-from pumphouse import utils
 
 
 LOG = logging.getLogger(__name__)
@@ -48,8 +49,9 @@ def extract_macs(info):
 class RetrieveAllEnvironments(task.Task):
     def execute(self):
         from pumphouse._vendor.fuelclient.objects import environment
-        envs = dict((env.data["name"], env.data)
-                    for env in environment.Environment.get_all())
+        with fuel.cached():
+            envs = dict((env.data["name"], env.data)
+                        for env in environment.Environment.get_all())
         return envs
 
 
@@ -62,8 +64,9 @@ class RetrieveEnvNodes(task.Task):
     def execute(self, env_info):
         from pumphouse._vendor.fuelclient.objects import environment
         env = environment.Environment.init_with_data(env_info)
-        nodes = dict((extract_hostname(node.data), node.data)
-                     for node in env.get_all_nodes())
+        with fuel.cached():
+            nodes = dict((extract_hostname(node.data), node.data)
+                         for node in env.get_all_nodes())
         return nodes
 
 
@@ -75,31 +78,57 @@ class RetrieveNode(task.Task):
 class DeployChanges(pump_task.BaseCloudTask):
     def execute(self, env_info, **nodes_infos):
         from pumphouse._vendor.fuelclient.objects import environment
+        # NOTE: Failed nodes of a batch are passed as None.
+        nodes_infos = dict((name, node_info)
+                           for name, node_info in nodes_infos.iteritems()
+                           if node_info is not None)
+        if not nodes_infos:
+            LOG.warning("There are no nodes to deploy in env %r",
+                        env_info["name"])
+            return env_info
         env = environment.Environment.init_with_data(env_info)
-        task = env.deploy_changes()
         watched_macs = set(extract_macs(node_info)
                            for node_info in nodes_infos.itervalues())
-        for progress, nodes in task:
-            for node in nodes:
-                node_macs = extract_macs(node.data)
-                if node_macs in watched_macs:
-                    self.provisioning_event(progress, node)
+        task = env.deploy_changes()
+        nodes_iter = fuel.get_watcher().watch()
+        try:
+            for nodes, changed in nodes_iter:
+                for node_data in changed:
+                    if extract_macs(node_data) in watched_macs:
+                        self.provisioning_event(node_data)
+                if self.is_deployed(task, env, nodes.values()):
+                    break
+        finally:
+            nodes_iter.close()
         env.update()
         return env.data
 
+    def is_deployed(self, task, env, nodes):
+        from pumphouse._vendor.fuelclient.cli import error
+        task_data = task.get_fresh_data()
+        if task_data["status"] == "error":
+            raise error.DeployProgressError(task_data["message"])
+        # NOTE: The list of nodes is empty until the first successful
+        #       request of the watcher.
+        if task_data["status"] != "ready" or not nodes:
+            return False
+        return all(node["status"] in ("ready", "error")
+                   for node in nodes
+                   if node["cluster"] == env.id)
+
     def revert(self, env_info, result, flow_failures, **nodes_infos):
         LOG.error("Deploying of changed failed for env %r with result %r",
                   env_info, result)
 
-    def provisioning_event(self, progress, node):
-        LOG.debug("Waiting for deploy: %r, %r", progress, node)
+    def provisioning_event(self, node_info):
+        LOG.debug("Waiting for deploy: %r", node_info)
         events.emit("update", {
-            "id": extract_hostname(node.data),
+            "id": extract_hostname(node_info),
             "type": "host",
             "cloud": self.cloud.name,
-            "progress": node.data["progress"],
+            "progress": node_info["progress"],
             "data": {
-                "status": node.data["status"],
+                "status": node_info["status"],
             }
         }, namespace="/events")
 
@@ -129,8 +158,11 @@ class CopyDisksAttributesFromNode(task.Task):
         from_node = Node.init_with_data(from_node_info)
         node = Node.init_with_data(node_info)
 
-        from_disks = from_node.get_attribute("disks")
-        disks = node.get_attribute("disks")
+        # NOTE: Attributes of the reference node are requested once for
+        #       all nodes of the batch.
+        with fuel.cached():
+            from_disks = from_node.get_attribute("disks")
+            disks = node.get_attribute("disks")
         changed_disks = self.update_disks_attrs(from_disks, disks)
         node.upload_node_attribute("disks", changed_disks)
 
@@ -167,8 +199,9 @@ class CopyNetAttributesFromNode(task.Task):
         from_node = Node.init_with_data(from_node_info)
         node = Node.init_with_data(node_info)
 
-        from_ifaces = from_node.get_attribute("interfaces")
-        ifaces = node.get_attribute("interfaces")
+        with fuel.cached():
+            from_ifaces = from_node.get_attribute("interfaces")
+            ifaces = node.get_attribute("interfaces")
         changed_ifaces = self.update_ifaces_attrs(from_ifaces, ifaces)
         node.upload_node_attribute("interfaces", changed_ifaces)
 
@@ -198,21 +231,17 @@ class CopyNetAttributesFromNode(task.Task):
 
 class WaitUnassignedNode(task.Task):
     def execute(self, node_info, **requires):
-        condition_check = lambda x: x is not None
         node_macs = extract_macs(node_info)
-        unassigned_node_info = utils.wait_for(node_macs,
-                                              self.retrieve_unassigned,
-                                              attribute_getter=condition_check,
-                                              value=True,
-                                              timeout=360)
+        unassigned_node_info = fuel.get_watcher().wait_for(
+            functools.partial(self.find_unassigned, node_macs),
+            timeout=360)
         return unassigned_node_info
 
-    def retrieve_unassigned(self, node_macs):
-        from pumphouse._vendor.fuelclient.objects.node import Node
-        for node in Node.get_all():
-            if (node.data["status"] == "discover" and
-                    extract_macs(node.data) == node_macs):
-                return node.data
+    def find_unassigned(self, node_macs, nodes):
+        for node in nodes:
+            if (node["status"] == "discover" and
+                    extract_macs(node) == node_macs):
+                return node
         # TODO(akscram): Raise an exception when status is error.
         return None
 
@@ -306,33 +335,84 @@ class HostsSuccessEvents(pump_task.BaseCloudTask):
         }, namespace="/events")
 
 
-def unassign_node(context, flow, env_name, hostname):
+def isolate_node_task(node_task):
+    """Isolates a failure of the node in the batch
+
+    The failure of the task is logged and the result of the task is
+    None, then following tasks of the node are skipped because one of
+    their arguments is None. Other nodes of the batch are processed as
+    usual.
+    """
+    execute = node_task.execute
+
+    @functools.wraps(execute)
+    def wrapper(**kwargs):
+        skipped = sorted(name for name, value in kwargs.iteritems()
+                         if value is None)
+        if skipped:
+            LOG.warning("Task %s is skipped because of failed %s",
+                        node_task.name, ", ".join(skipped))
+            return None
+        try:
+            return execute(**kwargs)
+        except Exception:
+            msg = ("Task {} failed, the node is excluded from the batch"
+                   .format(node_task.name))
+            LOG.exception(msg)
+            events.emit("error", {
+                "message": msg,
+            }, namespace="/events")
+            return None
+    # NOTE: The mapping of arguments is built from the original execute
+    #       method in the constructor of the task, so it stays intact.
+    node_task.execute = wrapper
+    return node_task
+
+
+def add_node_tasks(flow, node_tasks, isolated):
+    if isolated:
+        node_tasks = [isolate_node_task(t) for t in node_tasks]
+    flow.add(*node_tasks)
+
+
+def unassign_nodes(context, flow, env_name, hostnames, isolated=False):
     env = "src-env-{}".format(env_name)
     deployed_env = "src-env-deployed-{}".format(env_name)
     env_nodes = "src-env-nodes-{}".format(env_name)
-    node = "node-{}".format(hostname)
-    pending_node = "node-pending-{}".format(hostname)
-    unassigned_node = "node-unassigned-{}".format(hostname)
 
-    flow.add(
-        RetrieveNode(name=node,
-                     provides=node,
-                     rebind=[env_nodes],
-                     inject={"hostname": hostname}),
-        UnassignNode(context.src_cloud,
-                     name=pending_node,
-                     provides=pending_node,
-                     rebind=[node, env]),
-        DeployChanges(context.src_cloud,
-                      name=deployed_env,
-                      provides=deployed_env,
-                      rebind=[env],
-                      requires=[pending_node]),
-        WaitUnassignedNode(name=unassigned_node,
-                           provides=unassigned_node,
-                           rebind=[pending_node],
-                           requires=[deployed_env]),
-    )
+    pending_nodes = []
+    for hostname in hostnames:
+        node = "node-{}".format(hostname)
+        pending_node = "node-pending-{}".format(hostname)
+        add_node_tasks(flow, [
+            RetrieveNode(name=node,
+                         provides=node,
+                         rebind=[env_nodes],
+                         inject={"hostname": hostname}),
+            UnassignNode(context.src_cloud,
+                         name=pending_node,
+                         provides=pending_node,
+                         rebind=[node, env]),
+        ], isolated)
+        pending_nodes.append(pending_node)
+    flow.add(DeployChanges(context.src_cloud,
+                           name=deployed_env,
+                           provides=deployed_env,
+                           rebind=[env],
+                           requires=pending_nodes))
+    for hostname in hostnames:
+        pending_node = "node-pending-{}".format(hostname)
+        unassigned_node = "node-unassigned-{}".format(hostname)
+        add_node_tasks(flow, [
+            WaitUnassignedNode(name=unassigned_node,
+                               provides=unassigned_node,
+                               rebind=[pending_node],
+                               requires=[deployed_env]),
+        ], isolated)
+
+
+def unassign_node(context, flow, env_name, hostname):
+    unassign_nodes(context, flow, env_name, [hostname])
 
 
 class DeleteServicesFromNode(service_tasks.DeleteServicesSilently):
@@ -341,13 +421,13 @@ class DeleteServicesFromNode(service_tasks.DeleteServicesSilently):
         return super(DeleteServicesFromNode, self).execute(hostname)
 
 
-def remove_computes(context, flow, env_name, hostname):
+def remove_computes(context, flow, env_name, hostname, isolated=False):
     deployed_env = "src-env-deployed-{}".format(env_name)
     pending_node = "node-pending-{}".format(hostname)
     delete_services = "services-delete-{}".format(hostname)
     delete_services_events = "services-delete-events-{}".format(hostname)
 
-    flow.add(
+    add_node_tasks(flow, [
         DeleteServicesFromNode(context.src_cloud,
                                name=delete_services,
                                provides=delete_services,
@@ -357,19 +437,15 @@ def remove_computes(context, flow, env_name, hostname):
         HostsDeleteEvents(context.src_cloud,
                           name=delete_services_events,
                           rebind=[delete_services]),
-    )
+    ], isolated)
 
 
-def assign_node(context, flow, env_name, hostname):
+def assign_nodes(context, flow, env_name, hostnames, isolated=False):
     env = "dst-env-{}".format(env_name)
     deployed_env = "dst-env-deployed-{}".format(env_name)
     env_nodes = "dst-env-nodes-{}".format(env_name)
-    unassigned_node = "node-unassigned-{}".format(hostname)
-    assigned_node = "node-assigned-{}".format(hostname)
     compute_node = "node-compute-{}".format(env_name)
     compute_roles = "compute-roles-{}".format(env_name)
-    node_with_disks = "node-with-disks-{}".format(hostname)
-    node_with_nets = "node-with-nets-{}".format(hostname)
 
     flow.add(
         ChooseAnyComputeNode(name=compute_node,
@@ -378,25 +454,39 @@ def assign_node(context, flow, env_name, hostname):
         ExtractRolesFromNode(name=compute_roles,
                              provides=compute_roles,
                              rebind=[compute_node]),
-        AssignNode(context.dst_cloud,
-                   name=assigned_node,
-                   provides=assigned_node,
-                   rebind=[unassigned_node, compute_roles, env]),
-        CopyDisksAttributesFromNode(name=node_with_disks,
-                                    provides=node_with_disks,
-                                    rebind=[compute_node, assigned_node]),
-        CopyNetAttributesFromNode(name=node_with_nets,
-                                  provides=node_with_nets,
-                                  rebind=[compute_node, assigned_node]),
-        DeployChanges(context.dst_cloud,
-                      name=deployed_env,
-                      provides=deployed_env,
-                      rebind=[env],
-                      requires=[node_with_disks, node_with_nets]),
     )
+    configured_nodes = []
+    for hostname in hostnames:
+        unassigned_node = "node-unassigned-{}".format(hostname)
+        assigned_node = "node-assigned-{}".format(hostname)
+        node_with_disks = "node-with-disks-{}".format(hostname)
+        node_with_nets = "node-with-nets-{}".format(hostname)
+        add_node_tasks(flow, [
+            AssignNode(context.dst_cloud,
+                       name=assigned_node,
+                       provides=assigned_node,
+                       rebind=[unassigned_node, compute_roles, env]),
+            CopyDisksAttributesFromNode(name=node_with_disks,
+                                        provides=node_with_disks,
+                                        rebind=[compute_node,
+                                                assigned_node]),
+            CopyNetAttributesFromNode(name=node_with_nets,
+                                      provides=node_with_nets,
+                                      rebind=[compute_node, assigned_node]),
+        ], isolated)
+        configured_nodes.extend([node_with_disks, node_with_nets])
+    flow.add(DeployChanges(context.dst_cloud,
+                           name=deployed_env,
+                           provides=deployed_env,
+                           rebind=[env],
+                           requires=configured_nodes))
+
+
+def assign_node(context, flow, env_name, hostname):
+    assign_nodes(context, flow, env_name, [hostname])
 
 
-def wait_computes(context, flow, env_name, hostname):
+def wait_computes(context, flow, env_name, hostname, isolated=False):
     deployed_env = "dst-env-deployed-{}".format(env_name)
     assigned_node = "node-assigned-{}".format(hostname)
     updated_assigned_node = "node-assigned-updated-{}".format(hostname)
@@ -404,7 +494,7 @@ def wait_computes(context, flow, env_name, hostname):
     wait_computes = "wait-computes-{}".format(hostname)
     host_success_events = "node-success-events-{}".format(hostname)
 
-    flow.add(
+    add_node_tasks(flow, [
         UpdateNodeInfo(name=updated_assigned_node,
                        provides=updated_assigned_node,
                        rebind=[assigned_node],
@@ -420,12 +510,21 @@ def wait_computes(context, flow, env_name, hostname):
         HostsSuccessEvents(context.dst_cloud,
                            name=host_success_events,
                            rebind=[wait_computes]),
-    )
+    ], isolated)
 
 
-def reassign_node(context, hostname):
+def reassign_nodes(context, hostnames, name=None):
+    """Reassigns a batch of nodes with a single deployment per environment
+
+    All nodes are unassigned from the source environment at once and
+    assigned to the destination one, so changes are deployed only once
+    in each environment. A failure of one node is isolated and does not
+    stop the reassignment of the rest of the batch, unless the batch
+    consists of a single node.
+    """
     src_env_name = context.config["source"]
     dst_env_name = context.config["destination"]
+    isolated = len(hostnames) > 1
 
     envs = "all-environments"
     src_env = "src-env-{}".format(src_env_name)
@@ -433,7 +532,9 @@ def reassign_node(context, hostname):
     src_env_nodes = "src-env-nodes-{}".format(src_env_name)
     dst_env_nodes = "dst-env-nodes-{}".format(dst_env_name)
 
-    flow = graph_flow.Flow(name="reassign-node-{}".format(hostname))
+    if name is None:
+        name = "reassign-nodes-{}".format("-".join(hostnames))
+    flow = graph_flow.Flow(name=name)
     flow.add(
         RetrieveAllEnvironments(name=envs,
                                 provides=envs),
@@ -454,8 +555,15 @@ def reassign_node(context, hostname):
                          provides=dst_env_nodes,
                          rebind=[dst_env]),
     )
-    unassign_node(context, flow, src_env_name, hostname)
-    remove_computes(context, flow, src_env_name, hostname)
-    assign_node(context, flow, dst_env_name, hostname)
-    wait_computes(context, flow, dst_env_name, hostname)
+    unassign_nodes(context, flow, src_env_name, hostnames, isolated)
+    for hostname in hostnames:
+        remove_computes(context, flow, src_env_name, hostname, isolated)
+    assign_nodes(context, flow, dst_env_name, hostnames, isolated)
+    for hostname in hostnames:
+        wait_computes(context, flow, dst_env_name, hostname, isolated)
     return flow
+
+
+def reassign_node(context, hostname):
+    return reassign_nodes(context, [hostname],
+                          name="reassign-node-{}".format(hostname))
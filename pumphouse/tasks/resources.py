@@ -21,10 +21,20 @@ from pumphouse.tasks import server_resources
 
 LOG = logging.getLogger(__name__)
 
+DEFAULT_WAVE_SIZE = 50
 
-def migrate_resources(context, tenant_id):
+
+def list_servers(context, tenant_id):
+    """Lists servers of the tenant which are not planned yet"""
     servers = context.src_cloud.nova.servers.list(
         search_opts={'all_tenants': 1, 'tenant_id': tenant_id})
+    return [server for server in servers
+            if "server-{}".format(server.id) not in context.store]
+
+
+def migrate_resources(context, tenant_id):
+    servers = list_servers(context, tenant_id)
+    server_resources.prefetch_servers(context, servers)
     flow = graph_flow.Flow("migrate-resources-{}".format(tenant_id))
     servers_flow = unordered_flow.Flow("migrate-servers-{}".format(tenant_id))
     migrate_server = server_resources.migrate_server
@@ -36,3 +46,44 @@ def migrate_resources(context, tenant_id):
             servers_flow.add(server_flow)
     flow.add(servers_flow)
     return flow
+
+
+def migrate_resources_waves(context, tenant_ids, wave_size=DEFAULT_WAVE_SIZE):
+    """Plans migration of servers of tenants in waves
+
+    Every wave is a separate flow of `wave_size` servers with the
+    prerequisites which were not planned in previous waves, so shared
+    identity, flavors and networks are migrated by the first waves.
+    Waves are run one by one with :func:`pumphouse.flows.run_segments`.
+
+    :returns: a list of flows of waves
+    """
+    servers = []
+    for tenant_id in tenant_ids:
+        servers.extend(list_servers(context, tenant_id))
+    server_resources.prefetch_servers(context, servers)
+    waves = []
+    wave = servers_flow = None
+    migrate_server = server_resources.migrate_server
+    for server in servers:
+        server_binding = "server-{}".format(server.id)
+        if server_binding in context.store:
+            continue
+        if wave is None or len(servers_flow) >= wave_size:
+            # NOTE: Dependencies in the graph flow are found when
+            #       servers are added, so they are added last.
+            if wave is not None:
+                wave.add(servers_flow)
+            wave = graph_flow.Flow("migrate-resources-wave-{}"
+                                   .format(len(waves)))
+            servers_flow = unordered_flow.Flow(
+                "migrate-servers-wave-{}".format(len(waves)))
+            waves.append(wave)
+        resources, server_flow = migrate_server(context, server.id)
+        wave.add(*resources)
+        servers_flow.add(server_flow)
+    if wave is not None:
+        wave.add(servers_flow)
+    LOG.info("Migration of tenants %s is planned in %d waves",
+             ", ".join(tenant_ids), len(waves))
+    return waves
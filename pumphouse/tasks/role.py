@@ -31,6 +31,8 @@ class RetrieveRole(task.BaseCloudTask):
 
 
 class EnsureRole(task.BaseCloudTask):
+    shared = True
+
     def execute(self, role_info):
         try:
             role = self.cloud.keystone.roles.find(name=role_info["name"])
@@ -39,24 +39,36 @@ class EvacuateServer(task.BaseCloudTask):
     """Migrates server within the cloud."""
 
     def __init__(self, cloud, block_migration=True, disk_over_commit=False,
-                 *args, **kwargs):
+                 target_host=None, semaphore=None, *args, **kwargs):
         super(EvacuateServer, self).__init__(cloud, *args, **kwargs)
         self.block_migration = block_migration
         self.disk_over_commit = disk_over_commit
+        self.target_host = target_host
+        self.semaphore = semaphore
 
     def execute(self, server_info, **requires):
+        if self.semaphore is None:
+            return self.evacuate(server_info)
+        with self.semaphore:
+            return self.evacuate(server_info)
+
+    def evacuate(self, server_info):
         server_id = server_info["id"]
         self.evacuation_start_event(server_info)
         # NOTE(akscram): The destination host will be chosen by the
-        #                scheduler.
-        self.cloud.nova.servers.live_migrate(server_id, None,
-                                             self.block_migration,
-                                             self.disk_over_commit)
+        #                scheduler if the target host is not set.
+        self.live_migrate(server_id, self.target_host)
         server = utils.wait_for(server_id, self.cloud.nova.servers.get)
         migrated_server_info = server.to_dict()
         self.evacuation_end_event(migrated_server_info)
         return migrated_server_info
 
+    @utils.retry_on(exceptions.transient_excs)
+    def live_migrate(self, server_id, host):
+        self.cloud.nova.servers.live_migrate(server_id, host,
+                                             self.block_migration,
+                                             self.disk_over_commit)
+
     def evacuation_start_event(self, server):
         if HYPERVISOR_HOSTNAME_ATTR not in server:
             LOG.warning("Could not get %r attribute from server %r",
@@ -124,14 +136,20 @@ class RetrieveServer(task.BaseCloudTask):
 
 
 class SuspendServer(task.BaseCloudTask):
+    required_fields = {"server_info": ("id",), "result": ()}
+
     def execute(self, server_info):
-        self.cloud.nova.servers.suspend(server_info["id"])
+        self.suspend(server_info["id"])
         server = utils.wait_for(server_info["id"], self.cloud.nova.servers.get,
                                 value="SUSPENDED")
         suspend_server_info = server.to_dict()
         self.suspend_event(suspend_server_info)
         return suspend_server_info
 
+    @utils.retry_on(exceptions.transient_excs)
+    def suspend(self, server_id):
+        self.cloud.nova.servers.suspend(server_id)
+
     def suspend_event(self, server):
         LOG.info("Server suspended: %s", server)
         events.emit("update", {
@@ -160,6 +178,14 @@ class SuspendServer(task.BaseCloudTask):
 
 
 class BootServerFromImage(task.BaseCloudTask):
+    required_fields = {
+        "server_info": ("name",),
+        "image_info": ("id",),
+        "flavor_info": ("id",),
+        "user_info": ("name",),
+        "tenant_info": ("id", "name"),
+    }
+
     def execute(self, server_info, image_info, flavor_info, user_info,
                 tenant_info, server_nics):
         # TODO(akscram): Network information doesn't saved.
@@ -167,16 +193,39 @@ class BootServerFromImage(task.BaseCloudTask):
             username=user_info["name"],
             tenant_name=tenant_info["name"],
             password="default")
-        server = restrict_cloud.nova.servers.create(server_info["name"],
-                                                    image_info["id"],
-                                                    flavor_info["id"],
-                                                    nics=server_nics)
+        known_ids = set(s.id for s in self.find(restrict_cloud,
+                                                server_info["name"],
+                                                tenant_info["id"]))
+        server = self.create(restrict_cloud, server_info["name"],
+                             image_info["id"], flavor_info["id"],
+                             server_nics, tenant_info["id"], known_ids, [])
         server = utils.wait_for(server, self.cloud.nova.servers.get,
                                 value="ACTIVE")
         spawn_server_info = server.to_dict()
         self.spawn_event(spawn_server_info)
         return spawn_server_info
 
+    @utils.retry_on(exceptions.transient_excs)
+    def find(self, cloud, name, tenant_id):
+        return [server for server in cloud.nova.servers.list()
+                if server.name == name and server.tenant_id == tenant_id]
+
+    @utils.retry_on(exceptions.transient_excs)
+    def create(self, cloud, name, image_id, flavor_id, nics, tenant_id,
+               known_ids, attempts):
+        # NOTE: Nova could accept the request of a failed attempt, e.g. if
+        #       the gateway timed out, so the server booted by it is taken
+        #       instead of booting another one with the same name.
+        if attempts:
+            for server in self.find(cloud, name, tenant_id):
+                if server.id not in known_ids:
+                    LOG.warning("Server %r was booted by the failed "
+                                "attempt: %s", name, server.id)
+                    return server
+        attempts.append(name)
+        return cloud.nova.servers.create(name, image_id, flavor_id,
+                                         nics=nics)
+
     def spawn_event(self, server):
         LOG.info("Server spawned: %s", server)
         if HYPERVISOR_HOSTNAME_ATTR not in server:
@@ -196,6 +245,8 @@ class BootServerFromImage(task.BaseCloudTask):
 
 
 class TerminateServer(task.BaseCloudTask):
+    required_fields = {"server_info": ("id",)}
+
     def execute(self, server_info):
         self.cloud.nova.servers.delete(server_info["id"])
         self.terminate_event(server_info)
@@ -310,19 +361,22 @@ def restore_floating_ips(context, server_info):
     return flow
 
 
-def evacuate_server(context, flow, hostname, requires=None):
+def evacuate_server(context, flow, hostname, requires=None,
+                    target_host=None, semaphore=None):
     server_retrieve = "server-{}-retrieve".format(hostname)
     server_binding = "server-{}".format(hostname)
     server_evacuate = "server-{}-evacuate".format(hostname)
     server_evacuated = "server-{}-evacuated".format(hostname)
     flow.add(EvacuateServer(context.src_cloud,
+                            target_host=target_host,
+                            semaphore=semaphore,
                             name=server_evacuate,
                             provides=server_evacuated,
                             rebind=[server_retrieve],
                             requires=requires or []))
-    if server_binding not in context.store:
-        context.store[server_binding] = hostname
+    if context.claim(server_binding, hostname):
         flow.add(RetrieveServer(context.src_cloud,
                                 name=server_retrieve,
                                 provides=server_retrieve,
                                 rebind=[server_binding]))
+    return server_evacuated
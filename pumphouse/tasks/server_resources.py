@@ -12,6 +12,7 @@
 # See the License for the specific language governing permissions and#
 # limitations under the License.
 
+import functools
 import logging
 
 from pumphouse import flows
@@ -29,8 +30,34 @@ migrate_disk = flows.register("migrate_disk")
 post_hooks = flows.register("post_server")
 
 
+def fetch_server_data(context, server):
+    """Fetches data used to plan migration of the server
+
+    The server is an object from a list of servers, it is used as is.
+    """
+    src = context.src_cloud
+    server = context.fetch(("server", server.id), lambda: server)
+    context.fetch(("tenant", server.tenant_id), src.keystone.tenants.get,
+                  server.tenant_id)
+    context.fetch(("user", server.user_id), src.keystone.users.get,
+                  server.user_id)
+    identity_tasks.fetch_user_roles(context, server.user_id,
+                                    server.tenant_id)
+    context.fetch(("server-secgroups", server.id),
+                  server.list_security_group)
+    if server.image:
+        image_id = server.image["id"]
+        context.fetch(("image", image_id), src.glance.images.get, image_id)
+
+
+def prefetch_servers(context, servers):
+    context.prefetch(functools.partial(fetch_server_data, server=server)
+                     for server in servers)
+
+
 def migrate_server(context, server_id):
-    server = context.src_cloud.nova.servers.get(server_id)
+    server = context.fetch(("server", server_id),
+                           context.src_cloud.nova.servers.get, server_id)
     server_id = server.id
     flavor_id = server.flavor["id"]
     flavor_retrieve = "flavor-{}-retrieve".format(flavor_id)
@@ -38,8 +65,11 @@ def migrate_server(context, server_id):
     identity_flow = identity_tasks.migrate_server_identity(
         context, server.to_dict())
     resources.append(identity_flow)
-    tenant = context.src_cloud.keystone.tenants.get(server.tenant_id)
-    server_secgroups = server.list_security_group()
+    tenant = context.fetch(("tenant", server.tenant_id),
+                           context.src_cloud.keystone.tenants.get,
+                           server.tenant_id)
+    server_secgroups = context.fetch(("server-secgroups", server_id),
+                                     server.list_security_group)
     for secgroup in server_secgroups:
         secgroup_retrieve = "secgroup-{}-retrieve".format(secgroup.id)
         if secgroup_retrieve not in context.store:
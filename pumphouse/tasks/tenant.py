@@ -31,6 +31,8 @@ class RetrieveTenant(task.BaseCloudTask):
 
 
 class EnsureTenant(task.BaseCloudTask):
+    shared = True
+
     def execute(self, tenant_info):
         try:
             tenant = self.cloud.keystone.tenants.find(name=tenant_info["name"])
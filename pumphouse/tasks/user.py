@@ -32,6 +32,8 @@ class RetrieveUser(task.BaseCloudTask):
 
 
 class EnsureUser(task.BaseCloudTask):
+    shared = True
+
     def execute(self, user_info, tenant_info):
         try:
             user = self.cloud.keystone.users.find(name=user_info["name"])
@@ -68,6 +70,8 @@ class EnsureOrphanUser(EnsureUser):
 
 
 class EnsureUserRole(task.BaseCloudTask):
+    shared = True
+
     def execute(self, user_info, role_info, tenant_info):
         try:
             self.cloud.keystone.tenants.add_user(tenant_info["id"],
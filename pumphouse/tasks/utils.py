@@ -16,11 +16,17 @@ import logging
 
 from taskflow import task
 
+from pumphouse import limits
+
 
 LOG = logging.getLogger(__name__)
 
 
 class SyncPoint(task.Task):
+    @property
+    def required_fields(self):
+        return dict.fromkeys(self.rebind, ())
+
     def execute(self, **requires):
         targets = ",".join(requires.keys())
         LOG.debug("Point %s is synchronized with requirements: %s",
@@ -73,5 +79,6 @@ class FileProxy(object):
     def read(self, amt=None):
         data = self.resp.next()
         if data:
+            limits.limits.transfer(len(data))
             self.reporter.update(len(data))
         return data
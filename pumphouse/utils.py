@@ -12,8 +12,10 @@
 # See the License for the specific language governing permissions and#
 # limitations under the License.
 
+import functools
 import logging
 import operator
+import random
 import sys
 import time
 import traceback
@@ -22,6 +24,7 @@ import re
 from collections import defaultdict
 
 from . import exceptions
+from . import limits
 
 
 LOG = logging.getLogger(__name__)
@@ -72,10 +75,90 @@ def wait_for(resource, update_resource,
             if result == error_value:
                 raise exceptions.Error(
                     "Resource %s fell into error state" % resource)
-        time.sleep(check_interval)
+        time.sleep(limits.limits.interval(check_interval))
         if time.time() - start > timeout:
             raise exceptions.TimeoutException()
 
+
+class Backoff(object):
+    """Describes a policy of retries with exponential backoff
+
+    Delays between attempts grow exponentially from `initial` up to
+    `maximum` and are randomized by the `jitter` fraction to avoid
+    synchronized retries of concurrent tasks.
+
+    :param initial:     a delay before the first retry in seconds
+    :param maximum:     the upper bound of a single delay in seconds
+    :param multiplier:  a factor to increase the delay on every retry
+    :param jitter:      a fraction of the delay which is randomized
+    :param max_elapsed: a limit of time spent on all attempts in seconds
+    :param max_retries: a limit of number of retries or None
+    """
+
+    def __init__(self, initial=1, maximum=30, multiplier=2, jitter=0.5,
+                 max_elapsed=300, max_retries=None):
+        self.initial = initial
+        self.maximum = maximum
+        self.multiplier = multiplier
+        self.jitter = jitter
+        self.max_elapsed = max_elapsed
+        self.max_retries = max_retries
+
+    def delays(self):
+        """Generates delays before consecutive retries."""
+        delay = self.initial
+        retries = 0
+        while self.max_retries is None or retries < self.max_retries:
+            spread = delay * self.jitter
+            yield min(self.maximum, delay + random.uniform(-spread, spread))
+            delay = min(self.maximum, delay * self.multiplier)
+            retries += 1
+
+    def __repr__(self):
+        return ("<Backoff(initial={!r}, maximum={!r}, multiplier={!r}, "
+                "jitter={!r}, max_elapsed={!r}, max_retries={!r})>"
+                .format(self.initial, self.maximum, self.multiplier,
+                        self.jitter, self.max_elapsed, self.max_retries))
+
+
+default_backoff = Backoff()
+
+
+def retry_on(excs, backoff=default_backoff):
+    """Retries a method of a task on the given errors
+
+    The decorated method is called again after a delay from the
+    `backoff` policy while it raises one of the `excs` exceptions. The
+    last exception is reraised when the policy is exhausted. Number of
+    retries is accumulated in the `retries` attribute of the object to
+    be shown in the run report.
+
+    :param excs:    an exception class or a tuple of them
+    :param backoff: an instance of :class:`Backoff`
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            start = time.time()
+            delays = backoff.delays()
+            while True:
+                try:
+                    return func(self, *args, **kwargs)
+                except excs as exc:
+                    delay = next(delays, None)
+                    elapsed = time.time() - start
+                    if delay is None or elapsed + delay > backoff.max_elapsed:
+                        LOG.warning("Giving up %s of %r after %.1f seconds",
+                                    func.__name__, self, elapsed)
+                        raise
+                    self.retries = getattr(self, "retries", 0) + 1
+                    LOG.warning("Retrying %s of %r in %.1f seconds: %s",
+                                func.__name__, self, delay, exc)
+                    time.sleep(delay)
+        return wrapper
+    return decorator
+
+
 counter = (chr(i) for i in range(ord('A'), ord('Z')))
 ids = defaultdict(lambda: next(counter))
 id_re = re.compile(r"""
@@ -0,0 +1,434 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+
+import logging
+import os
+import pkgutil
+import tempfile
+import threading
+import time
+
+from concurrent import futures
+from taskflow.engines.worker_based import endpoint as wbe_endpoint
+from taskflow.engines.worker_based import executor as wbe_executor
+from taskflow.engines.worker_based import protocol as pr
+from taskflow.engines.worker_based import server as wbe_server
+from taskflow.utils import misc
+from taskflow.utils import reflection
+
+from pumphouse import exceptions
+from pumphouse import flows
+from pumphouse import limits
+from pumphouse import plan
+from pumphouse import task
+
+
+LOG = logging.getLogger(__name__)
+
+# NOTE: Endpoints, the server and the executor of workers override
+#       private methods and attributes of the worker based engine of
+#       taskflow 0.4 and 0.5 (_task_cls_name, _process_request,
+#       _parse_message, _reply, _proxy, _requests_cache, _workers_cache,
+#       _submit_task), they are not a part of its public API and change
+#       in later versions.
+
+DEFAULT_EXCHANGE = "pumphouse"
+DEFAULT_TOPIC = "pumphouse-workers"
+DEFAULT_THREADS = 8
+DEFAULT_LOCAL_WORKERS = 8
+DEFAULT_POLLING_INTERVAL = 0.1
+# NOTE: Requests wait for a free worker for at most this number of
+#       seconds, workers report running requests every heartbeat period.
+DEFAULT_REQUEST_TIMEOUT = 600
+HEARTBEAT_PERIOD = 5
+DEFAULT_HEARTBEAT_TIMEOUT = 6 * HEARTBEAT_PERIOD
+DEFAULT_MAX_RESENDS = 3
+
+
+def get_endpoint_name(atom):
+    """Returns the name of the endpoint of workers for the task
+
+    Workers create tasks of the same class for every cloud, so names of
+    clouds of the task are a part of the name.
+    """
+    if isinstance(atom, task.BaseCloudTask):
+        clouds = [atom.cloud]
+    else:
+        clouds = [atom.src_cloud, atom.dst_cloud]
+    return "{}@{}".format(reflection.get_class_name(atom),
+                          ",".join(cloud.name for cloud in clouds))
+
+
+def is_remote(atom):
+    """Checks that the task can be run by workers"""
+    return (isinstance(atom, (task.BaseCloudTask, task.BaseCloudsTask)) and
+            plan.can_recreate(type(atom)))
+
+
+def iter_subclasses(cls):
+    for subclass in cls.__subclasses__():
+        yield subclass
+        for subsubclass in iter_subclasses(subclass):
+            yield subsubclass
+
+
+def load_task_classes():
+    """Imports modules of tasks and returns classes which workers run"""
+    import pumphouse.tasks
+    for _, name, _ in pkgutil.walk_packages(pumphouse.tasks.__path__,
+                                            "pumphouse.tasks."):
+        __import__(name)
+    classes = set()
+    for base in (task.BaseCloudTask, task.BaseCloudsTask):
+        classes.update(cls for cls in iter_subclasses(base)
+                       if plan.can_recreate(cls))
+    return sorted(classes, key=reflection.get_class_name)
+
+
+class Endpoint(wbe_endpoint.Endpoint):
+    """Creates tasks of the class with the given clouds"""
+
+    def __init__(self, task_cls, clouds):
+        super(Endpoint, self).__init__(task_cls)
+        self.clouds = clouds
+        self._task_cls_name = "{}@{}".format(
+            self._task_cls_name, ",".join(cloud.name for cloud in clouds))
+
+    def _get_task(self, name=None):
+        return self._task_cls(*self.clouds, name=name)
+
+    def execute(self, task_name, **kwargs):
+        with limits.limits.tasks:
+            return super(Endpoint, self).execute(task_name, **kwargs)
+
+
+def make_endpoints(task_classes, src_cloud, dst_cloud):
+    endpoints = []
+    for cls in task_classes:
+        if issubclass(cls, task.BaseCloudTask):
+            clouds_list = [[src_cloud], [dst_cloud]]
+        else:
+            clouds_list = [[src_cloud, dst_cloud], [dst_cloud, src_cloud]]
+        endpoints.extend(Endpoint(cls, clouds) for clouds in clouds_list)
+    return endpoints
+
+
+class Server(wbe_server.Server):
+    """Processes requests and reports running ones to their executors"""
+
+    def __init__(self, *args, **kwargs):
+        super(Server, self).__init__(*args, **kwargs)
+        self.running = set()
+        self.running_lock = threading.Lock()
+
+    def _process_request(self, request, message):
+        try:
+            key = tuple(self._parse_message(message))
+        except ValueError:
+            key = None
+        if key is not None:
+            with self.running_lock:
+                self.running.add(key)
+        try:
+            super(Server, self)._process_request(request, message)
+        finally:
+            if key is not None:
+                with self.running_lock:
+                    self.running.discard(key)
+
+    def _reply(self, reply_to, task_uuid, state=pr.FAILURE, **kwargs):
+        response = pr.Response(state, **kwargs)
+        try:
+            self._proxy.publish(response, reply_to, correlation_id=task_uuid)
+        except Exception:
+            if state not in (pr.SUCCESS, pr.FAILURE):
+                LOG.exception("Failed to send the %s reply of %s", state,
+                              task_uuid)
+                return
+            # NOTE: The executor would take the silent request for lost
+            #       and send it again, so the failure is sent instead,
+            #       e.g. if the result can not be encoded.
+            with misc.capture_failure() as failure:
+                LOG.exception("Failed to send the result of %s", task_uuid)
+            response = pr.Response(pr.FAILURE, result=failure.to_dict())
+            try:
+                self._proxy.publish(response, reply_to,
+                                    correlation_id=task_uuid)
+            except Exception:
+                LOG.exception("Failed to send the failure of %s", task_uuid)
+
+    def heartbeat(self):
+        # NOTE: Executors ignore repeated transitions to the RUNNING
+        #       state, so they are used as heartbeats.
+        with self.running_lock:
+            running = list(self.running)
+        for reply_to, task_uuid in running:
+            self._reply(reply_to, task_uuid, state=pr.RUNNING)
+
+
+class Worker(object):
+    """Runs tasks of migrations sent by engines over the broker
+
+    :param broker:    an instance of :class:`Broker`
+    :param src_cloud: an instance of :class:`pumphouse.cloud.Cloud`
+    :param dst_cloud: an instance of :class:`pumphouse.cloud.Cloud`
+    :param threads:   a number of tasks run at the same time
+    """
+
+    def __init__(self, broker, src_cloud, dst_cloud, threads=DEFAULT_THREADS):
+        self.broker = broker
+        self.executor = futures.ThreadPoolExecutor(threads)
+        self.endpoints = make_endpoints(load_task_classes(),
+                                        src_cloud, dst_cloud)
+        self.server = Server(broker.topic, broker.exchange, self.executor,
+                             self.endpoints, **broker.connection_options())
+        self.stopped = threading.Event()
+        self.heartbeats = None
+
+    def send_heartbeats(self):
+        while not self.stopped.wait(HEARTBEAT_PERIOD):
+            try:
+                self.server.heartbeat()
+            except Exception:
+                LOG.exception("Unable to send heartbeats")
+
+    def run(self):
+        """Processes requests until the worker is stopped"""
+        LOG.info("Worker %d serves %d endpoints on %s", os.getpid(),
+                 len(self.endpoints), self.broker)
+        self.stopped.clear()
+        self.heartbeats = threading.Thread(target=self.send_heartbeats,
+                                           name="worker-heartbeats")
+        self.heartbeats.daemon = True
+        self.heartbeats.start()
+        self.server.start()
+
+    def wait(self):
+        """Waits until the worker is ready to process requests"""
+        self.server.wait()
+
+    def stop(self):
+        self.stopped.set()
+        self.server.stop()
+        self.executor.shutdown()
+        if self.heartbeats is not None:
+            self.heartbeats.join()
+
+
+class Request(pr.Request):
+    """A request which is sent again if its worker is lost
+
+    :param resends: a number of times the request was sent again
+    """
+
+    def __init__(self, atom, endpoint, uuid, action, arguments,
+                 progress_callback, timeout, heartbeat_timeout, resends=0,
+                 **kwargs):
+        super(Request, self).__init__(atom, uuid, action, arguments,
+                                      progress_callback, timeout, **kwargs)
+        # NOTE: The name of the endpoint is sent instead of the class.
+        self._task_cls = endpoint
+        self.args = (atom, endpoint, uuid, action, arguments,
+                     progress_callback, timeout, heartbeat_timeout, resends)
+        self.kwargs = kwargs
+        self.heartbeat_timeout = heartbeat_timeout
+        self.resends = resends
+        self.last_seen = time.time()
+
+    def seen(self):
+        self.last_seen = time.time()
+
+    @property
+    def lost(self):
+        return (self.state == pr.RUNNING and
+                time.time() - self.last_seen > self.heartbeat_timeout)
+
+    @property
+    def expired(self):
+        return self.lost or super(Request, self).expired
+
+    def retry(self):
+        """Returns a new request which resolves the same future"""
+        request = Request(*self.args[:-1], resends=self.resends + 1,
+                          **self.kwargs)
+        request.result = self.result
+        return request
+
+
+class WorkerTaskExecutor(wbe_executor.WorkerTaskExecutor):
+    """Executes tasks of clouds on workers and other tasks locally
+
+    Requests of workers which stopped sending heartbeats are sent to
+    other workers at most `max_resends` times, then they fail. Shared
+    tasks are sent under leases. Calls of clouds made by local tasks are
+    counted in `calls` if they are given, calls made by workers are
+    counted in their processes.
+    """
+
+    def __init__(self, uuid, exchange, topics, leases=None, calls=None,
+                 request_timeout=DEFAULT_REQUEST_TIMEOUT,
+                 heartbeat_timeout=DEFAULT_HEARTBEAT_TIMEOUT,
+                 max_resends=DEFAULT_MAX_RESENDS,
+                 local_workers=DEFAULT_LOCAL_WORKERS, **kwargs):
+        super(WorkerTaskExecutor, self).__init__(uuid, exchange, topics,
+                                                 **kwargs)
+        self.leases = leases
+        self.calls = calls
+        self.request_timeout = request_timeout
+        self.heartbeat_timeout = heartbeat_timeout
+        self.max_resends = max_resends
+        self.local_workers = local_workers
+        self.local = None
+
+    def _process_response(self, response, message):
+        request = self._requests_cache.get(
+            message.properties.get("correlation_id"))
+        if request is not None:
+            request.seen()
+        super(WorkerTaskExecutor, self)._process_response(response, message)
+
+    def _handle_expired_request(self, request):
+        if not request.lost:
+            super(WorkerTaskExecutor, self)._handle_expired_request(request)
+        elif request.resends < self.max_resends:
+            LOG.warning("Worker of the request %s is lost, the request is "
+                        "sent again", request)
+            self._submit_request(request.retry())
+        elif request.transition_and_log_error(pr.FAILURE, logger=LOG):
+            try:
+                raise exceptions.WorkerLost(
+                    "Workers of the request {} were lost {} times"
+                    .format(request, request.resends + 1))
+            except exceptions.WorkerLost:
+                with misc.capture_failure() as failure:
+                    LOG.error(failure.exception_str)
+                    request.set_result(failure)
+
+    def _submit_request(self, request):
+        topic = self._workers_cache.get_topic_by_task(request.task_cls)
+        if topic is not None:
+            if request.transition_and_log_error(pr.PENDING, logger=LOG):
+                self._requests_cache[request.uuid] = request
+                self._publish_request(request, topic)
+        else:
+            self._requests_cache[request.uuid] = request
+
+    def _submit_task(self, atom, task_uuid, action, arguments,
+                     progress_callback, **kwargs):
+        request = Request(atom, get_endpoint_name(atom), task_uuid, action,
+                          arguments, progress_callback, self.request_timeout,
+                          self.heartbeat_timeout, **kwargs)
+        self._submit_request(request)
+        return request.result
+
+    def _execute_remote(self, atom, task_uuid, arguments, progress_callback):
+        return super(WorkerTaskExecutor, self).execute_task(
+            atom, task_uuid, arguments, progress_callback).result()
+
+    def execute_task(self, atom, task_uuid, arguments,
+                     progress_callback=None):
+        if not is_remote(atom):
+            return self.local.submit(flows.execute_task, atom, arguments,
+                                     progress_callback, self.calls)
+        if self.leases is not None and atom.shared:
+            return self.local.submit(flows.execute_shared, self.leases,
+                                     self._execute_remote, atom, task_uuid,
+                                     arguments, progress_callback)
+        return super(WorkerTaskExecutor, self).execute_task(
+            atom, task_uuid, arguments, progress_callback)
+
+    def revert_task(self, atom, task_uuid, arguments, result, failures,
+                    progress_callback=None):
+        if not is_remote(atom):
+            return self.local.submit(flows.revert_task, atom, arguments,
+                                     result, failures, progress_callback,
+                                     self.calls)
+        return super(WorkerTaskExecutor, self).revert_task(
+            atom, task_uuid, arguments, result, failures, progress_callback)
+
+    def start(self):
+        super(WorkerTaskExecutor, self).start()
+        if self.local is None:
+            self.local = futures.ThreadPoolExecutor(self.local_workers)
+
+    def stop(self):
+        super(WorkerTaskExecutor, self).stop()
+        if self.local is not None:
+            self.local.shutdown()
+            self.local = None
+
+
+class Broker(object):
+    """Parameters of the connection of engines and workers
+
+    By default messages are passed through files of a directory, so
+    engines and workers on the same host need no other services.
+
+    :param url:               a URL of the broker in the format of Kombu
+    :param transport_options: options of the transport of Kombu
+    """
+
+    def __init__(self, url, transport_options=None,
+                 exchange=DEFAULT_EXCHANGE, topic=DEFAULT_TOPIC,
+                 request_timeout=DEFAULT_REQUEST_TIMEOUT,
+                 heartbeat_timeout=DEFAULT_HEARTBEAT_TIMEOUT,
+                 max_resends=DEFAULT_MAX_RESENDS):
+        self.url = url
+        self.transport_options = dict(transport_options or {})
+        self.transport_options.setdefault("polling_interval",
+                                          DEFAULT_POLLING_INTERVAL)
+        self.exchange = exchange
+        self.topic = topic
+        self.request_timeout = request_timeout
+        self.heartbeat_timeout = heartbeat_timeout
+        self.max_resends = max_resends
+
+    def __str__(self):
+        return "{} ({})".format(self.url, self.topic)
+
+    @classmethod
+    def from_config(cls, config=None):
+        """Creates the broker from the `WORKERS` section of the config
+
+        The `path` parameter is a directory of messages for the default
+        `filesystem://` transport.
+        """
+        config = dict(config or {})
+        url = config.pop("url", "filesystem://")
+        transport_options = config.pop("transport_options", {})
+        if url.startswith("filesystem:"):
+            path = config.pop("path", os.path.join(tempfile.gettempdir(),
+                                                   "pumphouse-broker"))
+            if not os.path.isdir(path):
+                os.makedirs(path)
+            transport_options.setdefault("data_folder_in", path)
+            transport_options.setdefault("data_folder_out", path)
+        return cls(url, transport_options=transport_options, **config)
+
+    def connection_options(self):
+        return {
+            "url": self.url,
+            "transport_options": self.transport_options,
+        }
+
+    def executor(self, uuid, leases=None, calls=None):
+        return WorkerTaskExecutor(uuid, self.exchange, [self.topic],
+                                  leases=leases, calls=calls,
+                                  request_timeout=self.request_timeout,
+                                  heartbeat_timeout=self.heartbeat_timeout,
+                                  max_resends=self.max_resends,
+                                  **self.connection_options())
+
+    def worker(self, src_cloud, dst_cloud, threads=DEFAULT_THREADS):
+        return Worker(self, src_cloud, dst_cloud, threads=threads)
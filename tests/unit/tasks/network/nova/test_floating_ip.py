@@ -1,3 +1,4 @@
+import itertools
 import unittest
 
 from mock import Mock, patch, call
@@ -142,7 +143,9 @@ class TestEnsureFloatingIP(TestFloatingIP):
         self.cloud.nova.servers.add_floating_ip.assert_run_once_with(
             self.test_instance_uuid, self.test_address, None)
 
-    def test_execute_bad_request(self):
+    @patch("pumphouse.utils.time")
+    def test_execute_bad_request(self, mock_time):
+        mock_time.time.side_effect = itertools.count(step=10)
         ensure_floating_ip = floating_ip.EnsureFloatingIP(self.cloud)
         self.cloud.nova.floating_ips_bulk.find.return_value = \
             self.floating_ip_unassigned
@@ -157,6 +160,30 @@ class TestEnsureFloatingIP(TestFloatingIP):
                                        self.fixed_ip_nic)
         ensure_floating_ip.assigning_error_event.assert_called_once_with(
             self.test_address, self.test_instance_uuid)
+        self.assertTrue(mock_time.sleep.called)
+        self.assertEqual(
+            ensure_floating_ip.retries,
+            self.cloud.nova.servers.add_floating_ip.call_count - 1)
+
+    @patch("pumphouse.utils.time")
+    def test_execute_retry_bad_request(self, mock_time):
+        mock_time.time.return_value = 0
+        ensure_floating_ip = floating_ip.EnsureFloatingIP(self.cloud)
+        self.returns = [self.floating_ip_unassigned,
+                        self.floating_ip]
+        self.cloud.nova.floating_ips_bulk.find.side_effect = \
+            self.side_effect
+        self.cloud.nova.servers.add_floating_ip.side_effect = [
+            exceptions.nova_excs.BadRequest("400 Bad Request"),
+            None,
+        ]
+
+        fip = ensure_floating_ip.execute(self.server_info,
+                                         self.floating_ip_info,
+                                         self.fixed_ip_nic)
+        self.assertEqual(self.floating_ip_info, fip)
+        self.assertEqual(1, ensure_floating_ip.retries)
+        self.assertEqual(1, mock_time.sleep.call_count)
 
     def test_execute_duplicate_association(self):
         """Test duplicated association of single floating ip address
@@ -0,0 +1,135 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+
+import unittest
+
+from mock import Mock
+
+from pumphouse.tasks import evacuation
+
+
+class TestEvacuationPlanner(unittest.TestCase):
+    def setUp(self):
+        self.hostname = "source-host"
+        self.flavors = {
+            "small": self.make_flavor(512, 1),
+            "medium": self.make_flavor(2048, 2),
+            "large": self.make_flavor(8192, 4),
+        }
+        self.servers = {
+            "s1": self.make_server("small"),
+            "s2": self.make_server("large"),
+            "s3": self.make_server("medium"),
+            "s4": self.make_server("small"),
+        }
+        source = Mock()
+        source.servers = [{"uuid": server_id}
+                          for server_id in sorted(self.servers)]
+
+        self.cloud = Mock()
+        self.cloud.nova.hypervisors.search.return_value = [source]
+        self.cloud.nova.hypervisors.list.return_value = [
+            self.make_hypervisor(self.hostname, 16384, 8, 0),
+            self.make_hypervisor("target-1", 10240, 8, 0),
+            self.make_hypervisor("target-2", 4096, 8, 2),
+            self.make_hypervisor("target-3", 65536, 8, 0),
+        ]
+        self.cloud.nova.services.list.return_value = [
+            self.make_service(self.hostname, "disabled", "up"),
+            self.make_service("target-1", "enabled", "up"),
+            self.make_service("target-2", "enabled", "up"),
+            self.make_service("target-3", "enabled", "down"),
+        ]
+        self.cloud.nova.servers.get.side_effect = self.servers.get
+        self.cloud.nova.flavors.get.side_effect = self.flavors.get
+
+    def make_flavor(self, ram, vcpus):
+        flavor = Mock()
+        flavor.ram = ram
+        flavor.vcpus = vcpus
+        return flavor
+
+    def make_server(self, flavor_id):
+        server = Mock()
+        server.flavor = {"id": flavor_id}
+        return server
+
+    def make_hypervisor(self, host, free_ram, vcpus, vcpus_used):
+        hyperv = Mock()
+        hyperv.service = {"host": host}
+        hyperv.free_ram_mb = free_ram
+        hyperv.vcpus = vcpus
+        hyperv.vcpus_used = vcpus_used
+        return hyperv
+
+    def make_service(self, host, status, state):
+        service = Mock()
+        service.host = host
+        service.status = status
+        service.state = state
+        return service
+
+    def test_get_targets(self):
+        planner = evacuation.EvacuationPlanner(self.cloud, self.hostname)
+        targets = planner.get_targets()
+        self.cloud.nova.services.list.assert_called_once_with(
+            binary="nova-compute")
+        self.assertEqual([("target-1", 10240, 8), ("target-2", 4096, 6)],
+                         [(t.host, t.free_ram, t.free_vcpus)
+                          for t in targets])
+
+    def test_get_servers(self):
+        planner = evacuation.EvacuationPlanner(self.cloud, self.hostname)
+        servers = planner.get_servers()
+        self.cloud.nova.hypervisors.search.assert_called_once_with(
+            self.hostname, servers=True)
+        self.assertEqual([("s1", 512, 1), ("s2", 8192, 4),
+                          ("s3", 2048, 2), ("s4", 512, 1)], servers)
+        self.assertEqual(3, self.cloud.nova.flavors.get.call_count)
+
+    def test_plan(self):
+        planner = evacuation.EvacuationPlanner(self.cloud, self.hostname,
+                                               max_per_source=2)
+        lanes = planner.plan()
+        self.assertEqual([
+            [("s2", "target-1")],
+            [("s3", "target-2"), ("s1", "target-1"), ("s4", "target-2")],
+        ], lanes)
+
+    def test_plan_no_target(self):
+        self.cloud.nova.hypervisors.list.return_value = []
+        planner = evacuation.EvacuationPlanner(self.cloud, self.hostname,
+                                               max_per_source=1)
+        lanes = planner.plan()
+        self.assertEqual([[("s2", None), ("s3", None),
+                           ("s1", None), ("s4", None)]], lanes)
+
+    def test_plan_no_servers(self):
+        self.cloud.nova.hypervisors.search.return_value = []
+        planner = evacuation.EvacuationPlanner(self.cloud, self.hostname)
+        self.assertEqual([], planner.plan())
+
+    def test_semaphores(self):
+        planner = evacuation.EvacuationPlanner(self.cloud, self.hostname,
+                                               max_per_target=2)
+        semaphores = planner.semaphores()
+        self.assertIs(semaphores["target-1"], semaphores["target-1"])
+        self.assertIsNot(semaphores["target-1"], semaphores["target-2"])
+        self.assertTrue(semaphores["target-1"].acquire(False))
+        self.assertTrue(semaphores["target-1"].acquire(False))
+        self.assertFalse(semaphores["target-1"].acquire(False))
+
+
+if __name__ == '__main__':
+    unittest.main()
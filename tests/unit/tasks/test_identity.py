@@ -40,6 +40,8 @@ class TestIdentity(unittest.TestCase):
                             dst_cloud=self.dst_cloud,
                             store={},
                             name="Context")
+        self.context.fetch.side_effect = \
+            lambda key, func, *args, **kwargs: func(*args, **kwargs)
 
 
 class TestMigratePasswords(TestIdentity):
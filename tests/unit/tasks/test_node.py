@@ -0,0 +1,162 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+
+import unittest
+
+from mock import Mock, patch
+
+from pumphouse.tasks import node
+
+
+class TestIsolateNodeTask(unittest.TestCase):
+    def setUp(self):
+        events_patcher = patch.object(node, "events")
+        self.events = events_patcher.start()
+        self.addCleanup(events_patcher.stop)
+
+    def test_execute(self):
+        node_task = node.isolate_node_task(
+            node.ExtractRolesFromNode(name="roles"))
+        self.assertEqual(set(["node_info"]), node_task.requires)
+        roles = node_task.execute(node_info={"roles": ["compute"]})
+        self.assertEqual(["compute"], roles)
+
+    def test_execute_failed(self):
+        node_task = node.isolate_node_task(
+            node.ExtractRolesFromNode(name="roles"))
+        self.assertIsNone(node_task.execute(node_info={}))
+        self.assertEqual(1, self.events.emit.call_count)
+
+    def test_execute_skipped(self):
+        node_task = node.isolate_node_task(
+            node.ExtractRolesFromNode(name="roles"))
+        self.assertIsNone(node_task.execute(node_info=None))
+        self.assertFalse(self.events.emit.called)
+
+
+class TestDeployChanges(unittest.TestCase):
+    def test_execute_no_nodes(self):
+        env_info = {"name": "env"}
+        deploy_changes = node.DeployChanges(Mock())
+        result = deploy_changes.execute(env_info, **{"node-pending-1": None})
+        self.assertEqual(env_info, result)
+
+
+class TestDeployChangesIsDeployed(unittest.TestCase):
+    def setUp(self):
+        self.deploy_changes = node.DeployChanges(Mock())
+        self.task = Mock()
+        self.env = Mock()
+        self.env.id = 1
+        self.nodes = [
+            {"id": 1, "cluster": 1, "status": "ready"},
+            {"id": 2, "cluster": 1, "status": "provisioning"},
+            {"id": 3, "cluster": None, "status": "discover"},
+        ]
+
+    def test_is_deployed(self):
+        self.task.get_fresh_data.return_value = {"status": "ready"}
+        self.nodes[1]["status"] = "ready"
+        self.assertTrue(self.deploy_changes.is_deployed(self.task, self.env,
+                                                        self.nodes))
+
+    def test_is_deployed_nodes_in_progress(self):
+        self.task.get_fresh_data.return_value = {"status": "ready"}
+        self.assertFalse(self.deploy_changes.is_deployed(self.task, self.env,
+                                                         self.nodes))
+
+    def test_is_deployed_no_nodes(self):
+        self.task.get_fresh_data.return_value = {"status": "ready"}
+        self.assertFalse(self.deploy_changes.is_deployed(self.task, self.env,
+                                                         []))
+
+    def test_is_deployed_error(self):
+        from pumphouse._vendor.fuelclient.cli import error
+        self.task.get_fresh_data.return_value = {"status": "error",
+                                                 "message": "Failed"}
+        with self.assertRaises(error.DeployProgressError):
+            self.deploy_changes.is_deployed(self.task, self.env, self.nodes)
+
+
+class TestWaitUnassignedNode(unittest.TestCase):
+    def make_node(self, status, mac):
+        return {
+            "status": status,
+            "meta": {"interfaces": [{"mac": mac}]},
+        }
+
+    def test_find_unassigned(self):
+        wait_unassigned = node.WaitUnassignedNode()
+        unassigned = self.make_node("discover", "aa")
+        nodes = [self.make_node("ready", "aa"),
+                 self.make_node("discover", "bb"),
+                 unassigned]
+        self.assertIs(unassigned,
+                      wait_unassigned.find_unassigned(("aa",), nodes))
+        self.assertIsNone(wait_unassigned.find_unassigned(("cc",), nodes))
+
+    @patch.object(node, "fuel")
+    def test_execute(self, fuel_mock):
+        wait_unassigned = node.WaitUnassignedNode()
+        watcher = fuel_mock.get_watcher.return_value
+        result = wait_unassigned.execute(self.make_node("ready", "aa"))
+        self.assertEqual(watcher.wait_for.return_value, result)
+        self.assertEqual(360, watcher.wait_for.call_args[1]["timeout"])
+
+
+class TestReassignNodes(unittest.TestCase):
+    def setUp(self):
+        self.context = Mock()
+        self.context.config = {
+            "source": "src",
+            "destination": "dst",
+        }
+
+    def get_tasks(self, flow):
+        return dict((t.name, t) for t in flow)
+
+    def test_reassign_nodes(self):
+        hostnames = ["node-1", "node-2", "node-3"]
+        flow = node.reassign_nodes(self.context, hostnames)
+        tasks = self.get_tasks(flow)
+
+        deploys = [t for t in tasks.itervalues()
+                   if isinstance(t, node.DeployChanges)]
+        self.assertEqual(2, len(deploys))
+        self.assertEqual(
+            set("node-pending-{}".format(h) for h in hostnames),
+            tasks["src-env-deployed-src"].requires - set(["src-env-src"]))
+        for hostname in hostnames:
+            for name in ("node-with-disks-{}", "node-with-nets-{}"):
+                self.assertIn(name.format(hostname),
+                              tasks["dst-env-deployed-dst"].requires)
+            self.assertIn("src-env-deployed-src",
+                          tasks["node-unassigned-{}".format(hostname)]
+                          .requires)
+        self.assertIsNone(
+            getattr(tasks["node-assigned-node-1"].execute, "__func__", None))
+        self.assertEqual(node.DeployChanges.execute.__func__,
+                         tasks["dst-env-deployed-dst"].execute.__func__)
+
+    def test_reassign_node(self):
+        flow = node.reassign_node(self.context, "node-1")
+        self.assertEqual("reassign-node-node-1", flow.name)
+        tasks = self.get_tasks(flow)
+        # NOTE: A single node is not isolated, its failure fails the flow.
+        self.assertEqual(node.AssignNode.execute.__func__,
+                         tasks["node-assigned-node-1"].execute.__func__)
+
+
+if __name__ == '__main__':
+    unittest.main()
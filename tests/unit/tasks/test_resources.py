@@ -0,0 +1,79 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+
+import unittest
+
+from mock import patch
+
+from pumphouse import context
+from pumphouse import fake
+from pumphouse import flows
+from pumphouse.tasks import resources
+
+
+class TestMigrateResourcesWaves(unittest.TestCase):
+    def setUp(self):
+        patcher = patch.object(flows, "LOG")
+        self.addCleanup(patcher.stop)
+        patcher.start()
+        endpoint = {
+            "username": "admin",
+            "password": "admin",
+            "tenant_name": "admin",
+            "auth_url": "http://localhost:5000/v2.0",
+        }
+        self.src = fake.Cloud.from_dict("source", fake.Identity(None), {
+            "endpoint": endpoint,
+            "fake": {"populate": {
+                "num_tenants": 2,
+                "num_servers": 5,
+            }},
+        })
+        self.dst = fake.Cloud.from_dict("destination", fake.Identity(None),
+                                        {"endpoint": endpoint})
+        self.context = context.Context({"provision_server": "image"},
+                                       self.src, self.dst)
+        self.tenant_ids = sorted(
+            tenant.id for tenant in self.src.keystone.tenants.list()
+            if tenant.name.startswith("pumphouse-fake"))
+
+    def test_waves(self):
+        waves = resources.migrate_resources_waves(self.context,
+                                                  self.tenant_ids, 2)
+        # NOTE: Servers of the first tenant go in waves of 2, 1 and those
+        #       of the second one continue the last wave.
+        self.assertEqual(3, len(waves))
+        self.assertTrue(waves[0].requires.issubset(self.context.store))
+        self.assertFalse(waves[-1].requires.issubset(self.context.store))
+        flows.run_segments(waves, self.context.store)
+        self.assertEqual(5, len(self.dst.nova.servers.list()))
+
+    def test_waves_deterministic(self):
+        graphs = []
+        for _ in xrange(2):
+            ctx = context.Context({"provision_server": "image"},
+                                  self.src, self.dst)
+            waves = resources.migrate_resources_waves(ctx,
+                                                      self.tenant_ids, 2)
+            graphs.append([sorted((u.name, v.name)
+                                  for u, v, _ in wave.iter_links())
+                           for wave in waves])
+        self.assertEqual(graphs[0], graphs[1])
+
+    def test_waves_planned(self):
+        servers = self.src.nova.servers.list()
+        self.context.store["server-{}".format(servers[0].id)] = None
+        waves = resources.migrate_resources_waves(self.context,
+                                                  self.tenant_ids, 10)
+        self.assertEqual(1, len(waves))
@@ -15,7 +15,9 @@
 import unittest
 from mock import MagicMock, Mock, patch, call
 
+from pumphouse import exceptions
 from pumphouse import task
+from pumphouse import utils
 from pumphouse.tasks import server
 
 
@@ -38,6 +40,7 @@ class TestServer(unittest.TestCase):
             "name": "test-user-name"
         }
         self.tenant_info = {
+            "id": "567",
             "name": "test-tenant-name"
         }
         self.server_nics = [{
@@ -58,6 +61,7 @@ class TestServer(unittest.TestCase):
         self.cloud.nova.servers.get.return_value = self.server
         self.cloud.nova.servers.find.return_value = self.server
         self.cloud.nova.servers.create.return_value = self.server
+        self.cloud.nova.servers.list.return_value = []
 
         self.src_cloud = Mock()
         self.dst_cloud = Mock()
@@ -134,6 +138,30 @@ class TestBootServer(TestServer):
             nics=self.server_nics)
         self.assertEqual(self.server_info, server_info)
 
+    @patch.object(utils, "time")
+    def test_create_retried(self, mock_time):
+        mock_time.time.return_value = 0
+        other = Mock(id="1", tenant_id="567")
+        other.name = self.server_info["name"]
+        self.server.name = self.server_info["name"]
+        self.server.tenant_id = "567"
+        self.cloud.nova.servers.list.side_effect = [
+            [other],
+            [other, self.server],
+        ]
+        self.cloud.nova.servers.create.side_effect = \
+            exceptions.nova_excs.RateLimit(429)
+        boot_server = server.BootServerFromImage(self.cloud)
+        server_info = boot_server.execute(self.server_info,
+                                          self.image_info,
+                                          self.flavor_info,
+                                          self.user_info,
+                                          self.tenant_info,
+                                          self.server_nics)
+        self.assertEqual(1, self.cloud.nova.servers.create.call_count)
+        self.assertEqual(1, boot_server.retries)
+        self.assertEqual(self.server_info, server_info)
+
 
 class TestTerminateServer(TestServer):
     def test_execute(self):
@@ -147,6 +175,32 @@ class TestTerminateServer(TestServer):
             self.server_info)
 
 
+class TestEvacuateServer(TestServer):
+    def test_execute(self):
+        semaphore = MagicMock()
+        evacuate_server = server.EvacuateServer(self.cloud,
+                                                target_host="host-1",
+                                                semaphore=semaphore)
+        evacuate_server.evacuation_start_event = Mock()
+        evacuate_server.evacuation_end_event = Mock()
+
+        server_info = evacuate_server.execute(self.server_info)
+        self.cloud.nova.servers.live_migrate.assert_called_once_with(
+            self.test_server_id, "host-1", True, False)
+        semaphore.__enter__.assert_called_once_with()
+        semaphore.__exit__.assert_called_once_with(None, None, None)
+        self.assertEqual(self.server_info, server_info)
+
+    def test_execute_scheduled(self):
+        evacuate_server = server.EvacuateServer(self.cloud)
+        evacuate_server.evacuation_start_event = Mock()
+        evacuate_server.evacuation_end_event = Mock()
+
+        evacuate_server.execute(self.server_info)
+        self.cloud.nova.servers.live_migrate.assert_called_once_with(
+            self.test_server_id, None, True, False)
+
+
 class TestReprovisionServer(TestServer):
 
     @patch("pumphouse.tasks.server.restore_floating_ips")
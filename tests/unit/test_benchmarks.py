@@ -0,0 +1,113 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+
+import argparse
+import unittest
+
+from benchmarks import __main__ as main
+from benchmarks import compare
+from benchmarks import suite
+from benchmarks import workloads
+
+
+class TestWorkloads(unittest.TestCase):
+    def test_make_fake_cloud(self):
+        shape = workloads.Shape(tenants=2, users=2, servers=3, secgroups=1,
+                                floating_ips=4)
+        cloud = workloads.make_fake_cloud("source", shape, seed=1)
+        self.assertEqual({}, cloud.simulation.report())
+        for tenant_id in suite.get_tenant_ids(cloud):
+            self.assertEqual(2, len(cloud.keystone.users.findall(
+                tenantId=tenant_id)))
+            self.assertEqual(1, len(cloud.nova.security_groups.findall(
+                tenant_id=tenant_id)))
+            self.assertEqual(3, len(cloud.nova.servers.findall(
+                tenant_id=tenant_id)))
+        self.assertEqual(0, len(cloud.nova.floating_ips_bulk.findall(
+            instance_uuid=None)))
+
+    def test_api_calls(self):
+        clouds = workloads.Clouds(workloads.Shape(1, 1, 1, 0, 0), seed=1)
+        clouds.src.nova.servers.list()
+        clouds.dst.keystone.tenants.list()
+        clouds.dst.keystone.users.list()
+        self.assertEqual({"source": 1, "destination": 2},
+                         dict(clouds.api_calls()))
+
+
+class TestSuite(unittest.TestCase):
+    def test_migrate_resources(self):
+        shape = workloads.Shape(tenants=2, users=1, servers=2, secgroups=1,
+                                floating_ips=1)
+        result = suite.migrate_resources(shape, seed=1)
+        self.assertEqual(11, result["resources"])
+        self.assertGreater(result["tasks"], 0)
+        self.assertGreater(result["src_api_calls"], 0)
+        self.assertGreater(result["dst_api_calls"], 0)
+
+    def test_image_streaming(self):
+        result = suite.image_streaming(None, None, size=suite.CHUNK_SIZE * 4)
+        self.assertEqual(suite.CHUNK_SIZE * 4, result["bytes"])
+
+    def test_aggregate(self):
+        self.assertEqual({"run_time": 1, "peak_memory_kb": 20, "tasks": 3},
+                         suite.aggregate([
+                             {"run_time": 2, "peak_memory_kb": 10,
+                              "tasks": 3},
+                             {"run_time": 1, "peak_memory_kb": 20,
+                              "tasks": 3},
+                         ]))
+
+
+class TestCompare(unittest.TestCase):
+    def make_run(self, **metrics):
+        return {"benchmarks": {"migrate_resources": metrics}}
+
+    def test_compare(self):
+        baseline = self.make_run(run_time=1.0, throughput_mbps=100.0,
+                                 peak_memory_kb=1000, tasks=10)
+        current = self.make_run(run_time=1.2, throughput_mbps=95.0,
+                                peak_memory_kb=1050, tasks=20)
+        rows = dict((row[1], row) for row in compare.compare(baseline,
+                                                             current))
+        self.assertTrue(rows["run_time"][-1])
+        self.assertFalse(rows["throughput_mbps"][-1])
+        self.assertFalse(rows["peak_memory_kb"][-1])
+        self.assertFalse(rows["tasks"][-1])
+
+    def test_compare_thresholds(self):
+        baseline = self.make_run(run_time=1.0, throughput_mbps=100.0)
+        current = self.make_run(run_time=1.2, throughput_mbps=80.0)
+        rows = compare.compare(baseline, current, threshold=0.3,
+                               thresholds={"throughput_mbps": 0.1})
+        self.assertEqual([("throughput_mbps", True), ("run_time", False)],
+                         [(row[1], row[-1]) for row in rows[::-1]])
+
+    def test_compare_missing(self):
+        baseline = {"benchmarks": {}}
+        current = self.make_run(run_time=1.0)
+        self.assertEqual([], compare.compare(baseline, current))
+
+    def test_relative_change(self):
+        self.assertEqual(0.5, compare.relative_change(2, 3))
+        self.assertEqual(0.0, compare.relative_change(0, 0))
+        self.assertEqual(float("inf"), compare.relative_change(0, 1))
+
+
+class TestMain(unittest.TestCase):
+    def test_shape_type(self):
+        self.assertEqual(workloads.SHAPES["tiny"], main.shape_type("tiny"))
+        self.assertEqual(workloads.Shape(1, 2, 3, 4, 5),
+                         main.shape_type("1x2x3x4x5"))
+        self.assertRaises(argparse.ArgumentTypeError, main.shape_type, "1x2")
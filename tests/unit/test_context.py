@@ -0,0 +1,67 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+
+
+import threading
+import unittest
+
+from mock import Mock, patch
+
+from pumphouse import context
+
+
+class TestContext(unittest.TestCase):
+    def setUp(self):
+        self.store = {}
+        self.context = context.Context({}, Mock(), Mock(), self.store,
+                                       planning_workers=4)
+
+    def test_claim(self):
+        self.assertTrue(self.context.claim("server-1", "1"))
+        self.assertFalse(self.context.claim("server-1", "2"))
+        self.assertEqual({"server-1": "1"}, self.store)
+
+    def test_fetch(self):
+        func = Mock(return_value="value")
+        self.assertEqual("value", self.context.fetch("key", func, 1, a=2))
+        self.assertEqual("value", self.context.fetch("key", func))
+        func.assert_called_once_with(1, a=2)
+
+    def test_prefetch(self):
+        events = [threading.Event() for _ in xrange(4)]
+
+        def fetcher(index):
+            # NOTE: Every fetcher waits for the next one, so they finish
+            #       in time only if they run at the same time.
+            def fetch(ctx):
+                if index < 3 and not events[index + 1].wait(5):
+                    raise RuntimeError()
+                ctx.fetch(index, lambda: index * 10)
+                events[index].set()
+            return fetch
+        self.context.prefetch(fetcher(i) for i in xrange(4))
+        self.assertEqual(dict((i, i * 10) for i in xrange(4)),
+                         self.context.cache)
+
+    @patch.object(context, "LOG")
+    def test_prefetch_failed(self, mock_log):
+        def fail(ctx):
+            raise ValueError()
+        self.context.prefetch([fail, lambda ctx: ctx.fetch("key", int)])
+        self.assertEqual({"key": 0}, self.context.cache)
+        self.assertEqual(1, mock_log.warning.call_count)
+
+
+if __name__ == '__main__':
+    unittest.main()
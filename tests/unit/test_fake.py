@@ -0,0 +1,330 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+
+import collections
+import json
+import random
+import unittest
+
+from mock import Mock, patch
+
+from pumphouse import exceptions
+from pumphouse import fake
+
+
+class TestStore(unittest.TestCase):
+    def setUp(self):
+        self.store = fake.Store()
+        self.first = self.make_object("1", "first", "tenant-1")
+        self.second = self.make_object("2", "second", "tenant-1")
+        self.store["1"] = self.first
+        self.store["2"] = self.second
+
+    def make_object(self, obj_id, name, tenant_id):
+        return fake.AttrDict(None, {
+            "id": obj_id,
+            "name": name,
+            "tenant_id": tenant_id,
+        })
+
+    def test_lookup(self):
+        self.assertEqual([self.first], self.store.lookup("name", "first"))
+        self.assertEqual(set(["1", "2"]),
+                         set(o.id for o in self.store.lookup("tenant_id",
+                                                             "tenant-1")))
+        self.assertEqual([], self.store.lookup("name", "third"))
+        self.assertEqual(["name", "tenant_id"], sorted(self.store.indexes))
+
+    def test_lookup_unhashable(self):
+        self.first["meta"] = {"a": 1}
+        self.assertEqual([self.first], self.store.lookup("meta", {"a": 1}))
+
+    def test_lookup_changed(self):
+        self.store.lookup("name", "first")
+        self.first.name = "renamed"
+        self.assertEqual([], self.store.lookup("name", "first"))
+        self.assertEqual([self.first], self.store.lookup("name", "renamed"))
+        self.second["name"] = "renamed"
+        self.assertEqual(2, len(self.store.lookup("name", "renamed")))
+
+    def test_lookup_added(self):
+        self.store.lookup("name", "first")
+        third = self.make_object("3", "first", "tenant-2")
+        self.store["3"] = third
+        self.assertEqual(set(["1", "3"]),
+                         set(o.id for o in self.store.lookup("name",
+                                                             "first")))
+
+    def test_pop(self):
+        self.store.lookup("name", "first")
+        self.store.pending.add("1")
+        self.assertIs(self.first, self.store.pop("1"))
+        self.assertEqual([], self.store.lookup("name", "first"))
+        self.assertEqual(set(), self.store.pending)
+        self.assertIsNone(self.store.pop("1", None))
+        self.first.name = "detached"
+        self.assertEqual([], self.store.lookup("name", "detached"))
+
+    def test_to_dict(self):
+        self.assertEqual({"id": "1", "name": "first", "tenant_id": "tenant-1"},
+                         self.first.to_dict())
+        self.assertEqual(self.first.to_dict(),
+                         json.loads(json.dumps(self.first.to_dict())))
+        self.assertNotIn("second", repr(self.first))
+
+    def test_store_dropped(self):
+        store = fake.Store()
+        obj = self.make_object("3", "third", "tenant-1")
+        store["3"] = obj
+        del store
+        obj.name = "renamed"
+        self.assertEqual("renamed", obj["name"])
+
+
+class TestCloud(unittest.TestCase):
+    def setUp(self):
+        self.config = {
+            "endpoint": {
+                "username": "admin",
+                "password": "admin",
+                "tenant_name": "admin",
+                "auth_url": "http://localhost:5000/v2.0",
+            },
+            "fake": {
+                "num_hypervisors": 3,
+                "populate": {
+                    "num_tenants": 2,
+                    "num_servers": 6,
+                    "num_floating_ips": 2,
+                },
+            },
+        }
+        self.cloud = fake.Cloud.from_dict("source", fake.Identity(None),
+                                          self.config)
+
+    def test_populate(self):
+        servers = self.cloud.nova.servers.list()
+        self.assertEqual(6, len(servers))
+        self.assertEqual(set(["ACTIVE"]), set(s.status for s in servers))
+        self.assertEqual(set(), self.cloud.nova.servers.objects.pending)
+        self.assertEqual(3, len(self.cloud.keystone.tenants.list()))
+        self.assertEqual(2, len(self.cloud.nova.floating_ips_bulk.findall(
+            instance_uuid=None)))
+        for service in self.cloud.nova.services.list():
+            hyperv, = self.cloud.nova.hypervisors.search(service.host,
+                                                         servers=True)
+            self.assertEqual(2, len(hyperv["servers"]))
+
+    def test_find(self):
+        tenant = self.cloud.keystone.tenants.find(
+            name="pumphouse-fake-tenant-1")
+        self.assertEqual(1, len(tenant.list_users()))
+        self.assertEqual(3, len(self.cloud.nova.servers.findall(
+            tenant_id=tenant.id)))
+        self.assertRaises(fake.keystone_excs.NotFound,
+                          self.cloud.keystone.tenants.find, name="missing")
+
+    def test_populate_users_secgroups(self):
+        self.config["fake"]["populate"].update(num_users=4, num_secgroups=2)
+        cloud = fake.Cloud.from_dict("source", fake.Identity(None),
+                                     self.config)
+        tenant = cloud.keystone.tenants.find(name="pumphouse-fake-tenant-1")
+        user_ids = set(user.id for user in tenant.list_users())
+        self.assertEqual(2, len(user_ids))
+        secgroup, = cloud.nova.security_groups.findall(tenant_id=tenant.id)
+        servers = cloud.nova.servers.list(search_opts={
+            "all_tenants": 1,
+            "tenant_id": tenant.id,
+        })
+        self.assertEqual(3, len(servers))
+        self.assertEqual(user_ids, set(s.user_id for s in servers))
+        for server in servers:
+            self.assertEqual([secgroup], server.list_security_group())
+
+    def test_add_floating_ip(self):
+        server = self.cloud.nova.servers.list()[0]
+        floating_ip = self.cloud.nova.floating_ips_bulk.list()[0]
+        self.cloud.nova.servers.add_floating_ip(server.id,
+                                                floating_ip.address)
+        addresses = [addr["addr"] for addrs in server.addresses.values()
+                     for addr in addrs
+                     if addr["OS-EXT-IPS:type"] == "floating"]
+        self.assertEqual([floating_ip.address], addresses)
+        self.assertEqual(server.id, floating_ip.instance_uuid)
+
+    def test_server_status(self):
+        server = self.cloud.nova.servers.create(
+            "server", self.cloud.glance.images.list()[0],
+            self.cloud.nova.flavors.list()[0])
+        self.assertEqual("BUILDING", server.status)
+        self.assertEqual(set([server.id]),
+                         self.cloud.nova.servers.objects.pending)
+        self.cloud.nova.servers.list()
+        self.assertEqual("ACTIVE", server.status)
+        self.assertEqual(set(), self.cloud.nova.servers.objects.pending)
+
+    def test_restrict(self):
+        tenant_cloud = self.cloud.restrict(
+            tenant_name="pumphouse-fake-tenant-0")
+        self.assertEqual(self.cloud.fake, tenant_cloud.fake)
+        self.assertEqual(6, len(tenant_cloud.nova.servers.list()))
+
+
+class TestBehavior(unittest.TestCase):
+    def make_behavior(self, seed=1, **kwargs):
+        return fake.Behavior(random.Random(seed), **kwargs)
+
+    def test_delay(self):
+        self.assertEqual(0, self.make_behavior().delay())
+        self.assertEqual(0.5, self.make_behavior(latency=0.5).delay())
+        uniform = {"distribution": "uniform", "min": 1, "max": 2}
+        delays = [self.make_behavior(latency=uniform).delay()
+                  for _ in xrange(2)]
+        self.assertEqual(delays[0], delays[1])
+        self.assertTrue(1 <= delays[0] <= 2)
+        normal = {"distribution": "normal", "mean": -10, "stddev": 1}
+        self.assertEqual(0, self.make_behavior(latency=normal).delay())
+
+    def test_delay_unknown(self):
+        behavior = self.make_behavior(latency={"distribution": "unknown"})
+        self.assertRaises(exceptions.ConfigError, behavior.delay)
+
+    def test_error(self):
+        behavior = self.make_behavior(errors={500: 0.2, 503: 0.3})
+        errors = collections.Counter(behavior.error()
+                                     for _ in xrange(1000))
+        self.assertEqual(set([None, 500, 503]), set(errors))
+        self.assertTrue(150 < errors[500] < 250)
+        self.assertTrue(250 < errors[503] < 350)
+
+    @patch.object(fake, "time")
+    def test_error_rate_limit(self, time_mock):
+        time_mock.time.return_value = 10.0
+        limiter = fake.RateLimiter(requests=2, period=1, status=503)
+        behavior = self.make_behavior(rate_limiter=limiter)
+        self.assertEqual([None, None, 503],
+                         [behavior.error() for _ in xrange(3)])
+        time_mock.time.return_value = 11.0
+        self.assertIsNone(behavior.error())
+
+
+class TestSimulation(unittest.TestCase):
+    def setUp(self):
+        self.config = {
+            "default": {"latency": 0.1},
+            "nova": {
+                "default": {"rate_limit": {"requests": 1}},
+                "servers.create": {"latency": 0.2, "errors": {503: 1}},
+            },
+        }
+        self.simulation = fake.Simulation(self.config, seed=1)
+        time_patcher = patch.object(fake, "time")
+        self.time = time_patcher.start()
+        self.time.time.return_value = 0
+        self.addCleanup(time_patcher.stop)
+
+    def test_behavior(self):
+        behavior = self.simulation.behavior("nova", "servers.create")
+        self.assertEqual(0.2, behavior.latency)
+        self.assertIs(behavior.rate_limiter,
+                      self.simulation.behavior("nova",
+                                               "flavors.list").rate_limiter)
+        self.assertIsNone(
+            self.simulation.behavior("glance", "images.list").rate_limiter)
+        self.assertIsNone(fake.Simulation().behavior("nova", "servers.list"))
+
+    def test_seed(self):
+        def sample(simulation):
+            rng = simulation.behavior("nova", "servers.create").rng
+            return [rng.random() for _ in xrange(5)]
+        self.assertEqual(sample(fake.Simulation(self.config, seed=1)),
+                         sample(fake.Simulation(self.config, seed=1)))
+        self.assertNotEqual(sample(fake.Simulation(self.config)),
+                            sample(fake.Simulation(self.config)))
+
+    def test_call(self):
+        func = Mock()
+        result = self.simulation.call("glance", "images.list", func, 1)
+        self.assertEqual(func.return_value, result)
+        func.assert_called_once_with(1)
+        self.time.sleep.assert_called_once_with(0.1)
+
+    def test_call_failed(self):
+        func = Mock()
+        self.simulation.call("nova", "servers.list", func)
+        self.assertRaises(fake.nova_excs.OverLimit, self.simulation.call,
+                          "nova", "servers.list", func)
+        self.time.time.return_value = 1
+        self.assertRaises(fake.nova_excs.ClientException,
+                          self.simulation.call,
+                          "nova", "servers.create", func)
+        self.assertEqual(1, func.call_count)
+        self.assertEqual({"calls": 2, "delay": 0.2, "413": 1},
+                         self.simulation.report()["nova servers.list"])
+
+    def test_call_nested(self):
+        def func():
+            return self.simulation.call("glance", "images.get", Mock())
+        self.simulation.call("glance", "images.list", func)
+        self.assertEqual(1, self.time.sleep.call_count)
+
+    def test_transfer(self):
+        simulation = fake.Simulation({"glance": {
+            "images.upload": {"bandwidth": 100},
+        }})
+        simulation.transfer("glance", "images.upload", 50)
+        self.time.sleep.assert_called_once_with(0.5)
+
+
+class TestSimulatedCloud(unittest.TestCase):
+    def make_cloud(self, fake_config):
+        config = {
+            "endpoint": {
+                "username": "admin",
+                "password": "admin",
+                "tenant_name": "admin",
+                "auth_url": "http://localhost:5000/v2.0",
+            },
+            "fake": fake_config,
+        }
+        return fake.Cloud.from_dict("source", fake.Identity(None), config)
+
+    def test_simulated_resource(self):
+        cloud = self.make_cloud({"simulation": {
+            "nova": {"floating_ips_bulk.create": {"errors": {500: 1}}},
+        }})
+        self.assertIsInstance(cloud.nova.floating_ips_bulk,
+                              fake.SimulatedResource)
+        self.assertRaises(fake.nova_excs.ClientException,
+                          cloud.nova.floating_ips_bulk.create, "10.0.0.1")
+        restricted = cloud.restrict(tenant_name="admin")
+        self.assertIs(cloud.simulation, restricted.simulation)
+
+    def test_not_simulated(self):
+        cloud = self.make_cloud({})
+        self.assertNotIsInstance(cloud.nova.servers, fake.SimulatedResource)
+
+    def test_delays(self):
+        cloud = self.make_cloud({"delays": True})
+        behavior = cloud.simulation.behavior("nova", "servers.live_migrate")
+        self.assertEqual("uniform", behavior.latency["distribution"])
+
+    def test_seed(self):
+        hosts = [[s.host for s in self.make_cloud({"seed": 1})
+                  .nova.services.list()] for _ in xrange(2)]
+        self.assertEqual(hosts[0], hosts[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
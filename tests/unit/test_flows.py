@@ -0,0 +1,227 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+
+import unittest
+
+from mock import Mock, patch
+from taskflow.patterns import linear_flow
+from taskflow import task
+
+from pumphouse import flows
+from pumphouse import limits
+from pumphouse import stats
+from pumphouse.tasks import utils as task_utils
+
+
+class Produce(task.Task):
+    def execute(self):
+        return {"id": "1", "name": "server", "addresses": {"a": [1] * 100}}
+
+
+class ConsumeId(task.Task):
+    required_fields = {"info": ("id",)}
+
+    def __init__(self, calls, *args, **kwargs):
+        super(ConsumeId, self).__init__(*args, **kwargs)
+        self.calls = calls
+
+    def execute(self, info):
+        self.calls.append(("execute", self.name, info))
+        return info["id"]
+
+    def revert(self, info, result, flow_failures):
+        self.calls.append(("revert", self.name, info))
+
+
+class ConsumeAll(task.Task):
+    def execute(self, info):
+        return dict(info)
+
+
+class Fail(task.Task):
+    def execute(self, info):
+        raise RuntimeError("failed")
+
+
+class Call(task.Task):
+    def execute(self, info):
+        stats.calls.record(("source", "nova", "servers.get"), 1)
+
+
+class TestRunFlow(unittest.TestCase):
+    def setUp(self):
+        self.calls = []
+        patcher = patch.object(flows, "LOG")
+        self.addCleanup(patcher.stop)
+        self.log = patcher.start()
+
+    def make_flow(self, *tasks):
+        flow = linear_flow.Flow("test")
+        flow.add(Produce(name="produce", provides="server"), *tasks)
+        return flow
+
+    def test_trim_release(self):
+        flow = self.make_flow(
+            ConsumeId(self.calls, name="consume-1", provides="consumed",
+                      rebind=["server"]),
+            task_utils.SyncPoint(name="sync", requires=["server"]),
+        )
+        result = flows.run_flow(flow, {"extra": 1})
+        self.assertEqual([("execute", "consume-1", {"id": "1"})],
+                         self.calls)
+        # NOTE: Results of all tasks are released once they are consumed.
+        self.assertEqual({"extra": 1}, result)
+
+    def test_no_trim_undeclared(self):
+        flow = self.make_flow(
+            ConsumeId(self.calls, name="consume-1", rebind=["server"]),
+            ConsumeAll(name="consume-2", provides="copy",
+                       rebind=["server"]),
+            ConsumeId(self.calls, name="consume-3", rebind=["copy"]),
+        )
+        flows.run_flow(flow, {})
+        info, = [info for _, name, info in self.calls
+                 if name == "consume-1"]
+        self.assertIn("addresses", info)
+
+    def test_revert_released(self):
+        flow = self.make_flow(
+            ConsumeId(self.calls, name="consume-1", provides="consumed",
+                      rebind=["server"]),
+            Fail(name="fail", rebind=["consumed"]),
+        )
+        self.assertRaises(RuntimeError, flows.run_flow, flow, {})
+        self.assertEqual([
+            ("execute", "consume-1", {"id": "1"}),
+            ("revert", "consume-1", {"id": "1"}),
+        ], self.calls)
+
+    @patch.object(stats, "calls", stats.Calls())
+    @patch.object(flows, "get_peak_memory")
+    def test_report(self, get_peak_memory):
+        get_peak_memory.side_effect = [1000, 1500]
+        flow = self.make_flow(
+            ConsumeId(self.calls, name="consume-1", rebind=["server"]),
+        )
+        stats.calls.record(("source", "nova", "servers.list"), 1)
+        report = flows.Report(flow)
+        with stats.calls.scope(report.calls):
+            stats.calls.record(("source", "nova", "servers.list"), 2)
+        stats.calls.record(("source", "nova", "servers.list"), 3)
+        releaser = Mock(released=2)
+        releaser.storage.spool.size = 100
+        report.collect(releaser)
+        self.assertEqual({
+            "flow": "test",
+            "retries": {},
+            "fuel_requests": {},
+            "cloud_calls": {"source nova servers.list": {
+                "count": 1,
+                "errors": 0,
+                "total_time": 2,
+                "avg_time": 2,
+                "max_time": 2,
+                "bytes": 0,
+                "buckets": [0] * 8 + [1] + [0] * 5,
+            }},
+            "cloud_calls_of_workers_excluded": False,
+            "peak_memory_kb": 1500,
+            "memory_growth_kb": 500,
+            "released_results": 2,
+            "spooled_bytes": 100,
+        }, report.to_dict())
+
+    @patch.object(stats, "calls", stats.Calls())
+    @patch.object(flows.Report, "log", autospec=True)
+    def test_report_calls_of_flow(self, log):
+        stats.calls.record(("source", "nova", "servers.list"), 1)
+        flow = self.make_flow(Call(name="call", rebind=["server"]))
+        flows.run_flow(flow, {})
+        report, = log.call_args[0]
+        self.assertEqual(["source nova servers.get"],
+                         report.cloud_calls.keys())
+        self.assertEqual(1, report.cloud_calls[
+            "source nova servers.get"]["count"])
+
+
+class TestThreadPoolExecutor(unittest.TestCase):
+    def test_grow(self):
+        executor = flows.ThreadPoolExecutor(1)
+        self.addCleanup(executor.shutdown)
+        with patch.object(limits, "limits", limits.Limits()) as knobs:
+            executor.submit(lambda: None).result()
+            self.assertEqual(1, executor._max_workers)
+            knobs.update({"max_tasks": 4})
+            executor.submit(lambda: None).result()
+            self.assertEqual(4, executor._max_workers)
+
+
+class TestRunSegments(unittest.TestCase):
+    def setUp(self):
+        self.calls = []
+        patcher = patch.object(flows, "LOG")
+        self.addCleanup(patcher.stop)
+        patcher.start()
+
+    def test_run_segments(self):
+        first = linear_flow.Flow("first")
+        first.add(Produce(name="produce", provides="server"),
+                  ConsumeId(self.calls, name="consume-1", rebind=["server"]))
+        second = linear_flow.Flow("second")
+        second.add(ConsumeId(self.calls, name="consume-2",
+                             provides="server-id", rebind=["server"]))
+        third = linear_flow.Flow("third")
+        third.add(ConsumeAll(name="consume-3", rebind=["extra"]))
+        store = flows.run_segments([first, second, third],
+                                   {"extra": {"a": 1}})
+        # NOTE: Results passed to later segments are not trimmed and are
+        #       dropped after the last consumer.
+        self.assertEqual([
+            ("execute", "consume-1", Produce().execute()),
+            ("execute", "consume-2", Produce().execute()),
+        ], self.calls)
+        self.assertEqual({"extra": {"a": 1}}, store)
+
+    def test_run_segments_failed(self):
+        first = linear_flow.Flow("first")
+        first.add(Produce(name="produce", provides="server"),
+                  Fail(name="fail", rebind=["server"]))
+        second = linear_flow.Flow("second")
+        second.add(ConsumeId(self.calls, name="consume", rebind=["server"]))
+        self.assertRaises(RuntimeError, flows.run_segments,
+                          [first, second], {})
+        self.assertEqual([], self.calls)
+
+
+class TestResultSpool(unittest.TestCase):
+    def test_put_get(self):
+        spool = flows.ResultSpool()
+        first = spool.put({"id": 1})
+        second = spool.put(["a", "b"])
+        self.assertEqual(["a", "b"], spool.get(second))
+        self.assertEqual({"id": 1}, spool.get(first))
+        self.assertEqual(2, spool.count)
+        spool.close()
+        self.assertIsNone(spool.file)
+
+
+class TestRequiredFields(unittest.TestCase):
+    def test_get_required_fields(self):
+        consumer = ConsumeId([], rebind=["server"])
+        self.assertEqual(("id",), flows.get_required_fields(consumer,
+                                                            "info"))
+        self.assertIsNone(flows.get_required_fields(consumer, "result"))
+        producer = Produce()
+        self.assertEqual((), flows.get_required_fields(producer, "result"))
+        self.assertIsNone(flows.get_required_fields(ConsumeAll(), "info"))
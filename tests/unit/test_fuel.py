@@ -0,0 +1,226 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+
+import threading
+import unittest
+
+from mock import Mock, patch
+
+from pumphouse._vendor.fuelclient import client
+from pumphouse import exceptions
+from pumphouse import fuel
+
+
+class TestNodeWatcher(unittest.TestCase):
+    def setUp(self):
+        self.responses = [
+            [{"id": 1, "status": "ready"}, {"id": 2, "status": "ready"}],
+            [{"id": 1, "status": "ready"}, {"id": 2, "status": "discover"}],
+        ]
+        self.fetch = Mock(side_effect=self.next_response)
+        self.watcher = fuel.NodeWatcher(self.fetch, interval=0.01)
+
+    def next_response(self):
+        if len(self.responses) > 1:
+            return self.responses.pop(0)
+        return self.responses[0]
+
+    def test_watch(self):
+        seen = threading.Event()
+
+        def next_response():
+            # NOTE: The second list is not fetched until the first one is
+            #       seen, otherwise the watcher could skip over it.
+            if len(self.responses) > 1:
+                return self.responses.pop(0)
+            seen.wait(5)
+            return self.responses[0]
+        self.fetch.side_effect = next_response
+        nodes_iter = self.watcher.watch()
+        changes = []
+        for nodes, changed in nodes_iter:
+            if nodes:
+                changes.append(sorted(n["id"] for n in changed))
+                seen.set()
+            if len(changes) == 2:
+                break
+        nodes_iter.close()
+        self.assertEqual([[1, 2], [2]], changes)
+        self.assertEqual(0, self.watcher.subscribers)
+
+    def test_wait_for(self):
+        def check(nodes):
+            for node in nodes:
+                if node["status"] == "discover":
+                    return node
+        node = self.watcher.wait_for(check, timeout=5)
+        self.assertEqual({"id": 2, "status": "discover"}, node)
+        self.assertEqual(0, self.watcher.subscribers)
+
+    def test_wait_for_timeout(self):
+        with self.assertRaises(exceptions.TimeoutException):
+            self.watcher.wait_for(lambda nodes: None, timeout=0.05)
+        self.assertEqual(0, self.watcher.subscribers)
+
+    def test_shared_requests(self):
+        results = []
+
+        def wait():
+            results.append(self.watcher.wait_for(
+                lambda nodes: nodes if len(nodes) == 2 else None,
+                timeout=5))
+        threads = [threading.Thread(target=wait) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(5, len(results))
+        self.assertLess(self.fetch.call_count, 5 * 2)
+
+    def test_tick_error(self):
+        self.fetch.side_effect = Exception("Connection refused")
+        self.watcher.tick()
+        self.assertEqual(0, self.watcher.version)
+        self.assertEqual({}, self.watcher.nodes)
+        self.assertEqual(1, self.watcher.to_dict()["failed_ticks"])
+
+    def test_tick_stats(self):
+        self.watcher.tick()
+        self.watcher.tick()
+        result = self.watcher.to_dict()
+        self.assertEqual(2, result["ticks"])
+        self.assertEqual(0, result["failed_ticks"])
+        self.assertEqual(2, result["nodes"])
+        self.assertIsNotNone(result["last_tick"])
+
+
+class TestConfigure(unittest.TestCase):
+    @patch.dict("os.environ", {}, clear=True)
+    def test_configure(self):
+        import os
+        fuel.configure({
+            "host": "10.20.0.2",
+            "port": 8000,
+            "username": "admin",
+            "password": "secret",
+            "read_timeout": 30,
+        })
+        self.assertEqual({
+            "SERVER_ADDRESS": "10.20.0.2",
+            "LISTEN_PORT": "8000",
+            "KEYSTONE_USER": "admin",
+            "KEYSTONE_PASS": "secret",
+            "READ_TIMEOUT": "30",
+        }, dict(os.environ))
+
+
+class TestClient(unittest.TestCase):
+    def setUp(self):
+        self.client = client.Client()
+        self.client._auth_required = False
+        self.client._session = Mock()
+        self.response = Mock(status_code=200)
+        self.response.json.return_value = {"id": 1}
+        self.client.session.request.return_value = self.response
+
+    def test_get_request(self):
+        result = self.client.get_request("nodes/1/")
+        self.assertEqual({"id": 1}, result)
+        self.client.session.request.assert_called_once_with(
+            "GET", self.client.api_root + "nodes/1/", data=None,
+            headers={"X-Auth-Token": ""}, timeout=self.client.timeout)
+        stats = self.client.get_stats()
+        self.assertEqual(["GET /nodes/{id}/"], stats.keys())
+        self.assertEqual(1, stats["GET /nodes/{id}/"]["count"])
+        self.assertEqual(0, stats["GET /nodes/{id}/"]["errors"])
+
+    def test_put_request(self):
+        self.client.put_request("nodes/1/", {"pending_deletion": True})
+        self.client.session.request.assert_called_once_with(
+            "PUT", self.client.api_root + "nodes/1/",
+            data='{"pending_deletion": true}',
+            headers={"X-Auth-Token": "",
+                     "Content-Type": "application/json"},
+            timeout=self.client.timeout)
+
+    def test_endpoint(self):
+        self.assertEqual(
+            "GET /nodes/",
+            self.client._endpoint("GET", self.client.api_root +
+                                  "nodes/?cluster_id=1"))
+        self.assertEqual(
+            "PUT /clusters/{id}/changes",
+            self.client._endpoint("PUT", self.client.api_root +
+                                  "clusters/12/changes"))
+
+    def test_request_unauthorized(self):
+        self.client._auth_required = True
+        keystone = Mock()
+        keystone.auth_token = "token"
+        keystone.auth_ref.will_expire_soon.return_value = False
+        self.client._keystone_client = keystone
+        unauthorized = Mock(status_code=401)
+        self.client.session.request.side_effect = [unauthorized,
+                                                   self.response]
+        self.assertEqual({"id": 1}, self.client.get_request("nodes/1/"))
+        self.assertEqual(2, self.client.session.request.call_count)
+        self.assertIsNone(keystone.auth_ref)
+        self.assertEqual(1, self.client.get_stats()
+                         ["GET /nodes/{id}/"]["errors"])
+
+    def test_get_request_cached(self):
+        with self.client.cached(ttl=60):
+            self.client.get_request("nodes/1/disks")
+            result = self.client.get_request("nodes/1/disks")
+        self.assertEqual({"id": 1}, result)
+        self.assertEqual(1, self.client.session.request.call_count)
+        self.assertEqual({"hits": 1, "misses": 1},
+                         self.client.get_cache_stats())
+
+    def test_get_request_not_cached(self):
+        with self.client.cached(ttl=60):
+            self.client.get_request("nodes/1/disks")
+        self.client.get_request("nodes/1/disks")
+        self.assertEqual(2, self.client.session.request.call_count)
+
+    def test_get_request_cache_expired(self):
+        with patch.object(client, "time") as time_mock:
+            time_mock.time.return_value = 0
+            with self.client.cached(ttl=60):
+                self.client.get_request("nodes/1/disks")
+                time_mock.time.return_value = 100
+                self.client.get_request("nodes/1/disks")
+        self.assertEqual(2, self.client.session.request.call_count)
+
+    def test_invalidate(self):
+        with self.client.cached(ttl=60):
+            for api in ("nodes/", "nodes/1/", "nodes/1/disks",
+                        "nodes/2/disks", "clusters/", "clusters/1/"):
+                self.client.get_request(api)
+            self.client.put_request("nodes/1/disks", {})
+            self.assertEqual(
+                ["clusters/", "clusters/1/", "nodes/2/disks"],
+                sorted(self.client._cache))
+            self.client.post_request("clusters/1/assignment/", {})
+            self.assertEqual(["nodes/2/disks"], sorted(self.client._cache))
+
+    def test_request_error(self):
+        self.response.status_code = 500
+        self.response.raise_for_status.side_effect = Exception("500")
+        with self.assertRaises(Exception):
+            self.client.get_request("nodes/")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+
+import unittest
+
+import gevent
+from gevent import monkey
+from mock import patch
+from taskflow.patterns import unordered_flow
+from taskflow import task
+
+from pumphouse import flows
+from pumphouse import green
+
+
+# NOTE: Other tests could patch the thread module, so the identifier of
+#       the real thread is taken from the original one.
+get_ident = monkey.get_original("thread", "get_ident")
+
+
+class Fail(task.Task):
+    def execute(self, info):
+        raise RuntimeError("failed")
+
+
+class Sleep(task.Task):
+    def __init__(self, running, *args, **kwargs):
+        super(Sleep, self).__init__(*args, **kwargs)
+        self.running = running
+
+    def execute(self):
+        self.running.append(self.name)
+        gevent.sleep(0.01)
+        result = (len(self.running), get_ident())
+        self.running.remove(self.name)
+        return result
+
+
+class TestGreen(unittest.TestCase):
+    def test_executor(self):
+        running = []
+        executor = green.GreenExecutor(max_workers=2)
+        fs = [executor.submit(Sleep(running, name=str(i)).execute)
+              for i in xrange(5)]
+        fs.append(executor.submit(Fail().execute, None))
+        done, not_done = green.wait_for_any(fs)
+        self.assertTrue(done)
+        executor.shutdown()
+        self.assertEqual(2, max(f.result()[0] for f in fs[:-1]))
+        self.assertRaises(RuntimeError, fs[-1].result)
+        self.assertEqual([], running)
+        self.assertEqual(set(), executor.greenlets)
+
+    def test_wait_for_any_timeout(self):
+        executor = green.GreenExecutor()
+        future = executor.submit(gevent.sleep, 1)
+        done, not_done = green.wait_for_any([future], timeout=0.01)
+        self.assertEqual((set(), set([future])), (done, not_done))
+        future.greenlet.kill()
+
+    @patch.object(flows, "LOG")
+    def test_run_flow(self, log):
+        running = []
+        flow = unordered_flow.Flow("green")
+        flow.add(*[Sleep(running, name=str(i), provides=str(i))
+                   for i in xrange(10)])
+        results = flows.run_flow(flow, {}, max_workers=4, green=True,
+                                 keep=[str(i) for i in xrange(10)])
+        self.assertEqual(4, max(count for count, _ in results.values()))
+        self.assertEqual(set([get_ident()]),
+                         set(ident for _, ident in results.values()))
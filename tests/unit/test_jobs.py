@@ -0,0 +1,187 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+
+import json
+import unittest
+
+import gevent
+import gevent.event
+from mock import patch
+from taskflow.patterns import linear_flow
+from taskflow import task
+
+from pumphouse.api import app
+from pumphouse.api import jobs
+from pumphouse import exceptions
+from pumphouse import flows
+
+
+class Step(task.Task):
+    def __init__(self, calls, started, *args, **kwargs):
+        super(Step, self).__init__(*args, **kwargs)
+        self.calls = calls
+        self.started = started
+
+    def execute(self):
+        self.calls.append(("execute", self.name))
+        self.started.set()
+        gevent.sleep(0.01)
+
+    def revert(self, result, flow_failures):
+        self.calls.append(("revert", self.name))
+
+
+class TestManager(unittest.TestCase):
+    def setUp(self):
+        self.manager = jobs.Manager(max_running=1, max_queued=2, history=2)
+        self.addCleanup(self.manager.stop)
+        self.release = gevent.event.Event()
+
+    def wait(self, job):
+        self.release.wait()
+
+    def test_submit(self):
+        first = self.manager.submit("migration", "1", self.wait)
+        second = self.manager.submit("migration", "2", lambda job: None)
+        gevent.sleep(0)
+        self.assertEqual((jobs.RUNNING, jobs.QUEUED),
+                         (first.state, second.state))
+        self.release.set()
+        gevent.sleep(0.01)
+        self.assertEqual([jobs.SUCCEEDED, jobs.SUCCEEDED],
+                         [job.state for job in self.manager.list()])
+        self.assertIs(second, self.manager.get(second.id))
+
+    def test_queue_full(self):
+        self.manager.submit("migration", "1", self.wait)
+        gevent.sleep(0)
+        for target in ("2", "3"):
+            self.manager.submit("migration", target, self.wait)
+        self.assertRaises(exceptions.QueueFull, self.manager.submit,
+                          "migration", "4", self.wait)
+
+    def test_cancel_queued(self):
+        self.manager.submit("migration", "1", self.wait)
+        queued = self.manager.submit("migration", "2", self.wait)
+        self.manager.cancel(queued.id)
+        self.assertEqual(jobs.CANCELLED, queued.state)
+        self.release.set()
+        gevent.sleep(0.01)
+        self.assertEqual(jobs.CANCELLED, queued.state)
+        self.assertIsNone(queued.started_at)
+
+    def test_failed(self):
+        def fail(job):
+            raise RuntimeError("failed")
+        job = self.manager.submit("migration", "1", fail)
+        with patch.object(jobs, "LOG"):
+            gevent.sleep(0.01)
+        self.assertEqual((jobs.FAILED, "failed"), (job.state, job.error))
+
+    def test_history(self):
+        submitted = []
+        for target in ("1", "2", "3"):
+            submitted.append(self.manager.submit("migration", target,
+                                                 lambda job: None))
+            gevent.sleep(0.01)
+        self.assertEqual(submitted[1:], self.manager.list())
+        self.assertRaises(exceptions.NotFound, self.manager.get,
+                          submitted[0].id)
+
+    @patch.object(flows, "LOG")
+    def test_cancel_running(self, log):
+        calls = []
+        started = gevent.event.Event()
+        flow = linear_flow.Flow("job").add(
+            Step(calls, started, name="first"),
+            Step(calls, gevent.event.Event(), name="second"))
+
+        def run(job):
+            job.track([flow])
+            flows.run_flow(flow, {}, green=True, cancel=job.cancelled,
+                           listener=job.on_task)
+
+        job = self.manager.submit("migration", "1", run)
+        started.wait(1)
+        self.manager.cancel(job.id)
+        gevent.sleep(0.05)
+        self.assertEqual(jobs.CANCELLED, job.state)
+        # NOTE: The cancelled task fails without being run and is reverted
+        #       with others.
+        self.assertEqual([("execute", "first"), ("revert", "second"),
+                          ("revert", "first")], calls)
+        self.assertEqual({"done": 1, "total": 2, "reverted": 2, "kept": 0},
+                         job.to_dict()["progress"])
+        self.assertFalse(job.partial)
+
+    @patch.object(flows, "LOG")
+    @patch.object(jobs, "LOG")
+    def test_cancel_segments(self, jobs_log, flows_log):
+        calls = []
+        started = gevent.event.Event()
+        segments = [
+            linear_flow.Flow("first").add(
+                Step(calls, gevent.event.Event(), name="first")),
+            linear_flow.Flow("second").add(
+                Step(calls, started, name="second"),
+                Step(calls, gevent.event.Event(), name="third")),
+        ]
+
+        def run(job):
+            job.track(segments)
+            flows.run_segments(segments, {}, green=True,
+                               cancel=job.cancelled, listener=job.on_task)
+
+        job = self.manager.submit("migration", "1", run)
+        started.wait(1)
+        self.manager.cancel(job.id)
+        gevent.sleep(0.05)
+        self.assertEqual(jobs.FAILED, job.state)
+        self.assertNotIn(("revert", "first"), calls)
+        self.assertTrue(job.to_dict()["partial"])
+        self.assertEqual(1, job.to_dict()["progress"]["kept"])
+
+
+class TestJobsAPI(unittest.TestCase):
+    def setUp(self):
+        self.app = app.create_app()
+        jobs.init_app(self.app)
+        self.manager = self.app.extensions["jobs"]
+        self.addCleanup(self.manager.stop)
+        self.client = self.app.test_client()
+
+    def get_json(self, response):
+        return json.loads(response.data)
+
+    def test_jobs(self):
+        job = self.manager.submit("migration", "1", lambda job: None)
+        gevent.sleep(0.01)
+        body = self.get_json(self.client.get("/jobs"))
+        self.assertEqual([job.id], [j["id"] for j in body["jobs"]])
+        body = self.get_json(self.client.get("/jobs/{}".format(job.id)))
+        self.assertEqual(jobs.SUCCEEDED, body["state"])
+        self.assertEqual(404, self.client.get("/jobs/missing").status_code)
+
+    def test_cancel(self):
+        release = gevent.event.Event()
+        self.manager.submit("migration", "1", lambda job: release.wait())
+        job = self.manager.submit("migration", "2", lambda job: None)
+        response = self.client.delete("/jobs/{}".format(job.id))
+        self.assertEqual(jobs.CANCELLED, self.get_json(response)["state"])
+        self.assertEqual(404, self.client.delete("/jobs/missing").status_code)
+        release.set()
+
+
+if __name__ == '__main__':
+    unittest.main()
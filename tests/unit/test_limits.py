@@ -0,0 +1,318 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+
+import json
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import unittest
+
+from mock import patch
+
+from pumphouse.api import app
+from pumphouse import cloud
+from pumphouse import exceptions
+from pumphouse import limits
+
+
+class TestResizableSemaphore(unittest.TestCase):
+    def test_resize(self):
+        semaphore = limits.ResizableSemaphore(1)
+        semaphore.acquire()
+        acquired = threading.Event()
+
+        def acquire():
+            with semaphore:
+                acquired.set()
+        thread = threading.Thread(target=acquire)
+        thread.start()
+        self.assertFalse(acquired.wait(0.05))
+        semaphore.resize(2)
+        self.assertTrue(acquired.wait(1))
+        thread.join()
+        semaphore.release()
+        self.assertEqual(0, semaphore.holders)
+
+    def test_unlimited(self):
+        semaphore = limits.ResizableSemaphore(0)
+        for _ in xrange(10):
+            semaphore.acquire()
+        self.assertEqual(10, semaphore.holders)
+
+
+class TestBandwidth(unittest.TestCase):
+    @patch.object(limits, "time")
+    def test_reserve(self, time_mock):
+        time_mock.time.return_value = 100.0
+        bandwidth = limits.Bandwidth(100.0)
+        self.assertEqual(0.5, bandwidth.reserve(50))
+        self.assertEqual(1.0, bandwidth.reserve(50))
+        time_mock.time.return_value = 110.0
+        self.assertEqual(0.5, bandwidth.reserve(50))
+        self.assertEqual(0, limits.Bandwidth().reserve(50))
+
+
+class TestLimits(unittest.TestCase):
+    def setUp(self):
+        self.limits = limits.Limits()
+
+    def test_update(self):
+        self.limits.update({"max_tasks": 4,
+                            "service_concurrency": {"nova": 2}})
+        result = self.limits.update({"bandwidth": 1024})
+        self.assertEqual({
+            "max_tasks": 4,
+            "service_concurrency": {"nova": 2},
+            "bandwidth": 1024,
+            "check_interval": None,
+            "adaptive": None,
+        }, result)
+        self.assertEqual(4, self.limits.tasks.limit)
+        self.assertEqual(2, self.limits.services["nova"].limit)
+        self.assertEqual(1024.0, self.limits.transfers.rate)
+        self.limits.update({"service_concurrency": {}, "max_tasks": 0})
+        self.assertIsNone(self.limits.services["nova"].limit)
+        self.assertIsNone(self.limits.tasks.limit)
+
+    def test_update_invalid(self):
+        for values in ({"unknown": 1}, {"max_tasks": -1},
+                       {"bandwidth": "fast"}, {"service_concurrency": 1},
+                       {"max_tasks": 2,
+                        "service_concurrency": {"nova": True}}):
+            self.assertRaises(exceptions.UsageError, self.limits.update,
+                              values)
+        self.assertIsNone(self.limits.max_tasks)
+
+    def test_interval(self):
+        self.assertEqual(5, self.limits.interval(5))
+        self.limits.update({"check_interval": 0.5})
+        self.assertEqual(0.5, self.limits.interval(5))
+
+    def test_call_nested(self):
+        self.limits.update({"service_concurrency": {"nova": 1}})
+        with self.limits.call("nova"):
+            with self.limits.call("nova"):
+                self.assertEqual(1, self.limits.services["nova"].holders)
+        self.assertEqual(0, self.limits.services["nova"].holders)
+
+    def test_load(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        path = os.path.join(tmpdir, "limits.yaml")
+        with open(path, "w") as f:
+            f.write("max_tasks: 3\ncheck_interval: 2\n")
+        self.limits.load(path)
+        self.assertEqual(3, self.limits.max_tasks)
+        with open(path, "w") as f:
+            f.write("max_tasks: many\n")
+        with patch.object(limits, "LOG"):
+            self.limits.load(path)
+            self.limits.load(os.path.join(tmpdir, "missing.yaml"))
+        self.assertEqual(3, self.limits.max_tasks)
+
+
+class TestAdaptiveLimiter(unittest.TestCase):
+    def setUp(self):
+        events_patcher = patch.object(limits, "events")
+        self.events = events_patcher.start()
+        self.addCleanup(events_patcher.stop)
+        self.limiter = limits.AdaptiveLimiter("source nova", initial=4,
+                                              maximum=6, cooldown=0)
+
+    def call(self, latency=0.1, overloaded=False):
+        self.limiter.acquire()
+        self.limiter.release(latency, overloaded)
+
+    def test_increase(self):
+        for _ in xrange(5):
+            self.call()
+        self.assertEqual(5, self.limiter.to_dict()["limit"])
+        for _ in xrange(100):
+            self.call()
+        self.assertEqual(6, self.limiter.to_dict()["limit"])
+        (event, state), kwargs = self.events.emit.call_args
+        self.assertEqual(("limit", "source nova", 6, 0),
+                         (event, state["name"], state["limit"],
+                          state["overloads"]))
+        self.assertEqual({"namespace": "/events"}, kwargs)
+
+    def test_decrease(self):
+        self.call(overloaded=True)
+        self.assertEqual(2, self.limiter.to_dict()["limit"])
+        self.call(overloaded=True)
+        self.call(overloaded=True)
+        self.assertEqual(1, self.limiter.to_dict()["limit"])
+        self.assertEqual(3, self.limiter.overloads)
+
+    def test_cooldown(self):
+        self.limiter.cooldown = 60
+        self.call(overloaded=True)
+        self.call(overloaded=True)
+        self.assertEqual(2, self.limiter.to_dict()["limit"])
+
+    def test_target_latency(self):
+        self.limiter.configure(target_latency=1, cooldown=0)
+        self.call(latency=0.5)
+        self.assertEqual(4, self.limiter.to_dict()["limit"])
+        self.call(latency=5)
+        self.assertEqual(2, self.limiter.to_dict()["limit"])
+
+    def test_acquire_blocks(self):
+        limiter = limits.AdaptiveLimiter("source nova", initial=1)
+        limiter.acquire()
+        acquired = threading.Event()
+
+        def acquire():
+            limiter.acquire()
+            acquired.set()
+        thread = threading.Thread(target=acquire)
+        thread.start()
+        self.assertFalse(acquired.wait(0.1))
+        limiter.release(0.1)
+        thread.join(1)
+        self.assertTrue(acquired.is_set())
+
+
+class TestAdaptiveLimits(unittest.TestCase):
+    def setUp(self):
+        self.limits = limits.Limits()
+        self.limits.update({"adaptive": {"initial": 2, "cooldown": 0}})
+
+    def test_is_overload(self):
+        error = Exception()
+        error.code = 429
+        self.assertTrue(limits.is_overload(error))
+        error.code = 500
+        self.assertFalse(limits.is_overload(error))
+        self.assertTrue(limits.is_overload(socket.timeout()))
+        self.assertFalse(limits.is_overload(ValueError()))
+
+    @patch.object(limits, "events")
+    def test_call(self, events_mock):
+        with self.limits.call("nova", "source"):
+            pass
+        error = Exception()
+        error.http_status = 503
+        try:
+            with self.limits.call("nova", "source"):
+                raise error
+        except Exception as exc:
+            self.assertIs(error, exc)
+        report = self.limits.report()
+        self.assertEqual(["source nova"], report.keys())
+        self.assertEqual(1, report["source nova"]["limit"])
+        self.assertEqual(1, report["source nova"]["overloads"])
+        self.assertEqual(2, report["source nova"]["calls"])
+
+    def test_update(self):
+        limiter = self.limits.get_limiter("source", "nova")
+        self.limits.update({"adaptive": {"maximum": 1}})
+        self.assertEqual(1, limiter.to_dict()["limit"])
+        self.limits.update({"adaptive": None})
+        self.assertIsNone(self.limits.get_limiter("source", "nova"))
+        self.assertEqual({}, self.limits.report())
+
+    def test_update_invalid(self):
+        for adaptive in ([], {"unknown": 1}, {"decrease": 2},
+                         {"maximum": -1}):
+            self.assertRaises(exceptions.UsageError, self.limits.update,
+                              {"adaptive": adaptive})
+
+
+class Manager(object):
+    def list(self, holders):
+        return holders()
+
+
+class Client(object):
+    def __init__(self):
+        self.servers = Manager()
+        self.info = {"id": 1}
+
+    def ping(self):
+        return "pong"
+
+
+class TestService(unittest.TestCase):
+    def setUp(self):
+        patcher = patch.object(limits, "limits", limits.Limits())
+        self.limits = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.limits.update({"service_concurrency": {"nova": 1}})
+        self.service = cloud.Service(Client(), "nova")
+
+    def holders(self):
+        return self.limits.services["nova"].holders
+
+    def test_call(self):
+        self.assertEqual(1, self.service.servers.list(self.holders))
+        self.assertEqual("pong", self.service.ping())
+        self.assertEqual(0, self.holders())
+
+    def test_attributes(self):
+        self.assertIsInstance(self.service.servers, cloud.Service)
+        self.assertEqual({"id": 1}, self.service.info)
+
+
+class TestWatcher(unittest.TestCase):
+    def test_load_after_signal(self):
+        watcher = limits.Watcher("limits.yaml", interval=0.01)
+        with patch.object(limits.limits, "load") as load:
+            with limits.limits.lock:
+                # NOTE: The handler does not wait for the held lock.
+                watcher.handle(None, None)
+            watcher.start()
+            for _ in xrange(100):
+                if load.called:
+                    break
+                threading.Event().wait(0.01)
+            watcher.stop()
+        load.assert_called_once_with("limits.yaml")
+        self.assertFalse(watcher.signalled)
+
+
+class TestLimitsAPI(unittest.TestCase):
+    def setUp(self):
+        patcher = patch.object(limits, "limits", limits.Limits())
+        self.limits = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = app.create_app().test_client()
+
+    def test_update(self):
+        response = self.client.put("/admin/limits",
+                                   data=json.dumps({"max_tasks": 8}))
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(8, self.limits.max_tasks)
+        body = json.loads(self.client.get("/admin/limits").data)
+        self.assertEqual(8, body["max_tasks"])
+
+    def test_adaptive(self):
+        self.limits.update({"adaptive": {}})
+        with self.limits.call("glance", "destination"):
+            pass
+        body = json.loads(self.client.get("/admin/limits/adaptive").data)
+        self.assertEqual(1, body["destination glance"]["calls"])
+
+    def test_update_invalid(self):
+        response = self.client.put("/admin/limits",
+                                   data=json.dumps({"max_tasks": -1}))
+        self.assertEqual(400, response.status_code)
+        response = self.client.put("/admin/limits", data="[]")
+        self.assertEqual(400, response.status_code)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,217 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+
+import unittest
+
+from mock import Mock, patch
+
+from pumphouse import exceptions
+from pumphouse import fake
+from pumphouse import management
+
+
+class TestCleanupFlow(unittest.TestCase):
+    def setUp(self):
+        self.cloud = Mock()
+        self.events = Mock()
+
+    def get_tasks(self, flow):
+        return dict((t.name, t) for t in flow)
+
+    def test_cleanup_flow(self):
+        flow = management.cleanup_flow(self.events, self.cloud, "source",
+                                       max_workers=4)
+        tasks = self.get_tasks(flow)
+        self.assertEqual(set(), tasks["cleanup-servers"].requires)
+        for name in ("cleanup-volumes", "cleanup-floating-ips",
+                     "cleanup-images", "cleanup-ports"):
+            self.assertEqual(set(["cleanup-servers"]), tasks[name].requires)
+        self.assertEqual(set(["cleanup-ports"]),
+                         tasks["cleanup-subnets"].requires)
+        self.assertEqual(set(["cleanup-subnets"]),
+                         tasks["cleanup-neutron-networks"].requires)
+        self.assertIn("cleanup-users", tasks["cleanup-tenants"].requires)
+        self.assertIn("cleanup-volumes", tasks["cleanup-tenants"].requires)
+        self.assertEqual(4, tasks["cleanup-servers"].max_workers)
+
+    def test_cleanup_flow_without_optional_services(self):
+        self.cloud.cinder = None
+        self.cloud.neutron = None
+        tasks = self.get_tasks(management.cleanup_flow(self.events,
+                                                       self.cloud,
+                                                       "source"))
+        self.assertNotIn("cleanup-volumes", tasks)
+        self.assertNotIn("cleanup-ports", tasks)
+        self.assertNotIn("cleanup-volumes", tasks["cleanup-tenants"].requires)
+
+
+class TestCleanupServers(unittest.TestCase):
+    def make_server(self, server_id, name):
+        server = Mock()
+        server.id = server_id
+        server.name = name
+        return server
+
+    @patch("pumphouse.utils.time")
+    def test_execute(self, time_mock):
+        time_mock.time.return_value = 0
+        servers = [self.make_server("1", "pumphouse-1"),
+                   self.make_server("2", "pumphouse-2"),
+                   self.make_server("3", "other")]
+        cloud = Mock()
+        cloud.nova.servers.list.side_effect = [
+            servers,
+            servers[1:],
+            servers[2:],
+        ]
+        cloud.nova.floating_ips_bulk.findall.return_value = []
+        events = Mock()
+        cleanup_servers = management.CleanupServers(cloud, events, "source")
+
+        deleted = cleanup_servers.execute()
+        self.assertEqual(["1", "2"], deleted)
+        self.assertEqual(2, cloud.nova.servers.delete.call_count)
+        self.assertEqual(3, cloud.nova.servers.list.call_count)
+        self.assertFalse(cloud.nova.servers.get.called)
+        self.assertEqual(2, events.emit.call_count)
+
+
+class TestBootServers(unittest.TestCase):
+    def setUp(self):
+        self.cloud = Mock()
+        self.image = Mock()
+        self.flavor = Mock()
+
+    def make_server(self, server_id, name):
+        server = Mock()
+        server.id = server_id
+        server.name = name
+        return server
+
+    def test_boot_one(self):
+        self.cloud.nova.servers.create.return_value.id = "1"
+        server_ids = management.boot_servers(self.cloud, "pumphouse-1",
+                                             self.image, self.flavor)
+        self.assertEqual(["1"], server_ids)
+        self.cloud.nova.servers.create.assert_called_once_with(
+            "pumphouse-1", self.image.id, self.flavor.id)
+        self.assertFalse(self.cloud.nova.servers.list.called)
+
+    def test_boot_batch(self):
+        self.cloud.nova.client.post.return_value = (
+            Mock(), {"reservation_id": "r-1"})
+        self.cloud.nova.servers.list.return_value = [
+            self.make_server("1", "pumphouse-1-1"),
+            self.make_server("2", "pumphouse-1-2"),
+        ]
+        server_ids = management.boot_servers(self.cloud, "pumphouse-1",
+                                             self.image, self.flavor, 2)
+        self.assertEqual(["1", "2"], server_ids)
+        body = self.cloud.nova.client.post.call_args[1]["body"]
+        self.assertEqual(2, body["server"]["max_count"])
+        self.assertTrue(body["server"]["return_reservation_id"])
+        self.cloud.nova.servers.list.assert_called_once_with(
+            search_opts={"reservation_id": "r-1"})
+
+    def test_boot_batch_fake(self):
+        cloud = fake.Cloud.from_dict("source", fake.Identity(None), {
+            "endpoint": {
+                "username": "admin",
+                "password": "admin",
+                "tenant_name": "admin",
+                "auth_url": "http://localhost:5000/v2.0",
+            },
+            "fake": {"populate": {"num_servers": 1}},
+        })
+        image = cloud.glance.images.list()[0]
+        flavor = cloud.nova.flavors.list()[0]
+        cloud.nova.servers.create("pumphouse-1-1", image, flavor)
+        first = management.boot_servers(cloud, "pumphouse-1", image, flavor,
+                                        2)
+        second = management.boot_servers(cloud, "pumphouse-1", image,
+                                         flavor, 2)
+        self.assertEqual(2, len(first))
+        self.assertEqual(2, len(second))
+        self.assertFalse(set(first) & set(second))
+
+
+class TestSetupServers(unittest.TestCase):
+    def setUp(self):
+        self.cloud = Mock()
+        self.user_cloud = Mock()
+        self.user_cloud.glance.images.list.return_value = [Mock()]
+        image = {"name": "image"}
+        self.servers = [
+            {"name": "pumphouse-{}".format(i),
+             "image": image,
+             "flavor": {"name": "small" if i < 5 else "large"}}
+            for i in xrange(7)
+        ]
+        self.setup_servers = management.SetupServers(
+            self.cloud, Mock(), "source", self.servers, Mock(),
+            batch_size=2)
+
+    def test_batches(self):
+        batches = list(self.setup_servers.batches(self.user_cloud))
+        self.assertEqual([("pumphouse-0", 2), ("pumphouse-2", 2),
+                          ("pumphouse-4", 1), ("pumphouse-5", 2)],
+                         [(name, count)
+                          for name, _, _, count in batches])
+        self.assertEqual(2, self.user_cloud.nova.flavors.find.call_count)
+
+    def make_server(self, server_id, status):
+        server = Mock()
+        server.id = server_id
+        server.status = status
+        return server
+
+    def test_pending(self):
+        self.user_cloud.nova.servers.list.return_value = [
+            self.make_server("1", "ACTIVE"),
+            self.make_server("2", "BUILD"),
+            self.make_server("3", "BUILD"),
+        ]
+        self.assertEqual(set(["2"]),
+                         self.setup_servers.pending(self.user_cloud,
+                                                    set(["1", "2"])))
+
+    def test_pending_error(self):
+        self.user_cloud.nova.servers.list.return_value = [
+            self.make_server("1", "ERROR"),
+        ]
+        self.assertRaises(exceptions.Error, self.setup_servers.pending,
+                          self.user_cloud, set(["1"]))
+
+
+class TestSetupFlow(unittest.TestCase):
+    def test_setup_flow(self):
+        tenants = [
+            {"name": "pumphouse-1", "servers": [Mock()], "volumes": []},
+            {"name": "pumphouse-2", "servers": [], "volumes": [Mock()]},
+        ]
+        flow = management.setup_flow({}, Mock(), Mock(), "source", tenants,
+                                     [], [], [], [])
+        tasks = dict((t.name, t) for t in flow)
+        self.assertEqual(set(["setup-tenant-pumphouse-1", "setup-images",
+                              "setup-flavors", "setup-networks",
+                              "setup-floating-ips"]),
+                         tasks["setup-servers-pumphouse-1"].requires)
+        self.assertEqual(set(["setup-tenant-pumphouse-2"]),
+                         tasks["setup-volumes-pumphouse-2"].requires)
+        self.assertNotIn("setup-volumes-pumphouse-1", tasks)
+        self.assertNotIn("setup-servers-pumphouse-2", tasks)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+
+import unittest
+
+from mock import patch
+
+from pumphouse.api import app
+from pumphouse.api import jobs
+from pumphouse.api import metrics
+from pumphouse import fuel
+from pumphouse import limits
+from pumphouse import stats
+
+
+class TestExposition(unittest.TestCase):
+    def test_sample(self):
+        exposition = metrics.Exposition()
+        exposition.sample("metric", 1, b="x", a='say "hi"\\')
+        exposition.sample("metric", 0.5)
+        exposition.sample("metric", None)
+        self.assertEqual('metric{a="say \\"hi\\"\\\\",b="x"} 1\n'
+                         'metric 0.5\n'
+                         'metric NaN\n', exposition.render())
+
+    def test_histogram(self):
+        exposition = metrics.Exposition()
+        exposition.histogram("latency", "Latency.", [({"service": "nova"}, {
+            "bounds": (0.1, 1.0),
+            "buckets": [1, 2, 3],
+            "total_time": 10.5,
+            "count": 6,
+        })])
+        self.assertEqual([
+            "# HELP latency Latency.",
+            "# TYPE latency histogram",
+            'latency_bucket{le="0.1",service="nova"} 1',
+            'latency_bucket{le="1.0",service="nova"} 3',
+            'latency_bucket{le="+Inf",service="nova"} 6',
+            'latency_sum{service="nova"} 10.5',
+            'latency_count{service="nova"} 6',
+        ], exposition.lines)
+
+
+class TestRender(unittest.TestCase):
+    def setUp(self):
+        for name, value in (("calls", stats.Calls()),
+                            ("tasks", stats.Calls(stats.DURATION_BUCKETS)),
+                            ("flows", stats.Gauge())):
+            patcher = patch.object(stats, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = patch.object(limits, "limits", limits.Limits())
+        self.limits = patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = patch.dict(fuel.watchers, clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get_samples(self, text):
+        return dict(line.rsplit(" ", 1) for line in text.splitlines()
+                    if not line.startswith("#"))
+
+    def test_render(self):
+        stats.calls.record(("source", "nova", "servers.list"), 0.2)
+        stats.calls.record(("source", "nova", "servers.get"), 0.3,
+                           error=True)
+        stats.calls.transfer(("source", "glance", "images.data"), 1024)
+        stats.tasks.record(("RetrieveServer",), 2)
+        self.limits.update({"adaptive": {"initial": 4}})
+        self.limits.get_limiter("destination", "glance")
+        fuel.watchers["http://fuel:8000"] = fuel.NodeWatcher(list)
+        fuel.watchers["http://fuel:8000"].tick()
+        with stats.flows:
+            samples = self.get_samples(metrics.render())
+        self.assertEqual("1", samples[
+            'pumphouse_cloud_calls_total{cloud="source",'
+            'method="servers.list",service="nova"}'])
+        self.assertEqual("1", samples[
+            'pumphouse_cloud_call_errors_total{cloud="source",'
+            'method="servers.get",service="nova"}'])
+        self.assertEqual("2", samples[
+            'pumphouse_cloud_call_duration_seconds_count{cloud="source",'
+            'service="nova"}'])
+        self.assertEqual("1", samples[
+            'pumphouse_cloud_call_duration_seconds_bucket{cloud="source",'
+            'le="0.25",service="nova"}'])
+        self.assertEqual("1024", samples[
+            'pumphouse_transfer_bytes_total{cloud="source",'
+            'method="images.data",service="glance"}'])
+        self.assertEqual("1", samples[
+            'pumphouse_tasks_total{task="RetrieveServer"}'])
+        self.assertEqual("1", samples['pumphouse_flows_running'])
+        self.assertEqual("4", samples[
+            'pumphouse_adaptive_limit{cloud="destination",'
+            'service="glance"}'])
+        self.assertEqual("1", samples[
+            'pumphouse_fuel_poller_ticks_total{'
+            'endpoint="http://fuel:8000"}'])
+        self.assertEqual("NaN", samples['pumphouse_limit_max_tasks'])
+        self.assertNotIn("pumphouse_jobs_queue_depth", samples)
+
+    def test_api(self):
+        application = app.create_app()
+        jobs.init_app(application)
+        response = application.test_client().get("/metrics")
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(metrics.CONTENT_TYPE,
+                         response.headers["Content-Type"])
+        samples = self.get_samples(response.data)
+        self.assertEqual("0", samples["pumphouse_jobs_queue_depth"])
+        self.assertEqual("0", samples['pumphouse_jobs{state="running"}'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,161 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+
+import threading
+import unittest
+
+from mock import Mock, patch
+
+from pumphouse import pipeline
+
+
+class TestRollingPipeline(unittest.TestCase):
+    def setUp(self):
+        self.cloud = Mock()
+        self.cloud.name = "source"
+        self.lock = threading.Lock()
+        self.running = {}
+        self.max_running = {}
+        self.calls = []
+        events_patcher = patch.object(pipeline, "events")
+        self.events = events_patcher.start()
+        self.addCleanup(events_patcher.stop)
+
+    def make_stage(self, name, concurrency=1, fail_on=(), cancel_on=()):
+        def run(hostname, cancel=None, listener=None, track=None):
+            if hostname in cancel_on:
+                cancel.set()
+            with self.lock:
+                self.calls.append((name, hostname))
+                self.running[name] = self.running.get(name, 0) + 1
+                self.max_running[name] = max(self.max_running.get(name, 0),
+                                             self.running[name])
+            try:
+                if hostname in fail_on:
+                    raise Exception("Failed")
+            finally:
+                with self.lock:
+                    self.running[name] -= 1
+        stage = pipeline.Stage(name, Mock(), concurrency)
+        stage.run = run
+        return stage
+
+    def test_run(self):
+        stages = [self.make_stage("evacuation"),
+                  self.make_stage("reassignment")]
+        rolling = pipeline.RollingPipeline(self.cloud, stages,
+                                           max_in_flight=2)
+        progress = rolling.run(["host-1", "host-2", "host-3"])
+
+        self.assertEqual(["host-1", "host-2", "host-3"], list(progress))
+        for stages_progress in progress.values():
+            self.assertEqual({"evacuation": pipeline.DONE,
+                              "reassignment": pipeline.DONE},
+                             dict(stages_progress))
+        self.assertEqual({"evacuation": 1, "reassignment": 1},
+                         self.max_running)
+        for hostname in ("host-1", "host-2", "host-3"):
+            self.assertLess(self.calls.index(("evacuation", hostname)),
+                            self.calls.index(("reassignment", hostname)))
+        self.assertEqual(12, self.events.emit.call_count)
+
+    def test_run_failed(self):
+        stages = [self.make_stage("evacuation", fail_on=("host-1",)),
+                  self.make_stage("reassignment")]
+        rolling = pipeline.RollingPipeline(self.cloud, stages,
+                                           max_in_flight=1)
+        progress = rolling.run(["host-1", "host-2"])
+
+        self.assertEqual({"evacuation": pipeline.FAILED,
+                          "reassignment": pipeline.SKIPPED},
+                         dict(progress["host-1"]))
+        self.assertEqual({"evacuation": pipeline.DONE,
+                          "reassignment": pipeline.DONE},
+                         dict(progress["host-2"]))
+        self.assertNotIn(("reassignment", "host-1"), self.calls)
+
+    def test_run_cancelled(self):
+        cancel = threading.Event()
+        stages = [self.make_stage("evacuation", cancel_on=("host-1",)),
+                  self.make_stage("reassignment")]
+        rolling = pipeline.RollingPipeline(self.cloud, stages,
+                                           max_in_flight=1, cancel=cancel)
+        progress = rolling.run(["host-1", "host-2"])
+
+        self.assertEqual({"evacuation": pipeline.DONE,
+                          "reassignment": pipeline.SKIPPED},
+                         dict(progress["host-1"]))
+        self.assertEqual({"evacuation": pipeline.SKIPPED,
+                          "reassignment": pipeline.SKIPPED},
+                         dict(progress["host-2"]))
+        self.assertEqual([("evacuation", "host-1")], self.calls)
+
+    def test_stage_run(self):
+        flow, store = Mock(), Mock()
+        stage = pipeline.Stage("evacuation", Mock(return_value=(flow,
+                                                                store)))
+        cancel, listener, track = Mock(), Mock(), Mock()
+        with patch.object(pipeline, "flows") as flows_mock:
+            stage.run("host-1", cancel=cancel, listener=listener,
+                      track=track)
+        track.assert_called_once_with([flow])
+        flows_mock.run_flow.assert_called_once_with(
+            flow, store, cancel=cancel, listener=listener)
+
+    def test_summary(self):
+        stages = [self.make_stage("evacuation"),
+                  self.make_stage("reassignment")]
+        rolling = pipeline.RollingPipeline(self.cloud, stages)
+        rolling.progress["host-1"] = {"evacuation": pipeline.DONE,
+                                      "reassignment": pipeline.RUNNING}
+        rolling.progress["host-2"] = {"evacuation": pipeline.RUNNING,
+                                      "reassignment": pipeline.PENDING}
+        self.assertEqual({
+            "evacuation": {pipeline.DONE: 1, pipeline.RUNNING: 1},
+            "reassignment": {pipeline.RUNNING: 1, pipeline.PENDING: 1},
+        }, rolling.summary())
+
+
+class TestSelectHosts(unittest.TestCase):
+    def setUp(self):
+        self.cloud = Mock()
+        services = []
+        for host in ("host-3", "host-1", "host-2", "host-4"):
+            service = Mock()
+            service.host = host
+            services.append(service)
+        self.cloud.nova.services.list.return_value = services
+
+    def test_select_hostnames(self):
+        hosts = pipeline.select_hosts(self.cloud, ["host-2"], 50)
+        self.assertEqual(["host-2"], hosts)
+        self.assertFalse(self.cloud.nova.services.list.called)
+
+    def test_select_percentage(self):
+        hosts = pipeline.select_hosts(self.cloud, percentage=50)
+        self.cloud.nova.services.list.assert_called_once_with(
+            binary="nova-compute")
+        self.assertEqual(["host-1", "host-2"], hosts)
+
+    def test_select_percentage_round_up(self):
+        hosts = pipeline.select_hosts(self.cloud, percentage=30)
+        self.assertEqual(["host-1", "host-2"], hosts)
+
+    def test_select_all(self):
+        hosts = pipeline.select_hosts(self.cloud)
+        self.assertEqual(["host-1", "host-2", "host-3", "host-4"], hosts)
+
+
+if __name__ == '__main__':
+    unittest.main()
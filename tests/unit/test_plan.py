@@ -0,0 +1,120 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from mock import Mock, patch
+from taskflow.patterns import linear_flow
+
+from pumphouse import context
+from pumphouse import exceptions
+from pumphouse import fake
+from pumphouse import flows
+from pumphouse import plan
+from pumphouse.tasks import flavor
+from pumphouse.tasks import resources
+from pumphouse.tasks import service
+
+
+def get_links(flow):
+    return sorted((u.name, v.name) for u, v, _ in flow.iter_links())
+
+
+class TestPlan(unittest.TestCase):
+    def setUp(self):
+        patcher = patch.object(flows, "LOG")
+        self.addCleanup(patcher.stop)
+        patcher.start()
+        endpoint = {
+            "username": "admin",
+            "password": "admin",
+            "tenant_name": "admin",
+            "auth_url": "http://localhost:5000/v2.0",
+        }
+        self.src = fake.Cloud.from_dict("source", fake.Identity(None), {
+            "endpoint": endpoint,
+            "fake": {"populate": {
+                "num_tenants": 2,
+                "num_servers": 4,
+                "num_floating_ips": 2,
+            }},
+        })
+        self.dst = fake.Cloud.from_dict("destination", fake.Identity(None),
+                                        {"endpoint": endpoint})
+        self.context = context.Context({"provision_server": "image"},
+                                       self.src, self.dst)
+        self.tenant_ids = sorted(
+            tenant.id for tenant in self.src.keystone.tenants.list()
+            if tenant.name.startswith("pumphouse-fake"))
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+
+    def make_plan(self):
+        waves = resources.migrate_resources_waves(self.context,
+                                                  self.tenant_ids, 2)
+        return waves, plan.make_plan(self.context, waves, "resources",
+                                     self.tenant_ids)
+
+    def test_load_plan(self):
+        waves, migration_plan = self.make_plan()
+        self.assertEqual(2, len(migration_plan["segments"]))
+        self.assertIn("server:{}".format(self.src.nova.servers.list()[0].id),
+                      migration_plan["inventory"])
+        segments, store = plan.load_plan(migration_plan, self.src, self.dst)
+        self.assertEqual([get_links(wave) for wave in waves],
+                         [get_links(segment) for segment in segments])
+        self.assertEqual(self.context.store, store)
+        flows.run_segments(segments, store)
+        self.assertEqual(4, len(self.dst.nova.servers.list()))
+
+    def test_save(self):
+        _, migration_plan = self.make_plan()
+        for filename in ("plan.json", "plan.json.gz"):
+            path = os.path.join(self.tmpdir, filename)
+            plan.save(migration_plan, path)
+            self.assertEqual(migration_plan["segments"],
+                             plan.load(path)["segments"])
+
+    def test_load_invalid(self):
+        path = os.path.join(self.tmpdir, "plan.json")
+        with open(path, "w") as f:
+            f.write("{")
+        self.assertRaises(exceptions.PlanError, plan.load, path)
+        self.assertRaises(exceptions.PlanError, plan.load_plan,
+                          {"version": 0}, self.src, self.dst)
+
+    def test_dump_unsupported(self):
+        flow = linear_flow.Flow("disable")
+        flow.add(service.DisableService("nova-compute", self.src,
+                                        name="disable-service"))
+        clouds = {"source": self.src}
+        self.assertRaises(exceptions.PlanError, plan.dump_flow, flow, clouds)
+        flow = linear_flow.Flow("unknown-cloud")
+        flow.add(flavor.RetrieveFlavor(Mock(), name="flavor-retrieve",
+                                       rebind=["flavor-id"]))
+        self.assertRaises(exceptions.PlanError, plan.dump_flow, flow, clouds)
+
+    def test_get_provides(self):
+        self.assertIsNone(plan.get_provides({}))
+        self.assertEqual("a", plan.get_provides({"a": None}))
+        self.assertEqual(["b", "a"], plan.get_provides({"a": 1, "b": 0}))
+        self.assertEqual(["a", "b"], plan.get_provides({"a": "a", "b": "b"}))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,144 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+
+
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+import uuid
+
+from mock import Mock, patch
+from taskflow.engines.action_engine import executor as taskflow_executor
+from taskflow.patterns import unordered_flow
+
+from pumphouse import exceptions
+from pumphouse import flows
+from pumphouse import shard
+from pumphouse import task
+
+
+class TestShard(unittest.TestCase):
+    def test_parse_shard(self):
+        self.assertEqual(shard.Shard(1, 4), shard.parse_shard("1/4"))
+        self.assertEqual("1/4", str(shard.parse_shard("1/4")))
+        for value in ("1", "a/b", "4/4", "-1/2"):
+            self.assertRaises(exceptions.UsageError, shard.parse_shard,
+                              value)
+
+    def test_select(self):
+        ids = [str(uuid.UUID(int=i)) for i in xrange(100)]
+        shards = [shard.Shard(i, 3) for i in xrange(3)]
+        parts = [s.select(ids) for s in shards]
+        self.assertEqual(sorted(ids), sorted(sum(parts, [])))
+        self.assertTrue(all(parts))
+        self.assertEqual(parts, [s.select(ids) for s in shards])
+
+
+class TestLeases(unittest.TestCase):
+    def setUp(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        self.path = os.path.join(tmpdir, "leases.db")
+        self.first = shard.Leases(self.path, owner="first",
+                                  poll_interval=0.01)
+        self.second = shard.Leases(self.path, owner="second",
+                                   poll_interval=0.01)
+
+    def test_try_acquire(self):
+        self.assertTrue(self.first.try_acquire("flavor-1"))
+        self.assertTrue(self.first.try_acquire("flavor-1"))
+        self.assertFalse(self.second.try_acquire("flavor-1"))
+        self.assertTrue(self.second.try_acquire("flavor-2"))
+        self.second.release("flavor-1")
+        self.assertFalse(self.second.try_acquire("flavor-1"))
+        self.first.release("flavor-1")
+        self.assertTrue(self.second.try_acquire("flavor-1"))
+
+    @patch.object(shard, "time")
+    def test_expired(self, mock_time):
+        mock_time.time.return_value = 100
+        self.assertTrue(self.first.try_acquire("flavor-1"))
+        mock_time.time.return_value = 100 + shard.DEFAULT_TTL + 1
+        self.assertTrue(self.second.try_acquire("flavor-1"))
+        self.assertFalse(self.first.try_acquire("flavor-1"))
+
+    def test_hold(self):
+        held = []
+
+        def hold(leases):
+            with leases.hold("image-1"):
+                held.append(leases.owner)
+                # NOTE: The other thread has to wait for the lease.
+                threading.Event().wait(0.05)
+                held.append(leases.owner)
+        threads = [threading.Thread(target=hold, args=(leases,))
+                   for leases in (self.first, self.second)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(4, len(held))
+        self.assertEqual(held[0], held[1])
+        self.assertEqual(held[2], held[3])
+        self.assertTrue(self.first.try_acquire("image-1"))
+
+    def test_hold_lost(self):
+        def take_over():
+            with self.first.connect() as conn:
+                conn.execute("UPDATE leases SET owner = ? WHERE key = ?",
+                             ("second", "image-1"))
+        with self.assertRaises(exceptions.LeaseLost):
+            with self.first.hold("image-1"):
+                take_over()
+        self.assertFalse(self.first.try_acquire("image-1"))
+
+
+class Ensure(task.BaseCloudTask):
+    shared = True
+
+    def execute(self):
+        # NOTE: Leases of another shard are passed instead of the cloud.
+        return self.cloud.try_acquire(self.name)
+
+
+class TestLeasedTaskExecutor(unittest.TestCase):
+    def test_run_flow(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        path = os.path.join(tmpdir, "leases.db")
+        leases = shard.Leases(path, owner="first")
+        other = shard.Leases(path, owner="second")
+        flow = unordered_flow.Flow("ensure")
+        flow.add(Ensure(other, name="ensure-1", provides="ensured-1"))
+        with patch.object(flows, "LOG"):
+            results = flows.run_flow(flow, {}, leases=leases,
+                                     keep=["ensured-1"])
+        self.assertEqual({"ensured-1": False}, results)
+        self.assertTrue(other.try_acquire("ensure-1"))
+
+    def test_lease_lost(self):
+        leases = Mock()
+        leases.call.side_effect = exceptions.LeaseLost("lost")
+        ensure = Ensure(None, name="ensure-1")
+        with patch.object(flows, "LOG"):
+            result = flows.execute_shared(leases, flows.execute_task,
+                                          ensure, {}, None)
+        self.assertEqual((ensure, taskflow_executor.EXECUTED), result[:2])
+        self.assertTrue(result[2].check(exceptions.LeaseLost))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,310 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+
+import io
+import json
+import unittest
+
+from mock import patch
+
+from pumphouse import cloud as pump_cloud
+from pumphouse import fake
+from pumphouse.standin import app
+from pumphouse.standin import base
+from pumphouse import stats
+
+
+def make_cloud():
+    config = {
+        "endpoint": {
+            "username": "admin",
+            "password": "admin",
+            "tenant_name": "admin",
+            "auth_url": "http://localhost:5000/v2.0",
+        },
+        "fake": {
+            "populate": {
+                "num_tenants": 1,
+                "num_servers": 3,
+                "num_images": 3,
+                "num_floating_ips": 1,
+            },
+        },
+    }
+    return fake.Cloud.from_dict("source", fake.Identity(None), config)
+
+
+class StandinTestCase(unittest.TestCase):
+    def setUp(self):
+        self.cloud = make_cloud()
+        self.client = app.create_app(self.cloud).test_client()
+        self.access = self.authenticate("admin", "admin")
+        self.token = self.access["token"]["id"]
+        self.tenant_id = self.access["token"]["tenant"]["id"]
+
+    def authenticate(self, username, tenant_name):
+        resp = self.client.post("/v2.0/tokens", data=json.dumps({"auth": {
+            "passwordCredentials": {
+                "username": username,
+                "password": "secret",
+            },
+            "tenantName": tenant_name,
+        }}))
+        if resp.status_code != 200:
+            return None
+        return json.loads(resp.data)["access"]
+
+    def request(self, method, url, body=None, **kwargs):
+        if body is not None:
+            kwargs["data"] = json.dumps(body)
+        resp = self.client.open(url, method=method,
+                                headers={"X-Auth-Token": self.token},
+                                **kwargs)
+        data = json.loads(resp.data) if resp.data else None
+        return resp, data
+
+
+class TestIdentity(StandinTestCase):
+    def test_token(self):
+        catalog = dict((service["type"], service["endpoints"][0])
+                       for service in self.access["serviceCatalog"])
+        self.assertEqual(
+            "http://localhost/compute/v2/{}".format(self.tenant_id),
+            catalog["compute"]["publicURL"])
+        self.assertEqual("http://localhost/v2.0",
+                         catalog["identity"]["adminURL"])
+        self.assertEqual(["admin"],
+                         [r["name"] for r in self.access["user"]["roles"]])
+
+    def test_token_invalid(self):
+        self.assertIsNone(self.authenticate("missing", "admin"))
+        self.assertIsNone(self.authenticate("admin", "missing"))
+
+    def test_unauthorized(self):
+        self.token = "invalid"
+        resp, body = self.request("GET", "/v2.0/tenants")
+        self.assertEqual(401, resp.status_code)
+        self.assertEqual(401, body["error"]["code"])
+
+    def test_user_token(self):
+        self.assertIsNotNone(self.authenticate("pumphouse-fake-user-0",
+                                               "pumphouse-fake-tenant-0"))
+
+    def test_tenant_users(self):
+        resp, body = self.request("POST", "/v2.0/tenants", {"tenant": {
+            "name": "tenant",
+            "description": "tenant",
+            "enabled": True,
+        }})
+        tenant_id = body["tenant"]["id"]
+        resp, body = self.request("POST", "/v2.0/users", {"user": {
+            "name": "user",
+            "password": "secret",
+            "tenantId": tenant_id,
+            "email": None,
+            "enabled": True,
+        }})
+        user_id = body["user"]["id"]
+        resp, body = self.request(
+            "GET", "/v2.0/tenants/{}/users".format(tenant_id))
+        self.assertEqual([user_id], [u["id"] for u in body["users"]])
+        self.assertNotIn("manager", body["users"][0])
+
+
+class TestCompute(StandinTestCase):
+    def url(self, path):
+        return "/compute/v2/{}{}".format(self.tenant_id, path)
+
+    def test_list_servers(self):
+        resp, body = self.request("GET", self.url("/servers/detail"))
+        self.assertEqual(3, len(body["servers"]))
+
+    def test_get_server_missing(self):
+        resp, body = self.request("GET", self.url("/servers/missing"))
+        self.assertEqual(404, resp.status_code)
+        self.assertEqual(404, body["error"]["code"])
+
+    def test_create_server(self):
+        image = self.cloud.glance.images.list()[0]
+        flavor = self.cloud.nova.flavors.list()[0]
+        resp, body = self.request("POST", self.url("/servers"), {"server": {
+            "name": "server",
+            "imageRef": image.id,
+            "flavorRef": flavor.id,
+            "min_count": 2,
+            "max_count": 2,
+        }})
+        self.assertEqual(202, resp.status_code)
+        self.assertEqual("server-1", body["server"]["name"])
+        self.assertEqual(5, len(self.cloud.nova.servers.list()))
+
+    def test_create_reservation(self):
+        image = self.cloud.glance.images.list()[0]
+        flavor = self.cloud.nova.flavors.list()[0]
+        resp, body = self.request("POST", self.url("/servers"), {"server": {
+            "name": "server",
+            "imageRef": image.id,
+            "flavorRef": flavor.id,
+            "min_count": 2,
+            "max_count": 2,
+            "return_reservation_id": True,
+        }})
+        self.assertEqual(202, resp.status_code)
+        reservation_id = body["reservation_id"]
+        resp, body = self.request("GET", self.url(
+            "/servers/detail?reservation_id={}".format(reservation_id)))
+        self.assertEqual(["server-1", "server-2"],
+                         sorted(s["name"] for s in body["servers"]))
+
+    def test_create_image(self):
+        server = self.cloud.nova.servers.list()[0]
+        resp, _ = self.request("POST",
+                               self.url("/servers/{}/action".format(
+                                   server.id)),
+                               {"createImage": {"name": "snapshot"}})
+        self.assertEqual(202, resp.status_code)
+        image_id = resp.headers["Location"].rsplit("/", 1)[-1]
+        self.assertEqual("snapshot",
+                         self.cloud.glance.images.get(image_id).name)
+
+    def test_unsupported_action(self):
+        server = self.cloud.nova.servers.list()[0]
+        resp, _ = self.request("POST",
+                               self.url("/servers/{}/action".format(
+                                   server.id)),
+                               {"reboot": {"type": "HARD"}})
+        self.assertEqual(400, resp.status_code)
+
+    def test_floating_ips_bulk(self):
+        resp, body = self.request("GET", self.url("/os-floating-ips-bulk"))
+        address = body["floating_ip_info"][0]["address"]
+        self.request("PUT", self.url("/os-floating-ips-bulk/delete"),
+                     {"ip_range": address})
+        resp, body = self.request("GET", self.url("/os-floating-ips-bulk"))
+        self.assertEqual([], body["floating_ip_info"])
+
+    def test_delete_service(self):
+        service = self.cloud.nova.services.list()[0]
+        resp, _ = self.request("DELETE", self.url(
+            "/os-services/{}".format(service.id)))
+        self.assertEqual(204, resp.status_code)
+        self.assertNotIn(service, self.cloud.nova.services.list())
+
+
+class TestImage(StandinTestCase):
+    def test_list_images(self):
+        resp, body = self.request("GET", "/image/v2/images?limit=2")
+        self.assertEqual(2, len(body["images"]))
+        resp, body = self.request("GET", "/image" + body["next"])
+        self.assertEqual(1, len(body["images"]))
+        self.assertNotIn("next", body)
+
+    def test_list_images_filtered(self):
+        resp, body = self.request(
+            "GET", "/image/v2/images?name=pumphouse-fake-image-1")
+        self.assertEqual(["pumphouse-fake-image-1"],
+                         [i["name"] for i in body["images"]])
+
+    def test_upload(self):
+        image = self.cloud.glance.images.list()[0]
+        url = "/image/v2/images/{}/file".format(image.id)
+        resp = self.client.put(url, data=b"x" * 100000, headers={
+            "X-Auth-Token": self.token,
+            "Content-Type": "application/octet-stream",
+        })
+        self.assertEqual(204, resp.status_code)
+        self.assertEqual(100000, image.size)
+        resp = self.client.get(url, headers={"X-Auth-Token": self.token})
+        self.assertEqual(100000, len(resp.data))
+
+
+class TestVolume(StandinTestCase):
+    def url(self, path):
+        return "/volume/v1/{}{}".format(self.tenant_id, path)
+
+    def test_volumes(self):
+        resp, body = self.request("POST", self.url("/volumes"), {"volume": {
+            "size": 1,
+            "display_name": "volume",
+            "status": "creating",
+        }})
+        volume_id = body["volume"]["id"]
+        resp, body = self.request("GET", self.url("/volumes/detail"))
+        self.assertEqual([volume_id], [v["id"] for v in body["volumes"]])
+        resp, body = self.request(
+            "POST", self.url("/volumes/{}/action".format(volume_id)),
+            {"os-volume_upload_image": {"image_name": "image"}})
+        image_id = body["os-volume_upload_image"]["image_id"]
+        self.assertEqual("image", self.cloud.glance.images.get(image_id).name)
+
+
+class TestNetwork(StandinTestCase):
+    def test_list(self):
+        resp, body = self.request("GET", "/network/v2.0/networks.json")
+        self.assertEqual([], body["networks"])
+
+    def test_delete(self):
+        resp, body = self.request("DELETE",
+                                  "/network/v2.0/ports/missing.json")
+        self.assertEqual(404, resp.status_code)
+        self.assertEqual("NotFound", body["NeutronError"]["type"])
+
+
+class TestIterChunked(unittest.TestCase):
+    def test_iter_chunked(self):
+        stream = io.BytesIO(b"5\r\nhello\r\n6;ext=1\r\n world\r\n"
+                            b"0\r\nTrailer: 1\r\n\r\nnext")
+        self.assertEqual([b"hello", b" world"],
+                         list(base.iter_chunked(stream)))
+        self.assertEqual(b"next", stream.read())
+
+
+class TestServer(unittest.TestCase):
+    def test_real_cloud(self):
+        with app.Server(make_cloud()) as server:
+            namespace = pump_cloud.Namespace(username="admin",
+                                             password="admin",
+                                             tenant_name="admin",
+                                             auth_url=server.auth_url)
+            cloud = pump_cloud.Cloud("source", namespace, None)
+            self.assertTrue(cloud.ping())
+            self.assertEqual(3, len(cloud.nova.servers.list()))
+            self.assertEqual(3, len(list(cloud.glance.images.list())))
+            tenant = cloud.keystone.tenants.find(
+                name="pumphouse-fake-tenant-0")
+            self.assertEqual(1, len(cloud.keystone.users.list(
+                tenant_id=tenant.id)))
+
+    @patch.object(stats, "calls", stats.Calls())
+    def test_real_cloud_calls(self):
+        with app.Server(make_cloud()) as server:
+            namespace = pump_cloud.Namespace(username="admin",
+                                             password="admin",
+                                             tenant_name="admin",
+                                             auth_url=server.auth_url)
+            cloud = pump_cloud.Cloud("source", namespace, None)
+            tenant_cloud = cloud.restrict(
+                tenant_name="pumphouse-fake-tenant-0")
+            tenant_cloud.nova.servers.list()
+            image = next(iter(cloud.glance.images.list()))
+            size = sum(len(chunk)
+                       for chunk in cloud.glance.images.data(image["id"]))
+        calls = stats.calls.get_stats()
+        self.assertEqual(1, calls[("source", "nova", "servers.list")]["count"])
+        self.assertEqual(size,
+                         calls[("source", "glance", "images.data")]["bytes"])
+
+
+if __name__ == '__main__':
+    unittest.main()
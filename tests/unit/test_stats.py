@@ -0,0 +1,127 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+
+import io
+import json
+import unittest
+
+from mock import patch
+
+from pumphouse.api import app
+from pumphouse import cloud
+from pumphouse import stats
+
+
+class TestCalls(unittest.TestCase):
+    def setUp(self):
+        self.calls = stats.Calls()
+        self.key = ("source", "nova", "servers.list")
+
+    def test_record(self):
+        self.calls.record(self.key, 0.02)
+        self.calls.record(self.key, 100, error=True)
+        self.calls.transfer(self.key, 10)
+        result = self.calls.get_stats()[self.key]
+        self.assertEqual(2, result["count"])
+        self.assertEqual(1, result["errors"])
+        self.assertEqual(100, result["max_time"])
+        self.assertEqual(50.01, result["avg_time"])
+        self.assertEqual(10, result["bytes"])
+        self.assertEqual(1, result["buckets"][2])
+        self.assertEqual(1, result["buckets"][-1])
+        self.assertEqual(2, sum(result["buckets"]))
+
+    def test_scope(self):
+        other = ("source", "nova", "flavors.list")
+        self.calls.record(other, 0.5)
+        scoped = stats.Calls()
+        with self.calls.scope(scoped):
+            self.calls.record(self.key, 1.5, error=True)
+            self.calls.transfer(self.key, 10)
+        self.calls.record(self.key, 0.5)
+        result = scoped.get_stats()
+        self.assertEqual([self.key], result.keys())
+        self.assertEqual(1, result[self.key]["count"])
+        self.assertEqual(1, result[self.key]["errors"])
+        self.assertEqual(10, result[self.key]["bytes"])
+        self.assertEqual(2, self.calls.get_stats()[self.key]["count"])
+
+    def test_meter(self):
+        data = stats.meter(io.BytesIO(b"abcdef"), self.key, self.calls)
+        self.assertEqual(b"abcd", data.read(4))
+        self.assertEqual(b"ef", data.read())
+        self.assertTrue(data.readable())
+        chunks = stats.meter([b"ab", b"c"], self.key, self.calls)
+        self.assertEqual([b"ab", b"c"], list(chunks))
+        stats.meter(b"xy", self.key, self.calls)
+        self.assertIsNone(stats.meter(None, self.key, self.calls))
+        self.assertEqual(11, self.calls.get_stats()[self.key]["bytes"])
+
+
+class Images(object):
+    def data(self, image_id):
+        return iter([b"abc", b"de"])
+
+    def upload(self, image_id, image_data):
+        return image_data.read()
+
+    def get(self, image_id):
+        raise ValueError(image_id)
+
+
+class Client(object):
+    def __init__(self):
+        self.images = Images()
+
+
+class TestService(unittest.TestCase):
+    def setUp(self):
+        patcher = patch.object(stats, "calls", stats.Calls())
+        self.calls = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.service = cloud.Service(Client(), "glance", "source")
+
+    def get_stats(self, method):
+        return self.calls.get_stats()[("source", "glance", method)]
+
+    def test_calls(self):
+        self.assertEqual([b"abc", b"de"],
+                         list(self.service.images.data("1")))
+        self.assertRaises(ValueError, self.service.images.get, "1")
+        self.assertEqual(1, self.get_stats("images.data")["count"])
+        self.assertEqual(5, self.get_stats("images.data")["bytes"])
+        self.assertEqual(1, self.get_stats("images.get")["errors"])
+
+    def test_upload(self):
+        self.service.images.upload("1", io.BytesIO(b"abcd"))
+        self.service.images.upload("1", image_data=io.BytesIO(b"ef"))
+        self.assertEqual(2, self.get_stats("images.upload")["count"])
+        self.assertEqual(6, self.get_stats("images.upload")["bytes"])
+
+
+class TestCallsAPI(unittest.TestCase):
+    def setUp(self):
+        patcher = patch.object(stats, "calls", stats.Calls())
+        self.calls = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = app.create_app().test_client()
+
+    def test_get(self):
+        self.calls.record(("source", "nova", "servers.list"), 0.1)
+        body = json.loads(self.client.get("/admin/calls").data)
+        self.assertEqual(1, body["source nova servers.list"]["count"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -58,6 +58,7 @@ class TestWaitFor(unittest.TestCase):
 
         time_patcher = patch("pumphouse.utils.time")
         self.time = time_patcher.start()
+        self.addCleanup(time_patcher.stop)
         self.time.time.side_effect = [100, 200, 300]
 
     def test_wait_for_success_on_first_pass(self):
@@ -109,5 +110,66 @@ class TestWaitFor(unittest.TestCase):
                 check_interval=self.check_interval
             )
 
+
+class TestBackoff(unittest.TestCase):
+    def test_delays(self):
+        backoff = utils.Backoff(initial=1, maximum=5, multiplier=2,
+                                jitter=0, max_retries=5)
+        self.assertEqual([1, 2, 4, 5, 5], list(backoff.delays()))
+
+    @patch("pumphouse.utils.random")
+    def test_delays_jitter(self, mock_random):
+        mock_random.uniform.side_effect = lambda a, b: b
+        backoff = utils.Backoff(initial=2, maximum=10, jitter=0.5,
+                                max_retries=3)
+        self.assertEqual([3, 6, 10], list(backoff.delays()))
+
+
+class DummyTask(object):
+    def __init__(self, results):
+        self.results = results
+
+    @utils.retry_on(excs.Conflict,
+                    backoff=utils.Backoff(max_elapsed=100, max_retries=3))
+    def call(self):
+        result = self.results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+class TestRetryOn(unittest.TestCase):
+    def setUp(self):
+        time_patcher = patch("pumphouse.utils.time")
+        self.time = time_patcher.start()
+        self.addCleanup(time_patcher.stop)
+        self.time.time.return_value = 0
+
+    def test_retry_on_success(self):
+        task = DummyTask([excs.Conflict(), excs.Conflict(), "result"])
+        self.assertEqual("result", task.call())
+        self.assertEqual(2, task.retries)
+        self.assertEqual(2, self.time.sleep.call_count)
+
+    def test_retry_on_exhausted(self):
+        task = DummyTask([excs.Conflict()] * 5)
+        with self.assertRaises(excs.Conflict):
+            task.call()
+        self.assertEqual(3, task.retries)
+        self.assertEqual(1, len(task.results))
+
+    def test_retry_on_elapsed(self):
+        self.time.time.side_effect = [0, 90, 180]
+        task = DummyTask([excs.Conflict()] * 5)
+        with self.assertRaises(excs.Conflict):
+            task.call()
+        self.assertEqual(1, task.retries)
+
+    def test_retry_on_unexpected(self):
+        task = DummyTask([excs.NotFound(), "result"])
+        with self.assertRaises(excs.NotFound):
+            task.call()
+        self.assertFalse(hasattr(task, "retries"))
+
 if __name__ == '__main__':
     unittest.main()
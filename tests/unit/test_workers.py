@@ -0,0 +1,224 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+
+import threading
+import unittest
+import uuid
+
+from mock import Mock, patch
+from taskflow import task as taskflow_task
+from taskflow.engines.worker_based import protocol as pr
+from taskflow.patterns import linear_flow
+
+from pumphouse import exceptions
+from pumphouse import flows
+from pumphouse import stats
+from pumphouse import task
+from pumphouse import workers
+
+
+class Double(task.BaseCloudTask):
+    def execute(self, value):
+        return {"value": value * 2, "cloud": self.cloud.name,
+                "thread": threading.current_thread().name}
+
+
+class Add(task.BaseCloudsTask):
+    def execute(self, doubled, value):
+        return doubled["value"] + value
+
+
+class Local(task.BaseCloudTask):
+    def __init__(self, cloud, offset, *args, **kwargs):
+        super(Local, self).__init__(cloud, *args, **kwargs)
+        self.offset = offset
+
+    def execute(self, total):
+        return total + self.offset
+
+
+class Circular(task.BaseCloudTask):
+    def execute(self):
+        result = {}
+        result["self"] = result
+        return result
+
+
+class Call(task.BaseCloudTask):
+    def __init__(self, cloud, *args, **kwargs):
+        # NOTE: Tasks which take other arguments run locally.
+        super(Call, self).__init__(cloud, *args, **kwargs)
+
+    def execute(self):
+        stats.calls.record((self.cloud.name, "nova", "servers.get"), 1)
+
+
+class Plain(taskflow_task.Task):
+    def execute(self):
+        pass
+
+
+def make_cloud(name):
+    cloud = Mock()
+    cloud.name = name
+    return cloud
+
+
+class TestEndpoints(unittest.TestCase):
+    def setUp(self):
+        self.src = make_cloud("source")
+        self.dst = make_cloud("destination")
+
+    def test_get_endpoint_name(self):
+        self.assertEqual("tests.unit.test_workers.Double@source",
+                         workers.get_endpoint_name(Double(self.src)))
+        self.assertEqual("tests.unit.test_workers.Add@destination,source",
+                         workers.get_endpoint_name(Add(self.dst, self.src)))
+
+    def test_is_remote(self):
+        self.assertTrue(workers.is_remote(Double(self.src)))
+        self.assertTrue(workers.is_remote(Add(self.src, self.dst)))
+        self.assertFalse(workers.is_remote(Local(self.src, 1)))
+        self.assertFalse(workers.is_remote(Plain()))
+
+    def test_make_endpoints(self):
+        endpoints = workers.make_endpoints([Double, Add], self.src, self.dst)
+        self.assertEqual(["tests.unit.test_workers.Double@source",
+                          "tests.unit.test_workers.Double@destination",
+                          "tests.unit.test_workers.Add@source,destination",
+                          "tests.unit.test_workers.Add@destination,source"],
+                         [endpoint.name for endpoint in endpoints])
+        atom = endpoints[3]._get_task("add")
+        self.assertEqual("add", atom.name)
+        self.assertIs(self.dst, atom.src_cloud)
+        self.assertIs(self.src, atom.dst_cloud)
+
+    def test_load_task_classes(self):
+        classes = workers.load_task_classes()
+        self.assertIn(Double, classes)
+        self.assertNotIn(Local, classes)
+        self.assertTrue(any(cls.__module__.startswith("pumphouse.tasks.")
+                            for cls in classes))
+
+
+class TestRequest(unittest.TestCase):
+    def make_request(self):
+        return workers.Request(Double(make_cloud("source"), name="double"),
+                               "double@source", str(uuid.uuid4()),
+                               pr.EXECUTE, {"value": 1}, None, 60, 10)
+
+    @patch.object(workers, "time")
+    def test_lost(self, time_mock):
+        time_mock.time.return_value = 100
+        request = self.make_request()
+        self.assertEqual("double@source", request.task_cls)
+        request.transition_and_log_error(pr.PENDING)
+        request.transition_and_log_error(pr.RUNNING)
+        time_mock.time.return_value = 105
+        self.assertFalse(request.expired)
+        request.seen()
+        time_mock.time.return_value = 120
+        self.assertTrue(request.lost)
+        self.assertTrue(request.expired)
+
+    def test_retry(self):
+        request = self.make_request()
+        retried = request.retry()
+        self.assertEqual(request.uuid, retried.uuid)
+        self.assertEqual(pr.WAITING, retried.state)
+        self.assertIs(request.result, retried.result)
+        self.assertEqual(1, retried.resends)
+        self.assertEqual(2, retried.retry().resends)
+
+
+class TestRunFlow(unittest.TestCase):
+    def setUp(self):
+        self.src = make_cloud("source")
+        self.dst = make_cloud("destination")
+        self.broker = workers.Broker("memory://",
+                                     topic="test-{}".format(uuid.uuid4()))
+        self.worker = self.broker.worker(self.src, self.dst, threads=2)
+        thread = threading.Thread(target=self.worker.run)
+        thread.daemon = True
+        thread.start()
+        self.worker.wait()
+        self.addCleanup(thread.join)
+        self.addCleanup(self.worker.stop)
+
+    def test_run_flow(self):
+        flow = linear_flow.Flow("workers").add(
+            Double(self.src, name="double", provides="doubled"),
+            Add(self.dst, self.src, name="add", provides="total"),
+            Local(self.dst, 1, name="local", provides="result"))
+        results = flows.run_flow(flow, {"value": 2}, broker=self.broker,
+                                 keep=("doubled", "result"))
+        self.assertEqual(4, results["doubled"]["value"])
+        self.assertEqual("source", results["doubled"]["cloud"])
+        self.assertNotEqual(threading.current_thread().name,
+                            results["doubled"]["thread"])
+        self.assertEqual(7, results["result"])
+
+    @patch.object(stats, "calls", stats.Calls())
+    @patch.object(flows.Report, "log", autospec=True)
+    def test_local_calls_reported(self, log):
+        flow = linear_flow.Flow("workers").add(
+            Call(self.dst, name="call"))
+        flows.run_flow(flow, {}, broker=self.broker)
+        report, = log.call_args[0]
+        self.assertEqual(1, report.cloud_calls[
+            "destination nova servers.get"]["count"])
+        self.assertTrue(report.to_dict()["cloud_calls_of_workers_excluded"])
+
+    @patch.object(stats, "tasks", stats.Calls())
+    def test_local_tasks_counted(self):
+        flow = linear_flow.Flow("workers").add(
+            Local(self.dst, 1, name="local", provides="result"))
+        flows.run_flow(flow, {"total": 1}, broker=self.broker)
+        self.assertEqual(1, stats.tasks.get_stats()[("Local",)]["count"])
+
+    def test_result_not_sent(self):
+        flow = linear_flow.Flow("workers").add(
+            Circular(self.src, name="circular"))
+        with patch.object(workers, "LOG"):
+            self.assertRaises(Exception, flows.run_flow, flow, {},
+                              broker=self.broker)
+
+
+class TestWorkerTaskExecutor(unittest.TestCase):
+    def test_resubmit_lost(self):
+        executor = workers.WorkerTaskExecutor("uuid", "exchange", ["topic"],
+                                              url="memory://")
+        request = Mock()
+        request.lost = True
+        request.resends = 0
+        with patch.object(executor, "_submit_request") as submit:
+            executor._handle_expired_request(request)
+        submit.assert_called_once_with(request.retry.return_value)
+
+    def test_fail_lost(self):
+        executor = workers.WorkerTaskExecutor("uuid", "exchange", ["topic"],
+                                              url="memory://", max_resends=2)
+        request = Mock(lost=True, resends=2)
+        with patch.object(executor, "_submit_request") as submit, \
+                patch.object(workers, "LOG"):
+            executor._handle_expired_request(request)
+        self.assertFalse(submit.called)
+        self.assertEqual((pr.FAILURE,),
+                         request.transition_and_log_error.call_args[0])
+        failure, = request.set_result.call_args[0]
+        self.assertTrue(failure.check(exceptions.WorkerLost))
+
+
+if __name__ == '__main__':
+    unittest.main()